@@ -247,8 +247,18 @@ class SumNetworkBikeSharing extends HTMLElement {
         console.error("Failed to load stops:", err);
       });
 
-    const fetchItineraries = fetch(path + "itineraries.geojson")
-      .then((res) => res.json())
+    // Prefer the TopoJSON itineraries (shared segments stored once), fall back to GeoJSON
+    const fetchItineraries = fetch(path + "itineraries.topojson")
+      .then((res) => {
+        if (!res.ok || typeof topojson === "undefined") throw new Error();
+        return res.json();
+      })
+      .then((topology) =>
+        topojson.feature(topology, topology.objects.itineraries)
+      )
+      .catch(() =>
+        fetch(path + "itineraries.geojson").then((res) => res.json())
+      )
       .then((data) => {
         if (!this.layers.itineraries) {
           this.layers.itineraries = L.layerGroup();
@@ -23,8 +23,23 @@ setup(
         "geopandas",
         "pandas",
         "build",
-        "h3"
+        "h3",
+        "numpy",
+        "scipy"
     ],
+    extras_require={
+        "fast": ["orjson"],
+        "tiles": ["mapbox-vector-tile", "pmtiles"],
+        "geoparquet": ["pyarrow"],
+        "compression": ["brotli"],
+    },
+    entry_points={
+        "console_scripts": [
+            "sum-gtfs-geojson-variants=sum_gtfs_geojson.variant_generator:main",
+            "sum-gtfs-geojson-server=sum_gtfs_geojson.server.feature_server:main",
+            "sum-gtfs-geojson-benchmark=sum_gtfs_geojson.benchmark.pipeline:main",
+        ],
+    },
     python_requires=">=3.8",
     classifiers=[
         "Programming Language :: Python :: 3",
@@ -1,8 +1,28 @@
-from .shared_mobility_manager import SharedMobilityManager
+from typing import TYPE_CHECKING
 from .enums import LivingLabsCity, DataType
-from .utils import GeoToolkit
-from .models import SumGtfsBaseModel, UrbanMobilitySystem, Stop, Route, Trip, Agency, StationInfoStatus, BikeTrip, Ridership, GTFSNetwork, StopTime, HexGrid, HexCell
-__all__ = ["SharedMobilityManager", "LivingLabsCity", "DataType", "GeoToolkit",
+from .lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .shared_mobility_manager import SharedMobilityManager
+    from .variant_generator import VariantGenerator
+    from .utils import GeoToolkit, ODMatrix
+    from .exporter import GeoJSONWriter
+    from .loader import ExportedDataLoader
+    from .models import SumGtfsBaseModel, UrbanMobilitySystem, Stop, Route, Trip, Agency, StationInfoStatus, BikeTrip, Ridership, GTFSNetwork, StopTime, Transfer, HexGrid, HexCell, HexPyramid
+
+# geopandas, shapely, h3, scipy and pandas are imported with the first of these names used, see lazy_exports
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "SharedMobilityManager": ".shared_mobility_manager",
+    "VariantGenerator": ".variant_generator",
+    **dict.fromkeys(["GeoToolkit", "ODMatrix"], ".utils"),
+    "GeoJSONWriter": ".exporter",
+    "ExportedDataLoader": ".loader",
+    **dict.fromkeys(["SumGtfsBaseModel", "UrbanMobilitySystem", "Stop", "Route", "Trip", "Agency", "StationInfoStatus",
+                     "BikeTrip", "Ridership", "GTFSNetwork", "StopTime", "Transfer", "HexGrid", "HexCell", "HexPyramid"],
+                    ".models"),
+})
+
+__all__ = ["SharedMobilityManager", "VariantGenerator", "LivingLabsCity", "DataType", "GeoToolkit", "ODMatrix", "GeoJSONWriter", "ExportedDataLoader",
            "SumGtfsBaseModel",
            "UrbanMobilitySystem",
            "Stop",
@@ -14,5 +34,7 @@ __all__ = ["SharedMobilityManager", "LivingLabsCity", "DataType", "GeoToolkit",
            "Ridership",
            "GTFSNetwork",
            "StopTime",
+           "Transfer",
            "HexGrid",
-           "HexCell"]
+           "HexCell",
+           "HexPyramid"]
@@ -0,0 +1,19 @@
+from typing import TYPE_CHECKING
+from sum_gtfs_geojson.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .synthetic import SyntheticCity, SyntheticCounts, SyntheticLoader
+    from .pipeline import (BENCHMARK_SCALES, StageResult, ScaleResult, benchmark_scale, run_benchmarks,
+                           compare_results)
+    from .import_time import IMPORT_BUDGETS, ImportResult, measure_import, benchmark_imports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    **dict.fromkeys(["SyntheticCity", "SyntheticCounts", "SyntheticLoader"], ".synthetic"),
+    **dict.fromkeys(["BENCHMARK_SCALES", "StageResult", "ScaleResult", "benchmark_scale", "run_benchmarks",
+                     "compare_results"], ".pipeline"),
+    **dict.fromkeys(["IMPORT_BUDGETS", "ImportResult", "measure_import", "benchmark_imports"], ".import_time"),
+})
+
+__all__ = ["SyntheticCity", "SyntheticCounts", "SyntheticLoader", "BENCHMARK_SCALES", "StageResult",
+           "ScaleResult", "benchmark_scale", "run_benchmarks", "compare_results",
+           "IMPORT_BUDGETS", "ImportResult", "measure_import", "benchmark_imports"]
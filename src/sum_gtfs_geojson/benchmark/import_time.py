@@ -0,0 +1,97 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ("geopandas", "shapely", "h3", "scipy", "pandas")
+GEO_MODULES = ("geopandas", "shapely", "h3", "scipy")
+DEFAULT_IMPORT_REPEAT = 3
+
+# Import statement -> (budget in seconds, heavy modules it must not import)
+IMPORT_BUDGETS: Dict[str, Tuple[float, Sequence[str]]] = {
+    "import sum_gtfs_geojson": (0.05, HEAVY_MODULES),
+    "from sum_gtfs_geojson import DataType, LivingLabsCity": (0.05, HEAVY_MODULES),
+    "from sum_gtfs_geojson.instrumentation import LoadReport, stage": (0.05, HEAVY_MODULES),
+    "from sum_gtfs_geojson.exporter import GeoJSONWriter, atomic_write": (0.2, HEAVY_MODULES),
+    "from sum_gtfs_geojson.models import Stop, GTFSNetwork": (0.4, HEAVY_MODULES),
+    "from sum_gtfs_geojson.models import UrbanMobilitySystem": (0.6, GEO_MODULES),
+}
+
+_MEASURE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+exec(sys.argv[1])
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "modules": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+
+@dataclass
+class ImportResult:
+    """
+    Import time of a statement in a fresh interpreter, checked against its budget.
+
+    Attributes:
+        statement (str): The import statement, e.g. "import sum_gtfs_geojson".
+        seconds (float): Best wall time of the import over the repeats, without the interpreter startup.
+        budget_seconds (float): Maximum allowed time.
+        heavy_modules (List[str]): Heavy dependencies (geopandas, shapely, h3, scipy, pandas) the import loaded.
+        forbidden_modules (List[str]): The heavy dependencies the import must not load.
+    """
+    statement: str
+    seconds: float
+    budget_seconds: float
+    heavy_modules: List[str] = field(default_factory=list)
+    forbidden_modules: List[str] = field(default_factory=list)
+
+    @property
+    def violations(self) -> List[str]:
+        """
+        Why the import is over budget, empty when it is not.
+        """
+        violations = [f"imports {module}" for module in self.heavy_modules if module in self.forbidden_modules]
+        if self.seconds > self.budget_seconds:
+            violations.append(f"{self.seconds * 1000:.0f} ms > {self.budget_seconds * 1000:.0f} ms")
+        return violations
+
+
+def measure_import(statement: str, repeat: int = DEFAULT_IMPORT_REPEAT) -> Tuple[float, List[str]]:
+    """
+    Time an import statement in new interpreters, so nothing is imported beforehand.
+
+    Args:
+        statement: The import statement.
+        repeat: Number of interpreters, the best time is kept. Defaults to 3.
+
+    Returns:
+        Tuple[float, List[str]]: The best time in seconds, and the heavy dependencies loaded by the import.
+    """
+    best, modules = float("inf"), []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, "-c", _MEASURE_SCRIPT, statement, *HEAVY_MODULES],
+                                   capture_output=True, text=True, check=True)
+        measure = json.loads(completed.stdout.strip().splitlines()[-1])
+        best, modules = min(best, measure["seconds"]), measure["modules"]
+    return best, modules
+
+
+def benchmark_imports(budgets: Optional[Dict[str, Tuple[float, Sequence[str]]]] = None,
+                      repeat: int = DEFAULT_IMPORT_REPEAT, budget_scale: float = 1.0) -> List[ImportResult]:
+    """
+    Measure the import time of the package entry points, so a module importing geopandas, shapely, h3 or
+    scipy at the top is caught before it slows down every `import sum_gtfs_geojson`.
+
+    Args:
+        budgets: Budget and forbidden heavy modules of every import statement. Defaults to IMPORT_BUDGETS.
+        repeat: Number of measures of every statement, the best one is kept. Defaults to 3.
+        budget_scale: Multiplier of the budgets, e.g. 2 on a slow machine. Defaults to 1.
+
+    Returns:
+        List[ImportResult]: One result per statement, in the order of the budgets.
+    """
+    results = []
+    for statement, (budget, forbidden) in (budgets or IMPORT_BUDGETS).items():
+        seconds, modules = measure_import(statement, repeat)
+        results.append(ImportResult(statement, seconds, budget * budget_scale, modules, list(forbidden)))
+    return results
@@ -0,0 +1,318 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext, redirect_stdout
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from sum_gtfs_geojson.exporter import atomic_write
+from sum_gtfs_geojson.instrumentation import max_rss_mb
+from sum_gtfs_geojson.exporter.manifest import library_version
+from sum_gtfs_geojson.models import UrbanMobilitySystem, GTFSNetwork
+from .synthetic import SyntheticCity, SyntheticLoader
+from .import_time import DEFAULT_IMPORT_REPEAT, benchmark_imports
+
+BENCHMARK_SCALES = (1, 10, 100)
+RESULTS_SCHEMA_VERSION = 1
+DEFAULT_REGRESSION_TOLERANCE = 0.10  # 10% slower
+MIN_COMPARED_SECONDS = 0.05  # shorter stages are too noisy to compare
+
+
+@dataclass
+class StageResult:
+    """
+    Measures of one pipeline stage.
+
+    Attributes:
+        name (str): Name of the stage, e.g. "load_stop_times".
+        seconds (float): Wall time.
+        rows (int): Number of rows or objects produced.
+        rows_per_second (float): rows / seconds.
+        max_rss_mb (float): Peak resident memory of the process at the end of the stage.
+        rss_growth_mb (float): Increase of the peak resident memory during the stage.
+        tracemalloc_peak_mb (float, optional): Peak Python allocations during the stage, with trace_memory.
+    """
+    name: str
+    seconds: float
+    rows: int
+    rows_per_second: float
+    max_rss_mb: float
+    rss_growth_mb: float
+    tracemalloc_peak_mb: Optional[float] = None
+
+
+@dataclass
+class ScaleResult:
+    """
+    Measures of every stage of the pipeline on a synthetic city.
+    """
+    scale: float
+    seed: int
+    counts: Dict[str, int]
+    stages: List[StageResult] = field(default_factory=list)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(stage.seconds for stage in self.stages)
+
+
+class _StageRunner:
+    """
+    Run the stages of a scale and record their measures.
+    """
+
+    def __init__(self, result: ScaleResult, trace_memory: bool, quiet: bool):
+        self.result = result
+        self.trace_memory = trace_memory
+        self.quiet = quiet
+
+    def __call__(self, name: str, function: Callable, rows: Optional[Callable] = None):
+        """
+        Run a stage, the number of rows being len(result) unless `rows` computes it from the result.
+        """
+        rss_before = max_rss_mb()
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()) if self.quiet else nullcontext():
+            value = function()
+        seconds = time.perf_counter() - start
+        peak = None
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+        count = int(rows(value) if rows is not None else (len(value) if value is not None else 0))
+        rss_after = max_rss_mb()
+        self.result.stages.append(StageResult(
+            name=name, seconds=round(seconds, 4), rows=count,
+            rows_per_second=round(count / seconds, 1) if seconds > 0 else 0.0,
+            max_rss_mb=round(rss_after, 1), rss_growth_mb=round(rss_after - rss_before, 1),
+            tracemalloc_peak_mb=None if peak is None else round(peak, 1)))
+        print(f"  {name}: {seconds:.3f} s, {count} rows, peak RSS {rss_after:.0f} MB")
+        return value
+
+
+def benchmark_scale(scale: float, seed: int = 0, work_dir: Optional[str] = None, trace_memory: bool = False,
+                    quiet: bool = True) -> ScaleResult:
+    """
+    Generate a synthetic city and time every stage of the pipeline on it: data generation, every loader
+    method, itinerary building, hex grid generation, the derived structures and the GeoJSON export.
+
+    Args:
+        scale: Multiplier of the Geneva feed shape, see SyntheticCity.
+        seed: Seed of the generator. Defaults to 0.
+        work_dir: Folder of the generated files and exports. Defaults to a temporary folder, removed after.
+        trace_memory: Also measure the peak Python allocations with tracemalloc. It slows the stages down,
+            so timings are comparable only between runs with the same setting. Defaults to False.
+        quiet: Hide the progress printed by the loaders and exporters. Defaults to True.
+
+    Returns:
+        ScaleResult: The measures of every stage.
+    """
+    if work_dir is None:
+        with tempfile.TemporaryDirectory(prefix=f"sum_gtfs_benchmark_{scale}x_") as folder:
+            return benchmark_scale(scale, seed, folder, trace_memory, quiet)
+
+    city = SyntheticCity(scale, seed)
+    result = ScaleResult(scale=scale, seed=seed, counts=city.counts().to_dict())
+    stage = _StageRunner(result, trace_memory, quiet)
+    print(f"Benchmark at scale {scale}x: {result.counts}")
+    data_folder = os.path.join(work_dir, "data")
+    stage("generate", lambda: city.write(data_folder), rows=lambda _: sum(result.counts.values()))
+
+    loader = SyntheticLoader(data_folder)
+    system = UrbanMobilitySystem(public_transport=GTFSNetwork(), bike_stations=[], ridership=[], bike_trips=[],
+                                 hex_grid=None)
+    network = system.public_transport
+    network.ids = loader.ids  # the identifiers interned by the loader, the stop times are encoded with them
+    network.stops = stage("load_stops", loader.load_stops)
+    network.routes = stage("load_routes", loader.load_routes)
+    network.trips = stage("load_trips", loader.load_trips)
+    network.stop_times = stage("load_stop_times", loader.load_stop_times)
+    stage("build_itineraries",
+          lambda: network.build_itineraries(network.stops, network.stop_times, network.trips, network.routes))
+    system.bike_stations = stage("load_bike_stations", loader.load_bike_stations)
+    system.ridership = stage("load_ridership", loader.load_ridership)
+    stage("load_ridership_cube", loader.load_ridership_cube)
+    store = stage("load_bike_trip_store", loader.load_bike_trip_store)
+    system.bike_trips = store.as_bike_trips()  # BikeTrip objects built on access
+    system.hex_grid = stage("generate_hex_grid", lambda: loader.load_hex_grid(network.stops, system.bike_stations),
+                            rows=lambda grid: len(grid.cells))
+    stage("build_bike_station_history", lambda: system.build_bike_station_history(loader.station_history_period))
+    stage("bike_trips_od_matrix", system.bike_trips_to_od_matrix, rows=lambda od: od.total_trips)
+    stage("ridership_cube", lambda: system.ridership_cube)
+    report = stage("export_geojson", lambda: system.save_to_geojson(os.path.join(work_dir, "geojson")),
+                   rows=lambda export: sum(layer.feature_count for layer in export.layers))
+    result.counts["exported_features"] = sum(layer.feature_count for layer in report.layers)
+    return result
+
+
+def environment() -> dict:
+    """
+    Description of the benchmark machine and code, so results from different commits can be compared.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                                cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "library_version": library_version(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def run_benchmarks(scales: Sequence[float] = BENCHMARK_SCALES, output: Optional[str] = "benchmark.json",
+                   seed: int = 0, work_dir: Optional[str] = None, trace_memory: bool = False,
+                   isolate: bool = True, quiet: bool = True) -> dict:
+    """
+    Benchmark the pipeline at several scales and write the results as JSON.
+
+    Args:
+        scales: Multipliers of the Geneva feed shape. Defaults to 1, 10 and 100.
+        output: Path of the JSON results, None not to write them. Defaults to "benchmark.json".
+        seed: Seed of the generator. Defaults to 0.
+        work_dir: Folder of the generated files, one subfolder per scale. Defaults to temporary folders.
+        trace_memory: Also measure the peak Python allocations, see benchmark_scale. Defaults to False.
+        isolate: Run every scale in a new process, so the peak memory of a scale is not the one of a
+            previous larger scale. Defaults to True.
+        quiet: Hide the progress printed by the loaders and exporters. Defaults to True.
+
+    Returns:
+        dict: The environment and the measures of every scale.
+    """
+    results = []
+    for scale in scales:
+        folder = None if work_dir is None else os.path.join(work_dir, f"scale_{scale}x")
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                result = executor.submit(benchmark_scale, scale, seed, folder, trace_memory, quiet).result()
+        else:
+            result = benchmark_scale(scale, seed, folder, trace_memory, quiet)
+        print(f"Scale {scale}x done in {result.total_seconds:.1f} s")
+        results.append({**asdict(result), "total_seconds": round(result.total_seconds, 4)})
+    document = {
+        "schema_version": RESULTS_SCHEMA_VERSION,
+        "environment": environment(),
+        "settings": {"seed": seed, "trace_memory": trace_memory, "isolate": isolate},
+        "results": results,
+    }
+    if output is not None:
+        with atomic_write(output) as f:
+            json.dump(document, f, indent=2)
+        print(f"Benchmark results saved to {output}")
+    return document
+
+
+def compare_results(baseline: dict, current: dict, tolerance: float = DEFAULT_REGRESSION_TOLERANCE) -> List[dict]:
+    """
+    Compare the stage timings of two benchmark results, e.g. of two commits.
+
+    Args:
+        baseline: Results of the reference run, as written by run_benchmarks.
+        current: Results of the run to check.
+        tolerance: Relative slowdown above which a stage is a regression. Defaults to 0.10.
+
+    Returns:
+        List[dict]: For every stage found at the same scale in both runs: scale, stage, both timings, the
+            ratio current / baseline, and whether it is a regression. Stages under 50 ms in both runs are
+            never regressions, their timings being mostly noise.
+    """
+    baseline_stages = {(result["scale"], stage["name"]): stage
+                       for result in baseline["results"] for stage in result["stages"]}
+    comparisons = []
+    for result in current["results"]:
+        for stage in result["stages"]:
+            reference = baseline_stages.get((result["scale"], stage["name"]))
+            if reference is None:
+                continue
+            ratio = stage["seconds"] / reference["seconds"] if reference["seconds"] > 0 else float("inf")
+            comparisons.append({
+                "scale": result["scale"],
+                "stage": stage["name"],
+                "baseline_seconds": reference["seconds"],
+                "current_seconds": stage["seconds"],
+                "ratio": round(ratio, 3),
+                "regression": (ratio > 1 + tolerance
+                               and max(stage["seconds"], reference["seconds"]) >= MIN_COMPARED_SECONDS),
+            })
+    return comparisons
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Console entry point: run the benchmark, compare two result files (exit code 1 on regression), or check the
+    import times (exit code 1 over budget).
+    """
+    parser = argparse.ArgumentParser(
+        prog="sum-gtfs-geojson-benchmark",
+        description="Time every pipeline stage on synthetic cities with the shape of the Geneva feed.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Run the benchmark and write the results as JSON.")
+    run.add_argument("--scales", nargs="+", type=float, default=list(BENCHMARK_SCALES))
+    run.add_argument("--output", default="benchmark.json")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--work-dir", default=None, help="Keep the generated files in this folder.")
+    run.add_argument("--trace-memory", action="store_true", help="Also measure the peak Python allocations.")
+    run.add_argument("--no-isolate", action="store_true", help="Run every scale in this process.")
+    run.add_argument("--verbose", action="store_true", help="Show the progress of the loaders and exporters.")
+    compare = commands.add_parser("compare", help="Compare the stage timings of two result files.")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--tolerance", type=float, default=DEFAULT_REGRESSION_TOLERANCE)
+    imports = commands.add_parser("imports", help="Check the import time of the package against its budgets.")
+    imports.add_argument("--repeat", type=int, default=DEFAULT_IMPORT_REPEAT)
+    imports.add_argument("--budget-scale", type=float, default=1.0, help="Multiplier of the budgets.")
+    args = parser.parse_args(argv)
+
+    if args.command == "imports":
+        results = benchmark_imports(repeat=args.repeat, budget_scale=args.budget_scale)
+        for result in results:
+            flag = "OVER BUDGET: " + ", ".join(result.violations) if result.violations else ""
+            print(f"{result.statement:<66} {result.seconds * 1000:>8.1f} ms "
+                  f"(budget {result.budget_seconds * 1000:.0f} ms) {' '.join(result.heavy_modules)}  {flag}".rstrip())
+        if any(result.violations for result in results):
+            sys.exit(1)
+        return
+
+    if args.command == "run":
+        scales = [int(scale) if scale.is_integer() else scale for scale in args.scales]
+        run_benchmarks(scales, args.output, args.seed, args.work_dir, args.trace_memory, not args.no_isolate,
+                       not args.verbose)
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    if baseline.get("settings") != current.get("settings"):
+        print(f"Warning: different settings, {baseline.get('settings')} and {current.get('settings')}")
+    comparisons = compare_results(baseline, current, args.tolerance)
+    for comparison in comparisons:
+        flag = "REGRESSION" if comparison["regression"] else ""
+        print(f"{comparison['scale']:>6}x {comparison['stage']:<28} {comparison['baseline_seconds']:>10.3f} s "
+              f"-> {comparison['current_seconds']:>10.3f} s  x{comparison['ratio']:<6} {flag}")
+    if any(comparison["regression"] for comparison in comparisons):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
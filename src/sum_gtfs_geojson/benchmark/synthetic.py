@@ -0,0 +1,312 @@
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+from pathlib import Path
+import math
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from sum_gtfs_geojson.loader import GenevaLoader
+
+# Shape of the Geneva feed at scale 1, every count is multiplied by the scale
+BASE_STATIONS = 1929  # stops.txt location_type 1
+PLATFORMS_PER_STATION = 2  # stops.txt location_type 0, 3866 in the Geneva feed
+BASE_ROUTES = 81
+BASE_TRIPS = 29469
+STOPS_PER_ROUTE = 20
+BASE_BIKE_STATIONS = 628
+BASE_BIKE_TRIPS = 12194
+BASE_RIDERSHIP = 50_000  # the Geneva ridership file is not distributed, estimated size
+BASE_RADIUS_KM = 8  # the network area grows with the scale, the density stays the same
+SERVICES = 32
+
+CENTER = (46.2044, 6.1432)  # Geneva
+KM_PER_DEGREE_LATITUDE = 111.32
+STOP_TIMES_CHUNK_TRIPS = 20_000
+TIMESLOTS = [f"{hour:02d}:00-{hour + 1:02d}:00" for hour in range(5, 24)]
+DAY_LABELS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+ROUTE_CANDIDATES_PER_STOP = 10
+
+# File of every GenevaLoader data file attribute, in a synthetic city folder
+FILE_NAMES = {
+    "STOPS_FILE_PATH": "stops.txt",
+    "ROUTES_FILE_PATH": "routes.txt",
+    "TRIPS_FILE_PATH": "trips.txt",
+    "STOPTIMES_FILE_PATH": "stop_times.txt",
+    "TRANSFERS_FILE_PATH": "transfers.txt",  # not generated, no transfer is loaded
+    "BIKES_STOPS_FILEPATH": "shared_bikes_stations.xlsx",
+    "RIDERSHIP_FILE_PATH": "ridership.csv",
+    "BIKE_TRIPS_FILE_PATH": "shared_bikes_trips.csv",
+}
+
+
+@dataclass
+class SyntheticCounts:
+    """
+    Number of rows of every synthetic file.
+    """
+    stops: int
+    routes: int
+    trips: int
+    stop_times: int
+    bike_stations: int
+    bike_trips: int
+    ridership: int
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class SyntheticCity:
+    """
+    Deterministic synthetic city with the shape of the Geneva feed, scaled by a factor: stations with their
+    platforms, routes as chains of nearby stations, trips with their stop times, bike stations, bike trips
+    between them and ridership records. The files are written in the Geneva formats, so the Geneva loader
+    parses them with its own code, see SyntheticLoader.
+
+    Usage:
+        city = SyntheticCity(scale=10, seed=0)
+        city.write("/tmp/synthetic_10x")
+        ums = SyntheticLoader("/tmp/synthetic_10x").load_all_data(list(DataType))
+
+    Attributes:
+        scale (float): Multiplier of every count of the Geneva shape, e.g. 1, 10 or 100.
+        seed (int): Seed of the random generator, the same seed and scale always give the same files.
+    """
+
+    def __init__(self, scale: float = 1, seed: int = 0):
+        if scale <= 0:
+            raise ValueError("Scale must be positive")
+        self.scale = scale
+        self.seed = seed
+
+    def _count(self, base: int) -> int:
+        return max(1, int(round(base * self.scale)))
+
+    @property
+    def radius_km(self) -> float:
+        return BASE_RADIUS_KM * math.sqrt(self.scale)
+
+    def counts(self) -> SyntheticCounts:
+        """
+        Number of rows of every file, without generating them.
+        """
+        stations = self._count(BASE_STATIONS)
+        trips = self._count(BASE_TRIPS)
+        return SyntheticCounts(
+            stops=stations * (1 + PLATFORMS_PER_STATION),
+            routes=self._count(BASE_ROUTES),
+            trips=trips,
+            stop_times=trips * min(STOPS_PER_ROUTE, stations),
+            bike_stations=self._count(BASE_BIKE_STATIONS),
+            bike_trips=self._count(BASE_BIKE_TRIPS),
+            ridership=self._count(BASE_RIDERSHIP),
+        )
+
+    def _positions(self, rng: np.random.Generator, count: int):
+        """
+        Uniform positions in the city disk, as (latitudes, longitudes).
+        """
+        distances = self.radius_km * np.sqrt(rng.random(count))
+        angles = rng.random(count) * 2 * np.pi
+        latitudes = CENTER[0] + distances * np.sin(angles) / KM_PER_DEGREE_LATITUDE
+        longitudes = CENTER[1] + distances * np.cos(angles) / (
+            KM_PER_DEGREE_LATITUDE * np.cos(np.radians(CENTER[0])))
+        return latitudes, longitudes
+
+    def write(self, folder: str) -> Dict[str, str]:
+        """
+        Generate the files in a folder, with the Geneva file names.
+
+        Args:
+            folder: The output folder, created if missing.
+
+        Returns:
+            Dict[str, str]: The path of every file, by GenevaLoader attribute name.
+        """
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        rng = np.random.default_rng(self.seed)
+        paths = {name: folder / filename for name, filename in FILE_NAMES.items()}
+        counts = self.counts()
+        station_lat, station_lon = self._positions(rng, self._count(BASE_STATIONS))
+        platform_ids = self._write_stops(paths["STOPS_FILE_PATH"], station_lat, station_lon)
+        route_stops = self._write_routes(rng, paths["ROUTES_FILE_PATH"], station_lat, station_lon, counts.routes)
+        self._write_trips(rng, paths["TRIPS_FILE_PATH"], paths["STOPTIMES_FILE_PATH"], route_stops,
+                          platform_ids, counts.trips)
+        bike_lat, bike_lon = self._write_bike_stations(rng, paths["BIKES_STOPS_FILEPATH"], counts.bike_stations)
+        self._write_bike_trips(rng, paths["BIKE_TRIPS_FILE_PATH"], bike_lat, bike_lon, counts.bike_trips)
+        self._write_ridership(rng, paths["RIDERSHIP_FILE_PATH"], station_lat, station_lon, route_stops,
+                              counts.ridership)
+        return {name: str(path) for name, path in paths.items()}
+
+    @staticmethod
+    def _write_stops(filepath: Path, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """
+        Write the stations and their platforms, a few metres apart.
+
+        Returns:
+            np.ndarray: (stations, platforms) array of the platform stop ids.
+        """
+        count = len(latitudes)
+        station_ids = np.char.add("S", np.char.zfill(np.arange(count).astype(str), 7))
+        names = np.char.add("Arrêt ", np.arange(count).astype(str))
+        frames = [pd.DataFrame({"stop_id": station_ids, "stop_code": "", "stop_name": names, "stop_desc": "",
+                                "stop_lat": latitudes.round(7), "stop_lon": longitudes.round(7), "zone_id": "",
+                                "stop_url": "", "location_type": 1, "parent_station": "", "platform_code": ""})]
+        platform_ids = np.empty((count, PLATFORMS_PER_STATION), dtype=object)
+        for platform in range(PLATFORMS_PER_STATION):
+            code = chr(ord("A") + platform)
+            platform_ids[:, platform] = np.char.add(np.char.zfill(np.arange(count).astype(str), 7), f"_{code}")
+            frames.append(pd.DataFrame({
+                "stop_id": platform_ids[:, platform], "stop_code": "", "stop_name": names, "stop_desc": "",
+                "stop_lat": (latitudes + 0.00005 * (platform + 1)).round(7), "stop_lon": longitudes.round(7),
+                "zone_id": "", "stop_url": "", "location_type": 0, "parent_station": station_ids,
+                "platform_code": code}))
+        pd.concat(frames).to_csv(filepath, index=False)
+        return platform_ids
+
+    @staticmethod
+    def _write_routes(rng: np.random.Generator, filepath: Path, latitudes: np.ndarray, longitudes: np.ndarray,
+                      count: int) -> np.ndarray:
+        """
+        Write the routes, each a chain of the stations closest to a random line through a random station,
+        among the stations near that anchor.
+
+        Returns:
+            np.ndarray: (routes, stops per route) array of station indexes, in travel order.
+        """
+        length = min(STOPS_PER_ROUTE, len(latitudes))
+        xy = np.column_stack([longitudes * np.cos(np.radians(CENTER[0])), latitudes])
+        anchors = rng.integers(0, len(latitudes), count)
+        angles = rng.random(count) * np.pi
+        _, neighbours = cKDTree(xy).query(xy[anchors], k=min(ROUTE_CANDIDATES_PER_STOP * length, len(xy)))
+        neighbours = neighbours.reshape(count, -1)
+        route_stops = np.empty((count, length), dtype=np.int64)
+        for route, angle in enumerate(angles.tolist()):
+            candidates = neighbours[route]
+            offsets = xy[candidates] - xy[anchors[route]]
+            along = offsets @ np.array([np.cos(angle), np.sin(angle)])
+            across = np.abs(offsets @ np.array([-np.sin(angle), np.cos(angle)]))
+            chosen = np.argpartition(across, length - 1)[:length] if len(candidates) > length else slice(None)
+            route_stops[route] = candidates[chosen][np.argsort(along[chosen])]
+        pd.DataFrame({
+            "route_id": [f"ch:1:SLNID:881_{route + 1}" for route in range(count)],
+            "agency_id": "000881",
+            # lettered lines as in Geneva (E, G, ...), so the column is read as text
+            "route_short_name": [chr(ord("A") + route // 9 % 26) if route % 9 == 0 else str(route + 1)
+                                 for route in range(count)],
+            "route_long_name": "", "route_desc": "",
+            "route_type": rng.choice([0, 3, 3, 3], count),
+            "route_url": "", "route_color": "5A1E82", "route_text_color": "FFFFFF",
+        }).to_csv(filepath, index=False)
+        return route_stops
+
+    @staticmethod
+    def _write_trips(rng: np.random.Generator, trips_filepath: Path, stop_times_filepath: Path,
+                     route_stops: np.ndarray, platform_ids: np.ndarray, count: int):
+        """
+        Write the trips, spread over the routes and both directions, and their stop times in chunks.
+        """
+        routes = np.arange(count) % len(route_stops)
+        directions = (np.arange(count) // len(route_stops)) % 2
+        pd.DataFrame({
+            "route_id": [f"ch:1:SLNID:881_{route + 1}" for route in routes.tolist()],
+            "service_id": [f"{service + 1:06d}" for service in rng.integers(0, SERVICES, count).tolist()],
+            "trip_id": np.arange(1, count + 1),
+            "trip_headsign": "", "trip_short_name": "", "direction_id": directions,
+            "block_id": "", "shape_id": "", "trip_type": 1,
+        }).to_csv(trips_filepath, index=False)
+
+        length = route_stops.shape[1]
+        departures = rng.integers(5 * 3600, 24 * 3600, count)
+        for start in range(0, count, STOP_TIMES_CHUNK_TRIPS):
+            trips = np.arange(start, min(start + STOP_TIMES_CHUNK_TRIPS, count))
+            sequence = np.tile(np.arange(length), len(trips))
+            trip = np.repeat(trips, length)
+            stations = route_stops[routes[trip], np.where(directions[trip] == 0, sequence, length - 1 - sequence)]
+            seconds = departures[trip] + 90 * sequence
+            times = [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in seconds.tolist()]
+            pd.DataFrame({
+                "trip_id": trip + 1, "arrival_time": times, "departure_time": times,
+                "stop_id": platform_ids[stations, directions[trip]], "stop_sequence": sequence + 1,
+                "stop_headsign": "", "pickup_type": 0, "drop_off_type": 0, "shape_dist_traveled": "",
+            }).to_csv(stop_times_filepath, index=False, header=start == 0, mode="w" if start == 0 else "a")
+
+    def _write_bike_stations(self, rng: np.random.Generator, filepath: Path, count: int):
+        latitudes, longitudes = self._positions(rng, count)
+        pd.DataFrame({"name": [f"Station {i}" for i in range(count)], "latitude": latitudes,
+                      "longitude": longitudes}).to_excel(filepath, index=False)
+        return latitudes, longitudes
+
+    def _write_bike_trips(self, rng: np.random.Generator, filepath: Path, station_lat: np.ndarray,
+                          station_lon: np.ndarray, count: int):
+        """
+        Write bike trips between stations, a few metres off, with a share of free-floating ends, from June
+        to December 2024 as the Geneva file.
+        """
+        origins = rng.integers(0, len(station_lat), count)
+        destinations = rng.integers(0, len(station_lat), count)
+        start_lat = station_lat[origins] + rng.normal(0, 0.0001, count)
+        start_lon = station_lon[origins] + rng.normal(0, 0.0001, count)
+        end_lat = station_lat[destinations] + rng.normal(0, 0.0001, count)
+        end_lon = station_lon[destinations] + rng.normal(0, 0.0001, count)
+        free_floating = rng.random(count) < 0.1
+        end_lat[free_floating], end_lon[free_floating] = self._positions(rng, int(free_floating.sum()))
+        distances = np.hypot((end_lat - start_lat) * KM_PER_DEGREE_LATITUDE,
+                             (end_lon - start_lon) * KM_PER_DEGREE_LATITUDE * np.cos(np.radians(CENTER[0])))
+        started = np.datetime64("2024-06-01T00:00:00") + rng.integers(0, 183 * 86400, count).astype("timedelta64[s]")
+        ended = started + (distances / rng.uniform(10, 20, count) * 3600 + 60).astype("timedelta64[s]")
+        pd.DataFrame({
+            "trip_id": np.arange(50_000_000, 50_000_000 + count),
+            "rental_id": rng.integers(10_000_000, 20_000_000, count),
+            "vehicle_type": rng.choice(["bike", "ebike"], count),
+            "trip_started_at_utc": np.char.add(np.datetime_as_string(started, "us").astype(str), " UTC"),
+            "trip_ended_at_utc": np.char.add(np.datetime_as_string(ended, "us").astype(str), " UTC"),
+            "latitude_start": start_lat, "longitude_start": start_lon,
+            "latitude_end": end_lat, "longitude_end": end_lon,
+            "distance_in_km": distances,
+        }).to_csv(filepath, index=False)
+
+    @staticmethod
+    def _write_ridership(rng: np.random.Generator, filepath: Path, station_lat: np.ndarray,
+                         station_lon: np.ndarray, route_stops: np.ndarray, count: int):
+        """
+        Write ridership records of the served stations, by line, timeslot and day of 2024.
+        """
+        routes = rng.integers(0, len(route_stops), count)
+        stations = route_stops[routes, rng.integers(0, route_stops.shape[1], count)]
+        days = np.datetime64("2024-01-01") + rng.integers(0, 366, count).astype("timedelta64[D]")
+        weekdays = (days.astype(np.int64) + 3) % 7
+        dates = pd.to_datetime(days)
+        pd.DataFrame({
+            "Date": np.datetime_as_string(days).astype(str),
+            "Timeslot": rng.choice(TIMESLOTS, count),
+            "Index Day Week": weekdays + 1,
+            "Line Type": "Urbaine",
+            "Schedule Type": np.where(weekdays < 5, "Semaine", "Week-end"),
+            "Line": (routes + 1).astype(str),
+            "Stop": np.char.add("Arrêt ", stations.astype(str)),
+            "Long Code Stop": np.char.add("R", np.char.zfill(stations.astype(str), 7)),
+            "Number of Boarding Passengers": rng.poisson(12, count),
+            "Number of Disembarking Passengers": rng.poisson(12, count),
+            "jour_semaine": np.array(DAY_LABELS)[weekdays],
+            "Week Index": dates.isocalendar().week.to_numpy(),
+            "Month Year": dates.strftime("%Y-%m"),
+            "Stop Latitudes": station_lat[stations],
+            "Stop Longtitudes": station_lon[stations],
+            "Final Data": 1,
+            "filter_graph": 0,
+        }).to_csv(filepath, index=False)
+
+
+class SyntheticLoader(GenevaLoader):
+    """
+    Geneva loader reading the files of a SyntheticCity folder, so the benchmarks run the Geneva parsing code.
+    """
+
+    def __init__(self, folder: str, distance_radius_km: Optional[float] = None, grid_resolution: int = 8,
+                 station_history_period: Optional[str] = "hour"):
+        super().__init__(restrict_country_boundaries=False, distance_radius_km=distance_radius_km,
+                         grid_resolution=grid_resolution, station_history_period=station_history_period)
+        for name, filename in FILE_NAMES.items():
+            setattr(self, name, Path(folder) / filename)
@@ -0,0 +1,41 @@
+from typing import TYPE_CHECKING
+from sum_gtfs_geojson.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .geojson_writer import GeoJSONWriter
+    from .atomic import AtomicFile, atomic_write, file_sha256
+    from .compression import Compression, CompressionOption, compression_levels, sidecar_paths, compress_file, \
+        compress_files, compress_folder, stale_sidecar_sources, SIDECAR_EXTENSIONS, DEFAULT_COMPRESSION_LEVELS
+    from .manifest import ExportManifest, LayerManifest, MANIFEST_FILENAME, library_version, input_keys, \
+        input_signature
+    from .parallel_export import ColumnarLayer, ExportReport, LayerExportReport, write_columnar_layer, run_export_tasks
+    from .geojson_seq import GeoJSONSeqWriter, PartitionedGeoJSONSeqWriter, read_geojson_seq, Partition, GEOJSON_SEQ_EXTENSION
+    from .topojson import build_topology, write_topojson_layer
+    from .vector_tiles import VectorTileExporter
+    from .geo_formats import write_geo_layers, GeoFormat, GEO_FORMAT_EXTENSIONS
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "GeoJSONWriter": ".geojson_writer",
+    **dict.fromkeys(["AtomicFile", "atomic_write", "file_sha256"], ".atomic"),
+    **dict.fromkeys(["Compression", "CompressionOption", "compression_levels", "sidecar_paths", "compress_file",
+                     "compress_files", "compress_folder", "stale_sidecar_sources", "SIDECAR_EXTENSIONS",
+                     "DEFAULT_COMPRESSION_LEVELS"], ".compression"),
+    **dict.fromkeys(["ExportManifest", "LayerManifest", "MANIFEST_FILENAME", "library_version", "input_keys",
+                     "input_signature"], ".manifest"),
+    **dict.fromkeys(["ColumnarLayer", "ExportReport", "LayerExportReport", "write_columnar_layer", "run_export_tasks"],
+                    ".parallel_export"),
+    **dict.fromkeys(["GeoJSONSeqWriter", "PartitionedGeoJSONSeqWriter", "read_geojson_seq", "Partition",
+                     "GEOJSON_SEQ_EXTENSION"], ".geojson_seq"),
+    **dict.fromkeys(["build_topology", "write_topojson_layer"], ".topojson"),
+    "VectorTileExporter": ".vector_tiles",  # imports shapely
+    **dict.fromkeys(["write_geo_layers", "GeoFormat", "GEO_FORMAT_EXTENSIONS"], ".geo_formats"),
+})
+
+__all__ = ["GeoJSONWriter", "AtomicFile", "atomic_write", "file_sha256",
+           "Compression", "CompressionOption", "compression_levels", "sidecar_paths", "compress_file", "compress_files",
+           "compress_folder", "stale_sidecar_sources", "SIDECAR_EXTENSIONS", "DEFAULT_COMPRESSION_LEVELS", "ExportManifest", "LayerManifest",
+           "MANIFEST_FILENAME", "library_version", "input_keys", "input_signature", "GeoJSONSeqWriter", "PartitionedGeoJSONSeqWriter", "read_geojson_seq",
+           "Partition", "GEOJSON_SEQ_EXTENSION", "ColumnarLayer", "ExportReport", "LayerExportReport",
+           "write_columnar_layer", "run_export_tasks", "VectorTileExporter",
+           "build_topology", "write_topojson_layer",
+           "write_geo_layers", "GeoFormat", "GEO_FORMAT_EXTENSIONS"]
@@ -0,0 +1,122 @@
+from contextlib import contextmanager
+from typing import List
+from pathlib import Path
+import hashlib
+import io
+import os
+from .compression import CompressionOption, SidecarTee, SIDECAR_EXTENSIONS, compression_levels, sidecar_paths
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def temporary_path(filepath: str) -> str:
+    """
+    Hidden temporary path next to `filepath`, on the same file system so it can be renamed atomically.
+    """
+    path = Path(filepath)
+    return str(path.with_name(f".{path.name}.{os.getpid()}.tmp"))
+
+
+def commit_temporary(temp_filepath: str, filepath: str):
+    """
+    Atomically replace `filepath` with the completed temporary file.
+    """
+    os.replace(temp_filepath, filepath)
+
+
+def discard_temporary(temp_filepath: str):
+    Path(temp_filepath).unlink(missing_ok=True)
+
+
+class AtomicFile:
+    """
+    Output file written to a temporary file renamed once complete, with optional compressed sidecars
+    (e.g. stops.geojson.gz, stops.geojson.br) streamed through the compressors while the file is written.
+
+    Committing also removes the sidecars of the formats not requested, which would be stale.
+
+    Usage:
+        output = AtomicFile("stops.geojson", compression={"gzip": 9, "brotli": 11})
+        with output.open("w", encoding="utf-8") as f:
+            f.write(content)
+        output.commit()
+
+    Attributes:
+        filepath (str): The path to the output file.
+        compression (Dict[str, int]): Compression level of every sidecar format, see compression_levels.
+        write_main (bool): Write the file itself, False to only write the sidecars of an existing file.
+    """
+
+    def __init__(self, filepath: str, compression: CompressionOption = None, write_main: bool = True):
+        self.filepath = str(filepath)
+        self.compression = compression_levels(compression)
+        self.write_main = write_main
+
+    @property
+    def filepaths(self) -> List[str]:
+        """
+        Paths of the written files: the file itself and its sidecars.
+        """
+        return ([self.filepath] if self.write_main else []) + sidecar_paths(self.filepath, self.compression)
+
+    def open(self, mode: str = "w", buffering: int = -1, **kwargs):
+        """
+        Open the temporary file(s) for writing, with the same arguments as open().
+        """
+        if not self.compression:
+            return open(temporary_path(self.filepath), mode, buffering, **kwargs)
+        main = open(temporary_path(self.filepath) if self.write_main else os.devnull, "wb")
+        sidecars = {name: open(temporary_path(path), "wb")
+                    for name, path in zip(self.compression, sidecar_paths(self.filepath, self.compression))}
+        buffered = io.BufferedWriter(SidecarTee(main, sidecars, self.compression),
+                                     buffering if buffering > 0 else io.DEFAULT_BUFFER_SIZE)
+        return buffered if "b" in mode else io.TextIOWrapper(buffered, **kwargs)
+
+    def commit(self):
+        """
+        Rename the completed temporary files to their final paths.
+        """
+        for filepath in self.filepaths:
+            commit_temporary(temporary_path(filepath), filepath)
+        for name, extension in SIDECAR_EXTENSIONS.items():
+            if name not in self.compression and self.write_main:
+                Path(self.filepath + extension).unlink(missing_ok=True)
+
+    def discard(self):
+        """
+        Remove the temporary files, leaving the previous version of the files untouched.
+        """
+        for filepath in self.filepaths:
+            discard_temporary(temporary_path(filepath))
+
+
+@contextmanager
+def atomic_write(filepath: str, mode: str = "w", compression: CompressionOption = None, **kwargs):
+    """
+    Open a temporary file for writing, renamed to `filepath` once completed, so readers never see
+    a partially written file. The temporary file is removed if writing fails.
+    With `compression`, the compressed sidecars are written at the same time, see AtomicFile.
+
+    Usage:
+        with atomic_write("od_trips.json", compression=["gzip", "brotli"]) as f:
+            json.dump(flows, f)
+    """
+    output = AtomicFile(filepath, compression)
+    try:
+        with output.open(mode, **kwargs) as f:
+            yield f
+        output.commit()
+    except BaseException:
+        output.discard()
+        raise
+
+
+def file_sha256(filepath: str) -> str:
+    """
+    SHA-256 hex digest of a file content, read by chunks.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,214 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Literal, Mapping, Optional, Union
+from pathlib import Path
+import io
+import os
+import zlib
+from sum_gtfs_geojson.instrumentation import stage
+
+try:
+    import brotli
+except ImportError:  # optional, only needed for .br sidecars
+    brotli = None
+
+Compression = Literal["gzip", "brotli"]
+SIDECAR_EXTENSIONS: Dict[str, str] = {
+    "gzip": ".gz",
+    "brotli": ".br",
+}
+DEFAULT_COMPRESSION_LEVELS: Dict[str, int] = {
+    "gzip": 9,  # 1 (fastest) to 9 (smallest)
+    "brotli": 11,  # 0 (fastest) to 11 (smallest)
+}
+# Text files served to the map demo, compressed by compress_files
+COMPRESSIBLE_EXTENSIONS = (".json", ".geojson", ".topojson", ".geojsonl", ".csv", ".js", ".css", ".html", ".svg")
+COMPRESS_CHUNK_SIZE = 1 << 20
+
+CompressionOption = Union[None, str, Iterable[str], Mapping[str, int]]
+
+
+def compression_levels(compression: CompressionOption) -> Dict[str, int]:
+    """
+    Normalize a compression option to {format: level}.
+
+    Args:
+        compression: None for no sidecar, a format ("gzip", "brotli"), a list of formats using the default
+            levels, or a {format: level} dict.
+
+    Returns:
+        Dict[str, int]: The compression level of every requested format.
+    """
+    if not compression:
+        return {}
+    if isinstance(compression, str):
+        compression = [compression]
+    if not isinstance(compression, Mapping):
+        compression = {name: DEFAULT_COMPRESSION_LEVELS.get(name) for name in compression}
+    for name in compression:
+        if name not in SIDECAR_EXTENSIONS:
+            raise ValueError(f"Unsupported compression: {name}, expected one of {list(SIDECAR_EXTENSIONS)}")
+    if "brotli" in compression and brotli is None:
+        raise ImportError("brotli sidecars require the brotli package: pip install brotli")
+    return dict(compression)
+
+
+def sidecar_paths(filepath: str, compression: CompressionOption) -> List[str]:
+    """
+    Paths of the compressed sidecars of a file, e.g. stops.geojson.gz and stops.geojson.br.
+    """
+    return [f"{filepath}{SIDECAR_EXTENSIONS[name]}" for name in compression_levels(compression)]
+
+
+class _BrotliCompressor:
+    """
+    brotli.Compressor with the zlib compress()/flush() interface.
+    """
+
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _compressor(name: str, level: int):
+    """
+    Streaming compressor with the zlib interface, compress(bytes) then flush().
+    """
+    if name == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container, no timestamp
+    return _BrotliCompressor(level)
+
+
+class SidecarTee(io.RawIOBase):
+    """
+    Binary sink writing every chunk to a file and, at the same time, through a compressor to each of its
+    sidecars, so the compressed copies never require reading the file back.
+
+    Wrap it in io.BufferedWriter (and io.TextIOWrapper for text) so the compressors receive large chunks.
+
+    Attributes:
+        file: The binary file receiving the uncompressed content.
+        sidecars (Dict[str, tuple]): (binary file, compressor) of every sidecar, by format.
+    """
+
+    def __init__(self, file, sidecar_files: Mapping[str, object], levels: Mapping[str, int]):
+        super().__init__()
+        self.file = file
+        self.sidecars = {name: (sidecar_files[name], _compressor(name, level)) for name, level in levels.items()}
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.file.write(data)
+        for sidecar, compressor in self.sidecars.values():
+            sidecar.write(compressor.compress(bytes(data)))
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            for sidecar, compressor in self.sidecars.values():
+                sidecar.write(compressor.flush())
+        finally:
+            for sidecar, _ in self.sidecars.values():
+                sidecar.close()
+            self.file.close()
+            super().close()
+
+
+def compress_file(filepath: str, compression: CompressionOption = ("gzip", "brotli")) -> List[str]:
+    """
+    Write the compressed sidecars of an existing file, reading it once for all the formats.
+
+    Args:
+        filepath: The file to compress.
+        compression: Formats and levels, see compression_levels. Defaults to gzip and brotli.
+
+    Returns:
+        List[str]: The paths of the written sidecars.
+    """
+    from .atomic import AtomicFile  # atomic depends on compression
+
+    levels = compression_levels(compression)
+    output = AtomicFile(filepath, levels, write_main=False)
+    with open(filepath, "rb") as source, output.open("wb") as target:
+        for chunk in iter(lambda: source.read(COMPRESS_CHUNK_SIZE), b""):
+            target.write(chunk)
+    output.commit()
+    return sidecar_paths(filepath, levels)
+
+
+def compress_files(filepaths: Iterable[str], compression: CompressionOption = ("gzip", "brotli"),
+                   max_workers: Optional[int] = None) -> List[str]:
+    """
+    Write the compressed sidecars of several existing files in a thread pool. zlib and brotli release
+    the GIL while compressing, so the files are compressed in parallel.
+
+    Args:
+        filepaths: The files to compress.
+        compression: Formats and levels, see compression_levels. Defaults to gzip and brotli.
+        max_workers: Maximum number of threads. Defaults to the ThreadPoolExecutor default.
+
+    Returns:
+        List[str]: The paths of the written sidecars.
+    """
+    levels = compression_levels(compression)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda filepath: compress_file(filepath, levels), filepaths)
+        return [sidecar for sidecars in results for sidecar in sidecars]
+
+
+def stale_sidecar_sources(folder: str, compression: CompressionOption = ("gzip", "brotli"),
+                          extensions: Iterable[str] = COMPRESSIBLE_EXTENSIONS, exclude: Iterable[str] = (),
+                          recursive: bool = False) -> List[str]:
+    """
+    Files of a folder, e.g. tunable_parameters.json next to the exported layers, with a missing sidecar
+    or a sidecar older than the file.
+
+    Args:
+        folder: The folder to scan.
+        compression: Formats of the expected sidecars. Defaults to gzip and brotli.
+        extensions: Extensions of the files to compress. Defaults to the text files served to the map demo.
+        exclude: Names of the files to ignore.
+        recursive: Also scan the subfolders. Defaults to False.
+
+    Returns:
+        List[str]: The paths of the files to compress.
+    """
+    levels = compression_levels(compression)
+    extensions = tuple(extensions)
+    exclude = set(exclude)
+    filepaths = []
+    for path in sorted(Path(folder).rglob("*") if recursive else Path(folder).iterdir()):
+        if (not path.is_file() or path.name.startswith(".") or path.name in exclude
+                or not path.name.endswith(extensions)):
+            continue
+        modified = path.stat().st_mtime
+        sidecars = sidecar_paths(str(path), levels)
+        if any(not os.path.exists(sidecar) or os.path.getmtime(sidecar) < modified for sidecar in sidecars):
+            filepaths.append(str(path))
+    return filepaths
+
+
+def compress_folder(folder: str, compression: CompressionOption = ("gzip", "brotli"),
+                    extensions: Iterable[str] = COMPRESSIBLE_EXTENSIONS, exclude: Iterable[str] = (),
+                    recursive: bool = False, max_workers: Optional[int] = None) -> List[str]:
+    """
+    Write the missing or outdated sidecars of the files of a folder, e.g. a map demo dataset folder with
+    its tunable_parameters.json, see stale_sidecar_sources and compress_files.
+
+    Returns:
+        List[str]: The paths of the written sidecars.
+    """
+    with stage("compress_folder", folder=folder) as span:
+        filepaths = stale_sidecar_sources(folder, compression, extensions, exclude, recursive)
+        span.rows_in = len(filepaths)
+        sidecars = compress_files(filepaths, compression, max_workers)
+        span.rows_out = len(sidecars)
+    return sidecars
@@ -0,0 +1,57 @@
+from typing import Dict, List, Literal
+import json
+import os
+from pathlib import Path
+from .parallel_export import ColumnarLayer
+from sum_gtfs_geojson.instrumentation import stage
+
+GeoFormat = Literal["geoparquet", "flatgeobuf"]
+GEO_FORMAT_EXTENSIONS: Dict[str, str] = {
+    "geoparquet": ".parquet",
+    "flatgeobuf": ".fgb",
+}
+DEFAULT_ROW_GROUP_SIZE = 8192
+
+
+def write_geo_layers(layers: List[ColumnarLayer], output_path: str, file_format: GeoFormat = "geoparquet",
+                     row_group_size: int = DEFAULT_ROW_GROUP_SIZE) -> List[str]:
+    """
+    Write layers in a spatially indexed format, so that consumers can read only the rows intersecting a bbox.
+
+    Rows are written in layer order, sort the layers first (see `GeoToolkit.sort_layer`) so nearby
+    features are stored together:
+    - GeoParquet: row groups of `row_group_size` rows, with a bbox covering column
+      (minx, miny, maxx, maxy) used to skip row groups outside of a query bbox.
+    - FlatGeobuf: packed Hilbert R-tree spatial index. Nested values (lists, dicts) are stored as JSON strings.
+
+    Args:
+        layers: The layers to write, one file per layer named {layer.name}.parquet or {layer.name}.fgb.
+        output_path: The folder where the files will be saved.
+        file_format: "geoparquet" or "flatgeobuf". Defaults to "geoparquet".
+        row_group_size: Number of rows per GeoParquet row group. Defaults to 8192.
+
+    Returns:
+        List[str]: The paths of the written files.
+    """
+    if file_format not in GEO_FORMAT_EXTENSIONS:
+        raise ValueError(f"Unsupported format: {file_format}, expected one of {list(GEO_FORMAT_EXTENSIONS)}")
+    Path(output_path).mkdir(parents=True, exist_ok=True)
+
+    filepaths = []
+    for layer in layers:
+        if not len(layer):
+            continue
+        filepath = os.path.join(output_path, f"{layer.name}{GEO_FORMAT_EXTENSIONS[file_format]}")
+        with stage(f"export_{layer.name}", filepath=filepath, file_format=file_format) as span:
+            gdf = layer.to_geodataframe()
+
+            if file_format == "geoparquet":
+                gdf.to_parquet(filepath, index=False, write_covering_bbox=True, row_group_size=row_group_size)
+            else:
+                for column in gdf.columns:
+                    if column != gdf.geometry.name and gdf[column].map(lambda v: isinstance(v, (list, dict))).any():
+                        gdf[column] = gdf[column].map(lambda v: json.dumps(v, default=str) if v is not None else None)
+                gdf.to_file(filepath, driver="FlatGeobuf", SPATIAL_INDEX="YES")
+            span.rows_out = len(gdf)
+        filepaths.append(filepath)
+    return filepaths
@@ -0,0 +1,257 @@
+from typing import Callable, Iterator, Literal, Optional, Tuple
+from collections import OrderedDict
+from datetime import date, datetime
+from pathlib import Path
+import gzip
+import json
+import numpy as np
+from .geojson_writer import GeoJSONWriter, DEFAULT_COORDINATE_PRECISION, WRITE_BUFFER_SIZE, orjson
+from .atomic import temporary_path, commit_temporary, discard_temporary
+
+Partition = Literal["day", "month"]
+GEOJSON_SEQ_EXTENSION = ".geojsonl"
+RECORD_SEPARATOR = "\x1e"
+DEFAULT_GZIP_LEVEL = 6
+MAX_OPEN_PARTITIONS = 32  # partition files kept open at once, the others are reopened in append mode
+
+
+def _open_text(filepath: str, mode: str, compresslevel: int = DEFAULT_GZIP_LEVEL):
+    """
+    Open a text file, gzip compressed when the path ends with .gz.
+    """
+    if str(filepath).endswith(".gz"):
+        return gzip.open(filepath, mode + "t", encoding="utf-8", compresslevel=compresslevel)
+    return open(filepath, mode, encoding="utf-8", buffering=WRITE_BUFFER_SIZE)
+
+
+def _parse_date(value) -> date:
+    """
+    Date or datetime of a date, datetime, numpy datetime64 or ISO 8601 string, e.g. "2024-05-01",
+    "2024-05-01T08:30:00Z" or "2024-05-01 08:30:00 UTC".
+    """
+    if isinstance(value, (datetime, date)):  # also pandas Timestamp
+        return value
+    if isinstance(value, np.datetime64):
+        return value.astype("datetime64[us]").item()
+    if not isinstance(value, str):
+        raise ValueError(f"Cannot partition on {value!r}, expected a date, a datetime or an ISO date string")
+    value = value.strip()
+    if value.endswith(" UTC"):
+        value = value[:-len(" UTC")]
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+class GeoJSONSeqWriter(GeoJSONWriter):
+    """
+    Streaming writer for GeoJSON text sequences: one Feature per line, without an enclosing FeatureCollection.
+
+    Each line is a complete JSON text, so the file can be produced and consumed incrementally with
+    constant memory, appended to, split or concatenated (`jq -c`, `ogr2ogr`, `read_geojson_seq`).
+    With `record_separator`, every feature is prefixed with the ASCII record separator as in RFC 8142
+    (`jq --seq`, GDAL `.geojsons`), otherwise the file is plain newline-delimited GeoJSON.
+    Files ending with `.gz` are gzip compressed. Unless appending, the file is written to a temporary
+    file renamed once complete.
+
+    Usage:
+        with GeoJSONSeqWriter("bike_trips.geojsonl.gz") as writer:
+            writer.write_features(features)
+
+    Attributes:
+        filepath (str): The path to the output file.
+        precision (int): Number of decimals kept for the coordinates.
+        record_separator (bool): Prefix the features with the RFC 8142 record separator.
+        compresslevel (int): gzip compression level, used for .gz files.
+        count (int): Number of features written so far.
+    """
+
+    def __init__(self, filepath: str, precision: int = DEFAULT_COORDINATE_PRECISION,
+                 record_separator: bool = False, compresslevel: int = DEFAULT_GZIP_LEVEL, append: bool = False):
+        super().__init__(filepath, precision=precision)
+        self.record_separator = record_separator
+        self.compresslevel = compresslevel
+        self._mode = "a" if append else "w"
+
+    def __enter__(self) -> "GeoJSONSeqWriter":
+        if self._mode == "a":
+            self._file = _open_text(self.filepath, self._mode, self.compresslevel)
+        else:
+            self._file = _open_text(temporary_path(self.filepath), self._mode, self.compresslevel)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(commit=exc_type is None)
+
+    def close(self, commit: bool = True):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if self._mode == "a":
+            return
+        if commit:
+            commit_temporary(temporary_path(self.filepath), self.filepath)
+        else:
+            discard_temporary(temporary_path(self.filepath))
+
+    def write_feature(self, geometry: Optional[dict], properties: dict):
+        """
+        Write a single feature, on its own line.
+
+        Args:
+            geometry: GeoJSON geometry dict, see `point`, `line_string` and `polygon`. Coordinates are rounded by the writer.
+            properties: Feature properties, must be JSON serializable (datetimes are written in ISO format).
+        """
+        if self.record_separator:
+            self._file.write(RECORD_SEPARATOR)
+        self._file.write(self._encode_feature(geometry, properties))
+        self._file.write("\n")
+        self.count += 1
+
+
+class PartitionedGeoJSONSeqWriter:
+    """
+    Write a layer as GeoJSON text sequences partitioned by day or by month, e.g.
+    `bike_trips/bike_trips_2024-05.geojsonl.gz`, so consumers can only read the periods they need.
+
+    Features do not need to be sorted by date: at most MAX_OPEN_PARTITIONS files are kept open, the least
+    recently used one is closed and reopened in append mode when needed (gzip members are concatenated).
+    Partitions are written to temporary files, renamed when the writer is closed, and the previous
+    partitions of the layer which were not rewritten are then removed.
+
+    Usage:
+        with PartitionedGeoJSONSeqWriter("output", "bike_trips", partition="month", compress=True) as writer:
+            for trip in trips:
+                writer.write_feature(trip.trip_started_at_utc, geometry, properties)
+
+    Attributes:
+        output_path (str): Folder where the `name` partition folder is created.
+        name (str): Name of the layer, used for the folder and file names.
+        partition (str): "day" or "month".
+        compress (bool): gzip compress the partition files.
+        count (int): Number of features written so far.
+        partitions (Dict[str, int]): Number of features written by partition key.
+    """
+
+    def __init__(self, output_path: str, name: str, partition: Partition = "day", compress: bool = False,
+                 precision: int = DEFAULT_COORDINATE_PRECISION, record_separator: bool = False,
+                 compresslevel: int = DEFAULT_GZIP_LEVEL):
+        if partition not in ("day", "month"):
+            raise ValueError(f"Unsupported partition: {partition}, expected 'day' or 'month'")
+        self.output_path = output_path
+        self.name = name
+        self.partition = partition
+        self.compress = compress
+        self.precision = precision
+        self.record_separator = record_separator
+        self.compresslevel = compresslevel
+        self.count = 0
+        self.partitions = {}
+        self._writers: "OrderedDict[str, GeoJSONSeqWriter]" = OrderedDict()
+
+    @property
+    def folder(self) -> Path:
+        return Path(self.output_path) / self.name
+
+    def partition_key(self, value) -> str:
+        """
+        Partition key of a date, datetime or ISO date string: "YYYY-MM-DD" by day, "YYYY-MM" by month.
+        Strings are parsed, so a malformed date raises a ValueError instead of naming a wrong partition.
+        """
+        return _parse_date(value).strftime("%Y-%m-%d" if self.partition == "day" else "%Y-%m")
+
+    def partition_filepath(self, key: str) -> str:
+        extension = GEOJSON_SEQ_EXTENSION + (".gz" if self.compress else "")
+        return str(self.folder / f"{self.name}_{key}{extension}")
+
+    def __enter__(self) -> "PartitionedGeoJSONSeqWriter":
+        self.folder.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+        filepaths = {self.partition_filepath(key) for key in self.partitions}
+        for filepath in filepaths:
+            if exc_type is None:
+                commit_temporary(temporary_path(filepath), filepath)
+            else:
+                discard_temporary(temporary_path(filepath))
+        if exc_type is None:
+            for existing in self.folder.glob(f"{self.name}_*{GEOJSON_SEQ_EXTENSION}*"):
+                if str(existing) not in filepaths:
+                    existing.unlink()
+
+    def write_feature(self, when, geometry: Optional[dict], properties: dict):
+        """
+        Write a feature to the partition of its date.
+
+        Args:
+            when: Date, datetime or ISO date string used to choose the partition.
+            geometry: GeoJSON geometry dict.
+            properties: Feature properties.
+        """
+        key = self.partition_key(when)
+        writer = self._writers.get(key)
+        if writer is None:
+            writer = self._open_partition(key)
+        else:
+            self._writers.move_to_end(key)
+        writer.write_feature(geometry, properties)
+        self.partitions[key] = self.partitions.get(key, 0) + 1
+        self.count += 1
+
+    def write_features(self, features: Iterator[Tuple[object, Optional[dict], dict]]) -> int:
+        """
+        Write (date, geometry, properties) tuples.
+
+        Returns:
+            int: Number of features written by this call.
+        """
+        start = self.count
+        for when, geometry, properties in features:
+            self.write_feature(when, geometry, properties)
+        return self.count - start
+
+    def _open_partition(self, key: str) -> GeoJSONSeqWriter:
+        if len(self._writers) >= MAX_OPEN_PARTITIONS:
+            _, oldest = self._writers.popitem(last=False)
+            oldest.close()
+        temp_filepath = temporary_path(self.partition_filepath(key))
+        if key not in self.partitions:
+            discard_temporary(temp_filepath)  # left over by an interrupted export
+        writer = GeoJSONSeqWriter(temp_filepath, precision=self.precision,
+                                  record_separator=self.record_separator, compresslevel=self.compresslevel,
+                                  append=True).__enter__()
+        self._writers[key] = writer
+        return writer
+
+
+def read_geojson_seq(path: str, where: Optional[Callable[[str], bool]] = None) -> Iterator[dict]:
+    """
+    Read the features of a GeoJSON text sequence one by one, with or without RFC 8142 record separators.
+
+    Args:
+        path: A .geojsonl(.gz) file, or a folder of partitions written by PartitionedGeoJSONSeqWriter,
+            read in partition order.
+        where: Optional filter on the partition key (e.g. `lambda key: key.startswith("2024-05")`), for folders.
+
+    Returns:
+        Iterator of GeoJSON Feature dicts.
+    """
+    path = Path(path)
+    if path.is_dir():
+        filepaths = sorted(f for f in path.glob(f"*{GEOJSON_SEQ_EXTENSION}*") if not f.name.startswith("."))
+        if where is not None:
+            filepaths = [f for f in filepaths if where(f.name.split(GEOJSON_SEQ_EXTENSION)[0].rsplit("_", 1)[-1])]
+    else:
+        filepaths = [path]
+    loads = orjson.loads if orjson is not None else json.loads
+    for filepath in filepaths:
+        with _open_text(str(filepath), "r") as f:
+            for line in f:
+                line = line.lstrip(RECORD_SEPARATOR).strip()
+                if line:
+                    yield loads(line)
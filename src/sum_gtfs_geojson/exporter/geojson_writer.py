@@ -0,0 +1,218 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from datetime import date, datetime
+from pathlib import Path
+import json
+import math
+import numpy as np
+from .atomic import AtomicFile
+from .compression import CompressionOption
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library encoder is used instead
+    orjson = None
+
+DEFAULT_COORDINATE_PRECISION = 6  # ~0.1 m at the equator
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def _json_default(value):
+    """
+    Encode the values not supported natively by the standard library JSON encoder.
+    """
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _finite(value):
+    """
+    Replace the NaN and infinite floats of nested values with None, written as null like orjson does,
+    since NaN and Infinity are not valid JSON.
+    """
+    if isinstance(value, dict):
+        return {key: _finite(v) for key, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return _finite(value.tolist())
+    if isinstance(value, (float, np.floating)) and not math.isfinite(value):
+        return None
+    return value
+
+
+if orjson is not None:
+    def _dumps(value) -> str:
+        return orjson.dumps(value, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+else:
+    def _dumps(value) -> str:
+        try:
+            return json.dumps(value, default=_json_default, separators=(",", ":"), allow_nan=False)
+        except ValueError:  # NaN or infinite values, rare, so the values are only copied then
+            return json.dumps(_finite(value), default=_json_default, separators=(",", ":"), allow_nan=False)
+
+
+class GeoJSONWriter:
+    """
+    Streaming writer for GeoJSON FeatureCollection files.
+
+    Features are encoded and written one by one, so the memory used does not depend on the
+    number of features. Coordinates are rounded to a fixed number of decimals.
+    The file is written to a temporary file renamed once complete, so readers never see a partial file,
+    with optional .gz/.br sidecars compressed while writing for static hosting.
+    Uses orjson when installed, the standard library JSON encoder otherwise.
+
+    Usage:
+        with GeoJSONWriter("stops.geojson", name="stops") as writer:
+            for stop in stops:
+                writer.write_feature(GeoJSONWriter.point(stop.stop_lon, stop.stop_lat), stop.model_dump())
+
+    Attributes:
+        filepath (str): The path to the output GeoJSON file.
+        name (str): Name of the collection, defaults to the file name without extension.
+        precision (int): Number of decimals kept for the coordinates.
+        compression: Compressed sidecars written with the file, e.g. ["gzip", "brotli"] or {"gzip": 6}, see compression_levels.
+        count (int): Number of features written so far.
+    """
+
+    def __init__(self, filepath: str, name: Optional[str] = None,
+                 precision: int = DEFAULT_COORDINATE_PRECISION, compression: CompressionOption = None):
+        self.filepath = filepath
+        self.name = name if name is not None else Path(filepath).stem
+        self.precision = precision
+        self.compression = compression
+        self.count = 0
+        self._file = None
+        self._output = None
+
+    def __enter__(self) -> "GeoJSONWriter":
+        self._output = AtomicFile(self.filepath, self.compression)
+        self._file = self._output.open("w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE)
+        self._file.write(f'{{"type":"FeatureCollection","name":{_dumps(self.name)},"features":[\n')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._file.write("\n]}\n")
+        self._close(commit=exc_type is None)
+
+    def _close(self, commit: bool = True):
+        """
+        Close the temporary file, and rename it to the output path or discard it.
+        """
+        self._file.close()
+        self._file = None
+        if commit:
+            self._output.commit()
+        else:
+            self._output.discard()
+
+    def write_feature(self, geometry: Optional[dict], properties: dict):
+        """
+        Write a single feature.
+
+        Args:
+            geometry: GeoJSON geometry dict, see `point`, `line_string` and `polygon`. Coordinates are rounded by the writer.
+            properties: Feature properties, must be JSON serializable (datetimes are written in ISO format).
+        """
+        feature = self._encode_feature(geometry, properties)
+        if self.count:
+            self._file.write(",\n")
+        self._file.write(feature)
+        self.count += 1
+
+    def write_features(self, features: Iterable[Tuple[Optional[dict], dict]]) -> int:
+        """
+        Write (geometry, properties) pairs, e.g. produced by a generator over models.
+
+        Args:
+            features: Iterable of (geometry, properties) tuples.
+
+        Returns:
+            int: Number of features written by this call.
+        """
+        start = self.count
+        for geometry, properties in features:
+            self.write_feature(geometry, properties)
+        return self.count - start
+
+    def write_columns(self, geometries: Iterable[Optional[dict]], columns: Dict[str, Sequence]) -> int:
+        """
+        Write features from columnar data: one geometry and one value per column for each feature.
+
+        Args:
+            geometries: Iterable of GeoJSON geometry dicts, one per feature.
+            columns: Property values by property name, every column with one value per feature.
+
+        Returns:
+            int: Number of features written by this call.
+        """
+        names = list(columns.keys())
+        values = [c.tolist() if isinstance(c, np.ndarray) else c for c in columns.values()]
+        return self.write_features(
+            (geometry, dict(zip(names, row))) for geometry, row in zip(geometries, zip(*values)))
+
+    def encode_columns(self, geometries: Iterable[Optional[dict]], columns: Dict[str, Sequence]) -> Iterator[str]:
+        """
+        Encode features from columnar data without writing them, e.g. to build an HTTP response.
+
+        Args:
+            geometries: Iterable of GeoJSON geometry dicts, one per feature.
+            columns: Property values by property name, every column with one value per feature.
+
+        Returns:
+            Iterator of the encoded features, compact JSON with rounded coordinates.
+        """
+        names = list(columns.keys())
+        values = [c.tolist() if isinstance(c, np.ndarray) else c for c in columns.values()]
+        for geometry, row in zip(geometries, zip(*values)):
+            yield self._encode_feature(geometry, dict(zip(names, row)))
+
+    def _encode_feature(self, geometry: Optional[dict], properties: dict) -> str:
+        """
+        Encode a feature as compact JSON, with rounded coordinates.
+        """
+        if geometry is not None:
+            geometry = {"type": geometry["type"],
+                        "coordinates": self._round(geometry["coordinates"])}
+        return _dumps({"type": "Feature", "properties": properties, "geometry": geometry})
+
+    def _round(self, coordinates):
+        """
+        Round nested coordinates to the writer precision. Empty coordinates, e.g. of an empty geometry, are kept.
+        """
+        if len(coordinates) and isinstance(coordinates[0], (list, tuple)):
+            return [self._round(c) for c in coordinates]
+        return [round(c, self.precision) for c in coordinates]
+
+    @staticmethod
+    def point(lon: float, lat: float) -> dict:
+        """
+        Build a GeoJSON Point geometry.
+        """
+        return {"type": "Point", "coordinates": (lon, lat)}
+
+    @staticmethod
+    def line_string(coordinates: List[Tuple[float, float]]) -> dict:
+        """
+        Build a GeoJSON LineString geometry from (lon, lat) tuples.
+        """
+        return {"type": "LineString", "coordinates": coordinates}
+
+    @staticmethod
+    def polygon(ring: List[Tuple[float, float]]) -> dict:
+        """
+        Build a GeoJSON Polygon geometry from the (lon, lat) tuples of its exterior ring. The ring is closed if needed.
+        """
+        ring = list(ring)
+        if ring and ring[0] != ring[-1]:
+            ring.append(ring[0])
+        return {"type": "Polygon", "coordinates": [ring]}
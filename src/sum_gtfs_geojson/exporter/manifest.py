@@ -0,0 +1,160 @@
+from collections import Counter
+from dataclasses import dataclass, field, asdict
+from importlib.metadata import version, PackageNotFoundError
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterable, List, Optional
+import hashlib
+import json
+import os
+from .atomic import atomic_write, file_sha256
+
+MANIFEST_FILENAME = "manifest.json"
+PACKAGE_DATA_ROOT = Path(__file__).resolve().parents[1] / "data"  # data files shipped with the package
+PACKAGE_DATA_KEY = "sum_gtfs_geojson/data"
+
+
+def library_version() -> str:
+    """
+    Installed version of sum_gtfs_geojson, "unknown" when running from the sources.
+    """
+    try:
+        return version("sum_gtfs_geojson")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def input_keys(filepaths: Iterable[str], data_root: Optional[str] = None) -> Dict[str, str]:
+    """
+    Portable name of every input file in the manifest, without the local absolute paths: the path relative
+    to the package data for the files shipped with the package, relative to the data root for the files
+    within it, the file name otherwise. File names shared by several files, e.g. the stops.txt of several
+    feeds, are qualified with their parent folders until they are unique.
+
+    Args:
+        filepaths: The input files.
+        data_root: Folder of the data files. Defaults to None, the current directory.
+
+    Returns:
+        Dict[str, str]: The name of every file, by file path.
+    """
+    data_root = Path(data_root if data_root is not None else os.getcwd()).resolve()
+    keys, outside = {}, {}
+    for filepath in dict.fromkeys(str(f) for f in filepaths):
+        path = Path(filepath).resolve()
+        if path.is_relative_to(PACKAGE_DATA_ROOT):
+            keys[filepath] = str(PurePosixPath(PACKAGE_DATA_KEY, *path.relative_to(PACKAGE_DATA_ROOT).parts))
+        elif path.is_relative_to(data_root):
+            keys[filepath] = str(PurePosixPath(*path.relative_to(data_root).parts))
+        else:
+            outside[filepath] = path.parts[1:]
+    depths = {filepath: 1 for filepath in outside}
+    while True:
+        names = {filepath: "/".join(parts[-depths[filepath]:]) for filepath, parts in outside.items()}
+        counts = Counter(list(keys.values()) + list(names.values()))
+        qualified = [filepath for filepath, name in names.items()
+                     if counts[name] > 1 and depths[filepath] < len(outside[filepath])]
+        if not qualified:
+            return {**keys, **names}
+        for filepath in qualified:
+            depths[filepath] += 1
+
+
+def input_signature(filepath: str) -> Optional[Dict[str, Any]]:
+    """
+    Content hash, size and modification time of an input file, None when it is missing.
+    Only the hash and the size are part of the layer fingerprints, so a copied or reinstalled file is unchanged.
+    """
+    if not os.path.exists(filepath):
+        return None
+    stat = os.stat(filepath)
+    return {"sha256": file_sha256(filepath), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+@dataclass
+class LayerManifest:
+    """
+    What a layer was built from, and the hashes of the files written for it.
+
+    Attributes:
+        fingerprint (str): Hash of the inputs, parameters and library version, see ExportManifest.fingerprint.
+        inputs (Dict[str, dict]): SHA-256, size and modification time of every input file the layer depends on,
+            None for a missing file, by portable file name, see input_keys and input_signature.
+        parameters (Dict[str, Any]): Loader and export parameters.
+        outputs (Dict[str, str]): SHA-256 of every written file, by file name.
+    """
+    fingerprint: str
+    inputs: Dict[str, Optional[Dict[str, Any]]] = field(default_factory=dict)
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    outputs: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class ExportManifest:
+    """
+    Manifest stored next to the exported files (manifest.json), used to skip the layers whose inputs did
+    not change since the previous export.
+
+    Attributes:
+        library_version (str): Version of the library which wrote the manifest.
+        layers (Dict[str, LayerManifest]): Manifest of every exported layer, by layer name.
+    """
+    library_version: str = field(default_factory=library_version)
+    layers: Dict[str, LayerManifest] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, output_path: str) -> "ExportManifest":
+        """
+        Read the manifest of an export folder. An empty manifest is returned when it is missing or is not
+        valid JSON, e.g. truncated.
+        """
+        filepath = os.path.join(output_path, MANIFEST_FILENAME)
+        try:
+            with open(filepath, encoding="utf-8") as f:
+                content = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls()
+        return cls(library_version=content["library_version"],
+                   layers={name: LayerManifest(**layer) for name, layer in content["layers"].items()})
+
+    def save(self, output_path: str) -> str:
+        """
+        Write the manifest atomically in the export folder.
+        """
+        filepath = os.path.join(output_path, MANIFEST_FILENAME)
+        with atomic_write(filepath, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, indent=2, sort_keys=True, default=str)
+        return filepath
+
+    @staticmethod
+    def fingerprint(inputs: Dict[str, Optional[Dict[str, Any]]], parameters: Dict[str, Any], library: str) -> str:
+        """
+        Hash identifying what a layer is built from: input file hashes and sizes, parameters and library version.
+        The modification times are left out, so copying or reinstalling the input files does not change it.
+        """
+        contents = {key: signature and {"sha256": signature["sha256"], "size": signature["size"]}
+                    for key, signature in inputs.items()}
+        content = json.dumps({"inputs": contents, "parameters": parameters, "library_version": library},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def is_up_to_date(self, name: str, fingerprint: str, output_path: str) -> bool:
+        """
+        Check if a layer was exported from the same inputs, and if its files are still unchanged on disk.
+        """
+        layer = self.layers.get(name)
+        if layer is None or layer.fingerprint != fingerprint or not layer.outputs:
+            return False
+        for filename, digest in layer.outputs.items():
+            filepath = os.path.join(output_path, filename)
+            if not os.path.exists(filepath) or file_sha256(filepath) != digest:
+                return False
+        return True
+
+    def record(self, name: str, fingerprint: str, inputs: Dict[str, str], parameters: Dict[str, Any],
+               filepaths: List[str]):
+        """
+        Record a freshly exported layer, with the hashes of its files.
+        """
+        self.layers[name] = LayerManifest(
+            fingerprint=fingerprint, inputs=inputs, parameters=parameters,
+            outputs={os.path.basename(filepath): file_sha256(filepath) for filepath in filepaths})
@@ -0,0 +1,301 @@
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+import time
+import numpy as np
+from pydantic import BaseModel
+from .geojson_writer import GeoJSONWriter, DEFAULT_COORDINATE_PRECISION
+from .compression import CompressionOption
+from sum_gtfs_geojson.instrumentation import StageSpan, record_span
+
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+
+@dataclass
+class ColumnarLayer:
+    """
+    Compact columnar representation of a layer, cheap to pickle to a worker process.
+
+    The vertices of all features are stored in a single (m, 2) array of (lon, lat), and
+    `offsets` gives the first vertex of each feature (with a final end offset), as in Arrow/GeoArrow.
+    Numeric and datetime columns are stored as numpy arrays, other columns as lists.
+
+    Attributes:
+        name (str): Name of the layer, e.g. "stops".
+        geometry_type (str): GeoJSON geometry type of the features: "Point", "LineString" or "Polygon".
+        coordinates (np.ndarray): (m, 2) float64 array with the vertices of all features.
+        offsets (np.ndarray): (n + 1) int64 array, the vertices of feature i are coordinates[offsets[i]:offsets[i + 1]].
+        columns (Dict[str, Sequence]): Property values by property name, one value per feature.
+    """
+    name: str
+    geometry_type: str
+    coordinates: np.ndarray
+    offsets: np.ndarray
+    columns: Dict[str, Sequence] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @classmethod
+    def from_models(cls, name: str, geometry_type: str, models: Sequence[BaseModel],
+                    vertices: Callable[[BaseModel], Optional[List[Tuple[float, float]]]]) -> "ColumnarLayer":
+        """
+        Build a layer from pydantic models, with one property column per model field.
+        Models for which `vertices` returns None are skipped.
+
+        Args:
+            name: Name of the layer.
+            geometry_type: GeoJSON geometry type of the features.
+            models: The models to export.
+            vertices: Function returning the (lon, lat) vertices of a model, or None when it has no geometry.
+
+        Returns:
+            ColumnarLayer with the located models.
+        """
+        located, coordinates, offsets = [], [], [0]
+        for model in models:
+            model_vertices = vertices(model)
+            if model_vertices is None:
+                continue
+            located.append(model)
+            coordinates.extend(model_vertices)
+            offsets.append(len(coordinates))
+
+        columns = {}
+        if located:
+            for field_name in type(located[0]).model_fields:
+                columns[field_name] = _to_column([getattr(m, field_name) for m in located])
+
+        return cls(name=name,
+                   geometry_type=geometry_type,
+                   coordinates=np.array(coordinates, dtype=np.float64).reshape(-1, 2),
+                   offsets=np.array(offsets, dtype=np.int64),
+                   columns=columns)
+
+    @classmethod
+    def from_features(cls, name: str, geometry_type: str,
+                      features: Iterable[Tuple[dict, dict]]) -> "ColumnarLayer":
+        """
+        Build a layer from (geometry, properties) pairs, all of the same geometry type.
+        Polygons are reduced to their exterior ring.
+
+        Args:
+            name: Name of the layer.
+            geometry_type: GeoJSON geometry type of the features.
+            features: Iterable of (geometry, properties) tuples, as written by GeoJSONWriter.
+
+        Returns:
+            ColumnarLayer with the features.
+        """
+        coordinates, offsets, rows = [], [0], []
+        for geometry, properties in features:
+            if geometry_type == "Point":
+                coordinates.append(geometry["coordinates"])
+            elif geometry_type == "Polygon":
+                coordinates.extend(geometry["coordinates"][0])
+            else:
+                coordinates.extend(geometry["coordinates"])
+            offsets.append(len(coordinates))
+            rows.append(properties)
+
+        names = list(dict.fromkeys(key for row in rows for key in row))
+        columns = {key: _to_column([row.get(key) for row in rows]) for key in names}
+
+        return cls(name=name,
+                   geometry_type=geometry_type,
+                   coordinates=np.array(coordinates, dtype=np.float64).reshape(-1, 2),
+                   offsets=np.array(offsets, dtype=np.int64),
+                   columns=columns)
+
+    def to_geodataframe(self) -> "gpd.GeoDataFrame":
+        """
+        Convert the layer to a GeoDataFrame, with geometries built in a single vectorized call.
+        """
+        import geopandas as gpd  # imported on first use, see sum_gtfs_geojson.lazy
+        import shapely
+
+        if self.geometry_type == "Point":
+            geometry = shapely.points(self.coordinates)
+        elif self.geometry_type == "LineString":
+            geometry = shapely.linestrings(self.coordinates, indices=self._feature_indices())
+        elif self.geometry_type == "Polygon":
+            geometry = shapely.polygons(shapely.linearrings(self.coordinates, indices=self._feature_indices()))
+        else:
+            raise ValueError(f"Unsupported geometry type: {self.geometry_type}")
+        return gpd.GeoDataFrame(dict(self.columns), geometry=geometry, crs="EPSG:4326")
+
+    def _feature_indices(self) -> np.ndarray:
+        """
+        Index of the feature of every vertex.
+        """
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    def centroids(self) -> np.ndarray:
+        """
+        Mean position of the vertices of each feature, as an (n, 2) array of (lon, lat).
+        """
+        if not len(self):
+            return np.empty((0, 2), dtype=np.float64)
+        sums = np.add.reduceat(self.coordinates, self.offsets[:-1], axis=0)
+        return sums / np.diff(self.offsets)[:, None]
+
+    def take(self, indices: np.ndarray) -> "ColumnarLayer":
+        """
+        Build a new layer with the features at the given indexes, in that order.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        lengths = np.diff(self.offsets)[indices]
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        vertices = np.repeat(self.offsets[indices] - offsets[:-1], lengths) + np.arange(offsets[-1])
+        columns = {name: (values[indices] if isinstance(values, np.ndarray) else [values[i] for i in indices.tolist()])
+                   for name, values in self.columns.items()}
+        return ColumnarLayer(name=self.name, geometry_type=self.geometry_type,
+                             coordinates=self.coordinates[vertices], offsets=offsets, columns=columns)
+
+    def geometries(self) -> Iterator[dict]:
+        """
+        Generate the GeoJSON geometry of each feature.
+        """
+        coordinates = self.coordinates.tolist()
+        offsets = self.offsets.tolist()
+        if self.geometry_type == "Point":
+            for start in offsets[:-1]:
+                yield GeoJSONWriter.point(*coordinates[start])
+        elif self.geometry_type == "LineString":
+            for start, end in zip(offsets[:-1], offsets[1:]):
+                yield GeoJSONWriter.line_string(coordinates[start:end])
+        elif self.geometry_type == "Polygon":
+            for start, end in zip(offsets[:-1], offsets[1:]):
+                yield GeoJSONWriter.polygon(coordinates[start:end])
+        else:
+            raise ValueError(f"Unsupported geometry type: {self.geometry_type}")
+
+
+def _to_column(values: list) -> Sequence:
+    """
+    Store a column compactly: numpy arrays for numbers and datetimes, plain values otherwise.
+    Nested models are converted to dictionaries so the column is JSON serializable.
+    """
+    if all(isinstance(v, bool) for v in values):
+        return np.array(values, dtype=np.bool_)
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return np.array(values, dtype=np.int64)
+    if all(isinstance(v, float) for v in values):
+        return np.array(values, dtype=np.float64)
+    if all(isinstance(v, datetime) and v.tzinfo is None for v in values):
+        return np.array(values, dtype="datetime64[us]")
+    return [_to_plain(v) for v in values]
+
+
+def _to_plain(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, list):
+        return [_to_plain(v) for v in value]
+    return value
+
+
+@dataclass
+class LayerExportReport:
+    """
+    Timing of the export of a single layer.
+
+    Attributes:
+        name (str): Name of the layer.
+        filepath (str): The path to the output file.
+        feature_count (int): Number of exported features.
+        seconds (float): Wall time of the export, in seconds.
+    """
+    name: str
+    filepath: str
+    feature_count: int
+    seconds: float
+
+
+@dataclass
+class ExportReport:
+    """
+    Aggregated timings of a multi-layer export.
+
+    Attributes:
+        output_path (str): The folder of the exported files.
+        layers (List[LayerExportReport]): Report of each exported layer, in completion order.
+        total_seconds (float): Wall time of the whole export, in seconds.
+        max_workers (Optional[int]): Number of worker processes, None for a sequential export.
+        skipped (List[str]): Layers not exported, because their files are up to date.
+    """
+    output_path: str
+    layers: List[LayerExportReport] = field(default_factory=list)
+    total_seconds: float = 0.0
+    max_workers: Optional[int] = None
+    skipped: List[str] = field(default_factory=list)
+
+    @property
+    def cumulated_seconds(self) -> float:
+        """
+        Sum of the layer export times, i.e. the duration of an equivalent sequential export.
+        """
+        return sum(layer.seconds for layer in self.layers)
+
+    def summary(self) -> str:
+        """
+        Human-readable summary of the export, one line per layer.
+        """
+        lines = [f"{layer.name}: {layer.feature_count} features in {layer.seconds:.2f}s"
+                 for layer in self.layers]
+        if self.skipped:
+            lines.append(f"Skipped {len(self.skipped)} unchanged layers: {', '.join(self.skipped)}")
+        lines.append(f"Exported {len(self.layers)} layers to {self.output_path} in {self.total_seconds:.2f}s "
+                     f"(cumulated layer time {self.cumulated_seconds:.2f}s)")
+        return "\n".join(lines)
+
+
+def write_columnar_layer(layer: ColumnarLayer, filepath: str, precision: int = DEFAULT_COORDINATE_PRECISION,
+                         compression: CompressionOption = None) -> LayerExportReport:
+    """
+    Write a columnar layer to a GeoJSON file. Top-level function, so it can run in a worker process.
+
+    Args:
+        layer: The layer to export.
+        filepath: The path to the output GeoJSON file.
+        precision: Number of decimals kept for the coordinates.
+        compression: Compressed sidecars written with the file, see compression_levels. Defaults to None.
+
+    Returns:
+        LayerExportReport: The timing of the export.
+    """
+    start = time.perf_counter()
+    with GeoJSONWriter(filepath, precision=precision, compression=compression) as writer:
+        writer.write_columns(layer.geometries(), layer.columns)
+    return LayerExportReport(name=layer.name, filepath=filepath,
+                             feature_count=writer.count, seconds=time.perf_counter() - start)
+
+
+def run_export_tasks(tasks: List[Tuple[Callable[..., LayerExportReport], tuple]], output_path: str,
+                     max_workers: Optional[int] = None) -> ExportReport:
+    """
+    Run layer export tasks in a process pool, recording a stage in the active report as each layer completes.
+
+    Args:
+        tasks: (function, arguments) of each task, the function must be picklable and return a LayerExportReport.
+            Tasks are submitted in the given order, so the largest layers should come first.
+        output_path: The folder of the exported files, for the report.
+        max_workers: Maximum number of worker processes. Defaults to the number of processors.
+
+    Returns:
+        ExportReport: The timings of every layer and of the whole export.
+    """
+    report = ExportReport(output_path=output_path, max_workers=max_workers)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(function, *arguments) for function, arguments in tasks]
+        for future in as_completed(futures):
+            layer_report = future.result()
+            report.layers.append(layer_report)
+            record_span(StageSpan(name=f"export_{layer_report.name}", started_at=time.time() - layer_report.seconds,
+                                  seconds=layer_report.seconds, rows_out=layer_report.feature_count,
+                                  attributes={"filepath": layer_report.filepath, "worker": True}))
+    report.total_seconds = time.perf_counter() - start
+    return report
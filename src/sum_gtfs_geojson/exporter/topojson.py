@@ -0,0 +1,152 @@
+from typing import Dict, List, Tuple
+import time
+import numpy as np
+from .geojson_writer import _dumps, WRITE_BUFFER_SIZE
+from .atomic import atomic_write
+from .compression import CompressionOption
+from .parallel_export import ColumnarLayer, LayerExportReport
+
+DEFAULT_QUANTIZATION = 100_000  # grid positions per axis, ~0.5 m over the Geneva area
+
+
+def build_topology(layer: ColumnarLayer, quantization: int = DEFAULT_QUANTIZATION) -> dict:
+    """
+    Build a TopoJSON topology from a LineString layer, storing the segments shared by several lines once.
+
+    Coordinates are quantized on a `quantization` x `quantization` grid over the layer bbox, and two
+    vertices at the same grid position are the same node. Lines are cut into arcs at junctions, the nodes
+    where lines start or end, merge or split (any node without exactly two neighbours), so the
+    lines running along the same streets reference the same arcs, reversed arcs being referenced with
+    their one's complement index as in the TopoJSON specification. Arc positions are delta-encoded.
+
+    Args:
+        layer: A LineString layer, e.g. the itineraries.
+        quantization: Number of grid positions per axis. Defaults to 100000.
+
+    Returns:
+        dict: The TopoJSON topology, with the lines and their properties in an object named after the layer.
+    """
+    if layer.geometry_type != "LineString":
+        raise ValueError(f"TopoJSON export supports LineString layers, got {layer.geometry_type}")
+
+    coordinates = layer.coordinates
+    bbox = [0.0, 0.0, 0.0, 0.0]
+    scale = np.ones(2)
+    translate = np.zeros(2)
+    if len(coordinates):
+        minimum, maximum = coordinates.min(axis=0), coordinates.max(axis=0)
+        bbox = [*minimum.tolist(), *maximum.tolist()]
+        translate = minimum
+        extent = maximum - minimum
+        scale = np.where(extent > 0, extent / (quantization - 1), 1.0)
+    quantized = np.rint((coordinates - translate) / scale).astype(np.int64)
+
+    lines = _node_sequences(quantized, layer.offsets)
+    junctions = _junctions(lines)
+
+    arcs: List[List[Tuple[int, int]]] = []
+    arc_index: Dict[tuple, int] = {}
+    geometries = []
+    columns = {name: (values.tolist() if isinstance(values, np.ndarray) else values)
+               for name, values in layer.columns.items()}
+    for i, nodes in enumerate(lines):
+        properties = {name: values[i] for name, values in columns.items()}
+        if len(nodes) < 2:
+            geometries.append({"type": None, "properties": properties})
+            continue
+        line_arcs = []
+        start = 0
+        for end in range(1, len(nodes)):
+            if end == len(nodes) - 1 or nodes[end] in junctions:
+                line_arcs.append(_arc_reference(tuple(nodes[start:end + 1]), arcs, arc_index))
+                start = end
+        geometries.append({"type": "LineString", "arcs": line_arcs, "properties": properties})
+
+    return {
+        "type": "Topology",
+        "bbox": bbox,
+        "transform": {"scale": scale.tolist(), "translate": translate.tolist()},
+        "objects": {layer.name: {"type": "GeometryCollection", "geometries": geometries}},
+        "arcs": [_delta_encode(arc) for arc in arcs],
+    }
+
+
+def _node_sequences(quantized: np.ndarray, offsets: np.ndarray) -> List[List[Tuple[int, int]]]:
+    """
+    Quantized positions of each line, without the consecutive duplicates created by quantization.
+    """
+    positions = [tuple(p) for p in quantized.tolist()]
+    lines = []
+    for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+        nodes = []
+        for position in positions[start:end]:
+            if not nodes or nodes[-1] != position:
+                nodes.append(position)
+        lines.append(nodes)
+    return lines
+
+
+def _junctions(lines: List[List[Tuple[int, int]]]) -> set:
+    """
+    Nodes where arcs must be cut: line ends, and nodes without exactly two distinct neighbours.
+    Between two junctions, every line follows the same sequence of nodes, so the arcs can be shared.
+    """
+    neighbours = {}
+    junctions = set()
+    for nodes in lines:
+        if not nodes:
+            continue
+        junctions.add(nodes[0])
+        junctions.add(nodes[-1])
+        for a, b in zip(nodes[:-1], nodes[1:]):
+            neighbours.setdefault(a, set()).add(b)
+            neighbours.setdefault(b, set()).add(a)
+    junctions.update(node for node, adjacent in neighbours.items() if len(adjacent) != 2)
+    return junctions
+
+
+def _arc_reference(nodes: tuple, arcs: list, arc_index: Dict[tuple, int]) -> int:
+    """
+    Index of the arc going through `nodes`, added if new. Arcs used backwards are referenced as ~index.
+    """
+    index = arc_index.get(nodes)
+    if index is not None:
+        return index
+    index = arc_index.get(nodes[::-1])
+    if index is not None:
+        return ~index
+    arc_index[nodes] = len(arcs)
+    arcs.append(list(nodes))
+    return len(arcs) - 1
+
+
+def _delta_encode(arc: List[Tuple[int, int]]) -> List[List[int]]:
+    """
+    Keep the first position of the arc, then the difference with the previous position.
+    """
+    encoded = [list(arc[0])]
+    for (x0, y0), (x1, y1) in zip(arc[:-1], arc[1:]):
+        encoded.append([x1 - x0, y1 - y0])
+    return encoded
+
+
+def write_topojson_layer(layer: ColumnarLayer, filepath: str, quantization: int = DEFAULT_QUANTIZATION,
+                         compression: CompressionOption = None) -> LayerExportReport:
+    """
+    Write a LineString layer to a TopoJSON file, see build_topology. Top-level function, so it can run in a worker process.
+
+    Args:
+        layer: The layer to export.
+        filepath: The path to the output TopoJSON file.
+        quantization: Number of grid positions per axis. Defaults to 100000.
+        compression: Compressed sidecars written with the file, see compression_levels. Defaults to None.
+
+    Returns:
+        LayerExportReport: The timing of the export.
+    """
+    start = time.perf_counter()
+    topology = build_topology(layer, quantization)
+    with atomic_write(filepath, "w", compression, encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(_dumps(topology))
+    return LayerExportReport(name=f"{layer.name}_topojson", filepath=filepath,
+                             feature_count=len(layer), seconds=time.perf_counter() - start)
@@ -0,0 +1,252 @@
+from typing import Dict, Iterator, List, Tuple
+from collections import defaultdict
+from pathlib import Path
+import gzip
+import json
+import sqlite3
+import numpy as np
+from shapely import clip_by_rect, simplify, transform
+from shapely.geometry import Point, LineString, Polygon
+from .parallel_export import ColumnarLayer
+from sum_gtfs_geojson.instrumentation import stage
+
+DEFAULT_MIN_ZOOM = 8
+DEFAULT_MAX_ZOOM = 14
+TILE_EXTENT = 4096
+TILE_BUFFER = 64  # in tile extent units, avoids seams when rendering clipped lines
+THINNING_SPACING_PX = 4  # below max zoom, keep one feature per bounding box rounded to this size (256 px tiles)
+MIN_FEATURE_SIZE_PX = 1  # below max zoom, drop lines and polygons smaller than this size (256 px tiles)
+SIMPLIFY_TOLERANCE_PX = 0.5  # below max zoom, simplify lines and polygons with this tolerance (256 px tiles)
+MAX_MERCATOR_LATITUDE = 85.0511287798
+
+
+class VectorTileExporter:
+    """
+    Export columnar layers as a tiled vector pyramid of Mapbox Vector Tiles, in a single archive.
+
+    The archive format is chosen from the file extension: `.pmtiles` (a single file readable with
+    HTTP range requests, suited to static hosting) or `.mbtiles` (SQLite, for tile servers).
+    Tiles are gzip compressed.
+
+    Below the maximum zoom, features are thinned so low zoom tiles stay small: features whose bounding
+    boxes match once rounded to THINNING_SPACING_PX pixels are dropped (the first one in layer order is
+    kept), lines and polygons smaller than a pixel are dropped and the others are simplified.
+
+    Requires the optional dependencies `mapbox-vector-tile`, and `pmtiles` for PMTiles archives.
+
+    Attributes:
+        layers (List[ColumnarLayer]): The layers to export, one MVT layer each.
+        min_zoom (int): Lowest zoom level of the pyramid.
+        max_zoom (int): Highest zoom level of the pyramid, where all features are kept.
+    """
+
+    def __init__(self, layers: List[ColumnarLayer], min_zoom: int = DEFAULT_MIN_ZOOM,
+                 max_zoom: int = DEFAULT_MAX_ZOOM):
+        if min_zoom < 0 or max_zoom < min_zoom:
+            raise ValueError("Zoom levels must satisfy 0 <= min_zoom <= max_zoom")
+        self.layers = [layer for layer in layers if len(layer)]
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        # Web mercator position of every vertex, as a fraction of the world width
+        self._mercator = {layer.name: _to_mercator(layer.coordinates) for layer in self.layers}
+
+    def export(self, filepath: str) -> int:
+        """
+        Write the vector tile archive.
+
+        Args:
+            filepath: The path to the output archive, ending with .pmtiles or .mbtiles.
+
+        Returns:
+            int: The number of written tiles.
+        """
+        extension = Path(filepath).suffix.lower()
+        if extension not in (".pmtiles", ".mbtiles"):
+            raise ValueError(f"Unsupported vector tile archive: {filepath}, expected .pmtiles or .mbtiles")
+        with stage("export_vector_tiles", filepath=filepath, min_zoom=self.min_zoom, max_zoom=self.max_zoom) as span:
+            span.rows_out = self._write_pmtiles(filepath) if extension == ".pmtiles" else self._write_mbtiles(filepath)
+        return span.rows_out
+
+    def tiles(self) -> Iterator[Tuple[int, int, int, bytes]]:
+        """
+        Generate the gzip compressed MVT tiles, zoom by zoom.
+
+        Returns:
+            Iterator of (z, x, y) tile coordinates (XYZ scheme) with the tile data.
+        """
+        import mapbox_vector_tile
+
+        for zoom in range(self.min_zoom, self.max_zoom + 1):
+            tile_layers: Dict[Tuple[int, int], Dict[str, list]] = defaultdict(lambda: defaultdict(list))
+            for layer in self.layers:
+                for tile, feature in self._layer_tile_features(layer, zoom):
+                    tile_layers[tile][layer.name].append(feature)
+
+            for (x, y), features_by_layer in sorted(tile_layers.items()):
+                data = mapbox_vector_tile.encode(
+                    [{"name": name, "features": features} for name, features in features_by_layer.items()],
+                    default_options={"y_coord_down": True, "extents": TILE_EXTENT},
+                )
+                yield zoom, x, y, gzip.compress(data, mtime=0)
+
+    def _layer_tile_features(self, layer: ColumnarLayer, zoom: int) -> Iterator[Tuple[Tuple[int, int], dict]]:
+        """
+        Generate the (tile, MVT feature) pairs of a layer at a zoom level, after thinning.
+        """
+        scale = (1 << zoom) * TILE_EXTENT
+        pixel = TILE_EXTENT / 256
+        vertices = self._mercator[layer.name] * scale
+        starts = layer.offsets[:-1]
+        is_max_zoom = zoom == self.max_zoom
+
+        mins = np.minimum.reduceat(vertices, starts)
+        maxs = np.maximum.reduceat(vertices, starts)
+        kept = np.arange(len(layer))
+        if not is_max_zoom:
+            # Features with the same bounding box at the thinning resolution look the same, keep the first one
+            bins = np.floor(np.hstack([mins, maxs]) / (THINNING_SPACING_PX * pixel)).astype(np.int64)
+            _, first = np.unique(bins, axis=0, return_index=True)
+            kept = np.sort(first)
+            if layer.geometry_type != "Point":
+                size = np.max(maxs[kept] - mins[kept], axis=1)
+                kept = kept[size >= MIN_FEATURE_SIZE_PX * pixel]
+
+        tile_mins = np.floor((mins - TILE_BUFFER) / TILE_EXTENT).astype(np.int64)
+        tile_maxs = np.floor((maxs + TILE_BUFFER) / TILE_EXTENT).astype(np.int64)
+        tile_mins = np.clip(tile_mins, 0, (1 << zoom) - 1)
+        tile_maxs = np.clip(tile_maxs, 0, (1 << zoom) - 1)
+        columns = {name: (values.tolist() if isinstance(values, np.ndarray) else values)
+                   for name, values in layer.columns.items()}
+
+        for i in kept.tolist():
+            feature_vertices = vertices[layer.offsets[i]:layer.offsets[i + 1]]
+            properties = _mvt_properties({name: values[i] for name, values in columns.items()})
+            geometry = _shape(layer.geometry_type, feature_vertices)
+            if not is_max_zoom and layer.geometry_type != "Point":
+                geometry = simplify(geometry, SIMPLIFY_TOLERANCE_PX * pixel, preserve_topology=True)
+            for x in range(tile_mins[i][0], tile_maxs[i][0] + 1):
+                for y in range(tile_mins[i][1], tile_maxs[i][1] + 1):
+                    origin_x, origin_y = x * TILE_EXTENT, y * TILE_EXTENT
+                    if layer.geometry_type == "Point":
+                        local = Point(feature_vertices[0][0] - origin_x, feature_vertices[0][1] - origin_y)
+                    else:
+                        local = clip_by_rect(
+                            geometry, origin_x - TILE_BUFFER, origin_y - TILE_BUFFER,
+                            origin_x + TILE_EXTENT + TILE_BUFFER, origin_y + TILE_EXTENT + TILE_BUFFER)
+                        if local.is_empty:
+                            continue
+                        local = _translate(local, -origin_x, -origin_y)
+                    yield (x, y), {"geometry": local, "properties": properties}
+
+    def _metadata(self) -> dict:
+        """
+        TileJSON style metadata describing the vector layers.
+        """
+        return {
+            "name": "sum_gtfs_geojson",
+            "format": "pbf",
+            "minzoom": self.min_zoom,
+            "maxzoom": self.max_zoom,
+            "vector_layers": [
+                {"id": layer.name, "fields": {name: "String" for name in layer.columns},
+                 "minzoom": self.min_zoom, "maxzoom": self.max_zoom}
+                for layer in self.layers
+            ],
+        }
+
+    def _bounds(self) -> Tuple[float, float, float, float]:
+        """
+        (min_lon, min_lat, max_lon, max_lat) of all the layers.
+        """
+        coordinates = np.concatenate([layer.coordinates for layer in self.layers])
+        min_lon, min_lat = coordinates.min(axis=0)
+        max_lon, max_lat = coordinates.max(axis=0)
+        return float(min_lon), float(min_lat), float(max_lon), float(max_lat)
+
+    def _write_pmtiles(self, filepath: str) -> int:
+        from pmtiles.tile import zxy_to_tileid, TileType, Compression
+        from pmtiles.writer import Writer
+
+        # PMTiles archives are clustered when tiles are written in tile id order
+        tiles = sorted(((zxy_to_tileid(z, x, y), data) for z, x, y, data in self.tiles()), key=lambda t: t[0])
+        min_lon, min_lat, max_lon, max_lat = self._bounds()
+        with open(filepath, "wb") as f:
+            writer = Writer(f)
+            for tile_id, data in tiles:
+                writer.write_tile(tile_id, data)
+            writer.finalize({
+                "tile_type": TileType.MVT,
+                "tile_compression": Compression.GZIP,
+                "min_lon_e7": int(min_lon * 1e7),
+                "min_lat_e7": int(min_lat * 1e7),
+                "max_lon_e7": int(max_lon * 1e7),
+                "max_lat_e7": int(max_lat * 1e7),
+                "center_zoom": self.min_zoom,
+                "center_lon_e7": int((min_lon + max_lon) / 2 * 1e7),
+                "center_lat_e7": int((min_lat + max_lat) / 2 * 1e7),
+            }, self._metadata())
+        return len(tiles)
+
+    def _write_mbtiles(self, filepath: str) -> int:
+        Path(filepath).unlink(missing_ok=True)
+        min_lon, min_lat, max_lon, max_lat = self._bounds()
+        metadata = self._metadata()
+        count = 0
+        with sqlite3.connect(filepath) as connection:
+            connection.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+            connection.execute(
+                "CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)")
+            connection.execute(
+                "CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+            connection.executemany("INSERT INTO metadata VALUES (?, ?)", [
+                ("name", metadata["name"]),
+                ("format", metadata["format"]),
+                ("minzoom", str(self.min_zoom)),
+                ("maxzoom", str(self.max_zoom)),
+                ("bounds", f"{min_lon},{min_lat},{max_lon},{max_lat}"),
+                ("center", f"{(min_lon + max_lon) / 2},{(min_lat + max_lat) / 2},{self.min_zoom}"),
+                ("json", json.dumps({"vector_layers": metadata["vector_layers"]})),
+            ])
+            for z, x, y, data in self.tiles():
+                # MBTiles rows follow the TMS scheme, with y pointing north
+                connection.execute("INSERT INTO tiles VALUES (?, ?, ?, ?)", (z, x, (1 << z) - 1 - y, data))
+                count += 1
+        return count
+
+
+def _to_mercator(coordinates: np.ndarray) -> np.ndarray:
+    """
+    Project (lon, lat) coordinates to web mercator, as (x, y) fractions of the world, y pointing south.
+    """
+    lon = coordinates[:, 0]
+    lat = np.radians(np.clip(coordinates[:, 1], -MAX_MERCATOR_LATITUDE, MAX_MERCATOR_LATITUDE))
+    x = (lon + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0
+    return np.column_stack([x, y])
+
+
+def _shape(geometry_type: str, vertices: np.ndarray):
+    if geometry_type == "Point":
+        return Point(vertices[0])
+    if geometry_type == "LineString":
+        return LineString(vertices)
+    return Polygon(vertices)
+
+
+def _translate(geometry, dx: float, dy: float):
+    return transform(geometry, lambda xy: xy + (dx, dy))
+
+
+def _mvt_properties(properties: dict) -> dict:
+    """
+    Keep the values supported by MVT attributes: None values are dropped, nested values are JSON encoded.
+    """
+    encoded = {}
+    for name, value in properties.items():
+        if value is None:
+            continue
+        if isinstance(value, (str, bool, int, float)):
+            encoded[name] = value
+        else:
+            encoded[name] = json.dumps(value, default=str)
+    return encoded
@@ -0,0 +1,7 @@
+from .report import StageSpan, LoadReport, stage, record_span, active_report, max_rss_mb
+from .sinks import ReportSink, LoggingSink, JsonFileSink, CallbackSink
+from .profiling import StageProfiler, ProfileOption, ProfileMode, profiling
+
+__all__ = ["StageSpan", "LoadReport", "stage", "record_span", "active_report", "max_rss_mb",
+           "ReportSink", "LoggingSink", "JsonFileSink", "CallbackSink",
+           "StageProfiler", "ProfileOption", "ProfileMode", "profiling"]
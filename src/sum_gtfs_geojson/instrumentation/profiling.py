@@ -0,0 +1,198 @@
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Collection, Dict, Iterator, List, Literal, Optional, Union
+import cProfile
+import re
+import sys
+import threading
+from .report import LoadReport, StageSpan, active_report
+
+ProfileMode = Literal["cprofile", "sampling", "both"]
+DEFAULT_PROFILE_MODE = "both"
+DEFAULT_SAMPLING_INTERVAL = 0.005  # seconds
+COLLAPSED_STACKS_FILENAME = "profile.collapsed"
+PROJECT_PACKAGE = "sum_gtfs_geojson"
+
+
+class _StackSampler:
+    """
+    Sample the call stack of a thread at a fixed interval from a daemon thread, and count every distinct stack.
+    The frames already on the stack when the sampling starts (the callers of the stage) are left out.
+    """
+
+    def __init__(self, interval: float, collapse_libraries: bool):
+        self.interval = interval
+        self.collapse_libraries = collapse_libraries
+        self.counts: Counter = Counter()
+        self._thread_id = threading.get_ident()
+        self._callers = set()
+        frame = sys._getframe()
+        while frame is not None:
+            self._callers.add(id(frame))
+            frame = frame.f_back
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="sum_gtfs_geojson_stack_sampler", daemon=True)
+        self._sampler.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self.counts[self._labels(frame)] += 1
+
+    def _labels(self, frame) -> tuple:
+        labels = []
+        while frame is not None and id(frame) not in self._callers:
+            module = frame.f_globals.get("__name__", "?")
+            package = module.split(".", 1)[0]
+            if self.collapse_libraries and package not in (PROJECT_PACKAGE, "__main__"):
+                if not labels or labels[-1] != package:
+                    labels.append(package)  # pandas, pydantic, numpy... internals as a single frame
+            else:
+                labels.append(f"{module}:{frame.f_code.co_name}")
+            frame = frame.f_back
+        return tuple(reversed(labels))
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._sampler.join()
+        return self.counts
+
+
+class StageProfiler:
+    """
+    Opt-in profiler of the pipeline stages recorded in a LoadReport, see `stage`.
+
+    Every profiled stage gets its own cProfile `.pstats` file, readable with pstats or snakeviz, and the
+    sampled stacks of all the profiled stages are written to one collapsed-stack file (one
+    "frame;frame;frame count" line per distinct stack, rooted at the stage name), readable with flamegraph.pl
+    or speedscope. The frames of the libraries (pandas, pydantic, numpy...) are collapsed to their package
+    name, so the stacks show where the library code is called from.
+
+    Stages nested in a profiled stage are profiled with it. By default the stages just below the top-level
+    stage are profiled, e.g. load_stops, load_trips... below load_all_data, or every exported layer below
+    save_to_geojson.
+
+    Usage:
+        ums = loader.load_all_data(datatypes, profile=StageProfiler("profiles", stages=["load_stop_times"]))
+        ums = loader.load_all_data(datatypes, profile="profiles")  # every stage below load_all_data
+
+    Attributes:
+        output_dir (Path): Folder of the profile files.
+        mode (str): "cprofile" for the .pstats files, "sampling" for the collapsed stacks, "both" for both.
+        stages (Collection[str], optional): Names of the profiled stages, None for the stages at `depth`.
+        depth (int): Depth of the profiled stages when no names are given, 0 for the top-level stages.
+        interval (float): Sampling interval, in seconds.
+        collapse_libraries (bool): Collapse the library frames of the sampled stacks to their package name.
+        files (List[str]): The written files.
+    """
+
+    def __init__(self, output_dir: Union[str, Path], mode: ProfileMode = DEFAULT_PROFILE_MODE,
+                 stages: Optional[Collection[str]] = None, depth: int = 1,
+                 interval: float = DEFAULT_SAMPLING_INTERVAL, collapse_libraries: bool = True):
+        if mode not in ProfileMode.__args__:
+            raise ValueError(f"Unsupported profile mode: {mode}, expected one of {list(ProfileMode.__args__)}")
+        self.output_dir = Path(output_dir)
+        self.mode = mode
+        self.stages = set(stages) if stages is not None else None
+        self.depth = depth
+        self.interval = interval
+        self.collapse_libraries = collapse_libraries
+        self.files: List[str] = []
+        self._collapsed: Counter = Counter()
+        self._profiled = 0
+        self._active: Optional[StageSpan] = None
+
+    @classmethod
+    def from_option(cls, profile: "ProfileOption") -> Optional["StageProfiler"]:
+        """
+        Profiler of a `profile=` option: None, an output folder, or a StageProfiler.
+        """
+        if profile is None or isinstance(profile, StageProfiler):
+            return profile
+        return cls(profile)
+
+    def should_profile(self, span: StageSpan, depth: int) -> bool:
+        if self._active is not None:
+            return False  # already profiled with the enclosing stage
+        return span.name in self.stages if self.stages is not None else depth == self.depth
+
+    @contextmanager
+    def profile(self, span: StageSpan) -> Iterator[None]:
+        """
+        Profile a stage, and write its files when it ends.
+        """
+        self._active = span
+        sampler = _StackSampler(self.interval, self.collapse_libraries) if self.mode != "cprofile" else None
+        profiler = cProfile.Profile() if self.mode != "sampling" else None
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            counts = sampler.stop() if sampler is not None else None
+            self._active = None
+            self._write(span, profiler, counts)
+
+    def _write(self, span: StageSpan, profiler: Optional[cProfile.Profile], counts: Optional[Counter]):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._profiled += 1
+        name = re.sub(r"[^\w.-]+", "_", span.name)
+        if profiler is not None:
+            filepath = str(self.output_dir / f"{self._profiled:03d}_{name}.pstats")
+            profiler.dump_stats(filepath)
+            span.attributes["pstats"] = filepath
+            self._record(filepath)
+        if counts is not None:
+            for stack, count in counts.items():
+                self._collapsed[(span.name,) + stack] += count
+            filepath = str(self.output_dir / COLLAPSED_STACKS_FILENAME)
+            with open(filepath, "w", encoding="utf-8") as f:
+                f.writelines(f"{';'.join(stack)} {count}\n" for stack, count in sorted(self._collapsed.items()))
+            span.attributes["profile_samples"] = sum(counts.values())
+            self._record(filepath)
+
+    def _record(self, filepath: str):
+        if filepath not in self.files:
+            self.files.append(filepath)
+
+    def collapsed_stacks(self) -> Dict[str, int]:
+        """
+        Sample count of every collapsed stack recorded so far, "stage;frame;frame" keys.
+        """
+        return {";".join(stack): count for stack, count in self._collapsed.items()}
+
+
+ProfileOption = Union[None, str, Path, StageProfiler]
+
+
+@contextmanager
+def profiling(profile: ProfileOption) -> Iterator[Optional[LoadReport]]:
+    """
+    Profile the stages opened in this context, see StageProfiler. The profiler is attached to the active
+    report, or to a new report logging the stages when none is active. Does nothing when profile is None.
+
+    Yields:
+        LoadReport: The report the profiler is attached to, None when profile is None.
+    """
+    profiler = StageProfiler.from_option(profile)
+    if profiler is None:
+        yield None
+        return
+    report = active_report()
+    if report is None:
+        from .sinks import LoggingSink
+
+        report = LoadReport([LoggingSink()])
+        context = report.activate()
+    else:
+        context = nullcontext(report)
+    previous, report.profiler = report.profiler, profiler
+    try:
+        with context:
+            yield report
+    finally:
+        report.profiler = previous
@@ -0,0 +1,298 @@
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+MB = 1024 * 1024
+
+_ACTIVE_REPORT: "ContextVar[Optional[LoadReport]]" = ContextVar("sum_gtfs_geojson_load_report", default=None)
+
+
+def max_rss_mb() -> float:
+    """
+    Peak resident memory of the process so far, in MB, 0 where the resource module is not available (Windows).
+    """
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MB if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+
+
+@dataclass
+class StageSpan:
+    """
+    Measures of one stage of the loading or export pipeline, with its nested stages.
+
+    Attributes:
+        name (str): Name of the stage, e.g. "load_stops".
+        started_at (float): UNIX time of the start of the stage.
+        seconds (float): Wall time.
+        rows_in (int, optional): Number of rows read by the stage, None when not relevant.
+        rows_out (int, optional): Number of rows or objects produced by the stage.
+        rejected (Dict[str, int]): Number of rows rejected by every filter, e.g. {"position": 12, "validation": 1}.
+        max_rss_mb (float, optional): Peak resident memory of the process at the end of the stage.
+        rss_growth_mb (float, optional): Increase of the peak resident memory during the stage.
+        tracemalloc_peak_mb (float, optional): Peak Python allocations during the stage above the allocations at
+            its start, when tracemalloc is tracing.
+        attributes (Dict[str, Any]): Other values of the stage, e.g. the file path.
+        children (List[StageSpan]): Nested stages, in start order.
+    """
+    name: str
+    started_at: float = 0.0
+    seconds: float = 0.0
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    rejected: Dict[str, int] = field(default_factory=dict)
+    max_rss_mb: Optional[float] = None
+    rss_growth_mb: Optional[float] = None
+    tracemalloc_peak_mb: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    children: List["StageSpan"] = field(default_factory=list)
+
+    @property
+    def rows_rejected(self) -> int:
+        return sum(self.rejected.values())
+
+    @property
+    def rows_per_second(self) -> Optional[float]:
+        """
+        Rows read per second, or produced when the stage reads no rows.
+        """
+        rows = self.rows_in if self.rows_in is not None else self.rows_out
+        if rows is None or self.seconds <= 0:
+            return None
+        return rows / self.seconds
+
+    def reject(self, count: int, reason: str = "filter"):
+        """
+        Count rows rejected by a filter of the stage.
+        """
+        if count:
+            self.rejected[reason] = self.rejected.get(reason, 0) + int(count)
+
+    def walk(self, depth: int = 0) -> Iterator[Tuple[int, "StageSpan"]]:
+        """
+        Iterate over the stage and its nested stages, depth first, with their depth.
+        """
+        yield depth, self
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+    def summary(self) -> str:
+        """
+        One-line human-readable summary of the stage.
+        """
+        parts = [f"{self.name}: {self.seconds:.3f} s"]
+        if self.rows_in is not None:
+            parts.append(f"{self.rows_in} rows in")
+        if self.rows_out is not None:
+            parts.append(f"{self.rows_out} rows out")
+        if self.rows_per_second is not None:
+            parts.append(f"{self.rows_per_second:.0f} rows/s")
+        if self.rejected:
+            parts.append(f"{self.rows_rejected} rejected ("
+                         + ", ".join(f"{reason}: {count}" for reason, count in self.rejected.items()) + ")")
+        if self.max_rss_mb is not None:
+            parts.append(f"peak RSS {self.max_rss_mb:.0f} MB (+{self.rss_growth_mb:.0f} MB)")
+        if self.tracemalloc_peak_mb is not None:
+            parts.append(f"tracemalloc peak {self.tracemalloc_peak_mb:.1f} MB")
+        return ", ".join(parts)
+
+    def to_dict(self) -> dict:
+        """
+        The stage and its nested stages as JSON-serializable values, with the derived measures.
+        """
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "rows_per_second": self.rows_per_second,
+            "rows_rejected": self.rows_rejected,
+            "rejected": dict(self.rejected),
+            "max_rss_mb": self.max_rss_mb,
+            "rss_growth_mb": self.rss_growth_mb,
+            "tracemalloc_peak_mb": self.tracemalloc_peak_mb,
+            "attributes": dict(self.attributes),
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class LoadReport:
+    """
+    Nested stages recorded while loading and exporting the data, sent to sinks as they start and finish.
+
+    The loaders and exporters open their stages with `stage`, which records into the report activated in the
+    current context, and costs nothing when no report is active.
+
+    Usage:
+        ums, report = loader.load_with_report(datatypes, sinks=[LoggingSink(), JsonFileSink("load.json")])
+        print(report.summary())
+        report.find("load_stop_times").rows_per_second
+
+    Attributes:
+        spans (List[StageSpan]): The top-level stages, in start order.
+        sinks (list): The ReportSink receiving the stages.
+        trace_memory (bool): Trace the Python allocations with tracemalloc while the report is active.
+        profiler (StageProfiler, optional): Profiler of the stages, None to profile nothing.
+    """
+
+    def __init__(self, sinks: Optional[list] = None, trace_memory: bool = False, profiler=None):
+        self.spans: List[StageSpan] = []
+        self.sinks = list(sinks or [])
+        self.trace_memory = trace_memory
+        self.profiler = profiler
+        self._stack: List[StageSpan] = []
+        self._allocations: List[List[int]] = []  # [traced at start, peak] of every open stage
+
+    @contextmanager
+    def activate(self) -> Iterator["LoadReport"]:
+        """
+        Record the stages opened in this context into the report.
+        """
+        token = _ACTIVE_REPORT.set(self)
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        try:
+            yield self
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            _ACTIVE_REPORT.reset(token)
+
+    def _update_allocation_peaks(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        for allocations in self._allocations:
+            allocations[1] = max(allocations[1], peak)
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None, **attributes) -> Iterator[StageSpan]:
+        """
+        Open a stage nested in the current one, see `stage`.
+        """
+        span = StageSpan(name=name, started_at=time.time(), rows_in=rows_in, attributes=attributes)
+        depth = len(self._stack)
+        (self._stack[-1].children if self._stack else self.spans).append(span)
+        for sink in self.sinks:
+            sink.span_started(self, span, depth)
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # the peak is reset for the nested stage, so the open stages keep the peak reached so far
+            self._update_allocation_peaks()
+            tracemalloc.reset_peak()
+            traced = tracemalloc.get_traced_memory()[0]
+            self._allocations.append([traced, traced])
+        self._stack.append(span)
+        profiled = self.profiler is not None and self.profiler.should_profile(span, depth)
+        rss_before = max_rss_mb()
+        try:
+            with self.profiler.profile(span) if profiled else nullcontext():
+                start = time.perf_counter()
+                try:
+                    yield span
+                finally:
+                    span.seconds = time.perf_counter() - start
+        except BaseException as e:
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            span.max_rss_mb = max_rss_mb()
+            span.rss_growth_mb = span.max_rss_mb - rss_before
+            if tracing and tracemalloc.is_tracing():
+                self._update_allocation_peaks()
+                traced, peak = self._allocations.pop()
+                span.tracemalloc_peak_mb = (peak - traced) / MB
+            elif tracing:
+                self._allocations.pop()
+            self._stack.pop()
+            for sink in self.sinks:
+                sink.span_finished(self, span, depth)
+
+    def record(self, span: StageSpan):
+        """
+        Add a stage measured elsewhere, e.g. in a worker process, nested in the current stage.
+        """
+        depth = len(self._stack)
+        (self._stack[-1].children if self._stack else self.spans).append(span)
+        for sink in self.sinks:
+            sink.span_finished(self, span, depth)
+
+    def walk(self) -> Iterator[Tuple[int, StageSpan]]:
+        """
+        Iterate over every stage, depth first, with its depth.
+        """
+        for span in self.spans:
+            yield from span.walk()
+
+    def find(self, name: str) -> Optional[StageSpan]:
+        """
+        First stage with the name, depth first, None when missing.
+        """
+        return next((span for _, span in self.walk() if span.name == name), None)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(span.seconds for span in self.spans)
+
+    def summary(self) -> str:
+        """
+        Human-readable summary of the report, one indented line per stage.
+        """
+        return "\n".join("  " * depth + span.summary() for depth, span in self.walk())
+
+    def to_dict(self) -> dict:
+        return {"total_seconds": self.total_seconds, "spans": [span.to_dict() for span in self.spans]}
+
+
+def active_report() -> Optional[LoadReport]:
+    """
+    The report recording the stages in the current context, None when no report is active.
+    """
+    return _ACTIVE_REPORT.get()
+
+
+@contextmanager
+def stage(name: str, rows_in: Optional[int] = None, **attributes) -> Iterator[StageSpan]:
+    """
+    Open a stage of the pipeline, recorded into the active report with its wall time and memory.
+    Without active report, the span is not recorded and nothing is measured.
+
+    Usage:
+        with stage("load_stops", filepath=path) as span:
+            span.rows_in = len(data)
+            span.reject(invalid_positions, "position")
+            span.rows_out = len(stops)
+
+    Args:
+        name: Name of the stage, e.g. "load_stops".
+        rows_in: Number of rows read by the stage, when known at the start.
+        **attributes: Other values recorded with the stage, e.g. the file path.
+
+    Yields:
+        StageSpan: The span, to set the row counts.
+    """
+    report = _ACTIVE_REPORT.get()
+    if report is None:
+        yield StageSpan(name=name, rows_in=rows_in, attributes=attributes)
+        return
+    with report.stage(name, rows_in, **attributes) as span:
+        yield span
+
+
+def record_span(span: StageSpan):
+    """
+    Add a stage measured elsewhere to the active report, see LoadReport.record. Ignored without active report.
+    """
+    report = _ACTIVE_REPORT.get()
+    if report is not None:
+        report.record(span)
@@ -0,0 +1,77 @@
+from typing import Callable, Optional
+import json
+import logging
+from .report import LoadReport, StageSpan
+
+logger = logging.getLogger("sum_gtfs_geojson")
+
+
+class ReportSink:
+    """
+    Receives the stages of a LoadReport as they start and finish. Subclasses override the hooks they need.
+    """
+
+    def span_started(self, report: LoadReport, span: StageSpan, depth: int):
+        pass
+
+    def span_finished(self, report: LoadReport, span: StageSpan, depth: int):
+        pass
+
+
+class LoggingSink(ReportSink):
+    """
+    Log every finished stage as an indented summary line, and every started stage at DEBUG level.
+    The default sink of the loaders, shown with e.g. logging.basicConfig(level=logging.INFO).
+    """
+
+    def __init__(self, logger: logging.Logger = logger, level: int = logging.INFO):
+        self.logger = logger
+        self.level = level
+
+    def span_started(self, report: LoadReport, span: StageSpan, depth: int):
+        self.logger.debug("%sStarted %s", "  " * depth, span.name)
+
+    def span_finished(self, report: LoadReport, span: StageSpan, depth: int):
+        self.logger.log(self.level, "%s%s", "  " * depth, span.summary())
+
+
+class JsonFileSink(ReportSink):
+    """
+    Write the whole report to a JSON file every time a top-level stage finishes, so the file is complete
+    after the load and after every later export recorded into the same report.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+
+    def span_finished(self, report: LoadReport, span: StageSpan, depth: int):
+        if depth:
+            return
+        from sum_gtfs_geojson.exporter.atomic import atomic_write  # the exporters are instrumented
+
+        with atomic_write(self.filepath, "w", encoding="utf-8") as f:
+            json.dump(report.to_dict(), f, indent=2, default=str)
+
+
+class CallbackSink(ReportSink):
+    """
+    Call a function with every finished stage, and optionally every started stage, e.g. to feed a progress
+    bar or a metrics client.
+    """
+
+    def __init__(self, on_finished: Callable[[StageSpan, int], None],
+                 on_started: Optional[Callable[[StageSpan, int], None]] = None):
+        """
+        Args:
+            on_finished: Called with the finished span and its depth.
+            on_started: Called with the started span and its depth. Defaults to None.
+        """
+        self.on_finished = on_finished
+        self.on_started = on_started
+
+    def span_started(self, report: LoadReport, span: StageSpan, depth: int):
+        if self.on_started is not None:
+            self.on_started(span, depth)
+
+    def span_finished(self, report: LoadReport, span: StageSpan, depth: int):
+        self.on_finished(span, depth)
@@ -0,0 +1,32 @@
+from typing import Callable, Dict, List, Tuple
+import importlib
+import sys
+
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Tuple[Callable[[str], object], Callable[[], List[str]]]:
+    """
+    Module __getattr__ and __dir__ of a package importing its exports on first access (PEP 562), so importing
+    the package, e.g. for the enums, does not import geopandas, shapely, h3 or scipy through its modules.
+
+    Usage, in the __init__.py of a package:
+        __getattr__, __dir__ = lazy_exports(__name__, {"GeoToolkit": ".geo_toolkit"})
+
+    Args:
+        package: __name__ of the package.
+        exports: Module of every exported name, relative to the package.
+
+    Returns:
+        The __getattr__ and __dir__ functions of the package.
+    """
+
+    def __getattr__(name: str):
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(exports[name], package), name)
+        setattr(sys.modules[package], name, value)  # later accesses do not call __getattr__
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__
@@ -1,4 +1,20 @@
-from .abstract_loader import AbstractLoader
-from .gva_loader import GenevaLoader
+from typing import TYPE_CHECKING
+from sum_gtfs_geojson.lazy import lazy_exports
 
-__all__ = ["AbstractLoader", "GenevaLoader"]
+if TYPE_CHECKING:
+    from .abstract_loader import AbstractLoader
+    from .gtfs_feed_loader import GTFSFeedLoader, CityConfig
+    from .gva_loader import GenevaLoader
+    from .exported_loader import ExportedDataLoader
+    from .city_registry import CITY_CONFIGS, register_city, get_city_config
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "AbstractLoader": ".abstract_loader",
+    **dict.fromkeys(["GTFSFeedLoader", "CityConfig"], ".gtfs_feed_loader"),
+    "GenevaLoader": ".gva_loader",
+    "ExportedDataLoader": ".exported_loader",
+    **dict.fromkeys(["CITY_CONFIGS", "register_city", "get_city_config"], ".city_registry"),
+})
+
+__all__ = ["AbstractLoader", "GTFSFeedLoader", "CityConfig", "GenevaLoader", "ExportedDataLoader",
+           "CITY_CONFIGS", "register_city", "get_city_config"]
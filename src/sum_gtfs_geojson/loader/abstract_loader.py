@@ -1,13 +1,19 @@
 from abc import ABC, abstractmethod
 from sum_gtfs_geojson.enums import DataType
-from sum_gtfs_geojson.models import UrbanMobilitySystem, GTFSNetwork, HexGrid, Stop, StationInfoStatus
+from sum_gtfs_geojson.models import UrbanMobilitySystem, GTFSNetwork, HexGrid, HexPyramid, Stop, StationInfoStatus, BikeTripStore, \
+    RidershipCube, IdDictionary, StopTimeTable, StopTimeSequence
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 from shapely.geometry import Point
 from pathlib import Path
-from typing import List, Optional, Literal
-from sum_gtfs_geojson.utils import GeoToolkit
+from typing import List, Optional, Literal, Tuple
+from sum_gtfs_geojson.utils import GeoToolkit, Perimeter, PerimeterOption
+from sum_gtfs_geojson.instrumentation import LoadReport, LoggingSink, ReportSink, ProfileOption, StageProfiler, stage
 from importlib.resources import files
+import logging
+
+logger = logging.getLogger(__name__)
 
 WORLD_COUNTRIES_FILE_PATH = files("sum_gtfs_geojson.data.world.10m").joinpath("ne_10m_admin_0_countries.shp")
 CRS_GEOGRAPHIC = "EPSG:4326"
@@ -16,18 +22,27 @@ CRS_PROJECTED = "EPSG:3857"
 
 class AbstractLoader(ABC):
     def __init__(self, country_a3: str, restrict_country_boundaries: bool = False,
-                 distance_radius_km: float = None, grid_resolution: Optional[int] = None):
+                 distance_radius_km: float = None, grid_resolution: Optional[int] = None,
+                 grid_pyramid_resolutions: Optional[List[int]] = None,
+                 station_history_period: Optional[str] = None, perimeter: PerimeterOption = None):
         """
         Initialize the AbstractLoader with a flag to include country border crossing data.
         Args:
             restrict_country_boundaries: Flag to restrict to country data. Defaults to False, then the complete data will be loaded, including neighbor countries (when applicable).
             distance_radius_km (float, optional): The distance radius in kilometers for filtering data. Defaults to None.
             grid_resolution (int, optional): Resolution of the grid. Defaults to None.
+            grid_pyramid_resolutions (list[int], optional): Coarser resolutions rolled up from the grid for zoom-dependent display. Defaults to None, no pyramid.
+            station_history_period (str, optional): Period of the bike station history reconstructed from the bike trips when both are loaded: "hour", "day_type", "day_type_hour" or "month". Defaults to None, the history is left empty.
+            perimeter (optional): Study area, only the positions within it are loaded: a GeoJSON file of a canton, a commune..., a shapely Polygon or MultiPolygon, or a Perimeter. Cached for the process, see Perimeter.of. Defaults to None, no perimeter.
         """
         self.country_a3 = country_a3
         self.restrict_country_boundaries = restrict_country_boundaries
         self.distance_radius_km = distance_radius_km
         self.grid_resolution = grid_resolution
+        self.grid_pyramid_resolutions = grid_pyramid_resolutions
+        self.station_history_period = station_history_period
+        self.perimeter = Perimeter.of(perimeter)
+        self.ids = IdDictionary()  # identifiers of the loaded GTFS models, shared with the loaded network
 
         if (restrict_country_boundaries):
             self.country_geo = self.get_country_boundaries()
@@ -75,6 +90,22 @@ class AbstractLoader(ABC):
     def load_stop_times(self):
         pass
 
+    def load_stop_time_table(self) -> StopTimeTable:
+        """
+        Load the stop times as columns encoded with the loader IdDictionary, see StopTimeTable.
+        The table of a StopTimeSequence returned by load_stop_times is used as is, a list of StopTime objects
+        is encoded.
+        :return: The stop times table.
+        """
+        stop_times = self.load_stop_times()
+        if (isinstance(stop_times, StopTimeSequence) and not stop_times.is_materialized
+                and stop_times.table.ids is self.ids):
+            return stop_times.table
+        with stage("encode_stop_times", rows_in=len(stop_times)) as span:
+            table = StopTimeTable.from_stop_times(stop_times, self.ids)
+            span.rows_out = len(table)
+        return table
+
     @abstractmethod
     def load_bike_stations(self):
         pass
@@ -87,6 +118,68 @@ class AbstractLoader(ABC):
     def load_bike_trips(self):
         pass
 
+    def load_transfers(self):
+        """
+        Load the transfers between stops, routes or trips, optional in GTFS. The default loads no transfer.
+
+        Returns:
+            list[Transfer]: The transfers.
+        """
+        return []
+
+    def input_files(self, datatype: DataType) -> list:
+        """
+        Files read to load a data type, hashed by the export manifest to detect changed inputs.
+        Loaders override it to add their own files to the country boundaries.
+
+        Args:
+            datatype (DataType): The data type.
+
+        Returns:
+            list: The input file paths.
+        """
+        input_files = [WORLD_COUNTRIES_FILE_PATH] if self.restrict_country_boundaries else []
+        if self.perimeter is not None and self.perimeter.source is not None:
+            input_files.append(self.perimeter.source)
+        return input_files
+
+    def parameters(self) -> dict:
+        """
+        Loader parameters changing the loaded data, recorded in the export manifest.
+
+        Returns:
+            dict: The parameters by name.
+        """
+        return {
+            "loader": type(self).__name__,
+            "restrict_country_boundaries": self.restrict_country_boundaries,
+            "distance_radius_km": self.distance_radius_km,
+            "grid_resolution": self.grid_resolution,
+            "grid_pyramid_resolutions": self.grid_pyramid_resolutions,
+            "station_history_period": self.station_history_period,
+            "perimeter": self.perimeter.name if self.perimeter is not None else None,
+        }
+
+    def load_bike_trip_store(self) -> BikeTripStore:
+        """
+        Load the bike trips as a time-indexed columnar store. Loaders reading a file should override it
+        to parse the columns directly, the default converts the result of load_bike_trips.
+
+        Returns:
+            BikeTripStore: The bike trips, sorted by start time.
+        """
+        return BikeTripStore.from_bike_trips(self.load_bike_trips())
+
+    def load_ridership_cube(self) -> RidershipCube:
+        """
+        Load the ridership as a dictionary-encoded data cube, without building the Ridership objects when
+        the loader overrides it. The default converts the result of load_ridership.
+
+        Returns:
+            RidershipCube: The ridership summed per stop, line, timeslot, day, week and month.
+        """
+        return RidershipCube.from_ridership(self.load_ridership())
+
     def get_country_boundaries(self) -> gpd.GeoDataFrame:
         """
         Load the country boundaries for the specified country.
@@ -104,6 +197,14 @@ class AbstractLoader(ABC):
 
         return country_row
 
+    @property
+    def country_perimeter(self) -> Perimeter:
+        """
+        Prepared country boundaries, built once per country for the process.
+        """
+        return Perimeter.cached(("country", self.country_a3), lambda: Perimeter(
+            self.country_geo.to_crs(CRS_GEOGRAPHIC).union_all(), name=self.country_a3))
+
     def is_location_within_country(self, latitude: float, longitude: float) -> bool:
         """
         Check if the given latitude and longitude are within the country boundaries.
@@ -115,18 +216,7 @@ class AbstractLoader(ABC):
         Returns:
             bool: True if the point is within the country boundaries, False otherwise.
         """
-        # Filter the data
-        point = gpd.GeoDataFrame(
-            geometry=[Point(longitude, latitude)],
-            crs=CRS_GEOGRAPHIC
-        )
-
-        # Ensure Coordinate Reference Systems Match
-        if point.crs != self.country_geo.crs:
-            point = point.to_crs(self.country_geo.crs)
-
-        is_within = point.within(self.country_geo.unary_union).iloc[0]
-        return is_within
+        return self.country_perimeter.contains_point(latitude, longitude)
 
     def is_location_within_radius(self, latitude: float, longitude: float) -> bool:
         """
@@ -174,16 +264,68 @@ class AbstractLoader(ABC):
             return False
         if (self.distance_radius_km is not None and self.is_location_within_radius(latitude, longitude) == False):
             return False
+        if (self.perimeter is not None and not self.perimeter.contains_point(latitude, longitude)):
+            return False
 
         return True
 
-    def load_all_data(self, datatypes: list[DataType] = None) -> UrbanMobilitySystem:
+    def positions_are_valid(self, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """
+        Vectorized position_is_valid: check many positions with one geometry call per filter, on the
+        positions kept by the previous filters.
+
+        Args:
+            latitudes (np.ndarray): latitudes, NaN for missing values.
+            longitudes (np.ndarray): longitudes, NaN for missing values.
+
+        Returns:
+            np.ndarray: Boolean mask of the valid positions.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        valid = ~(np.isnan(latitudes) | np.isnan(longitudes))
+        if self.perimeter is not None:
+            valid[valid] = self.perimeter.contains(latitudes[valid], longitudes[valid])
+        if self.restrict_country_boundaries:
+            valid[valid] = self.country_perimeter.contains(latitudes[valid], longitudes[valid])
+        if self.distance_radius_km is not None:
+            center_lat, center_lon = self._CITY_CENTER
+            city_buffer = gpd.GeoSeries([Point(center_lon, center_lat)], crs=CRS_GEOGRAPHIC).to_crs(
+                CRS_PROJECTED).buffer(self.distance_radius_km * 1000).iloc[0]
+            points = gpd.GeoSeries(gpd.points_from_xy(longitudes[valid], latitudes[valid]),
+                                   crs=CRS_GEOGRAPHIC).to_crs(CRS_PROJECTED)
+            valid[valid] = points.within(city_buffer).to_numpy()
+        return valid
+
+    def load_all_data(self, datatypes: list[DataType] = None, profile: ProfileOption = None) -> UrbanMobilitySystem:
         """
-            Load all data for the specified data types.
+            Load all data for the specified data types, the stages being logged, see load_with_report.
             :param datatypes: List of data types to load. If None, load all data types.
+            :param profile: Profile the stages, see load_with_report. Defaults to None, no profiling.
             :return: An UrbanMobilitySystem object containing the loaded data.
         """
+        return self.load_with_report(datatypes, profile=profile)[0]
 
+    def load_with_report(self, datatypes: list[DataType] = None, sinks: Optional[List[ReportSink]] = None,
+                         trace_memory: bool = False,
+                         profile: ProfileOption = None) -> Tuple[UrbanMobilitySystem, LoadReport]:
+        """
+            Load all data for the specified data types, and record the wall time, rows, rejected rows and
+            memory of every stage.
+            :param datatypes: List of data types to load. If None, load all data types.
+            :param sinks: ReportSink receiving the stages, e.g. [LoggingSink(), JsonFileSink("load.json")]. Defaults to None, a LoggingSink.
+            :param trace_memory: Also measure the peak Python allocations of every stage with tracemalloc, which slows the load down. Defaults to False.
+            :param profile: Folder where a cProfile .pstats file per loading stage and a collapsed-stack file are written, or a StageProfiler choosing the stages and the profiler. Defaults to None, no profiling.
+            :return: The UrbanMobilitySystem object containing the loaded data, and the LoadReport of the stages.
+        """
+        report = LoadReport([LoggingSink()] if sinks is None else sinks, trace_memory,
+                            StageProfiler.from_option(profile))
+        with report.activate(), stage("load_all_data", loader=type(self).__name__,
+                                      datatypes=[t.name for t in datatypes or []]):
+            ums = self._load_all_data(datatypes)
+        return ums, report
+
+    def _load_all_data(self, datatypes: list[DataType] = None) -> UrbanMobilitySystem:
         ums = UrbanMobilitySystem(
             public_transport=GTFSNetwork(),
             bike_stations=[],
@@ -192,68 +334,101 @@ class AbstractLoader(ABC):
             hex_grid=None
         )
         if datatypes is None:
-            print("No data types specified, nothing to load.")
+            logger.warning("No data types specified, nothing to load.")
             return ums
 
         if DataType.STOPS in datatypes or DataType.ITINERARIES in datatypes:
-            ums.public_transport.stops = self.load_stops()
-            print(
-                f"Finished loading stations, loaded counter = {len(ums.public_transport.stops)}")
-        if DataType.ITINERARIES in datatypes:
-            ums.public_transport.routes = self.load_routes()
-            print(
-                f"Finished loading routes, loaded counter = {len(ums.public_transport.routes)}")
-            ums.public_transport.trips = self.load_trips()
-            print(
-                f"Finished loading trips, loaded counter = {len(ums.public_transport.trips)}")
-            ums.public_transport.stop_times = self.load_stop_times()
-            print(
-                f"Finished loading stop_times, loaded counter = {len(ums.public_transport.stop_times)}")
-            ums.public_transport.build_itineraries(ums.public_transport.stops,
-                                                   ums.public_transport.stop_times,
-                                                   ums.public_transport.trips,
-                                                   ums.public_transport.routes)
-            print(
-                f"Finished building itineraries, loaded counter = {len(ums.public_transport.itineraries)}")
+            ums.public_transport = self.load_public_transport(DataType.ITINERARIES in datatypes)
         if DataType.BIKE_STATIONS in datatypes:
             ums.bike_stations = self.load_bike_stations()
-            print(
-                f"Finished loading bike_stations, loaded counter = {len(ums.bike_stations)}")
         if DataType.RIDERSHIP in datatypes:
             ums.ridership = self.load_ridership()
-            print(
-                f"Finished loading ridership, loaded counter = {len(ums.ridership)}")
         if DataType.BIKE_TRIPS in datatypes:
-            ums.bike_trips = self.load_bike_trips()
-            print(
-                f"Finished loading bike_trips, loaded counter = {len(ums.bike_trips)}")
+            # the trips are held as columns, the BikeTrip objects are built on access
+            ums.bike_trips = self.load_bike_trip_store().as_bike_trips()
+        if (DataType.BIKE_STATIONS in datatypes and DataType.BIKE_TRIPS in datatypes
+                and self.station_history_period is not None):
+            with stage("build_bike_station_history", rows_in=len(ums.bike_trips),
+                       period=self.station_history_period) as span:
+                inventory = ums.build_bike_station_history(self.station_history_period)
+                span.rows_out = len(inventory)
         if DataType.HEX_GRID in datatypes:
             ums.hex_grid = self.load_hex_grid(
                 ums.public_transport.stops, ums.bike_stations)
-            print(
-                f"Finished loading hex grid, loaded counter = {len(ums.hex_grid.cells)}")
+            if self.grid_pyramid_resolutions:
+                ums.hex_pyramid = self.load_hex_pyramid(ums.hex_grid)
 
         return ums
 
-    def load_hex_grid(self, stops: List[Stop] = None, bike_stations: List[StationInfoStatus] = None) -> HexGrid:
+    def load_public_transport(self, itineraries: bool = True) -> GTFSNetwork:
+        """
+        Load the public transport network: the stops, and with the itineraries the routes, trips, stop times
+        and transfers the itineraries are built from.
+        :param itineraries: Also load the itineraries. Defaults to True.
+        :return: A GTFSNetwork object containing the loaded network.
+        """
+        network = self._load_network(itineraries)
+        if itineraries:
+            self.build_itineraries(network)
+        return network
+
+    def _load_network(self, itineraries: bool = True) -> GTFSNetwork:
+        network = GTFSNetwork(stops=self.load_stops())
+        network.ids = self.ids
+        if itineraries:
+            network.routes = self.load_routes()
+            network.trips = self.load_trips()
+            network.stop_times = self.load_stop_time_table().as_stop_times()
+            network.transfers = self.load_transfers()
+        return network
+
+    @staticmethod
+    def build_itineraries(network: GTFSNetwork):
+        """
+        Build the itineraries of a network from its stops, stop times, trips and routes.
+        :param network: The network, its itineraries are replaced.
+        """
+        with stage("build_itineraries", rows_in=len(network.stop_times)) as span:
+            network.build_itineraries(network.stops, network.stop_times, network.trips, network.routes)
+            span.rows_out = len(network.itineraries)
+
+    def load_hex_grid(self, stops: List[Stop] = None, bike_stations: List[StationInfoStatus] = None,
+                      resolution: Optional[int] = None) -> HexGrid:
         """
         Load the hex grid for the specified city.
+        :param resolution: Resolution of the grid. If None, the loader grid_resolution is used.
         :return: A HexGrid object containing the hexagonal grid.
         """
-        print("Loading hex grid... with resolution: ", self.grid_resolution)
-        if self.grid_resolution is None:
+        resolution = resolution if resolution is not None else self.grid_resolution
+        if resolution is None:
             raise ValueError("Grid resolution must be set to load a hex grid.")
 
-        stop_points = [
-            Point(s.stop_lon, s.stop_lat) for s in stops if s.stop_lat is not None and s.stop_lat is not None]
-        bike_station_points = [
-            Point(s.lon, s.lat) for s in bike_stations if s.lon is not None and s.lat is not None]
-        all_points = stop_points + bike_station_points
-        if not all_points:
-            raise ValueError("No valid points found for hex grid generation.")
-
-        print(f"Generating hex grid with {len(all_points)} points.")
-        grid = GeoToolkit.generate_hex_grid(all_points, self.grid_resolution)
-        print(f"Hex grid generated with {len(grid.cells)} cells.")
+        with stage("load_hex_grid", resolution=resolution) as span:
+            stops = [s for s in stops if s.stop_lat is not None and s.stop_lon is not None]
+            bike_stations = [s for s in bike_stations if s.lon is not None and s.lat is not None]
+            stop_points = [Point(s.stop_lon, s.stop_lat) for s in stops]
+            bike_station_points = [Point(s.lon, s.lat) for s in bike_stations]
+            all_points = stop_points + bike_station_points
+            if not all_points:
+                raise ValueError("No valid points found for hex grid generation.")
+
+            span.rows_in = len(all_points)
+            grid = GeoToolkit.generate_hex_grid(all_points, resolution)
+            grid.add_metric("stop_count", GeoToolkit.points_to_cells(
+                np.array([s.stop_lat for s in stops]), np.array([s.stop_lon for s in stops]), resolution))
+            grid.add_metric("bike_station_count", GeoToolkit.points_to_cells(
+                np.array([s.lat for s in bike_stations]), np.array([s.lon for s in bike_stations]), resolution))
+            span.rows_out = len(grid.cells)
 
         return grid
+
+    def load_hex_pyramid(self, grid: HexGrid) -> HexPyramid:
+        """
+        Roll up the hex grid into the coarser pyramid resolutions, without reloading any data.
+        :param grid: The hex grid at the finest resolution.
+        :return: A HexPyramid object containing one grid per resolution.
+        """
+        with stage("load_hex_pyramid", rows_in=len(grid.cells), resolutions=self.grid_pyramid_resolutions) as span:
+            pyramid = GeoToolkit.generate_hex_pyramid(grid, self.grid_pyramid_resolutions)
+            span.rows_out = sum(len(pyramid.get_level(resolution).cells) for resolution in pyramid.resolutions)
+        return pyramid
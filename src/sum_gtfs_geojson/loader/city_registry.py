@@ -0,0 +1,45 @@
+from sum_gtfs_geojson.enums import LivingLabsCity
+from .gtfs_feed_loader import CityConfig
+from .gva_loader import GENEVA_CONFIG
+from typing import Dict
+
+# Larnaca data is not shipped with the package, the GTFS feed and mobility files are given with CityConfig.replace
+LARNACA_CONFIG = CityConfig(
+    name="Larnaca",
+    country_a3="CYP",
+    country_name="Cyprus",
+    country_iso="CY",
+    center=(34.9229, 33.6233),
+)
+
+CITY_CONFIGS: Dict[LivingLabsCity, CityConfig] = {
+    LivingLabsCity.GENEVA: GENEVA_CONFIG,
+    LivingLabsCity.LARNACA: LARNACA_CONFIG,
+}
+
+
+def register_city(city: LivingLabsCity, config: CityConfig):
+    """
+    Register or replace the config of a living lab, e.g. to point Larnaca to its GTFS feed:
+    register_city(LivingLabsCity.LARNACA, get_city_config(LivingLabsCity.LARNACA).replace(gtfs="larnaca.zip"))
+
+    Args:
+        city (LivingLabsCity): The living lab.
+        config (CityConfig): Its location and data files.
+    """
+    CITY_CONFIGS[city] = config
+
+
+def get_city_config(city: LivingLabsCity) -> CityConfig:
+    """
+    Config of a living lab.
+
+    Args:
+        city (LivingLabsCity): The living lab.
+
+    Returns:
+        CityConfig: Its location and data files.
+    """
+    if city not in CITY_CONFIGS:
+        raise ValueError(f"Unsupported Living Lab: {city}, no values found for this city.")
+    return CITY_CONFIGS[city]
@@ -0,0 +1,194 @@
+from typing import List, Optional, Tuple, Type, get_args, get_origin
+import json
+import os
+import geopandas as gpd
+import pandas as pd
+import h3
+from pydantic import BaseModel
+from sum_gtfs_geojson.enums import DataType
+from sum_gtfs_geojson.exporter import GeoFormat, GEO_FORMAT_EXTENSIONS
+from sum_gtfs_geojson.instrumentation import LoadReport, LoggingSink, ReportSink, ProfileOption, StageProfiler, stage
+from sum_gtfs_geojson.models import (UrbanMobilitySystem, GTFSNetwork, HexGrid, HexCell, Stop, StationInfoStatus,
+                                     BikeTrip, Ridership)
+from sum_gtfs_geojson.models.gtfs import Itinerary
+
+
+class ExportedDataLoader:
+    """
+    Reload an UrbanMobilitySystem previously saved with `save_to_geo_format` (GeoParquet or FlatGeobuf),
+    without reading the raw GTFS and mobility files again.
+
+    When a bbox is given, only the rows intersecting it are read, using the GeoParquet bbox covering
+    column or the FlatGeobuf spatial index.
+    """
+
+    def __init__(self, input_path: str, file_format: GeoFormat = "geoparquet",
+                 bbox: Optional[Tuple[float, float, float, float]] = None):
+        """
+        Initialize the loader on a folder of exported files.
+        Args:
+            input_path (str): The folder with the exported files.
+            file_format (str): "geoparquet" or "flatgeobuf". Defaults to "geoparquet".
+            bbox (tuple, optional): (min_lon, min_lat, max_lon, max_lat) to read only the features intersecting it. Defaults to None, all features.
+        """
+        if file_format not in GEO_FORMAT_EXTENSIONS:
+            raise ValueError(f"Unsupported format: {file_format}, expected one of {list(GEO_FORMAT_EXTENSIONS)}")
+        self.input_path = input_path
+        self.file_format = file_format
+        self.bbox = bbox
+
+    def read_layer(self, name: str) -> Optional[gpd.GeoDataFrame]:
+        """
+        Read an exported layer, restricted to the loader bbox.
+        Args:
+            name (str): Name of the layer, e.g. "stops".
+        Returns:
+            gpd.GeoDataFrame: The layer rows, None if the layer was not exported.
+        """
+        filepath = os.path.join(self.input_path, f"{name}{GEO_FORMAT_EXTENSIONS[self.file_format]}")
+        if not os.path.exists(filepath):
+            return None
+        with stage("read_layer", layer=name, filepath=filepath) as span:
+            if self.file_format == "geoparquet":
+                gdf = gpd.read_parquet(filepath, bbox=self.bbox)
+            else:
+                gdf = gpd.read_file(filepath, bbox=self.bbox)
+            span.rows_out = len(gdf)
+        return gdf.drop(columns=[c for c in ("bbox",) if c in gdf.columns])
+
+    def load_stops(self) -> List[Stop]:
+        return self._load_models("stops", Stop)
+
+    def load_itineraries(self, stops: List[Stop]) -> List[Itinerary]:
+        """
+        Load the itineraries, with their stops resolved from the exported stop_ids.
+        Stops missing from `stops` (e.g. outside of the bbox) are left out of the itinerary.
+        """
+        gdf = self.read_layer("itineraries")
+        if gdf is None:
+            return []
+        stop_lookup = {stop.stop_id: stop for stop in stops}
+        itineraries = []
+        for row in self._rows(gdf, Itinerary):
+            stop_ids = row.pop("stop_ids", None) or []
+            row["stops"] = [stop_lookup[stop_id] for stop_id in stop_ids if stop_id in stop_lookup]
+            itineraries.append(Itinerary(**row))
+        return itineraries
+
+    def load_bike_stations(self) -> List[StationInfoStatus]:
+        return self._load_models("bike_stations", StationInfoStatus)
+
+    def load_ridership(self) -> List[Ridership]:
+        return self._load_models("ridership", Ridership)
+
+    def load_bike_trips(self) -> List[BikeTrip]:
+        return self._load_models("bike_trips", BikeTrip)
+
+    def load_hex_grid(self) -> Optional[HexGrid]:
+        """
+        Load the hex grid, with the cell metrics from the non-id columns.
+        """
+        gdf = self.read_layer("hex_grid")
+        if gdf is None or gdf.empty:
+            return None
+        metric_names = [c for c in gdf.columns if c not in ("h3_id", gdf.geometry.name)]
+        cells = []
+        for row in gdf[["h3_id"] + metric_names].itertuples(index=False):
+            lat, lon = h3.cell_to_latlng(row[0])
+            cells.append(HexCell(h3_id=row[0], center=(lon, lat),
+                                 polygon=[(p[1], p[0]) for p in h3.cell_to_boundary(row[0])],
+                                 metrics={name: int(value) for name, value in zip(metric_names, row[1:])}))
+        return HexGrid(resolution=h3.get_resolution(cells[0].h3_id), cells=cells)
+
+    def load_all_data(self, datatypes: List[DataType] = None, profile: ProfileOption = None) -> UrbanMobilitySystem:
+        """
+        Load the exported data for the specified data types, the stages being logged, see load_with_report.
+        :param datatypes: List of data types to load. If None, load all data types.
+        :param profile: Profile the stages, see AbstractLoader.load_with_report. Defaults to None, no profiling.
+        :return: An UrbanMobilitySystem object containing the loaded data.
+        """
+        return self.load_with_report(datatypes, profile=profile)[0]
+
+    def load_with_report(self, datatypes: List[DataType] = None, sinks: Optional[List[ReportSink]] = None,
+                         trace_memory: bool = False,
+                         profile: ProfileOption = None) -> Tuple[UrbanMobilitySystem, LoadReport]:
+        """
+        Load the exported data for the specified data types, and record the stages, see AbstractLoader.load_with_report.
+        :param datatypes: List of data types to load. If None, load all data types.
+        :param sinks: ReportSink receiving the stages. Defaults to None, a LoggingSink.
+        :param trace_memory: Also measure the peak Python allocations of every stage with tracemalloc. Defaults to False.
+        :param profile: Profile the stages, see AbstractLoader.load_with_report. Defaults to None, no profiling.
+        :return: The UrbanMobilitySystem object containing the loaded data, and the LoadReport of the stages.
+        """
+        datatypes = datatypes if datatypes is not None else list(DataType)
+        report = LoadReport([LoggingSink()] if sinks is None else sinks, trace_memory,
+                            StageProfiler.from_option(profile))
+        with report.activate(), stage("load_exported_data", input_path=self.input_path,
+                                      file_format=self.file_format):
+            ums = UrbanMobilitySystem(
+                public_transport=GTFSNetwork(),
+                bike_stations=[],
+                ridership=[],
+                bike_trips=[],
+                hex_grid=None
+            )
+            if DataType.STOPS in datatypes or DataType.ITINERARIES in datatypes:
+                ums.public_transport.stops = self.load_stops()
+            if DataType.ITINERARIES in datatypes:
+                ums.public_transport.itineraries = self.load_itineraries(ums.public_transport.stops)
+            if DataType.BIKE_STATIONS in datatypes:
+                ums.bike_stations = self.load_bike_stations()
+            if DataType.RIDERSHIP in datatypes:
+                ums.ridership = self.load_ridership()
+            if DataType.BIKE_TRIPS in datatypes:
+                ums.bike_trips = self.load_bike_trips()
+            if DataType.HEX_GRID in datatypes:
+                ums.hex_grid = self.load_hex_grid()
+        return ums, report
+
+    def _load_models(self, name: str, model: Type[BaseModel]) -> list:
+        gdf = self.read_layer(name)
+        if gdf is None:
+            return []
+        return [model(**row) for row in self._rows(gdf, model)]
+
+    def _rows(self, gdf: gpd.GeoDataFrame, model: Type[BaseModel]) -> List[dict]:
+        """
+        Convert the rows to model keyword arguments: missing values become None, and the nested
+        values stored as JSON strings (FlatGeobuf) or arrays (GeoParquet) are converted back to lists.
+        """
+        df = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+        df = df.astype(object).where(df.notna(), None)
+        nested = [name for name in df.columns if name == "stop_ids" or _is_nested(model, name)]
+        rows = df.to_dict(orient="records")
+        for row in rows:
+            for name in nested:
+                value = row[name]
+                if isinstance(value, str):
+                    row[name] = json.loads(value)
+                elif value is not None and not isinstance(value, list):
+                    row[name] = _to_list(value)
+        return rows
+
+
+def _is_nested(model: Type[BaseModel], name: str) -> bool:
+    """
+    Check if a model field holds a list or a dict (including Optional ones).
+    """
+    field = model.model_fields.get(name)
+    if field is None:
+        return False
+    annotation = field.annotation
+    candidates = [annotation] + list(get_args(annotation))
+    return any(get_origin(a) in (list, dict) or a in (list, dict) for a in candidates)
+
+
+def _to_list(value):
+    """
+    Convert the numpy arrays read from Parquet list columns to plain lists.
+    """
+    if hasattr(value, "tolist"):
+        value = value.tolist()
+    if isinstance(value, list):
+        return [_to_list(v) for v in value]
+    return value
@@ -0,0 +1,597 @@
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+from sum_gtfs_geojson.models import Stop, Route, StationInfoStatus, BikeTripStore, Ridership, RidershipCube, \
+    StopTimeTable, Trip, Transfer, GTFSNetwork, IdDictionary
+from sum_gtfs_geojson.models.gtfs.gtfs_network import DEFAULT_MERGE_DISTANCE_M, DEFAULT_MERGE_NAME_SIMILARITY
+from sum_gtfs_geojson.enums import DataType
+from sum_gtfs_geojson.instrumentation import stage
+from sum_gtfs_geojson.utils import PerimeterOption
+from .abstract_loader import AbstractLoader
+from dataclasses import dataclass, replace
+import copy
+from pathlib import Path, PurePosixPath
+import logging
+import os
+import zipfile
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# File of every data file attribute of the loader, in a GTFS feed
+GTFS_FILE_NAMES = {
+    "STOPS_FILE_PATH": "stops.txt",
+    "ROUTES_FILE_PATH": "routes.txt",
+    "TRIPS_FILE_PATH": "trips.txt",
+    "STOPTIMES_FILE_PATH": "stop_times.txt",
+    "TRANSFERS_FILE_PATH": "transfers.txt",
+}
+
+# Ridership file headers of the cube dimensions and measures
+RIDERSHIP_CUBE_COLUMNS = {
+    "Long Code Stop": "stop_code",
+    "Line": "line",
+    "Timeslot": "timeslot",
+    "Index Day Week": "day_index",
+    "Week Index": "week_index",
+    "Month Year": "month_year",
+    "Number of Boarding Passengers": "boardings",
+    "Number of Disembarking Passengers": "alightings",
+}
+
+
+def safe_get(row, key, default=None, dtype=None):
+    return safe_value(row.get(key, default), default, dtype)
+
+
+def safe_value(val, default=None, dtype=None):
+    if pd.isna(val):
+        return default
+    if dtype:
+        try:
+            return dtype(val)
+        except Exception:
+            return default
+    return val
+
+
+def safe_column(data: pd.DataFrame, key, default=None, dtype=None) -> list:
+    """
+    Values of a column converted as safe_get does for every row, default for a missing column.
+    """
+    if key not in data.columns:
+        return [default] * len(data)
+    return [safe_value(val, default, dtype) for val in data[key].tolist()]
+
+
+@dataclass(frozen=True)
+class CityConfig:
+    """
+    Location and data files of a city, read by GTFSFeedLoader.
+
+    The mobility files (bike stations, ridership, bike trips) are read with the formats of the Geneva living
+    lab, see GTFSFeedLoader. Files left to None are not available, loading their data type fails.
+
+    Attributes:
+        name (str): Name of the city, e.g. "Geneva".
+        country_a3 (str): Sovereignty ISO 3166-1 alpha-3 code of the country, as in the world boundaries, e.g. "CHE".
+        country_name (str): Name of the country, e.g. "Switzerland".
+        country_iso (str): ISO 3166-1 alpha-2 code of the country, e.g. "CH".
+        center (Tuple[float, float]): (latitude, longitude) of the city center, for the distance radius filter.
+        gtfs (optional): GTFS feed, a folder or a zip archive. Several feeds, e.g. of the operators of a
+            cross-border city, are given as a list or as a dictionary by namespace, and merged into one network,
+            see GTFSNetwork.merge. Defaults to None.
+        bike_stations_file (str or Path, optional): Excel file of the bike sharing stations. Defaults to None.
+        ridership_file (str or Path, optional): CSV file of the public transport ridership. Defaults to None.
+        bike_trips_file (str or Path, optional): CSV file of the bike sharing trips. Defaults to None.
+        merge_distance_m (float): Maximum distance between the merged stops of several feeds, in meters.
+        merge_name_similarity (float): Minimum name similarity of the merged stops of several feeds, from 0 to 1.
+    """
+    name: str
+    country_a3: str
+    country_name: str
+    country_iso: str
+    center: Tuple[float, float]
+    gtfs: Optional[Any] = None
+    bike_stations_file: Optional[Any] = None
+    ridership_file: Optional[Any] = None
+    bike_trips_file: Optional[Any] = None
+    merge_distance_m: float = DEFAULT_MERGE_DISTANCE_M
+    merge_name_similarity: float = DEFAULT_MERGE_NAME_SIMILARITY
+
+    def replace(self, **changes) -> "CityConfig":
+        """
+        Copy of the config with some values changed, e.g. config.replace(gtfs="data/larnaca_gtfs.zip").
+        """
+        return replace(self, **changes)
+
+
+def gtfs_feeds(gtfs) -> Dict[str, Any]:
+    """
+    GTFS feeds of a CityConfig by namespace. The namespace of a feed of a list is its file name without
+    extension, e.g. "fr" for "feeds/fr.zip".
+
+    Args:
+        gtfs: A feed, a list of feeds or a dictionary of feeds by namespace, None when the city has no feed.
+
+    Returns:
+        Dict[str, Any]: The feeds, a single feed has an empty namespace.
+    """
+    if gtfs is None:
+        return {}
+    if isinstance(gtfs, dict):
+        return dict(gtfs)
+    if isinstance(gtfs, (list, tuple)):
+        feeds = {}
+        for index, feed in enumerate(gtfs):
+            namespace = PurePosixPath(str(feed).replace(os.sep, "/")).stem or f"feed{index}"
+            feeds[namespace if namespace not in feeds else f"{namespace}{index}"] = feed
+        return feeds
+    return {"": gtfs}
+
+
+def gtfs_feed_files(feed) -> Dict[str, Any]:
+    """
+    Path of every GTFS file read by the loader in a feed folder or zip archive, by loader attribute name.
+    The files of an archive are found at any depth, as some feeds are zipped with their folder.
+
+    Args:
+        feed: The folder or zip archive of the feed, None when the city has no feed.
+
+    Returns:
+        Dict[str, Any]: The paths, zipfile.Path for the files of an archive, None without feed.
+    """
+    if feed is None:
+        return {name: None for name in GTFS_FILE_NAMES}
+    if isinstance(feed, (str, os.PathLike)) and os.path.isfile(feed) and zipfile.is_zipfile(feed):
+        root = zipfile.Path(feed)
+        members = {PurePosixPath(member).name: member for member in root.root.namelist()}
+        return {name: root.joinpath(members.get(filename, filename)) for name, filename in GTFS_FILE_NAMES.items()}
+    folder = feed if hasattr(feed, "joinpath") else Path(feed)
+    return {name: folder.joinpath(filename) for name, filename in GTFS_FILE_NAMES.items()}
+
+
+class GTFSFeedLoader(AbstractLoader):
+    """
+    Loader of any GTFS feed, a folder or a zip archive, and of the mobility files of a city, see CityConfig.
+
+    Usage:
+        loader = GTFSFeedLoader(CityConfig(name="Larnaca", country_a3="CYP", country_name="Cyprus",
+                                           country_iso="CY", center=(34.9229, 33.6233), gtfs="larnaca_gtfs.zip"))
+        ums = loader.load_all_data([DataType.STOPS, DataType.ITINERARIES])
+    """
+
+    def __init__(self, config: CityConfig, restrict_country_boundaries: bool = False, distance_radius_km: float = None,
+                 grid_resolution: int = 8, grid_pyramid_resolutions: Optional[List[int]] = None,
+                 station_history_period: Optional[str] = None, perimeter: PerimeterOption = None):
+        self.config = config
+        super().__init__(config.country_a3, restrict_country_boundaries, distance_radius_km, grid_resolution,
+                         grid_pyramid_resolutions, station_history_period, perimeter)
+        # Data files, replaced by loaders reading the same formats from another folder
+        feeds = gtfs_feeds(config.gtfs)
+        for name, filepath in gtfs_feed_files(next(iter(feeds.values()), None)).items():
+            setattr(self, name, filepath)
+        # GTFS files of every feed by namespace, when several feeds are merged
+        self.feed_files = {namespace: gtfs_feed_files(feed) for namespace, feed in feeds.items()} \
+            if len(feeds) > 1 else {}
+        self.BIKES_STOPS_FILEPATH = config.bike_stations_file
+        self.RIDERSHIP_FILE_PATH = config.ridership_file
+        self.BIKE_TRIPS_FILE_PATH = config.bike_trips_file
+
+    @property
+    def COUNTRY_A3_CODE(self): return self.config.country_a3
+
+    @property
+    def COUNTRY_NAME(self): return self.config.country_name
+
+    @property
+    def COUNTRY_ISO_CODE(self): return self.config.country_iso
+
+    @property
+    def _CITY_CENTER(self): return self.config.center
+
+    @property
+    def CITY_CENTER(self): return self.config.center
+
+    @property
+    def CITY_NAME(self): return self.config.name
+
+    def input_files(self, datatype: DataType) -> list:
+        """
+        GTFS, GBFS and mobility files read to load a data type, see AbstractLoader.input_files.
+        The archive is listed for the files of a zipped feed.
+        """
+        feeds = list(self.feed_files.values()) or [{name: getattr(self, name) for name in GTFS_FILE_NAMES}]
+        stops = [feed["STOPS_FILE_PATH"] for feed in feeds]
+        input_files = {
+            DataType.STOPS: stops,
+            DataType.ITINERARIES: [feed[name] for feed in feeds for name in GTFS_FILE_NAMES],
+            DataType.BIKE_STATIONS: [self.BIKES_STOPS_FILEPATH],
+            DataType.RIDERSHIP: [self.RIDERSHIP_FILE_PATH],
+            DataType.BIKE_TRIPS: [self.BIKE_TRIPS_FILE_PATH],
+            DataType.HEX_GRID: stops + [self.BIKES_STOPS_FILEPATH],
+        }
+        filepaths = [filepath.root.filename if isinstance(filepath, zipfile.Path) else filepath
+                     for filepath in input_files.get(datatype, []) if filepath is not None]
+        return list(dict.fromkeys(filepaths)) + super().input_files(datatype)
+
+    def parameters(self) -> dict:
+        """
+        Loader parameters changing the loaded data, with the city, see AbstractLoader.parameters.
+        """
+        return {**super().parameters(), "city": self.CITY_NAME}
+
+    def _load_network(self, itineraries: bool = True) -> GTFSNetwork:
+        """
+        Load the network of the feed, or load the network of every feed and merge them, see GTFSNetwork.merge.
+        """
+        if not self.feed_files:
+            return super()._load_network(itineraries)
+        networks = []
+        for namespace, feed_files in self.feed_files.items():
+            feed_loader = copy.copy(self)
+            feed_loader.feed_files = {}
+            feed_loader.ids = IdDictionary()
+            for name, filepath in feed_files.items():
+                setattr(feed_loader, name, filepath)
+            with stage("load_feed", namespace=namespace):
+                networks.append(feed_loader._load_network(itineraries))
+        return GTFSNetwork.merge(networks, list(self.feed_files), self.config.merge_distance_m,
+                                 self.config.merge_name_similarity)
+
+    def _read_file(self, read, filepath, **kwargs) -> pd.DataFrame:
+        """
+        Read a data file with a pandas reader, in a stage of its own. Members of a zipped feed are read
+        without extracting the archive.
+        """
+        if filepath is None:
+            raise FileNotFoundError(f"Data file not configured for {self.CITY_NAME}, see CityConfig.")
+        with stage("read_file", filepath=str(filepath)) as span:
+            if isinstance(filepath, zipfile.Path):
+                with filepath.open("rb") as f:
+                    data = read(f, **kwargs)
+            else:
+                data = read(filepath, **kwargs)
+            span.rows_out = len(data)
+        return data
+
+    def _valid_positions(self, data: pd.DataFrame, latitude: str, longitude: str) -> np.ndarray:
+        """
+        Check the positions of all the rows of a file at once, see positions_are_valid.
+        Missing columns and values that are not numbers are invalid positions.
+        """
+        if latitude not in data or longitude not in data:
+            return np.zeros(len(data), dtype=bool)
+        return self.positions_are_valid(
+            pd.to_numeric(data[latitude], errors="coerce").to_numpy(dtype=np.float64),
+            pd.to_numeric(data[longitude], errors="coerce").to_numpy(dtype=np.float64))
+
+    def load_stops(self):
+        """ Load GTFS stops from the GTFS data file
+        Headers in file :
+        stop_id,stop_name,stop_lat,stop_lon,stop_desc,zone_id,stop_url,location_type,parent_station
+        Returns:
+            list[Stop]: A list of Stop objects representing the stops in the GTFS data.
+        """
+        with stage("load_stops") as span:
+            public_transport_stations = self._read_file(pd.read_csv, self.STOPS_FILE_PATH)
+            valid_positions = self._valid_positions(public_transport_stations, "stop_lat", "stop_lon")
+            public_transport_stations = public_transport_stations.where(
+                pd.notnull(public_transport_stations), None)
+            span.rows_in = len(public_transport_stations)
+            span.reject(len(valid_positions) - int(valid_positions.sum()), "position")
+            stops = []
+            for _, row in public_transport_stations[valid_positions].iterrows():
+                try:
+                    stop_lat = safe_get(row, "stop_lat", None, float)
+                    stop_lon = safe_get(row, "stop_lon", None, float)
+
+                    stops.append(
+                        Stop(
+                            stop_id=self.ids.intern("stop", safe_get(row, "stop_id", "")),
+                            stop_name=safe_get(row, "stop_name", ""),
+                            stop_lat=stop_lat,
+                            stop_lon=stop_lon,
+                            stop_desc=safe_get(row, "stop_desc", None),
+                            zone_id=safe_get(row, "zone_id", None),
+                            stop_url=safe_get(row, "stop_url", None),
+                            location_type=safe_get(row, "location_type", 0, int),
+                            parent_station=self.ids.intern("stop", safe_get(row, "parent_station", None)),
+                        )
+                    )
+                except ValidationError:  # counted in the stage rejections, without a traceback per row
+                    span.reject(1, "validation")
+                    continue
+            span.rows_out = len(stops)
+        return stops
+
+    def load_routes(self):
+        """ Load GTFS routes from the GTFS data file
+        Headers in file :
+        route_id,agency_id,route_short_name,route_long_name,route_desc,route_type,route_url,route_color,route_text_color
+        Returns:
+            list[Route]: A list of Route objects representing the routes in the GTFS data.
+        """
+        with stage("load_routes") as span:
+            public_transport_routes = self._read_file(pd.read_csv, self.ROUTES_FILE_PATH)
+            public_transport_routes = public_transport_routes.where(
+                pd.notnull(public_transport_routes), None)
+            span.rows_in = len(public_transport_routes)
+            routes = []
+            for _, row in public_transport_routes.iterrows():
+                try:
+                    routes.append(
+                        Route(
+                            route_id=self.ids.intern("route", safe_get(row, "route_id", "")),
+                            agency_id=safe_get(row, "agency_id", "", str),
+                            route_short_name=safe_get(row, "route_short_name", ""),
+                            route_long_name=safe_get(row, "route_long_name", ""),
+                            route_desc=safe_get(row, "route_desc", None),
+                            route_type=safe_get(row, "route_type", ""),
+                            route_url=safe_get(row, "route_url", None),
+                            route_color=safe_get(row, "route_color", None),
+                            route_text_color=safe_get(
+                                row, "route_text_color", None),
+                        )
+                    )
+                except ValidationError:  # counted in the stage rejections, without a traceback per row
+                    span.reject(1, "validation")
+                    continue
+            span.rows_out = len(routes)
+        return routes
+
+    def load_trips(self):
+        """ Load GTFS trips from the GTFS data file 
+        Headers in file : 
+        route_id,service_id,trip_id,trip_headsign,trip_short_name,direction_id,block_id,shape_id,trip_type
+        Returns:
+            list[Trip]: A list of Trip objects representing the trips in the GTFS data.
+        """
+        with stage("load_trips") as span:
+            public_transport_trips = self._read_file(pd.read_csv, self.TRIPS_FILE_PATH)
+            public_transport_trips = public_transport_trips.where(
+                pd.notnull(public_transport_trips), None)
+            span.rows_in = len(public_transport_trips)
+
+            trips = []
+            for _, row in public_transport_trips.iterrows():
+                try:
+                    trips.append(
+                        Trip(
+                            route_id=self.ids.intern("route", safe_get(row, "route_id", "", str)),
+                            service_id=self.ids.intern("service", safe_get(row, "service_id", "", str)),
+                            trip_id=self.ids.intern("trip", safe_get(row, "trip_id", "", str)),
+                            trip_headsign=safe_get(
+                                row, "trip_headsign", None, str),
+                            trip_short_name=safe_get(
+                                row, "trip_short_name", None, str),
+                            direction_id=safe_get(row, "direction_id", None, int),
+                            block_id=safe_get(row, "block_id", None, str),
+                            shape_id=safe_get(row, "shape_id", None, str),
+                        )
+                    )
+                except ValidationError as e:
+                    logger.exception(f"ValidationError in load_trips: {e}")
+                    span.reject(1, "validation")
+                    continue
+            span.rows_out = len(trips)
+        return trips
+
+    def load_stop_times(self):
+        """ Load GTFS stop_times from the GTFS data file
+        Headers in file :
+        trip_id,arrival_time,departure_time,stop_id,stop_sequence,stop_headsign,pickup_type,drop_off_type,shape_dist_traveled
+
+        The columns are encoded in a StopTimeTable, with the trip and stop codes of the loader IdDictionary,
+        without building a StopTime object per row.
+
+        Returns:
+            StopTimeSequence: The StopTime objects of the stop times, built on first use, sorted by trip and stop sequence.
+        """
+        with stage("load_stop_times") as span:
+            public_transport_stop_times = self._read_file(pd.read_csv, self.STOPTIMES_FILE_PATH)
+            span.rows_in = len(public_transport_stop_times)
+
+            def column(key, default=None, dtype=None):
+                return safe_column(public_transport_stop_times, key, default, dtype)
+
+            table = StopTimeTable.from_columns(
+                self.ids,
+                trip_ids=column("trip_id", "", str),
+                stop_ids=column("stop_id", "", str),
+                stop_sequences=column("stop_sequence", 0, int),
+                arrival_time=column("arrival_time", "", str),
+                departure_time=column("departure_time", "", str),
+                stop_headsign=column("stop_headsign", None, str),
+                pickup_type=column("pickup_type", None, int),
+                drop_off_type=column("drop_off_type", None, int),
+                shape_dist_traveled=column("shape_dist_traveled", None, float),
+                timepoint=column("timepoint", None, int),
+            )
+            span.rows_out = len(table)
+        return table.as_stop_times()
+
+    def load_transfers(self):
+        """ Load GTFS transfers from the GTFS data file, optional in GTFS: no transfer without file.
+        Headers in file :
+        from_stop_id,to_stop_id,transfer_type,min_transfer_time,from_route_id,to_route_id,from_trip_id,to_trip_id
+
+        Returns:
+            list[Transfer]: A list of Transfer objects representing the transfers in the GTFS data.
+        """
+        if self.TRANSFERS_FILE_PATH is None or not self.TRANSFERS_FILE_PATH.is_file():
+            return []
+        with stage("load_transfers") as span:
+            public_transport_transfers = self._read_file(pd.read_csv, self.TRANSFERS_FILE_PATH, dtype=str)
+            public_transport_transfers = public_transport_transfers.where(
+                pd.notnull(public_transport_transfers), None)
+            span.rows_in = len(public_transport_transfers)
+            transfers = []
+            for _, row in public_transport_transfers.iterrows():
+                try:
+                    transfers.append(
+                        Transfer(
+                            from_stop_id=self.ids.intern("stop", safe_get(row, "from_stop_id", None, str)),
+                            to_stop_id=self.ids.intern("stop", safe_get(row, "to_stop_id", None, str)),
+                            transfer_type=safe_get(row, "transfer_type", 0, int),
+                            min_transfer_time=safe_get(row, "min_transfer_time", None, int),
+                            from_route_id=self.ids.intern("route", safe_get(row, "from_route_id", None, str)),
+                            to_route_id=self.ids.intern("route", safe_get(row, "to_route_id", None, str)),
+                            from_trip_id=self.ids.intern("trip", safe_get(row, "from_trip_id", None, str)),
+                            to_trip_id=self.ids.intern("trip", safe_get(row, "to_trip_id", None, str)),
+                        )
+                    )
+                except ValidationError as e:
+                    logger.exception(f"ValidationError in load_transfers: {e}")
+                    span.reject(1, "validation")
+                    continue
+            span.rows_out = len(transfers)
+        return transfers
+
+    def load_bike_stations(self):
+        """ Load bike sharing stations from the GBFS data file
+        Headers in file :
+        name	latitude	longitude
+        Returns:
+            list[StationInfoStatus]: A list of StationInfoStatus objects representing the bike sharing stations.
+        """
+        with stage("load_bike_stations") as span:
+            shared_bikes_stations = self._read_file(pd.read_excel, self.BIKES_STOPS_FILEPATH)
+            valid_positions = self._valid_positions(shared_bikes_stations, "latitude", "longitude")
+            shared_bikes_stations = shared_bikes_stations.where(
+                pd.notnull(shared_bikes_stations), None)
+            span.rows_in = len(shared_bikes_stations)
+            span.reject(len(valid_positions) - int(valid_positions.sum()), "position")
+            bike_stations = []
+            for _, row in shared_bikes_stations[valid_positions].iterrows():
+                try:
+                    lat = safe_get(row, "latitude", None, float)
+                    lon = safe_get(row, "longitude", None, float)
+                    bike_stations.append(
+                        StationInfoStatus(
+                            station_id=safe_get(row, "name", ""),
+                            name=safe_get(row, "name", ""),
+                            lat=lat,
+                            lon=lon,
+                            short_name="",
+                            address="",
+                            capacity=None,
+                            region_id="",
+                            rental_methods=None,
+                            has_kiosk=None,
+                            history=[],
+                        )
+                    )
+                except ValidationError as e:
+                    logger.exception(f"ValidationError in load_bike_stations: {e}")
+                    span.reject(1, "validation")
+                    continue
+            span.rows_out = len(bike_stations)
+        return bike_stations
+
+    def load_ridership(self):
+        """ Load ridership data from the Excel file
+        Headers in file :
+        Date	Timeslot	Index Day Week	Line Type	Schedule Type	Line	Stop	Long Code Stop	Number of Boarding Passengers	Number of Disembarking Passengers	jour_semaine	Week Index	Month Year	Stop Latitudes	Stop Longtitudes	Final Data	filter_graph
+
+        Returns:
+            list[Ridership]: A list of Ridership objects representing the ridership data.
+        """
+        with stage("load_ridership") as span:
+            public_transport_ridership = self._read_file(pd.read_csv, self.RIDERSHIP_FILE_PATH)
+            valid_positions = self._valid_positions(public_transport_ridership, "Stop Latitudes", "Stop Longtitudes")
+            public_transport_ridership = public_transport_ridership.where(
+                pd.notnull(public_transport_ridership), None)
+            span.rows_in = len(public_transport_ridership)
+            span.reject(len(valid_positions) - int(valid_positions.sum()), "position")
+            ridership_data = []
+            for _, row in public_transport_ridership[valid_positions].iterrows():
+                try:
+                    stop_lat = safe_get(row, "Stop Latitudes", None, float)
+                    stop_lon = safe_get(row, "Stop Longtitudes", None, float)
+                    ridership_data.append(
+                        Ridership(
+                            date=safe_get(row, "Date", "", str),
+                            timeslot=safe_get(row, "Timeslot", "", str),
+                            day_index=safe_get(row, "Index Day Week", 0, int),
+                            line_type=safe_get(row, "Line Type", "", str),
+                            schedule_type=safe_get(row, "Schedule Type", "", str),
+                            line=safe_get(row, "Line", "", str),
+                            stop_name=safe_get(row, "Stop", "", str),
+                            stop_code=safe_get(row, "Long Code Stop", "", str),
+                            boardings=safe_get(
+                                row, "Number of Boarding Passengers", 0, int),
+                            alightings=safe_get(
+                                row, "Number of Disembarking Passengers", 0, int),
+                            day_label=safe_get(row, "jour_semaine", ""),
+                            week_index=safe_get(row, "Week Index", 0, int),
+                            month_year=safe_get(row, "Month Year", "", str),
+                            stop_lat=stop_lat,
+                            stop_lon=stop_lon,
+                            is_final=bool(safe_get(row, "Final Data", False)),
+                            is_filtered=bool(safe_get(row, "filter_graph", False)),
+                        )
+                    )
+                except ValidationError as e:
+                    logger.exception(f"ValidationError in load_ridership: {e}")
+                    span.reject(1, "validation")
+                    continue
+            span.rows_out = len(ridership_data)
+        return ridership_data
+
+    def load_ridership_cube(self) -> RidershipCube:
+        """ Load ridership data from the CSV file as a data cube, see load_ridership for the headers.
+        Only the dimension and measure columns are read, records with an invalid stop position are filtered
+        with one geometry call, see positions_are_valid.
+
+        Returns:
+            RidershipCube: The ridership summed per stop, line, timeslot, day, week and month.
+        """
+        with stage("load_ridership_cube") as span:
+            ridership = self._read_file(
+                pd.read_csv, self.RIDERSHIP_FILE_PATH,
+                usecols=list(RIDERSHIP_CUBE_COLUMNS) + ["Stop Latitudes", "Stop Longtitudes"],
+                dtype={"Long Code Stop": str, "Line": str, "Timeslot": str, "Month Year": str})
+            span.rows_in = len(ridership)
+            valid = self._valid_positions(ridership, "Stop Latitudes", "Stop Longtitudes")
+            span.reject(len(ridership) - int(valid.sum()), "position")
+            data = ridership.loc[valid, list(RIDERSHIP_CUBE_COLUMNS)].rename(columns=RIDERSHIP_CUBE_COLUMNS)
+            for name in ("stop_code", "line", "timeslot", "month_year"):
+                data[name] = data[name].fillna("")
+            for name in ("day_index", "week_index"):
+                data[name] = pd.to_numeric(data[name], errors="coerce").fillna(0).astype(np.int64)
+            cube = RidershipCube.from_dataframe(data)
+            span.rows_out = len(cube)
+        return cube
+
+    def load_bike_trips(self):
+        """ Load bike trips data from the CSV file, see load_bike_trip_store.
+
+        Returns:
+            list[BikeTrip]: A list of BikeTrip objects representing the bike trips data, sorted by start time.
+        """
+        return self.load_bike_trip_store().to_bike_trips()
+
+    def load_bike_trip_store(self) -> BikeTripStore:
+        """ Load bike trips data from the CSV file as a time-indexed columnar store.
+        Headers in file :
+        trip_id,rental_id,vehicle_type,trip_started_at_utc,trip_ended_at_utc,latitude_start,longitude_start,latitude_end,longitude_end,distance_in_km
+
+        Timestamps are parsed from the CSV columns in one vectorized call, and trips with an invalid
+        start or end position are filtered with one geometry call, see positions_are_valid.
+
+        Returns:
+            BikeTripStore: The bike trips, sorted by start time.
+        """
+        with stage("load_bike_trip_store") as span:
+            bike_trips = self._read_file(pd.read_csv, self.BIKE_TRIPS_FILE_PATH,
+                                         dtype={"trip_id": str, "rental_id": str, "vehicle_type": str})
+            span.rows_in = len(bike_trips)
+            store = BikeTripStore.from_dataframe(bike_trips)
+            span.reject(len(bike_trips) - len(store), "validation")
+            valid = (self.positions_are_valid(store["latitude_start"], store["longitude_start"]) &
+                     self.positions_are_valid(store["latitude_end"], store["longitude_end"]))
+            span.reject(len(store) - int(valid.sum()), "position")
+            store = store.take(np.flatnonzero(valid))
+            span.rows_out = len(store)
+        return store
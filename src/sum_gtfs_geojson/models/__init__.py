@@ -1,9 +1,24 @@
-from .sum_gtfs_base_model import SumGtfsBaseModel
-from .urban_mobility_system import UrbanMobilitySystem
-from .gtfs import Stop, Route, Trip, Agency, GTFSNetwork, StopTime
-from .gbfs import StationInfoStatus
-from .mobility import BikeTrip, Ridership
-from .grid import HexGrid, HexCell
+from typing import TYPE_CHECKING
+from sum_gtfs_geojson.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .sum_gtfs_base_model import SumGtfsBaseModel
+    from .urban_mobility_system import UrbanMobilitySystem
+    from .gtfs import (Stop, Route, Trip, Agency, GTFSNetwork, StopTime, Transfer, IdDictionary, StopTimeTable,
+                       StopTimeSequence)
+    from .gbfs import StationInfoStatus
+    from .mobility import BikeTrip, BikeTripStore, BikeTripSequence, Ridership, RidershipCube
+    from .grid import HexGrid, HexCell, HexPyramid
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "SumGtfsBaseModel": ".sum_gtfs_base_model",
+    "UrbanMobilitySystem": ".urban_mobility_system",
+    **dict.fromkeys(["Stop", "Route", "Trip", "Agency", "GTFSNetwork", "StopTime", "Transfer", "IdDictionary",
+                     "StopTimeTable", "StopTimeSequence"], ".gtfs"),
+    "StationInfoStatus": ".gbfs",
+    **dict.fromkeys(["BikeTrip", "BikeTripStore", "BikeTripSequence", "Ridership", "RidershipCube"], ".mobility"),
+    **dict.fromkeys(["HexGrid", "HexCell", "HexPyramid"], ".grid"),
+})
 
 __all__ = [
     "SumGtfsBaseModel",
@@ -14,9 +29,17 @@ __all__ = [
     "Agency",
     "StationInfoStatus",
     "BikeTrip",
+    "BikeTripStore",
+    "BikeTripSequence",
     "Ridership",
+    "RidershipCube",
     "GTFSNetwork",
     "StopTime",
+    "Transfer",
+    "IdDictionary",
+    "StopTimeTable",
+    "StopTimeSequence",
     "HexGrid",
-    "HexCell"
+    "HexCell",
+    "HexPyramid"
 ]
@@ -10,13 +10,30 @@ class StationStatusPeriod(StationStatus):
     Extends StationStatus with period metadata to group availability by time periods.
 
     This is useful for analyzing patterns across predefined time windows (e.g., by hour,
-    weekday/weekend, or month).
+    weekday/weekend, or month). The status fields are optional, as the periods reconstructed from the bike
+    trips only know the trip counts: the availability and the installed/renting/returning flags are not
+    observed and are left unset.
 
     Attributes:
         period_id (str): Identifier for the time period (e.g., "weekday_morning", "2024-05").
         period_label (Optional[str]): Human-readable label for the time period.
+        num_departures (Optional[int]): Number of trips started at the station during the period.
+        num_arrivals (Optional[int]): Number of trips ended at the station during the period.
+        net_flow (Optional[int]): Inventory change over the period, arrivals minus departures.
     """
+    num_bikes_available: Optional[int] = None
+    num_docks_available: Optional[int] = None
+    is_installed: Optional[int] = None
+    is_renting: Optional[int] = None
+    is_returning: Optional[int] = None
+    last_reported: Optional[int] = None
     period_id: str = Field(...,
                            description="Machine-readable identifier for the analysis period.")
     period_label: Optional[str] = Field(
         default=None, description="Display name for the period (e.g., 'Weekday Morning').")
+    num_departures: Optional[int] = Field(
+        default=None, description="Trips started at the station during the period.")
+    num_arrivals: Optional[int] = Field(
+        default=None, description="Trips ended at the station during the period.")
+    net_flow: Optional[int] = Field(
+        default=None, description="Arrivals minus departures over the period.")
@@ -1,6 +1,8 @@
 from .hex_grid import HexGrid
 from .hex_cell import HexCell
+from .hex_pyramid import HexPyramid
 __all__ = [
     "HexGrid",
-    "HexCell"
+    "HexCell",
+    "HexPyramid"
 ]
@@ -1,9 +1,10 @@
 from .. import SumGtfsBaseModel
 from pydantic import Field
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 
 class HexCell(SumGtfsBaseModel):
     h3_id: str = Field(..., description="Unique H3 cell identifier")
     center: Tuple[float, float] = Field(..., description="Center point of the hex cell as (longitude, latitude)")
     polygon: List[Tuple[float, float]] = Field(..., description="List of (longitude, latitude) tuples defining the hexagon boundary")
+    metrics: Dict[str, int] = Field(default_factory=dict, description="Aggregated counters for the cell (e.g. number of stops), by metric name")
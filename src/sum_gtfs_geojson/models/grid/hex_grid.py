@@ -1,10 +1,12 @@
-from shapely.geometry import Point, Polygon
-import geopandas as gpd
-import h3
-from typing import List, Optional
+import numpy as np
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
 from .. import SumGtfsBaseModel
 from .hex_cell import HexCell
 from pydantic import Field
+from sum_gtfs_geojson.exporter import GeoJSONWriter, ColumnarLayer
+
+if TYPE_CHECKING:
+    import geopandas as gpd
 
 
 
@@ -13,7 +15,7 @@ class HexGrid(SumGtfsBaseModel):
     cells: List[HexCell] = Field(..., description="List of hexagonal cells")
     
     @classmethod
-    def from_geodataframe(cls, gdf: gpd.GeoDataFrame, resolution: int) -> "HexGrid":
+    def from_geodataframe(cls, gdf: "gpd.GeoDataFrame", resolution: int) -> "HexGrid":
         """
         Create a HexGrid instance from a GeoDataFrame of point geometries.
 
@@ -24,11 +26,10 @@ class HexGrid(SumGtfsBaseModel):
         Returns:
             HexGrid instance.
         """
+        import h3  # imported on first use, see sum_gtfs_geojson.lazy
+
         if gdf.empty:
             raise ValueError("The GeoDataFrame is empty.")
-        
-        print('Generating hex grid, gdf containts h3 ids:', gdf['h3_id'].unique())
-        print('grid contains the following geometries:', gdf['geometry'].count())
 
         # Create a bounding polygon (convex hull with a small buffer)
         bounding_polygon = gdf.unary_union.convex_hull.buffer(0.01)  # ~1km buffer
@@ -47,23 +48,79 @@ class HexGrid(SumGtfsBaseModel):
 
         return cls(resolution=resolution, cells=cells)
 
-    def to_geodataframe(self) -> gpd.GeoDataFrame:
+    @property
+    def metric_names(self) -> List[str]:
+        """
+        Names of the metrics available in the cells, in insertion order.
+        """
+        names = {}
+        for cell in self.cells:
+            names.update(dict.fromkeys(cell.metrics))
+        return list(names)
+
+    def add_metric(self, name: str, cells: np.ndarray):
+        """
+        Count occurrences of H3 cells into a cell metric, e.g. the number of stops per cell.
+        Occurrences outside the grid are ignored.
+
+        Args:
+            name: Name of the metric.
+            cells: Integer H3 cell indexes at the grid resolution, one per occurrence.
+        """
+        import h3
+
+        cell_ids, counts = np.unique(np.asarray(cells, dtype=np.uint64), return_counts=True)
+        counts_by_id = dict(zip(cell_ids.tolist(), counts.tolist()))
+        for cell in self.cells:
+            cell.metrics[name] = counts_by_id.get(h3.str_to_int(cell.h3_id), 0)
+
+    def to_geodataframe(self) -> "gpd.GeoDataFrame":
         """
         Convert the HexGrid instance to a GeoDataFrame.
 
         Returns:
-            GeoDataFrame with hex cell geometries and identifiers.
+            GeoDataFrame with hex cell geometries, identifiers and one column per metric.
         """
+        import geopandas as gpd
+        from shapely.geometry import Polygon
+
         hex_ids = [cell.h3_id for cell in self.cells]
         polygons = [Polygon(cell.polygon) for cell in self.cells]
-        gdf = gpd.GeoDataFrame({"h3_id": hex_ids, "geometry": polygons}, crs="EPSG:4326")
+        columns = {"h3_id": hex_ids}
+        for name in self.metric_names:
+            columns[name] = [cell.metrics.get(name, 0) for cell in self.cells]
+        gdf = gpd.GeoDataFrame({**columns, "geometry": polygons}, crs="EPSG:4326")
         return gdf
 
-    def to_geojson(self, filepath: str = None) -> dict:
-        """Export the grid to a GeoJSON file."""
-        
-        gdf = self.to_geodataframe()
-        if filepath is not None:
-            gdf.to_file(filepath, driver="GeoJSON")
-        
-        return gdf.to_json()
\ No newline at end of file
+    def to_geojson(self, filepath: str) -> int:
+        """
+        Export the grid to a GeoJSON file, with the H3 id and the metrics of each cell as properties.
+
+        Args:
+            filepath: The path to the output GeoJSON file.
+
+        Returns:
+            int: The number of exported cells.
+        """
+        with GeoJSONWriter(filepath) as writer:
+            writer.write_features(self._cell_features())
+        return writer.count
+
+    def to_columnar(self, name: str = "hex_grid") -> ColumnarLayer:
+        """
+        Convert the grid to a compact columnar layer, e.g. to export it in a worker process.
+
+        Args:
+            name: Name of the layer. Defaults to "hex_grid".
+        """
+        return ColumnarLayer.from_features(name, "Polygon", self._cell_features())
+
+    def _cell_features(self) -> Iterator[Tuple[dict, dict]]:
+        """
+        Generate the (geometry, properties) of each cell.
+        """
+        metric_names = self.metric_names
+        for cell in self.cells:
+            properties = {"h3_id": cell.h3_id}
+            properties.update({name: cell.metrics.get(name, 0) for name in metric_names})
+            yield GeoJSONWriter.polygon(cell.polygon), properties
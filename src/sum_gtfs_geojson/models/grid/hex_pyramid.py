@@ -0,0 +1,60 @@
+from typing import Dict, List
+import os
+from pathlib import Path
+from .. import SumGtfsBaseModel
+from .hex_grid import HexGrid
+from pydantic import Field
+
+
+class HexPyramid(SumGtfsBaseModel):
+    """
+    Hexagonal grids of the same area at several H3 resolutions, for zoom-dependent display.
+
+    The coarser levels are rolled up from the finest one, so the cell metrics are consistent
+    across levels: the metrics of a cell are the sum of the metrics of its children.
+
+    Attributes:
+        levels: Hex grid of each resolution, by resolution.
+    """
+    levels: Dict[int, HexGrid] = Field(..., description="Hex grid of each resolution, by resolution")
+
+    @property
+    def resolutions(self) -> List[int]:
+        """
+        Resolutions available in the pyramid, from the coarsest to the finest.
+        """
+        return sorted(self.levels.keys())
+
+    def get_level(self, resolution: int) -> HexGrid:
+        """
+        Get the hex grid of a given resolution.
+
+        Args:
+            resolution: H3 resolution level.
+
+        Returns:
+            HexGrid of the requested resolution.
+        """
+        if resolution not in self.levels:
+            raise ValueError(
+                f"Resolution {resolution} not in pyramid, available resolutions: {self.resolutions}")
+        return self.levels[resolution]
+
+    @staticmethod
+    def level_name(resolution: int) -> str:
+        """
+        Name of the layer of a resolution level, e.g. hex_grid_8res.
+        """
+        return f"hex_grid_{resolution}res"
+
+    def to_geojson(self, output_path: str):
+        """
+        Export every level of the pyramid to a separate GeoJSON file named hex_grid_{resolution}res.geojson.
+
+        Args:
+            output_path: The folder where the GeoJSON files will be saved.
+        """
+        Path(output_path).mkdir(parents=True, exist_ok=True)
+        for resolution in self.resolutions:
+            self.levels[resolution].to_geojson(
+                os.path.join(output_path, f"{self.level_name(resolution)}.geojson"))
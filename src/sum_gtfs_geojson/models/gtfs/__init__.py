@@ -4,6 +4,9 @@ from .stop import Stop
 from .trip import Trip
 from .stop_time import StopTime
 from .itinerary import Itinerary
+from .transfer import Transfer
+from .id_dictionary import IdDictionary, ID_KINDS, ID_FIELD_KINDS, MISSING_CODE
+from .stop_time_table import StopTimeTable, StopTimeSequence
 from .gtfs_network import GTFSNetwork
 
 __all__ = [
@@ -13,5 +16,12 @@ __all__ = [
     "Trip",
     "StopTime",
     "Itinerary",
+    "Transfer",
+    "IdDictionary",
+    "ID_KINDS",
+    "ID_FIELD_KINDS",
+    "MISSING_CODE",
+    "StopTimeTable",
+    "StopTimeSequence",
     "GTFSNetwork",
 ]
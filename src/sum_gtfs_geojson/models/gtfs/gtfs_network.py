@@ -1,11 +1,18 @@
-from typing import List, Dict, Tuple
-from pydantic import Field
+from typing import TYPE_CHECKING, List, Dict, Iterator, Optional, Sequence, Tuple, Union
+from pydantic import Field, InstanceOf, PrivateAttr, field_serializer
 from .. import SumGtfsBaseModel
-from shapely.geometry import Point, LineString, mapping
-import geopandas as gpd
-from . import Stop, Route, Trip, StopTime, Itinerary
-from collections import defaultdict
-import json
+from . import Stop, Route, Trip, StopTime, Itinerary, Transfer
+from .id_dictionary import IdDictionary, MISSING_CODE, ID_FIELD_KINDS
+from .stop_time_table import StopTimeTable, StopTimeSequence
+import numpy as np
+from sum_gtfs_geojson.exporter import GeoJSONWriter, ColumnarLayer, GeoFormat, write_geo_layers, write_topojson_layer
+from sum_gtfs_geojson.instrumentation import stage
+
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+DEFAULT_MERGE_DISTANCE_M = 50.0
+DEFAULT_MERGE_NAME_SIMILARITY = 0.8
 
 
 class GTFSNetwork(SumGtfsBaseModel):
@@ -16,76 +23,335 @@ class GTFSNetwork(SumGtfsBaseModel):
         stops: All GTFS stops (stations or platforms).
         routes: All GTFS routes (lines).
         trips: All trips (vehicle runs) along routes.
-        stop_times: Stop-by-stop itineraries for each trip.
+        stop_times: Stop-by-stop itineraries for each trip. When loaded, a StopTimeSequence over the columnar table,
+            building the StopTime objects on first use and then behaving as a list.
+        itineraries: Stop sequence of every route and direction, see build_itineraries.
+        transfers: Connections between stops, routes or trips.
     """
     stops: List[Stop] = Field(default_factory=list)
     routes: List[Route] = Field(default_factory=list)
     trips: List[Trip] = Field(default_factory=list)
-    stop_times: List[StopTime] = Field(default_factory=list)
+    stop_times: Union[InstanceOf[StopTimeSequence], List[StopTime]] = Field(default_factory=list,
+                                                                             union_mode="left_to_right")
     itineraries: List[Itinerary] = Field(default_factory=list)
+    transfers: List[Transfer] = Field(default_factory=list)
+    _ids: Optional[IdDictionary] = PrivateAttr(None)
+    _stop_time_table: Optional[StopTimeTable] = PrivateAttr(None)
+    _stop_time_table_source: Optional[Sequence[StopTime]] = PrivateAttr(None)  # the stop_times of the table
+
+    @field_serializer("stop_times", mode="wrap")
+    def _serialize_stop_times(self, stop_times, handler):
+        # the StopTime objects of a StopTimeSequence are dumped like a list, without being kept
+        return handler(stop_times.copy() if isinstance(stop_times, StopTimeSequence) else stop_times)
+
+    @property
+    def ids(self) -> IdDictionary:
+        """
+        Dictionary of the identifiers of the network, mapping every stop, trip, route and service id to an
+        integer code. Set by the loaders, which intern the identifiers of the models into it, or built from the
+        models on first use.
+        """
+        if self._ids is None:
+            ids = IdDictionary()
+            for stop in self.stops:
+                ids.encode("stop", stop.stop_id)
+            for route in self.routes:
+                ids.encode("route", route.route_id)
+            for trip in self.trips:
+                ids.encode("trip", trip.trip_id)
+                ids.encode("service", trip.service_id)
+            self._ids = ids
+        return self._ids
+
+    @ids.setter
+    def ids(self, ids: IdDictionary):
+        self._ids = ids
+        self._stop_time_table = None
+
+    @property
+    def stop_time_table(self) -> StopTimeTable:
+        """
+        The stop times as columns, with the trip and stop codes of the ids dictionary. The table of a loaded
+        StopTimeSequence, recoded if it uses another dictionary, otherwise built from the StopTime objects on
+        first use, and rebuilt if stop_times was replaced or resized, or once the StopTimeSequence is
+        materialized (its StopTime objects may have been edited).
+        """
+        if (self._stop_time_table is None or self._stop_time_table_source is not self._stop_time_source()
+                or len(self._stop_time_table) != len(self.stop_times)):
+            self.stop_time_table = StopTimeTable.from_stop_times(self.stop_times, self.ids)
+        return self._stop_time_table
+
+    @stop_time_table.setter
+    def stop_time_table(self, table: StopTimeTable):
+        """
+        Set the table of the current stop_times, e.g. parsed from the same file.
+        """
+        self._stop_time_table = table
+        self._stop_time_table_source = self._stop_time_source()
+
+    def _stop_time_source(self) -> Sequence[StopTime]:
+        """
+        What the table of the stop times is built from: the StopTime objects of a materialized StopTimeSequence,
+        otherwise stop_times.
+        """
+        stop_times = self.stop_times
+        return stop_times.items if isinstance(stop_times, StopTimeSequence) and stop_times.is_materialized \
+            else stop_times
+
+    def with_namespace(self, namespace: str) -> "GTFSNetwork":
+        """
+        Copy of the network with every identifier prefixed by the namespace, e.g. "fr:StopArea:123",
+        so networks of different feeds can be merged without identifier collisions.
+        The stop, route, agency, trip, service, block, shape and fare zone identifiers are prefixed.
+
+        Args:
+            namespace (str): The namespace, e.g. the country or operator of the feed.
+
+        Returns:
+            GTFSNetwork: The namespaced network, the original network is unchanged.
+        """
+        ids = IdDictionary()  # every namespaced identifier string is built once
+
+        def prefixed(model, *names):
+            return model.model_copy(update={
+                name: ids.intern(ID_FIELD_KINDS[name], f"{namespace}:{getattr(model, name)}")
+                for name in names if getattr(model, name) not in (None, "")})
+
+        stops = [prefixed(s, "stop_id", "parent_station", "zone_id") for s in self.stops]
+        stop_lookup = {stop.stop_id: stop for stop in stops}
+        trips = [prefixed(t, "route_id", "service_id", "trip_id", "block_id", "shape_id") for t in self.trips]
+        # the stop times stay columnar, only their distinct identifiers are prefixed
+        stop_times = self.stop_time_table.recode(ids, trip_id=lambda trip_id: f"{namespace}:{trip_id}",
+                                                 stop_id=lambda stop_id: f"{namespace}:{stop_id}")
+        network = GTFSNetwork(
+            stops=stops,
+            routes=[prefixed(r, "route_id", "agency_id") for r in self.routes],
+            trips=trips,
+            stop_times=stop_times.as_stop_times(),
+            itineraries=[prefixed(i, "route_id", "trip_id").model_copy(update={
+                "stops": [stop_lookup.get(f"{namespace}:{s.stop_id}", s) for s in i.stops]})
+                for i in self.itineraries],
+            transfers=[prefixed(t, "from_stop_id", "to_stop_id", "from_route_id", "to_route_id", "from_trip_id",
+                                "to_trip_id") for t in self.transfers],
+        )
+        network.ids = ids
+        network.stop_time_table = stop_times
+        return network
+
+    @classmethod
+    def merge(cls, networks: Sequence["GTFSNetwork"], namespaces: Optional[Sequence[str]] = None,
+              distance_m: float = DEFAULT_MERGE_DISTANCE_M,
+              name_similarity: float = DEFAULT_MERGE_NAME_SIMILARITY) -> "GTFSNetwork":
+        """
+        Merge the networks of several feeds, e.g. the Swiss and French operators of a cross-border city.
+
+        The identifiers of every network are namespaced, see with_namespace. The stops of different feeds at
+        the same place, within distance_m and with similar names, are merged into the stop of the first feed,
+        see StopDeduplicator: the stop times, transfers, itineraries and child stops of a merged stop refer to
+        the kept stop. The transfers of all the feeds are unified on the kept stops, without duplicates.
+        Every object is visited a constant number of times, so the merge runs in linear time.
+
+        Args:
+            networks (List[GTFSNetwork]): The networks, the stops of the first ones are kept.
+            namespaces (List[str], optional): Namespace of every network. Defaults to None, "feed0", "feed1"...
+            distance_m (float, optional): Maximum distance between two merged stops, in meters. Defaults to 50.
+            name_similarity (float, optional): Minimum similarity of the names of two merged stops, from 0 to 1. Defaults to 0.8.
+
+        Returns:
+            GTFSNetwork: The merged network, the original networks are unchanged.
+        """
+        from sum_gtfs_geojson.utils import StopDeduplicator  # utils depends on models
+
+        if namespaces is None:
+            namespaces = [f"feed{index}" for index in range(len(networks))]
+        if len(namespaces) != len(networks) or len(set(namespaces)) != len(namespaces):
+            raise ValueError(f"Expected {len(networks)} distinct namespaces, got {list(namespaces)}")
+
+        with stage("merge_networks", rows_in=sum(len(n.stops) for n in networks), feeds=list(namespaces)) as span:
+            namespaced = [network.with_namespace(namespace) for network, namespace in zip(networks, namespaces)]
+            deduplicator = StopDeduplicator(distance_m, name_similarity)
+            kept_stop_ids: Dict[str, str] = {}  # merged stop id -> kept stop id
+            stops: List[Stop] = []
+            for group, network in enumerate(namespaced):
+                for stop in network.stops:
+                    kept_stop_id = deduplicator.add(stop, group)
+                    if kept_stop_id is None:
+                        stops.append(stop)
+                    else:
+                        kept_stop_ids[stop.stop_id] = kept_stop_id
+            span.reject(len(kept_stop_ids), "duplicate_stop")
+
+            def kept(model, *names):
+                update = {name: kept_stop_ids[getattr(model, name)] for name in names
+                          if getattr(model, name) in kept_stop_ids}
+                return model.model_copy(update=update) if update else model
+
+            stops = [kept(s, "parent_station") for s in stops]
+            stop_lookup = {stop.stop_id: stop for stop in stops}
+            merged = cls(
+                stops=stops,
+                routes=[r for network in namespaced for r in network.routes],
+                trips=[t for network in namespaced for t in network.trips],
+                itineraries=[i.model_copy(update={
+                    "stops": [stop_lookup.get(kept_stop_ids.get(s.stop_id, s.stop_id), s) for s in i.stops]})
+                    for network in namespaced for i in network.itineraries],
+            )
+
+            ids = merged.ids
+            # the stop times of the feeds are recoded to the merged codes, their merged stops to the kept stops
+            stop_times = StopTimeTable.concat([
+                network.stop_time_table.recode(ids, stop_id=lambda stop_id: kept_stop_ids.get(stop_id, stop_id))
+                for network in namespaced])
+            merged.stop_times = stop_times.as_stop_times()
+            merged.stop_time_table = stop_times
+            transfers: Dict[tuple, Transfer] = {}
+            for network in namespaced:
+                for transfer in network.transfers:
+                    transfer = kept(transfer, "from_stop_id", "to_stop_id")
+                    key = (ids.encode("stop", transfer.from_stop_id), ids.encode("stop", transfer.to_stop_id),
+                           ids.encode("route", transfer.from_route_id), ids.encode("route", transfer.to_route_id),
+                           ids.encode("trip", transfer.from_trip_id), ids.encode("trip", transfer.to_trip_id))
+                    transfers.setdefault(key, transfer)
+            merged.transfers = list(transfers.values())
+            span.rows_out = len(merged.stops)
+        return merged
 
-    def stops_to_geojson(self, filepath: str = None) -> gpd.GeoDataFrame:
+    def stops_to_geojson(self, filepath: str) -> int:
         """
         Export stops as a GeoJSON file, with stop information as properties.
+        Features are streamed to the file, without building a GeoDataFrame.
+
+        Note:
+            Changed in the streaming export: the filepath is required and the number of exported stops is returned
+            instead of a GeoDataFrame. Use `stops_to_geodataframe` for the GeoDataFrame.
+
         Args:
-            filepath (str): The path to the output GeoJSON file. Optional, if defined it will be saved to this path.
+            filepath (str): The path to the output GeoJSON file.
+        Returns:
+            int: The number of exported stops.
         """
         if not self.stops:
-            return
-        gdf = gpd.GeoDataFrame(
-            [s.model_dump() for s in self.stops],
-            geometry=[Point(s.stop_lon, s.stop_lat)
-                      for s in self.stops if s.stop_lon is not None and s.stop_lat is not None],
+            return 0
+        with GeoJSONWriter(filepath) as writer:
+            writer.write_features(
+                (GeoJSONWriter.point(s.stop_lon, s.stop_lat), s.model_dump())
+                for s in self.stops if s.stop_lon is not None and s.stop_lat is not None)
+        return writer.count
+
+    def stops_to_geodataframe(self) -> "gpd.GeoDataFrame":
+        """
+        Convert the stops to a GeoDataFrame, with stop information as columns.
+        """
+        import geopandas as gpd  # imported on first use, see sum_gtfs_geojson.lazy
+        from shapely.geometry import Point
+
+        stops = [s for s in self.stops if s.stop_lon is not None and s.stop_lat is not None]
+        return gpd.GeoDataFrame(
+            [s.model_dump() for s in stops],
+            geometry=[Point(s.stop_lon, s.stop_lat) for s in stops],
             crs="EPSG:4326"
         )
-        if (filepath is not None):
-            gdf.to_file(filepath, driver="GeoJSON")
 
-        return gdf
+    def stops_to_columnar(self) -> ColumnarLayer:
+        """
+        Convert the stops to a compact columnar layer, e.g. to export them in a worker process.
+        """
+        return ColumnarLayer.from_models(
+            "stops", "Point", self.stops,
+            lambda s: [(s.stop_lon, s.stop_lat)] if s.stop_lon is not None and s.stop_lat is not None else None)
 
-    def itineraries_to_geojson(self, filepath: str = None) -> gpd.GeoDataFrame:
+    def itineraries_to_geojson(self, filepath: str) -> int:
         """
         Export each route's itinerary as a GeoJSON LineString, using stop sequences for each trip.
+        Features are streamed to the file, without building a GeoDataFrame.
+
+        Note:
+            Changed in the streaming export: the filepath is required and the number of exported itineraries is
+            returned instead of a GeoDataFrame. Use `itineraries_to_geodataframe` for the GeoDataFrame.
 
         Args:
-            filepath (str): The path to the output GeoJSON file. Optional, if defined it will be saved to this path.
+            filepath (str): The path to the output GeoJSON file.
+        Returns:
+            int: The number of exported itineraries.
         """
-        print("Exporting itineraries to GeoJSON... for itineraries count = ", len(
-            self.itineraries))
         if not self.itineraries:
-            return
-        features = []
+            return 0
+        with GeoJSONWriter(filepath) as writer:
+            writer.write_features(self._itinerary_features())
+        return writer.count
+
+    def itineraries_to_topojson(self, filepath: str, quantization: int = 100_000) -> int:
+        """
+        Export the itineraries as TopoJSON: the stop-to-stop segments shared by several lines are stored once
+        as arcs referenced by index, with quantized, delta-encoded coordinates.
+        The file is read in the map demo with topojson-client, `topojson.feature(data, data.objects.itineraries)`.
+
+        Args:
+            filepath (str): The path to the output TopoJSON file.
+            quantization (int): Number of grid positions per axis for the coordinates. Defaults to 100000.
+        Returns:
+            int: The number of exported itineraries.
+        """
+        layer = self.itineraries_to_columnar()
+        if not len(layer):
+            return 0
+        return write_topojson_layer(layer, filepath, quantization).feature_count
+
+    def itineraries_to_geodataframe(self) -> "gpd.GeoDataFrame":
+        """
+        Convert the itineraries to a GeoDataFrame of LineStrings, with route and trip information as columns.
+        """
+        import geopandas as gpd  # imported on first use, see sum_gtfs_geojson.lazy
+
+        features = [{"type": "Feature", "geometry": geometry, "properties": properties}
+                    for geometry, properties in self._itinerary_features()]
+        return gpd.GeoDataFrame.from_features(features, crs="EPSG:4326")
+
+    def itineraries_to_columnar(self, include_stop_ids: bool = False) -> ColumnarLayer:
+        """
+        Convert the itineraries to a compact columnar layer, e.g. to export them in a worker process.
+
+        Args:
+            include_stop_ids (bool): Add the ordered stop ids of each itinerary as a "stop_ids" column, so it can be reloaded. Defaults to False.
+        """
+        return ColumnarLayer.from_features("itineraries", "LineString", self._itinerary_features(include_stop_ids))
+
+    def save_to_geo_format(self, output_path: str, file_format: GeoFormat = "geoparquet") -> List[str]:
+        """
+        Save the stops and itineraries as spatially sorted GeoParquet or FlatGeobuf files, which can be read by bbox.
+        Args:
+            output_path (str): The folder where the files will be saved.
+            file_format (str): "geoparquet" or "flatgeobuf". Defaults to "geoparquet".
+        Returns:
+            List[str]: The paths of the written files.
+        """
+        from sum_gtfs_geojson.utils import GeoToolkit  # utils depends on models
+        layers = [self.stops_to_columnar(), self.itineraries_to_columnar(include_stop_ids=True)]
+        return write_geo_layers([GeoToolkit.sort_layer(layer) for layer in layers], output_path, file_format)
+
+    def _itinerary_features(self, include_stop_ids: bool = False) -> Iterator[Tuple[dict, dict]]:
+        """
+        Generate the (geometry, properties) of each itinerary with at least two located stops.
+        """
         for itinerary in self.itineraries:
-            coords = [(stop.stop_lon, stop.stop_lat)
-                      for stop in itinerary.stops if stop.stop_lon is not None and stop.stop_lat is not None]
-            if len(coords) < 2:
+            located_stops = [stop for stop in itinerary.stops
+                             if stop.stop_lon is not None and stop.stop_lat is not None]
+            if len(located_stops) < 2:
                 continue
-            feature = {
-                "type": "Feature",
-                "geometry": mapping(LineString(coords)),
-                "properties": {
-                    "route_id": itinerary.route_id,
-                    "direction_id": itinerary.direction_id,
-                    "trip_id": itinerary.trip_id,
-                    "headsign": itinerary.headsign,
-                    "route_short_name": itinerary.route_short_name,
-                    "route_long_name": itinerary.route_long_name,
-                    "route_type": itinerary.route_type,
-                    "color": itinerary.color,
-                    "text_color": itinerary.text_color
-                }
+            properties = {
+                "route_id": itinerary.route_id,
+                "direction_id": itinerary.direction_id,
+                "trip_id": itinerary.trip_id,
+                "headsign": itinerary.headsign,
+                "route_short_name": itinerary.route_short_name,
+                "route_long_name": itinerary.route_long_name,
+                "route_type": itinerary.route_type,
+                "color": itinerary.color,
+                "text_color": itinerary.text_color
             }
-            features.append(feature)
-        feature_collection = {
-            "type": "FeatureCollection",
-            "features": features
-        }
-        if filepath is not None:
-            with open(filepath, 'w') as f:
-                json.dump(feature_collection, f, indent=4)
-        print(f"Exported {len(features)} itineraries to {filepath}")
-
-        return gpd.GeoDataFrame.from_features(features, crs="EPSG:4326")
+            if include_stop_ids:
+                properties["stop_ids"] = [stop.stop_id for stop in located_stops]
+            yield GeoJSONWriter.line_string([(stop.stop_lon, stop.stop_lat) for stop in located_stops]), properties
 
     def build_itineraries(
         self,
@@ -106,47 +372,44 @@ class GTFSNetwork(SumGtfsBaseModel):
         Returns:
             List[Itinerary]: A list of Itinerary objects representing unique route and direction combinations.
         """
-        # Map stop_id to Stop object for quick lookup
-        stop_lookup: Dict[str, Stop] = {stop.stop_id: stop for stop in stops}
+        # The joins run on the integer codes of the identifiers, see IdDictionary
+        ids = self.ids
+        table = (self.stop_time_table if stop_times is self.stop_times
+                 else StopTimeTable.from_stop_times(stop_times, ids))
 
-        # Group stop_times by trip_id
-        trip_stop_times: Dict[str, List[StopTime]] = defaultdict(list)
-        for st in stop_times:
-            trip_stop_times[st.trip_id].append(st)
+        # Map stop code to the index of the Stop object for quick lookup
+        stop_codes = ids.encode_values("stop", (stop.stop_id for stop in stops))
+        located = stop_codes != MISSING_CODE
+        stop_index = np.full(ids.size("stop"), -1, dtype=np.int64)
+        stop_index[stop_codes[located]] = np.flatnonzero(located)
 
-        # Group trips by (route_id, direction_id) and select the first trip as representative
-        trip_by_route_dir: Dict[Tuple[str, int], Trip] = {}
+        # Group trips by (route code, direction_id) and select the first trip as representative
+        trip_by_route_dir: Dict[Tuple[int, int], Trip] = {}
         for trip in trips:
-            key = (trip.route_id, trip.direction_id or 0)
+            key = (ids.encode("route", trip.route_id), trip.direction_id or 0)
             if key not in trip_by_route_dir:
                 trip_by_route_dir[key] = trip
 
-        # Map route_id to Route object for metadata
-        route_lookup: Dict[str, Route] = {
-            route.route_id: route for route in routes}
+        # Map route code to Route object for metadata
+        route_lookup: Dict[int, Route] = {
+            ids.encode("route", route.route_id): route for route in routes}
 
         self.itineraries: List[Itinerary] = []
 
-        for (route_id, direction_id), trip in trip_by_route_dir.items():
-            stop_times_list = sorted(
-                trip_stop_times.get(trip.trip_id, []),
-                key=lambda st: st.stop_sequence
-            )
-
-            # Build the list of Stop instances for the itinerary
-            itinerary_stops: List[Stop] = []
-            for st in stop_times_list:
-                stop = stop_lookup.get(st.stop_id)
-                if stop:
-                    itinerary_stops.append(stop)
+        for (route_code, direction_id), trip in trip_by_route_dir.items():
+            # Stop codes of the trip in stop sequence order, then the Stop instances of the itinerary
+            trip_stop_codes = table.trip_stop_codes(ids.encode("trip", trip.trip_id))
+            trip_stop_indices = stop_index[trip_stop_codes[trip_stop_codes != MISSING_CODE]]
+            itinerary_stops: List[Stop] = [stops[index]
+                                           for index in trip_stop_indices[trip_stop_indices >= 0].tolist()]
 
             if len(itinerary_stops) < 2:
                 continue  # Skip itineraries with insufficient stops
 
-            route = route_lookup.get(route_id)
+            route = route_lookup.get(route_code)
 
             itinerary = Itinerary(
-                route_id=route.route_id if route else route_id,
+                route_id=route.route_id if route else trip.route_id,
                 direction_id=direction_id,
                 trip_id=trip.trip_id,
                 headsign=trip.trip_headsign,
@@ -0,0 +1,123 @@
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+ID_KINDS = ("stop", "trip", "route", "service")
+MISSING_CODE = -1
+
+# Kind of every identifier field of the GTFS models in the IdDictionary
+ID_FIELD_KINDS: Dict[str, str] = {
+    "stop_id": "stop", "parent_station": "stop", "from_stop_id": "stop", "to_stop_id": "stop",
+    "trip_id": "trip", "from_trip_id": "trip", "to_trip_id": "trip",
+    "route_id": "route", "from_route_id": "route", "to_route_id": "route",
+    "service_id": "service",
+    "agency_id": "agency", "zone_id": "zone", "block_id": "block", "shape_id": "shape",
+}
+
+
+class IdDictionary:
+    """
+    Network-wide dictionary of the GTFS identifiers: every identifier string is stored once per kind, and
+    mapped to a compact integer code, in order of first appearance.
+
+    The loaders intern the identifiers of the stops, routes, trips, stop times and transfers, so the models
+    share the dictionary strings instead of holding one copy per row, e.g. per stop time. The joins
+    (itineraries, transfers) run on the integer codes, see StopTimeTable, and the strings are only read back
+    to build the exported features. The dictionary only grows, so the code of an identifier never changes.
+
+    Usage:
+        ids = IdDictionary()
+        code = ids.encode("stop", "ch:1:sloid:92773:0:43716")
+        ids.decode("stop", code)  # "ch:1:sloid:92773:0:43716"
+
+    Attributes:
+        kinds (List[str]): The kinds of identifiers of the dictionary, see ID_KINDS.
+    """
+
+    def __init__(self):
+        self._codes: Dict[str, Dict[str, int]] = {kind: {} for kind in ID_KINDS}
+        self._values: Dict[str, List[str]] = {kind: [] for kind in ID_KINDS}
+
+    def __len__(self) -> int:
+        return sum(len(values) for values in self._values.values())
+
+    def __repr__(self) -> str:
+        return f"IdDictionary({self.summary()})"
+
+    @property
+    def kinds(self) -> List[str]:
+        return list(self._values)
+
+    def size(self, kind: str) -> int:
+        """
+        Number of identifiers of a kind, the codes are below it.
+        """
+        return len(self._values.get(kind, ()))
+
+    def summary(self) -> Dict[str, int]:
+        return {kind: len(values) for kind, values in self._values.items()}
+
+    def encode(self, kind: str, value) -> int:
+        """
+        Code of an identifier, added to the dictionary when missing.
+
+        Args:
+            kind: Kind of identifier, e.g. "stop". Other kinds than ID_KINDS, e.g. "shape", are created on first use.
+            value: The identifier, converted to a string.
+
+        Returns:
+            int: The code, MISSING_CODE for None or an empty identifier.
+        """
+        if value is None or value == "":
+            return MISSING_CODE
+        codes = self._codes.get(kind)
+        if codes is None:
+            codes = self._codes[kind] = {}
+            self._values[kind] = []
+        value = value if type(value) is str else str(value)
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            self._values[kind].append(value)
+        return code
+
+    def encode_values(self, kind: str, values: Iterable) -> np.ndarray:
+        """
+        Codes of many identifiers, see encode.
+
+        Returns:
+            np.ndarray: int32 codes, MISSING_CODE for the missing identifiers.
+        """
+        values = values if isinstance(values, list) else list(values)
+        codes = self._codes.get(kind, {})
+        encoded = [codes.get(value) for value in values]  # one hash lookup per known identifier
+        return np.array([self.encode(kind, value) if code is None else code for code, value in zip(encoded, values)]
+                        if None in encoded else encoded, dtype=np.int32)
+
+    def code(self, kind: str, value) -> int:
+        """
+        Code of an identifier without adding it, MISSING_CODE when it is not in the dictionary.
+        """
+        if value is None:
+            return MISSING_CODE
+        return self._codes.get(kind, {}).get(value if type(value) is str else str(value), MISSING_CODE)
+
+    def decode(self, kind: str, code: int) -> Optional[str]:
+        """
+        Identifier of a code, None for MISSING_CODE.
+        """
+        return self._values[kind][code] if code != MISSING_CODE else None
+
+    def decode_values(self, kind: str, codes: Iterable[int]) -> List[Optional[str]]:
+        """
+        Identifiers of many codes, None for MISSING_CODE.
+        """
+        values = self._values[kind]
+        return [values[code] if code != MISSING_CODE else None for code in np.asarray(codes).tolist()]
+
+    def intern(self, kind: str, value) -> Optional[str]:
+        """
+        The dictionary string of an identifier, added when missing, so equal identifiers share one string.
+        None and empty identifiers are returned as is.
+        """
+        code = self.encode(kind, value)
+        return self._values[kind][code] if code != MISSING_CODE else value
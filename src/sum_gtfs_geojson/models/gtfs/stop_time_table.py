@@ -0,0 +1,226 @@
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Sequence, Union
+import numpy as np
+from .id_dictionary import IdDictionary, MISSING_CODE
+from .stop_time import StopTime
+from ..lazy_model_list import LazyModelList
+
+STOP_TIME_TEXT_COLUMNS = ("arrival_time", "departure_time", "stop_headsign")
+STOP_TIME_INT_COLUMNS = ("pickup_type", "drop_off_type", "timepoint")
+STOP_TIME_FLOAT_COLUMNS = ("shape_dist_traveled",)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def _text_column(values: Iterable[Optional[str]]) -> "pd.Categorical":
+    """
+    Dictionary-encoded text column, every distinct value stored once, None for the missing values.
+    """
+    import pandas as pd  # imported on first use, see sum_gtfs_geojson.lazy
+
+    return pd.Categorical(values if isinstance(values, list) else list(values))
+
+
+def _number_column(values: Iterable[Optional[float]]) -> np.ndarray:
+    """
+    float64 column, NaN for the missing values.
+    """
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+class StopTimeTable:
+    """
+    Columnar stop times, sorted by trip and stop sequence: the trip and stop identifiers are int32 codes of the
+    IdDictionary of the network, the times and headsigns are dictionary-encoded, and the optional numbers are
+    float64 arrays with NaN for the missing values.
+
+    The stops of a trip are a contiguous slice of the table, found with a binary search on the sorted trip
+    codes, so building the itineraries neither hashes nor compares identifier strings. The StopTime objects are
+    only built on access, see as_stop_times, and the identifiers decoded then.
+
+    Usage:
+        table = StopTimeTable.from_stop_times(network.stop_times, network.ids)
+        stop_codes = table.trip_stop_codes(network.ids.code("trip", trip_id))
+        first = table.as_stop_times()[0]
+
+    Attributes:
+        ids (IdDictionary): Dictionary of the trip and stop codes.
+        trip_codes (np.ndarray): Trip code of every stop time, sorted.
+        stop_codes (np.ndarray): Stop code of every stop time.
+        stop_sequences (np.ndarray): Stop sequence of every stop time, sorted within every trip.
+        columns (Dict[str, Union[pd.Categorical, np.ndarray]]): The other StopTime fields, see
+            STOP_TIME_TEXT_COLUMNS, STOP_TIME_INT_COLUMNS and STOP_TIME_FLOAT_COLUMNS.
+    """
+
+    def __init__(self, ids: IdDictionary, trip_codes: np.ndarray, stop_codes: np.ndarray, stop_sequences: np.ndarray,
+                 columns: Optional[Dict[str, Union["pd.Categorical", np.ndarray]]] = None, is_sorted: bool = False):
+        trip_codes = np.asarray(trip_codes, dtype=np.int32)
+        stop_codes = np.asarray(stop_codes, dtype=np.int32)
+        stop_sequences = np.asarray(stop_sequences, dtype=np.int64)
+        columns = dict(columns or {})
+        for name in STOP_TIME_TEXT_COLUMNS:
+            columns.setdefault(name, _text_column([None] * len(trip_codes)))
+        for name in STOP_TIME_INT_COLUMNS + STOP_TIME_FLOAT_COLUMNS:
+            columns.setdefault(name, np.full(len(trip_codes), np.nan))
+        if not is_sorted:
+            order = np.lexsort((stop_sequences, trip_codes))
+            trip_codes, stop_codes, stop_sequences = trip_codes[order], stop_codes[order], stop_sequences[order]
+            columns = {name: values[order] for name, values in columns.items()}
+        self.ids = ids
+        self.trip_codes = trip_codes
+        self.stop_codes = stop_codes
+        self.stop_sequences = stop_sequences
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.trip_codes)
+
+    @classmethod
+    def from_columns(cls, ids: IdDictionary, trip_ids: Sequence[str], stop_ids: Sequence[str],
+                     stop_sequences: Sequence[int], **columns: Sequence) -> "StopTimeTable":
+        """
+        Encode parsed stop time columns, their trip and stop identifiers are added to the dictionary when missing.
+
+        Args:
+            ids: Dictionary of the trip and stop codes.
+            trip_ids: Trip identifier of every stop time.
+            stop_ids: Stop identifier of every stop time.
+            stop_sequences: Stop sequence of every stop time.
+            **columns: The other StopTime fields, None for the missing values. Missing columns are left empty.
+
+        Returns:
+            StopTimeTable: The table, sorted by trip and stop sequence.
+        """
+        encoded = {name: _text_column(values) if name in STOP_TIME_TEXT_COLUMNS else _number_column(values)
+                   for name, values in columns.items()}
+        return cls(ids, ids.encode_values("trip", trip_ids), ids.encode_values("stop", stop_ids),
+                   np.fromiter(stop_sequences, dtype=np.int64, count=len(stop_sequences)), encoded)
+
+    @classmethod
+    def from_stop_times(cls, stop_times: List[StopTime], ids: IdDictionary) -> "StopTimeTable":
+        """
+        Encode StopTime objects, their trip and stop identifiers are added to the dictionary when missing.
+        The table of a StopTimeSequence not materialized is recoded instead, without building the objects.
+        """
+        if isinstance(stop_times, StopTimeSequence) and not stop_times.is_materialized:
+            return stop_times.table.recode(ids)
+        stop_times = stop_times if isinstance(stop_times, list) else list(stop_times)
+        return cls.from_columns(
+            ids, [st.trip_id for st in stop_times], [st.stop_id for st in stop_times],
+            [st.stop_sequence for st in stop_times],
+            **{name: [getattr(st, name) for st in stop_times]
+               for name in STOP_TIME_TEXT_COLUMNS + STOP_TIME_INT_COLUMNS + STOP_TIME_FLOAT_COLUMNS})
+
+    @classmethod
+    def concat(cls, tables: Sequence["StopTimeTable"]) -> "StopTimeTable":
+        """
+        Table with the stop times of several tables encoded with the same dictionary, see recode.
+        """
+        from pandas.api.types import union_categoricals  # imported on first use, see sum_gtfs_geojson.lazy
+
+        if len({id(table.ids) for table in tables}) > 1:
+            raise ValueError("The concatenated stop time tables must share their IdDictionary, see recode")
+        columns = {name: (union_categoricals([table.columns[name] for table in tables])
+                          if name in STOP_TIME_TEXT_COLUMNS
+                          else np.concatenate([table.columns[name] for table in tables]))
+                   for name in tables[0].columns}
+        return cls(tables[0].ids, np.concatenate([table.trip_codes for table in tables]),
+                   np.concatenate([table.stop_codes for table in tables]),
+                   np.concatenate([table.stop_sequences for table in tables]), columns)
+
+    def take(self, indices: Union[np.ndarray, slice]) -> "StopTimeTable":
+        """
+        Table with the stop times at the given indexes or slice. Sorted indexes keep the trip order.
+        """
+        return StopTimeTable(self.ids, self.trip_codes[indices], self.stop_codes[indices],
+                             self.stop_sequences[indices],
+                             {name: values[indices] for name, values in self.columns.items()}, is_sorted=True)
+
+    def recode(self, ids: IdDictionary, trip_id: Optional[Callable[[str], str]] = None,
+               stop_id: Optional[Callable[[str], str]] = None) -> "StopTimeTable":
+        """
+        Table encoded with another dictionary, e.g. with namespaced or merged identifiers. The identifiers are
+        renamed once per distinct value, and the other columns are shared with this table.
+
+        Args:
+            ids: The dictionary of the new codes, the renamed identifiers are added to it when missing.
+            trip_id: Optional renaming of the trip identifiers, e.g. to prefix them with a namespace.
+            stop_id: Optional renaming of the stop identifiers, e.g. to the kept stop of a merged stop.
+
+        Returns:
+            StopTimeTable: The recoded table, this table when neither the dictionary nor the identifiers change.
+        """
+        if ids is self.ids and trip_id is None and stop_id is None:
+            return self
+
+        def codes(kind: str, values: np.ndarray, rename: Optional[Callable[[str], str]]) -> np.ndarray:
+            identifiers = self.ids.decode_values(kind, range(self.ids.size(kind)))
+            mapping = np.append(ids.encode_values(kind, identifiers if rename is None
+                                                  else [rename(value) for value in identifiers]), MISSING_CODE)
+            return mapping[values]  # MISSING_CODE, i.e. -1, maps to the appended MISSING_CODE
+
+        return StopTimeTable(ids, codes("trip", self.trip_codes, trip_id), codes("stop", self.stop_codes, stop_id),
+                             self.stop_sequences, self.columns)
+
+    def trip_stop_codes(self, trip_code: int) -> np.ndarray:
+        """
+        Stop codes of a trip, in stop sequence order, empty for an unknown trip or MISSING_CODE.
+        """
+        if trip_code == MISSING_CODE:
+            return self.stop_codes[:0]
+        start, end = np.searchsorted(self.trip_codes, [trip_code, trip_code + 1])
+        return self.stop_codes[start:end]
+
+    def to_stop_times(self) -> List[StopTime]:
+        """
+        Convert back to StopTime objects, in trip and stop sequence order. The values are already validated,
+        so the models are built without running the validators.
+        """
+        values = {"trip_id": self.ids.decode_values("trip", self.trip_codes),
+                  "stop_id": self.ids.decode_values("stop", self.stop_codes),
+                  "stop_sequence": self.stop_sequences.tolist()}
+        for name in STOP_TIME_TEXT_COLUMNS:
+            column = self.columns[name]
+            decoded = column.categories.tolist() + [None]  # code -1, the missing values, reads the last item
+            values[name] = [decoded[code] for code in column.codes.tolist()]
+        for name in STOP_TIME_INT_COLUMNS + STOP_TIME_FLOAT_COLUMNS:
+            convert = int if name in STOP_TIME_INT_COLUMNS else float
+            values[name] = [None if value != value else convert(value) for value in self.columns[name].tolist()]
+        for name in ("arrival_time", "departure_time"):
+            values[name] = ["" if value is None else value for value in values[name]]
+        names = list(values)
+        return [StopTime.model_construct(**dict(zip(names, row))) for row in zip(*values.values())]
+
+    def as_stop_times(self) -> "StopTimeSequence":
+        """
+        The stop times as a list of StopTime objects built on first use, see StopTimeSequence.
+        """
+        return StopTimeSequence(self)
+
+
+class StopTimeSequence(LazyModelList):
+    """
+    List of the StopTime objects of a StopTimeTable, built on first use instead of being held in memory.
+    The loaders set it as GTFSNetwork.stop_times: `len` builds no model, and the itineraries and exports
+    read the codes of the table directly. The first indexing, iteration or write builds every StopTime
+    once and keeps them, it then behaves as a list: the edits of the stop times, `append` and item
+    assignment are kept, and GTFSNetwork.stop_time_table is rebuilt from them, see LazyModelList.
+
+    Usage:
+        stop_times = table.as_stop_times()
+        stop_times[0].stop_headsign = "Gare"  # kept, table no longer describes the stop times
+        stop_times.append(stop_time)
+
+    Attributes:
+        table (StopTimeTable): The columns of the stop times, as loaded.
+    """
+
+    def __init__(self, table: StopTimeTable):
+        super().__init__()
+        self.table = table
+
+    def _build_range(self, start: int, stop: int) -> List[StopTime]:
+        return self.table.take(slice(start, stop)).to_stop_times()
+
+    def _column_length(self) -> int:
+        return len(self.table)
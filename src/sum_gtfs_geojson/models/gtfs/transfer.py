@@ -0,0 +1,27 @@
+from pydantic import Field
+from typing import Optional
+from .. import SumGtfsBaseModel
+
+
+class Transfer(SumGtfsBaseModel):
+    """
+    Describes a connection between two stops, routes or trips, from the optional GTFS transfers.txt file.
+
+    Attributes:
+        from_stop_id: Identifier of the stop where the connection begins.
+        to_stop_id: Identifier of the stop where the connection ends.
+        transfer_type: Type of connection (0=recommended, 1=timed, 2=minimum time, 3=not possible, etc.).
+        min_transfer_time: Minimum time in seconds to make the connection, for transfer_type 2.
+        from_route_id: Identifier of the route where the connection begins.
+        to_route_id: Identifier of the route where the connection ends.
+        from_trip_id: Identifier of the trip where the connection begins.
+        to_trip_id: Identifier of the trip where the connection ends.
+    """
+    from_stop_id: Optional[str] = Field(default=None)
+    to_stop_id: Optional[str] = Field(default=None)
+    transfer_type: int = Field(default=0)
+    min_transfer_time: Optional[int] = Field(default=None)
+    from_route_id: Optional[str] = Field(default=None)
+    to_route_id: Optional[str] = Field(default=None)
+    from_trip_id: Optional[str] = Field(default=None)
+    to_trip_id: Optional[str] = Field(default=None)
@@ -0,0 +1,90 @@
+from collections.abc import MutableSequence
+from typing import Iterator, List, Optional
+
+MODEL_BATCH_SIZE = 4096  # models built at once when iterating over a LazyModelList that is not materialized
+
+
+class LazyModelList(MutableSequence):
+    """
+    List of models held as columns until their first use, e.g. the stop times of a loaded network.
+
+    `len` builds no model, and the columnar consumers (itineraries, exports, stores) read the columns directly.
+    The first access to the items (indexing, iteration or any write) builds every model once and
+    keeps them: from then on it behaves as a list of these models, so the edits of the items, `append` and item
+    assignment are kept, and the columnar consumers rebuild their columns from the items.
+
+    Subclasses build the models from their columns, see _build_range and _column_length.
+    """
+
+    def __init__(self):
+        self._items: Optional[list] = None
+
+    def _build_range(self, start: int, stop: int) -> list:
+        raise NotImplementedError
+
+    def _column_length(self) -> int:
+        raise NotImplementedError
+
+    @property
+    def is_materialized(self) -> bool:
+        """
+        True once the models are built and kept, the columns then no longer describe the items.
+        """
+        return self._items is not None
+
+    @property
+    def items(self) -> list:
+        """
+        The models, built and kept on first use.
+        """
+        if self._items is None:
+            self._items = self._build_range(0, self._column_length())
+        return self._items
+
+    def iter_models(self) -> Iterator:
+        """
+        Iterate over the models without keeping them, for the readers: the kept models once materialized,
+        otherwise models built by batches of MODEL_BATCH_SIZE.
+        """
+        if self._items is not None:
+            yield from self._items
+            return
+        for start in range(0, self._column_length(), MODEL_BATCH_SIZE):
+            yield from self._build_range(start, min(start + MODEL_BATCH_SIZE, self._column_length()))
+
+    def copy(self) -> List:
+        """
+        List of the models, see iter_models.
+        """
+        return list(self.iter_models())
+
+    def __len__(self) -> int:
+        return len(self._items) if self._items is not None else self._column_length()
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __setitem__(self, index, value):
+        self.items[index] = value
+
+    def __delitem__(self, index):
+        del self.items[index]
+
+    def insert(self, index: int, value):
+        self.items.insert(index, value)
+
+    def __iter__(self) -> Iterator:
+        return iter(self.items)
+
+    def __repr__(self) -> str:
+        state = "materialized" if self.is_materialized else "columnar"
+        return f"{type(self).__name__}({len(self)} items, {state})"
+
+    def __eq__(self, other) -> bool:
+        if other is self:
+            return True
+        if not isinstance(other, (LazyModelList, list)) or len(other) != len(self):
+            return False
+        return self.copy() == (other.copy() if isinstance(other, LazyModelList) else other)
+
+    __hash__ = None
@@ -1,7 +1,16 @@
 from .bike_trip import BikeTrip
+from .bike_trip_store import BikeTripStore, BikeTripSequence, parse_utc_timestamps, WEEKDAYS
 from .ridership import Ridership
+from .ridership_cube import RidershipCube, RIDERSHIP_DIMENSIONS, RIDERSHIP_MEASURES
 
 __all__ = [
     "BikeTrip",
+    "BikeTripStore",
+    "BikeTripSequence",
+    "parse_utc_timestamps",
+    "WEEKDAYS",
     "Ridership",
+    "RidershipCube",
+    "RIDERSHIP_DIMENSIONS",
+    "RIDERSHIP_MEASURES",
 ]
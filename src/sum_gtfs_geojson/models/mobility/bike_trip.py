@@ -37,12 +37,16 @@ class BikeTrip(SumGtfsBaseModel):
 
     @field_validator("trip_started_at_utc", mode="before")
     def parse_trip_start(cls, value):
+        if isinstance(value, datetime):
+            return value
         if isinstance(value, str) and value.endswith(" UTC"):
             value = value.replace(" UTC", "")
         return datetime.fromisoformat(value)
 
     @field_validator("trip_ended_at_utc", mode="before")
     def parse_trip_end(cls, value):
+        if isinstance(value, datetime):
+            return value
         if isinstance(value, str) and value.endswith(" UTC"):
             value = value.replace(" UTC", "")
         return datetime.fromisoformat(value)
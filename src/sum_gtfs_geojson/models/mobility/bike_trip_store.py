@@ -0,0 +1,279 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from .bike_trip import BikeTrip
+from ..lazy_model_list import LazyModelList
+
+TimeBound = Union[str, np.datetime64, pd.Timestamp, None]
+
+BIKE_TRIP_TEXT_COLUMNS = ("trip_id", "rental_id", "vehicle_type")
+BIKE_TRIP_FLOAT_COLUMNS = ("latitude_start", "longitude_start", "latitude_end", "longitude_end", "distance_in_km")
+BIKE_TRIP_TIME_COLUMNS = ("trip_started_at_utc", "trip_ended_at_utc")
+WEEKDAYS = (0, 1, 2, 3, 4)  # Monday to Friday, Monday being 0 as in datetime.weekday()
+DEFAULT_DURATION_BINS = np.array([0, 5, 10, 15, 20, 30, 45, 60, 90, 120, np.inf])  # minutes
+DEFAULT_SPEED_BINS = np.array([0, 5, 10, 15, 20, 25, 30, np.inf])  # km/h
+
+
+def parse_utc_timestamps(values: Sequence) -> np.ndarray:
+    """
+    Parse a column of ISO timestamps, optionally suffixed with " UTC" as in the Geneva trips file,
+    in a single vectorized call. Timestamps with an offset are converted to UTC.
+
+    Args:
+        values: The timestamps, as strings or datetimes.
+
+    Returns:
+        np.ndarray: Naive UTC datetime64[ns] array, NaT for missing or invalid values.
+    """
+    series = pd.Series(values)
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        series = series.astype("string").str.removesuffix(" UTC")
+    parsed = pd.to_datetime(series, format="ISO8601", errors="coerce", utc=True)
+    return parsed.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+
+
+class BikeTripStore:
+    """
+    Columnar, time-indexed bike trips: one numpy array per BikeTrip field, with the trips sorted by start time.
+
+    Window queries are binary searches on the sorted start times (`np.searchsorted`) and return a store
+    sharing the arrays of this one (views), and time of day, weekday and histogram queries are vectorized,
+    instead of scanning a list of BikeTrip objects in Python.
+
+    Usage:
+        store = BikeTripStore.from_csv("shared_bikes_trips.csv")
+        morning_peak = store.window("2024-05-01", "2024-06-01").between_hours(7, 9, weekdays=WEEKDAYS)
+        print(morning_peak.hourly_histogram(), morning_peak.speed_distribution())
+
+    Attributes:
+        columns (Dict[str, np.ndarray]): One array per BikeTrip field, datetime64[ns] for the timestamps,
+            float64 for the positions and distance, str for the identifiers.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], is_sorted: bool = False):
+        if not is_sorted:
+            order = np.argsort(columns["trip_started_at_utc"], kind="stable")
+            columns = {name: values[order] for name, values in columns.items()}
+        self.columns = columns
+
+    @classmethod
+    def from_dataframe(cls, data: pd.DataFrame) -> "BikeTripStore":
+        """
+        Build the store from a DataFrame with the BikeTrip columns, e.g. read from the trips CSV file.
+        Trips without both positions, both timestamps and a distance are dropped, as they would fail the
+        BikeTrip validation.
+        """
+        columns = {name: parse_utc_timestamps(data[name]) for name in BIKE_TRIP_TIME_COLUMNS}
+        for name in BIKE_TRIP_FLOAT_COLUMNS:
+            columns[name] = pd.to_numeric(data[name], errors="coerce").to_numpy(dtype=np.float64)
+        for name in BIKE_TRIP_TEXT_COLUMNS:
+            columns[name] = data[name].astype("string").fillna("").to_numpy(dtype=str)
+        valid = np.ones(len(data), dtype=bool)
+        for name in BIKE_TRIP_TIME_COLUMNS:
+            valid &= ~np.isnat(columns[name])
+        for name in BIKE_TRIP_FLOAT_COLUMNS:
+            valid &= ~np.isnan(columns[name])
+        return cls({name: values[valid] for name, values in columns.items()})
+
+    @classmethod
+    def from_csv(cls, filepath: str) -> "BikeTripStore":
+        """
+        Read a trips CSV file with the BikeTrip columns, the identifiers being kept as text.
+        """
+        return cls.from_dataframe(pd.read_csv(filepath, dtype={name: str for name in BIKE_TRIP_TEXT_COLUMNS}))
+
+    @classmethod
+    def from_bike_trips(cls, bike_trips: List[BikeTrip]) -> "BikeTripStore":
+        """
+        Build the store from BikeTrip objects.
+        """
+        columns = {name: parse_utc_timestamps([getattr(t, name) for t in bike_trips])
+                   for name in BIKE_TRIP_TIME_COLUMNS}
+        for name in BIKE_TRIP_FLOAT_COLUMNS:
+            columns[name] = np.fromiter((getattr(t, name) for t in bike_trips), dtype=np.float64, count=len(bike_trips))
+        for name in BIKE_TRIP_TEXT_COLUMNS:
+            columns[name] = np.array([getattr(t, name) for t in bike_trips], dtype=str)
+        return cls(columns)
+
+    def as_bike_trips(self) -> "BikeTripSequence":
+        """
+        List of BikeTrip objects built from the store on first use, see BikeTripSequence.
+        """
+        return BikeTripSequence(self)
+
+    def to_bike_trips(self) -> List[BikeTrip]:
+        """
+        Convert back to BikeTrip objects, in start time order. The values are already validated, so the
+        models are built without running the validators.
+        """
+        values = {name: self.columns[name].astype("datetime64[us]").tolist() for name in BIKE_TRIP_TIME_COLUMNS}
+        values.update({name: self.columns[name].tolist()
+                       for name in BIKE_TRIP_FLOAT_COLUMNS + BIKE_TRIP_TEXT_COLUMNS})
+        names = list(values)
+        return [BikeTrip.model_construct(**dict(zip(names, row))) for row in zip(*values.values())]
+
+    def __len__(self) -> int:
+        return len(self.started_at)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @property
+    def started_at(self) -> np.ndarray:
+        return self.columns["trip_started_at_utc"]
+
+    @property
+    def ended_at(self) -> np.ndarray:
+        return self.columns["trip_ended_at_utc"]
+
+    def take(self, indices: Union[np.ndarray, slice]) -> "BikeTripStore":
+        """
+        Store with the trips at the given indexes or slice. Sorted indexes keep the start time order.
+        """
+        return BikeTripStore({name: values[indices] for name, values in self.columns.items()}, is_sorted=True)
+
+    def window_slice(self, start: TimeBound = None, end: TimeBound = None) -> slice:
+        """
+        Positions of the trips started in [start, end), found by binary search. An open bound is unbounded.
+        """
+        low = 0 if start is None else int(np.searchsorted(self.started_at, np.datetime64(start, "ns"), side="left"))
+        high = len(self) if end is None else int(np.searchsorted(self.started_at, np.datetime64(end, "ns"), side="left"))
+        return slice(low, max(low, high))
+
+    def window(self, start: TimeBound = None, end: TimeBound = None) -> "BikeTripStore":
+        """
+        Trips started in [start, end), as a store of array views, see window_slice.
+        """
+        return self.take(self.window_slice(start, end))
+
+    def hours(self) -> np.ndarray:
+        """
+        Fractional hour of the day of each trip start, from 0 to 24.
+        """
+        return (self.started_at - self.started_at.astype("datetime64[D]")) / np.timedelta64(1, "h")
+
+    def weekdays(self) -> np.ndarray:
+        """
+        Weekday of each trip start, Monday being 0 and Sunday 6.
+        """
+        return (self.started_at.astype("datetime64[D]").astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+
+    def between_hours(self, start_hour: float, end_hour: float,
+                      weekdays: Optional[Iterable[int]] = None) -> "BikeTripStore":
+        """
+        Trips started in the [start_hour, end_hour) time of day window, e.g. (7, 9) for the morning peak.
+        The window may wrap around midnight, e.g. (22, 2).
+
+        Args:
+            start_hour: Start of the window, fractional hours allowed.
+            end_hour: End of the window, excluded.
+            weekdays: Optional weekdays to keep, Monday being 0, e.g. WEEKDAYS for Monday to Friday.
+
+        Returns:
+            BikeTripStore: The matching trips, in start time order.
+        """
+        hours = self.hours()
+        if start_hour <= end_hour:
+            mask = (hours >= start_hour) & (hours < end_hour)
+        else:
+            mask = (hours >= start_hour) | (hours < end_hour)
+        if weekdays is not None:
+            mask &= np.isin(self.weekdays(), list(weekdays))
+        return self.take(np.flatnonzero(mask))
+
+    def hourly_histogram(self) -> np.ndarray:
+        """
+        Number of trips started in each hour of the day, an array of 24 counts.
+        """
+        return np.bincount(self.hours().astype(np.int64), minlength=24)[:24]
+
+    def weekday_histogram(self) -> np.ndarray:
+        """
+        Number of trips started on each weekday, an array of 7 counts from Monday to Sunday.
+        """
+        return np.bincount(self.weekdays(), minlength=7)
+
+    def daily_counts(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Number of trips started on each day with trips.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The days (datetime64[D]) and their trip counts.
+        """
+        return np.unique(self.started_at.astype("datetime64[D]"), return_counts=True)
+
+    def durations_minutes(self) -> np.ndarray:
+        """
+        Duration of each trip, in minutes.
+        """
+        return (self.ended_at - self.started_at) / np.timedelta64(1, "m")
+
+    def speeds_kmh(self) -> np.ndarray:
+        """
+        Mean speed of each trip in km/h, NaN for trips without a positive duration.
+        """
+        hours = self.durations_minutes() / 60
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(hours > 0, self.columns["distance_in_km"] / hours, np.nan)
+
+    def duration_distribution(self, bins: Sequence[float] = DEFAULT_DURATION_BINS) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Histogram of the trip durations.
+
+        Args:
+            bins: Bin edges in minutes. Defaults to 0, 5, 10, 15, 20, 30, 45, 60, 90, 120 and more.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The counts and the bin edges, as np.histogram.
+        """
+        return np.histogram(self.durations_minutes(), bins=bins)
+
+    def speed_distribution(self, bins: Sequence[float] = DEFAULT_SPEED_BINS) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Histogram of the trip mean speeds, trips without a positive duration being ignored.
+
+        Args:
+            bins: Bin edges in km/h. Defaults to 0, 5, 10, 15, 20, 25, 30 and more.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The counts and the bin edges, as np.histogram.
+        """
+        speeds = self.speeds_kmh()
+        return np.histogram(speeds[~np.isnan(speeds)], bins=bins)
+
+    def to_od_matrix(self, resolution: int = 8, time_of_day: Optional[Tuple[float, float]] = None):
+        """
+        Origin-destination matrix of the trips between H3 cells, see ODMatrix.from_arrays.
+        """
+        from sum_gtfs_geojson.utils import ODMatrix  # utils depends on models
+        return ODMatrix.from_arrays(self.columns["latitude_start"], self.columns["longitude_start"],
+                                    self.columns["latitude_end"], self.columns["longitude_end"],
+                                    resolution, self.started_at, time_of_day)
+
+
+class BikeTripSequence(LazyModelList):
+    """
+    List of the BikeTrip objects of a BikeTripStore, built on first use instead of being held in memory.
+    The loaders set it as UrbanMobilitySystem.bike_trips: `len` builds no model, and the exports read the
+    columns of the store directly. The first indexing, iteration or write builds every BikeTrip once and
+    keeps them, it then behaves as a list: the edits of the trips, `append` and item assignment are kept,
+    and UrbanMobilitySystem.bike_trip_store is rebuilt from them, see LazyModelList.
+
+    Usage:
+        trips = store.as_bike_trips()
+        trips[0].vehicle_type = "e-bike"  # kept, store no longer describes the trips
+        trips.append(trip)
+
+    Attributes:
+        store (BikeTripStore): The columns of the trips, as loaded.
+    """
+
+    def __init__(self, store: BikeTripStore):
+        super().__init__()
+        self.store = store
+
+    def _build_range(self, start: int, stop: int) -> List[BikeTrip]:
+        return self.store.take(slice(start, stop)).to_bike_trips()
+
+    def _column_length(self) -> int:
+        return len(self.store)
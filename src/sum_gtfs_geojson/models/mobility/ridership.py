@@ -1,4 +1,5 @@
 from pydantic import Field
+from typing import Optional
 from .. import SumGtfsBaseModel
 
 
@@ -29,6 +30,7 @@ class Ridership(SumGtfsBaseModel):
         stop_lon (float): Longitude coordinate of the stop.
         is_final (bool): Flag indicating whether the data is final and validated.
         is_filtered (bool): Flag indicating whether this record was excluded from primary analysis (e.g., due to quality filters).
+        stop_id (Optional[str]): GTFS stop matched to the stop code, set by UrbanMobilitySystem.match_ridership_stops.
     """
 
     date: str
@@ -48,3 +50,4 @@ class Ridership(SumGtfsBaseModel):
     stop_lon: float
     is_final: bool
     is_filtered: bool
+    stop_id: Optional[str] = Field(default=None, description="Matched GTFS stop id.")
@@ -0,0 +1,251 @@
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from sum_gtfs_geojson.exporter import atomic_write
+from .ridership import Ridership
+
+RIDERSHIP_DIMENSIONS = ("stop_code", "line", "timeslot", "day_index", "week_index", "month_year")
+RIDERSHIP_MEASURES = ("boardings", "alightings")
+MAX_DENSE_CELLS = 50_000_000
+
+Selection = Union[object, Iterable[object]]
+
+
+def _group_codes(codes: np.ndarray, shape: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Group the rows of a (n, d) code matrix.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The distinct code rows, sorted, and the group of every input row.
+    """
+    if not codes.shape[1]:
+        return np.zeros((min(len(codes), 1), 0), dtype=np.int32), np.zeros(len(codes), dtype=np.int64)
+    if np.prod(shape, dtype=np.float64) < 2 ** 62:
+        keys = np.ravel_multi_index(tuple(codes.T), tuple(shape))
+        groups, inverse = np.unique(keys, return_inverse=True)
+        return np.column_stack(np.unravel_index(groups, tuple(shape))).astype(np.int32), inverse
+    groups, inverse = np.unique(codes, axis=0, return_inverse=True)
+    return groups.astype(np.int32), inverse.reshape(-1)
+
+
+class RidershipCube:
+    """
+    Ridership as a sparse data cube: every dimension (stop, line, timeslot, day, week, month) is
+    dictionary-encoded, and the boardings and alightings are summed per distinct combination of codes.
+
+    Slices are boolean masks over the code arrays, and roll-ups and top-k are bincounts over the codes,
+    so dashboard queries run on numpy arrays instead of looping over Ridership objects.
+
+    Usage:
+        cube = RidershipCube.from_ridership(ums.ridership)
+        weekdays = cube.slice(day_index=[1, 2, 3, 4, 5])
+        per_stop_timeslot = weekdays.rollup("stop_code", "timeslot").to_dense("boardings")
+        busiest_stops = weekdays.top_k("stop_code", 10)
+
+    Attributes:
+        dimensions (Tuple[str, ...]): Names of the dimensions.
+        dictionaries (Dict[str, np.ndarray]): Sorted distinct values of every dimension, a code being an
+            index in this array.
+        codes (np.ndarray): (cells, dimensions) int32 matrix with the codes of every cell, distinct rows.
+        measures (Dict[str, np.ndarray]): int64 sum of every measure per cell.
+    """
+
+    def __init__(self, dimensions: Sequence[str], dictionaries: Dict[str, np.ndarray], codes: np.ndarray,
+                 measures: Dict[str, np.ndarray]):
+        self.dimensions = tuple(dimensions)
+        self.dictionaries = dictionaries
+        self.codes = codes
+        self.measures = measures
+
+    @classmethod
+    def from_dataframe(cls, data: pd.DataFrame, dimensions: Sequence[str] = RIDERSHIP_DIMENSIONS,
+                       measures: Sequence[str] = RIDERSHIP_MEASURES) -> "RidershipCube":
+        """
+        Build the cube from a DataFrame with the Ridership columns, e.g. read from the ridership file.
+        Records with the same dimension values are summed.
+
+        Args:
+            data: The ridership records.
+            dimensions: Columns encoded as dimensions. Defaults to stop_code, line, timeslot, day_index,
+                week_index and month_year.
+            measures: Columns summed as measures. Defaults to boardings and alightings.
+
+        Returns:
+            RidershipCube: The cube.
+        """
+        dictionaries = {}
+        codes = np.empty((len(data), len(dimensions)), dtype=np.int32)
+        for axis, name in enumerate(dimensions):
+            codes[:, axis], uniques = pd.factorize(data[name], sort=True)
+            uniques = np.asarray(uniques)
+            dictionaries[name] = uniques.astype(str) if uniques.dtype == object else uniques
+        if (codes < 0).any():
+            raise ValueError("Ridership dimensions must not have missing values")
+        values = {name: pd.to_numeric(data[name], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+                  for name in measures}
+        return cls._aggregate(dimensions, dictionaries, codes, values)
+
+    @classmethod
+    def from_ridership(cls, ridership: List[Ridership], dimensions: Sequence[str] = RIDERSHIP_DIMENSIONS,
+                       measures: Sequence[str] = RIDERSHIP_MEASURES) -> "RidershipCube":
+        """
+        Build the cube from Ridership objects, see from_dataframe.
+        """
+        columns = list(dimensions) + list(measures)
+        return cls.from_dataframe(pd.DataFrame({name: [getattr(r, name) for r in ridership] for name in columns}),
+                                  dimensions, measures)
+
+    @classmethod
+    def _aggregate(cls, dimensions: Sequence[str], dictionaries: Dict[str, np.ndarray], codes: np.ndarray,
+                   measures: Dict[str, np.ndarray]) -> "RidershipCube":
+        """
+        Sum the measures of the rows sharing the same codes.
+        """
+        shape = [len(dictionaries[name]) for name in dimensions]
+        groups, inverse = _group_codes(codes, shape)
+        sums = {name: np.bincount(inverse, weights=values, minlength=len(groups)).astype(np.int64)
+                for name, values in measures.items()}
+        return cls(dimensions, dictionaries, groups, sums)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """
+        Number of distinct values of every dimension, the shape of the dense cube.
+        """
+        return tuple(len(self.dictionaries[name]) for name in self.dimensions)
+
+    def _axis(self, dimension: str) -> int:
+        if dimension not in self.dimensions:
+            raise KeyError(f"Unknown dimension: {dimension}, expected one of {list(self.dimensions)}")
+        return self.dimensions.index(dimension)
+
+    def encode(self, dimension: str, values: Selection) -> np.ndarray:
+        """
+        Codes of dimension values, values absent from the cube being ignored.
+
+        Args:
+            dimension: The dimension name.
+            values: A value or an iterable of values, e.g. "07:00-08:00" or [1, 2, 3, 4, 5].
+
+        Returns:
+            np.ndarray: The codes of the values found in the dimension dictionary.
+        """
+        dictionary = self.dictionaries[dimension]
+        if isinstance(values, (str, bytes)) or not isinstance(values, Iterable):
+            values = [values]
+        values = np.asarray(list(values))
+        positions = np.searchsorted(dictionary, values)
+        positions = positions[positions < len(dictionary)]
+        return np.unique(positions[np.isin(dictionary[positions], values)])
+
+    def _take(self, cells: np.ndarray) -> "RidershipCube":
+        return RidershipCube(self.dimensions, self.dictionaries, self.codes[cells],
+                             {name: values[cells] for name, values in self.measures.items()})
+
+    def slice(self, **selections: Selection) -> "RidershipCube":
+        """
+        Cells matching every selection, the dimensions and dictionaries being kept.
+
+        Args:
+            **selections: A value or iterable of values per dimension, e.g. day_index=[1, 2, 3, 4, 5].
+
+        Returns:
+            RidershipCube: The selected cells.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for dimension, values in selections.items():
+            axis = self._axis(dimension)
+            selected = np.zeros(len(self.dictionaries[dimension]), dtype=bool)
+            selected[self.encode(dimension, values)] = True
+            mask &= selected[self.codes[:, axis]]
+        return self._take(np.flatnonzero(mask))
+
+    def rollup(self, *dimensions: str) -> "RidershipCube":
+        """
+        Sum the measures over the other dimensions, e.g. rollup("stop_code", "timeslot").
+
+        Args:
+            *dimensions: The dimensions to keep, in the order of the result.
+
+        Returns:
+            RidershipCube: The aggregated cube, with only the given dimensions.
+        """
+        axes = [self._axis(dimension) for dimension in dimensions]
+        dictionaries = {dimension: self.dictionaries[dimension] for dimension in dimensions}
+        return RidershipCube._aggregate(dimensions, dictionaries, self.codes[:, axes], self.measures)
+
+    def totals(self, dimension: str, measure: str = "boardings") -> np.ndarray:
+        """
+        Sum of a measure per value of a dimension, aligned with the dimension dictionary.
+        """
+        return np.bincount(self.codes[:, self._axis(dimension)], weights=self.measures[measure],
+                           minlength=len(self.dictionaries[dimension])).astype(np.int64)
+
+    def top_k(self, dimension: str, k: int = 10, measure: str = "boardings") -> List[Tuple[object, int]]:
+        """
+        Values of a dimension with the largest sum of a measure, e.g. the busiest stops.
+
+        Args:
+            dimension: The dimension to rank.
+            k: Number of values. Defaults to 10.
+            measure: The measure to sum. Defaults to "boardings".
+
+        Returns:
+            List[Tuple[object, int]]: The (value, total) pairs, largest first, ties in dictionary order.
+        """
+        totals = self.totals(dimension, measure)
+        k = min(k, len(totals))
+        if not k:
+            return []
+        candidates = np.argpartition(-totals, k - 1)[:k]
+        candidates = candidates[np.lexsort((candidates, -totals[candidates]))]
+        dictionary = self.dictionaries[dimension]
+        return [(dictionary[code].item(), int(totals[code])) for code in candidates]
+
+    def to_dense(self, measure: str = "boardings") -> np.ndarray:
+        """
+        Dense array of a measure with one axis per dimension, indexed by the codes, e.g. after a rollup.
+        Combinations without records are 0.
+        """
+        size = np.prod(self.shape, dtype=np.float64)
+        if size > MAX_DENSE_CELLS:
+            raise ValueError(f"Dense cube of shape {self.shape} is too large, roll it up or slice it first")
+        dense = np.zeros(self.shape, dtype=np.int64)
+        dense[tuple(self.codes.T)] = self.measures[measure]
+        return dense
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Decode the cells to a DataFrame with one column per dimension and measure.
+        """
+        columns = {name: self.dictionaries[name][self.codes[:, axis]] for axis, name in enumerate(self.dimensions)}
+        columns.update(self.measures)
+        return pd.DataFrame(columns)
+
+    def save(self, filepath: str) -> str:
+        """
+        Save the cube to a .npz file, reloadable with load. Only plain arrays are written, no pickle.
+
+        Returns:
+            str: The file path.
+        """
+        arrays = {"dimensions": np.array(self.dimensions), "codes": self.codes}
+        arrays.update({f"dictionary/{name}": values for name, values in self.dictionaries.items()})
+        arrays.update({f"measure/{name}": values for name, values in self.measures.items()})
+        with atomic_write(filepath, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        return filepath
+
+    @classmethod
+    def load(cls, filepath: str) -> "RidershipCube":
+        """
+        Load a cube saved with save.
+        """
+        with np.load(filepath, allow_pickle=False) as archive:
+            dimensions = archive["dimensions"].tolist()
+            dictionaries = {name: archive[f"dictionary/{name}"] for name in dimensions}
+            measures = {key.split("/", 1)[1]: archive[key] for key in archive.files if key.startswith("measure/")}
+            return cls(dimensions, dictionaries, archive["codes"], measures)
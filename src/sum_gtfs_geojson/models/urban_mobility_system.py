@@ -1,14 +1,20 @@
-from typing import List, Optional
+from typing import Collection, List, Optional, Sequence, Tuple, Union
 from .sum_gtfs_base_model import SumGtfsBaseModel
 from .gtfs import Stop, Route, GTFSNetwork
 from .gbfs import StationInfoStatus
-from .mobility import BikeTrip, Ridership
-from .grid import HexGrid
-from pydantic import Field
+from .mobility import BikeTrip, BikeTripStore, BikeTripSequence, Ridership, RidershipCube
+from .mobility.bike_trip_store import BIKE_TRIP_FLOAT_COLUMNS, BIKE_TRIP_TIME_COLUMNS
+from .grid import HexGrid, HexPyramid
+from pydantic import Field, InstanceOf, PrivateAttr, field_serializer
 import os
+import time
+import numpy as np
+from functools import partial
 from pathlib import Path
-import geopandas as gpd
-from shapely.geometry import Point, LineString
+from sum_gtfs_geojson.exporter import GeoJSONWriter, ColumnarLayer, ExportReport, LayerExportReport, write_columnar_layer, run_export_tasks, GeoFormat, write_geo_layers, \
+    GeoJSONSeqWriter, PartitionedGeoJSONSeqWriter, Partition, GEOJSON_SEQ_EXTENSION, write_topojson_layer, \
+    CompressionOption, compression_levels, compress_folder, MANIFEST_FILENAME
+from sum_gtfs_geojson.instrumentation import ProfileOption, profiling, stage
 
 
 class UrbanMobilitySystem(SumGtfsBaseModel):
@@ -28,32 +34,277 @@ class UrbanMobilitySystem(SumGtfsBaseModel):
         ..., description="Custom GBFS Bike sharing station infrastructure metadata, with status (inventory...) over time periods.")
     ridership: List[Ridership] = Field(
         ..., description="Passenger activity at transit stops (e.g., boardings).")
-    bike_trips: List[BikeTrip] = Field(
-        ..., description="Trip-level data from bike sharing systems.")
+    bike_trips: Union[InstanceOf[BikeTripSequence], List[BikeTrip]] = Field(
+        ..., union_mode="left_to_right",
+        description="Trip-level data from bike sharing systems. When loaded, a BikeTripSequence over the columnar "
+                    "store, building the BikeTrip objects on first use and then behaving as a list.")
 
     hex_grid: Optional[HexGrid] = Field(
         None, description="Hexagonal grid for spatial analysis.")
+    hex_pyramid: Optional[HexPyramid] = Field(
+        None, description="Hexagonal grids at several resolutions, rolled up from the hex grid for zoom-dependent display.")
+    _bike_trip_store: Optional[BikeTripStore] = PrivateAttr(None)
+    _bike_trip_store_source: Optional[Sequence[BikeTrip]] = PrivateAttr(None)  # the bike trips of the store
+    _ridership_cube: Optional[RidershipCube] = PrivateAttr(None)
+    _ridership_cube_records: int = PrivateAttr(0)
+    _ridership_stop_matches: Optional[object] = PrivateAttr(None)
 
-    def save_to_geojson(self, output_path: str = "data/sum_gtfs_geojson/geojson"):
+    @field_serializer("bike_trips", mode="wrap")
+    def _serialize_bike_trips(self, bike_trips, handler):
+        # the BikeTrip objects of a BikeTripSequence are dumped like a list, without being kept
+        return handler(bike_trips.copy() if isinstance(bike_trips, BikeTripSequence) else bike_trips)
+
+    @property
+    def bike_trip_store(self) -> BikeTripStore:
+        """
+        The bike trips as a time-indexed columnar store, for vectorized window queries and histograms.
+        The store of a loaded BikeTripSequence, otherwise built from the BikeTrip objects on first use, and
+        rebuilt when bike_trips is replaced or resized, or once the BikeTripSequence is materialized (its
+        BikeTrip objects may have been edited).
+        """
+        if isinstance(self.bike_trips, BikeTripSequence) and not self.bike_trips.is_materialized:
+            return self.bike_trips.store
+        if (self._bike_trip_store is None or self._bike_trip_store_source is not self._bike_trip_source()
+                or len(self._bike_trip_store) != len(self.bike_trips)):
+            self.bike_trip_store = BikeTripStore.from_bike_trips(self.bike_trips)
+        return self._bike_trip_store
+
+    @bike_trip_store.setter
+    def bike_trip_store(self, store: BikeTripStore):
+        """
+        Set the store of the current bike_trips list, e.g. parsed from the same file.
+        """
+        self._bike_trip_store = store
+        self._bike_trip_store_source = self._bike_trip_source()
+
+    def _bike_trip_source(self) -> Sequence[BikeTrip]:
+        """
+        What the store of the bike trips is built from: the BikeTrip objects of a materialized BikeTripSequence,
+        otherwise bike_trips.
+        """
+        bike_trips = self.bike_trips
+        return bike_trips.items if isinstance(bike_trips, BikeTripSequence) and bike_trips.is_materialized \
+            else bike_trips
+
+    @property
+    def ridership_cube(self) -> RidershipCube:
+        """
+        The ridership as a dictionary-encoded data cube, for slicing, roll-up and top-k queries.
+        Built from ridership on first use, and rebuilt if ridership was replaced.
+        """
+        if self._ridership_cube is None or self._ridership_cube_records != len(self.ridership):
+            self.ridership_cube = RidershipCube.from_ridership(self.ridership)
+        return self._ridership_cube
+
+    @ridership_cube.setter
+    def ridership_cube(self, cube: RidershipCube):
+        self._ridership_cube = cube
+        self._ridership_cube_records = len(self.ridership)
+
+    def save_to_geojson(self, output_path: str = "data/sum_gtfs_geojson/geojson",
+                        parallel: bool = False, max_workers: Optional[int] = None,
+                        spatial_sort: bool = False, skip_layers: Optional[Collection[str]] = None,
+                        compression: CompressionOption = None, profile: ProfileOption = None) -> ExportReport:
         """
         Save the Urban Mobility System data to GeoJSON files. One file per data type.
         The files will be saved in the specified output path.
         :param output_path: The path where the GeoJSON files will be saved. Default is "data/sum_gtfs_geojson/geojson".
+        :param parallel: Export the layers concurrently, one task per layer in a process pool. Default is False.
+        :param max_workers: Maximum number of worker processes for the parallel export. Default is the number of processors.
+        :param spatial_sort: Write the features in Hilbert curve order of their centroid, for smaller compressed files. Default is False, source order.
+        :param skip_layers: Names of the layers not to export, e.g. the unchanged layers of an incremental export. Default is None, every layer.
+        :param compression: Precompressed sidecars for static hosting, e.g. ["gzip", "brotli"] or {"gzip": 9, "brotli": 11}: every file is streamed through the compressors while written (stops.geojson.gz, stops.geojson.br), and the other files of the folder (e.g. tunable_parameters.json) are compressed in a thread pool. Default is None, no sidecar.
+        :param profile: Folder where a cProfile .pstats file per exported layer and a collapsed-stack file are written, or a StageProfiler, see load_with_report of the loaders. The layers exported in worker processes are not profiled. Default is None, no profiling.
+        :return: An ExportReport with the feature count and the duration of every exported layer.
         """
         Path(output_path).mkdir(parents=True, exist_ok=True)
+        skip_layers = set(skip_layers or ())
+        compression = compression_levels(compression)
+
+        with profiling(profile), stage("save_to_geojson", output_path=output_path, parallel=parallel) as span:
+            if parallel:
+                report = run_export_tasks(self._export_tasks(output_path, spatial_sort, skip_layers, compression),
+                                          output_path, max_workers)
+            elif spatial_sort or compression:
+                report = self._run_export_tasks_sequentially(output_path, spatial_sort, skip_layers, compression)
+            else:
+                report = self._save_layers(output_path, skip_layers)
+            report.skipped = sorted(skip_layers & set(self.layer_names()))
+            if compression:
+                compress_folder(output_path, compression, exclude=[MANIFEST_FILENAME], max_workers=max_workers)
+            span.rows_out = sum(layer.feature_count for layer in report.layers)
+            span.attributes["skipped"] = report.skipped
+        return report
+
+    def layer_names(self) -> List[str]:
+        """
+        Names of the layers written by save_to_geojson, also used for the file names.
+        """
+        names = ["stops", "itineraries", "itineraries_topojson", "bike_stations", "ridership", "bike_trips",
+                 "od_trips", "hex_grid"]
+        if self.hex_pyramid:
+            names += [self.hex_pyramid.level_name(resolution) for resolution in self.hex_pyramid.resolutions]
+        return names
+
+    def _save_layers(self, output_path: str, skip_layers: Collection[str] = ()) -> ExportReport:
+        """
+        Save each layer as a separate GeoJSON file, one after the other.
+        """
+        layers = [
+            ("stops", "stops.geojson", self.stops_to_geojson),
+            ("itineraries", "itineraries.geojson", self.itineraries_to_geojson),
+            ("itineraries_topojson", "itineraries.topojson", self.itineraries_to_topojson),
+            ("bike_stations", "bike_stations.geojson", self.bike_stations_to_geojson),
+            ("ridership", "ridership.geojson", self.ridership_to_geojson),
+            ("bike_trips", "bike_trips.geojson", self.bike_trips_to_geojson),
+            ("od_trips", "od_trips.json", self.od_trips_to_json),
+            ("hex_grid", "hex_grid.geojson", self.hex_grid_to_geojson),
+        ]
+        if self.hex_pyramid:
+            layers += [(self.hex_pyramid.level_name(resolution), f"{self.hex_pyramid.level_name(resolution)}.geojson",
+                        self.hex_pyramid.get_level(resolution).to_geojson)
+                       for resolution in self.hex_pyramid.resolutions]
+
+        report = ExportReport(output_path=output_path)
+        start = time.perf_counter()
+        for name, filename, export in layers:
+            if name in skip_layers:
+                continue
+            filepath = os.path.join(output_path, filename)
+            layer_start = time.perf_counter()
+            with stage(f"export_{name}", filepath=filepath) as span:
+                exported = export(filepath)
+                span.rows_out = exported if isinstance(exported, int) else len(exported or ())
+            if not exported:
+                continue  # empty layer, no file written
+            report.layers.append(LayerExportReport(
+                name=name, filepath=filepath,
+                feature_count=exported if isinstance(exported, int) else len(exported),
+                seconds=time.perf_counter() - layer_start))
+        report.total_seconds = time.perf_counter() - start
+        return report
+
+    def _run_export_tasks_sequentially(self, output_path: str, spatial_sort: bool = True,
+                                       skip_layers: Collection[str] = (), compression: CompressionOption = None) -> ExportReport:
+        """
+        Run the export tasks one after the other, in this process.
+        """
+        report = ExportReport(output_path=output_path)
+        start = time.perf_counter()
+        for function, arguments in self._export_tasks(output_path, spatial_sort, skip_layers, compression):
+            with stage("export_layer") as span:
+                layer_report = function(*arguments)
+                span.name = f"export_{layer_report.name}"
+                span.rows_out = layer_report.feature_count
+                span.attributes["filepath"] = layer_report.filepath
+            report.layers.append(layer_report)
+        report.total_seconds = time.perf_counter() - start
+        return report
+
+    def _export_tasks(self, output_path: str, spatial_sort: bool = False, skip_layers: Collection[str] = (),
+                      compression: CompressionOption = None) -> list:
+        """
+        Build one export task per non-empty layer, with the layer converted to a compact columnar payload.
+        The tasks are sorted from the largest layer to the smallest, so the longest ones start first.
+        The layers in `skip_layers` get no task, but still feed the layers derived from them (TopoJSON, OD trips).
+        """
+        from sum_gtfs_geojson.utils import write_od_trips_layer  # utils depends on models
 
-        # Save each layer as a separate GeoJSON file
-        self.stops_to_geojson(os.path.join(output_path, "stops.geojson"))
-        self.itineraries_to_geojson(os.path.join(output_path, "itineraries.geojson"))
-        self.bike_stations_to_geojson(os.path.join(
-            output_path, "bike_stations.geojson"))
-        self.ridership_to_geojson(os.path.join(
-            output_path, "ridership.geojson"))
-        self.bike_trips_to_geojson(os.path.join(
-            output_path, "bike_trips.geojson"))
-        self.hex_grid_to_geojson(os.path.join(
-            output_path, "hex_grid.geojson"))
-        print(f"GeoJSON files saved to {output_path}")
+        layers = sorted(self.to_columnar_layers(spatial_sort), key=lambda layer: len(layer.coordinates), reverse=True)
+
+        tasks = [(partial(write_columnar_layer, compression=compression),
+                  (layer, os.path.join(output_path, f"{layer.name}.geojson")))
+                 for layer in layers if layer.name not in skip_layers]
+        itineraries = next((layer for layer in layers if layer.name == "itineraries"), None)
+        if itineraries is not None and "itineraries_topojson" not in skip_layers:
+            tasks.append((partial(write_topojson_layer, compression=compression),
+                          (itineraries, os.path.join(output_path, "itineraries.topojson"))))
+        bike_trips = next((layer for layer in layers if layer.name == "bike_trips"), None)
+        if bike_trips is not None and "od_trips" not in skip_layers:
+            resolution = self.hex_grid.resolution if self.hex_grid else 8
+            tasks.insert(0, (partial(write_od_trips_layer, compression=compression),
+                             (bike_trips, os.path.join(output_path, "od_trips.json"), resolution)))
+        return tasks
+
+    def to_columnar_layers(self, spatial_sort: bool = False) -> List[ColumnarLayer]:
+        """
+        Convert every non-empty layer, including the hex grid pyramid levels, to a compact columnar layer.
+        :param spatial_sort: Order the features along a Hilbert curve. Default is False, source order.
+        :return: The columnar layers, named as the exported files.
+        """
+        layers = self._columnar_layers(spatial_sort)
+        if self.hex_pyramid:
+            layers += [self._sort_layer(self.hex_pyramid.get_level(resolution).to_columnar(
+                           self.hex_pyramid.level_name(resolution)), spatial_sort)
+                       for resolution in self.hex_pyramid.resolutions]
+        return layers
+
+    def _columnar_layers(self, spatial_sort: bool = False) -> List[ColumnarLayer]:
+        """
+        Convert every non-empty layer to a compact columnar layer, optionally in spatial order.
+        """
+        layers = [
+            self.public_transport.stops_to_columnar(),
+            self.public_transport.itineraries_to_columnar(),
+            self.bike_stations_to_columnar(),
+            self.ridership_to_columnar(),
+            self.bike_trips_to_columnar(),
+        ]
+        if self.hex_grid:
+            layers.append(self.hex_grid.to_columnar())
+        return [self._sort_layer(layer, spatial_sort) for layer in layers if len(layer)]
+
+    @staticmethod
+    def _sort_layer(layer: ColumnarLayer, spatial_sort: bool) -> ColumnarLayer:
+        if not spatial_sort:
+            return layer
+        from sum_gtfs_geojson.utils import GeoToolkit  # utils depends on models
+        return GeoToolkit.sort_layer(layer)
+
+    def save_to_geo_format(self, output_path: str, file_format: GeoFormat = "geoparquet",
+                           spatial_sort: bool = True) -> List[str]:
+        """
+        Save every layer as a spatially sorted GeoParquet or FlatGeobuf file, one file per data type.
+        Consumers can read only the rows intersecting a bbox, and the files can be reloaded with ExportedDataLoader.
+        :param output_path: The folder where the files will be saved.
+        :param file_format: "geoparquet" (bbox covering columns) or "flatgeobuf" (packed R-tree). Default is "geoparquet".
+        :param spatial_sort: Write the rows in Hilbert curve order, so row groups cover small areas. Default is True.
+        :return: The paths of the written files.
+        """
+        layers = self._columnar_layers()
+        layers = [self.public_transport.itineraries_to_columnar(include_stop_ids=True)
+                  if layer.name == "itineraries" else layer for layer in layers]
+        layers = [self._sort_layer(layer, spatial_sort) for layer in layers]
+        return write_geo_layers(layers, output_path, file_format)
+
+    def save_to_geoparquet(self, output_path: str) -> List[str]:
+        """
+        Save every layer as a GeoParquet file, see save_to_geo_format.
+        """
+        return self.save_to_geo_format(output_path, "geoparquet")
+
+    def save_to_flatgeobuf(self, output_path: str) -> List[str]:
+        """
+        Save every layer as a FlatGeobuf file, see save_to_geo_format.
+        """
+        return self.save_to_geo_format(output_path, "flatgeobuf")
+
+    def save_to_vector_tiles(self, filepath: str, min_zoom: int = 8, max_zoom: int = 14,
+                             spatial_sort: bool = False) -> int:
+        """
+        Save every layer in a single vector tile archive (Mapbox Vector Tiles), so map clients only fetch the tiles in view.
+        Features are thinned below the maximum zoom level.
+        Requires the optional dependencies mapbox-vector-tile, and pmtiles for PMTiles archives.
+        :param filepath: The path to the archive, ending with .pmtiles (static hosting) or .mbtiles (tile servers).
+        :param min_zoom: Lowest zoom level of the tile pyramid. Default is 8.
+        :param max_zoom: Highest zoom level of the tile pyramid, where all features are kept. Default is 14.
+        :param spatial_sort: Order the features of every tile along a Hilbert curve. Default is False, source order.
+        :return: The number of written tiles.
+        """
+        from sum_gtfs_geojson.exporter import VectorTileExporter  # imports shapely
+
+        Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+        return VectorTileExporter(self._columnar_layers(spatial_sort), min_zoom, max_zoom).export(filepath)
 
     def stops_to_geojson(self, filepath):
         """
@@ -61,8 +312,7 @@ class UrbanMobilitySystem(SumGtfsBaseModel):
         Args:
             filepath (str): The path to the output GeoJSON file.
         """
-        print("Exporting stops to GeoJSON...")
-        self.public_transport.stops_to_geojson(filepath)
+        return self.public_transport.stops_to_geojson(filepath)
 
     def itineraries_to_geojson(self, filepath):
         """
@@ -71,8 +321,16 @@ class UrbanMobilitySystem(SumGtfsBaseModel):
         Args:
             filepath (str): The path to the output GeoJSON file.
         """
-        print("Exporting routes to GeoJSON...")
-        self.public_transport.itineraries_to_geojson(filepath)
+        return self.public_transport.itineraries_to_geojson(filepath)
+
+    def itineraries_to_topojson(self, filepath):
+        """
+        Export the itineraries as TopoJSON, with the segments shared by several lines stored once.
+
+        Args:
+            filepath (str): The path to the output TopoJSON file.
+        """
+        return self.public_transport.itineraries_to_topojson(filepath)
 
     def bike_stations_to_geojson(self, filepath):
         """
@@ -80,18 +338,21 @@ class UrbanMobilitySystem(SumGtfsBaseModel):
         Args:
             filepath (str): The path to the output GeoJSON file.
         """
-        print("Exporting bike stations to GeoJSON...")
         if not self.bike_stations:
             return
-        gdf = gpd.GeoDataFrame(
-            [s.model_dump() for s in self.bike_stations],
-            geometry=[Point(s.lon, s.lat)
-                      for s in self.bike_stations if s.lon is not None and s.lat is not None],
-            crs="EPSG:4326"
-        )
-        gdf.to_file(filepath, driver="GeoJSON")
+        with GeoJSONWriter(filepath) as writer:
+            writer.write_features(
+                (GeoJSONWriter.point(s.lon, s.lat), s.model_dump())
+                for s in self.bike_stations if s.lon is not None and s.lat is not None)
+        return writer.count
 
-        return gdf
+    def bike_stations_to_columnar(self) -> ColumnarLayer:
+        """
+        Convert the bike stations to a compact columnar layer, e.g. to export them in a worker process.
+        """
+        return ColumnarLayer.from_models(
+            "bike_stations", "Point", self.bike_stations,
+            lambda s: [(s.lon, s.lat)] if s.lon is not None and s.lat is not None else None)
 
     def ridership_to_geojson(self, filepath):
         """
@@ -99,16 +360,27 @@ class UrbanMobilitySystem(SumGtfsBaseModel):
         Args:
             filepath (str): The path to the output GeoJSON file.
         """
-        print("Exporting ridership to GeoJSON...")
         if not self.ridership:
             return
-        gdf = gpd.GeoDataFrame(
-            [r.model_dump() for r in self.ridership],
-            geometry=[Point(r.stop_lon, r.stop_lat)
-                      for r in self.ridership if r.stop_lon is not None and r.stop_lat is not None],
-            crs="EPSG:4326"
-        )
-        gdf.to_file(filepath, driver="GeoJSON")
+        with GeoJSONWriter(filepath) as writer:
+            writer.write_features((geometry, properties) for _, geometry, properties in self._ridership_features())
+        return writer.count
+
+    def _ridership_features(self):
+        """
+        Generate the (date, geometry, properties) of the located ridership records.
+        """
+        for r in self.ridership:
+            if r.stop_lon is not None and r.stop_lat is not None:
+                yield r.date, GeoJSONWriter.point(r.stop_lon, r.stop_lat), r.model_dump()
+
+    def ridership_to_columnar(self) -> ColumnarLayer:
+        """
+        Convert the ridership data to a compact columnar layer, e.g. to export it in a worker process.
+        """
+        return ColumnarLayer.from_models(
+            "ridership", "Point", self.ridership,
+            lambda r: [(r.stop_lon, r.stop_lat)] if r.stop_lon is not None and r.stop_lat is not None else None)
 
     def bike_trips_to_geojson(self, filepath):
         """
@@ -116,34 +388,204 @@ class UrbanMobilitySystem(SumGtfsBaseModel):
         Args:
             filepath (str): The path to the output GeoJSON file.
         """
-        print("Exporting bike trips to GeoJSON...")
-
         if not self.bike_trips:
             return
-        # This assumes BikeTrip has latitude_start, longitude_start, latitude_end, longitude_end
-        features = []
-        for t in self.bike_trips:
-            d = t.model_dump()
-            if all([
-                getattr(t, "longitude_start", None) is not None,
-                getattr(t, "latitude_start", None) is not None,
-                getattr(t, "longitude_end", None) is not None,
-                getattr(t, "latitude_end", None) is not None,
-            ]):
-                d["geometry"] = LineString([
-                    (t.longitude_start, t.latitude_start),
-                    (t.longitude_end, t.latitude_end)
-                ])
+        with GeoJSONWriter(filepath) as writer:
+            writer.write_features((geometry, properties) for _, geometry, properties in self._bike_trip_features())
+        return writer.count
+
+    def _bike_trip_features(self):
+        """
+        Generate the (start time, geometry, properties) of the bike trips. Trips without both ends located are skipped.
+        """
+        bike_trips = self.bike_trips.iter_models() if isinstance(self.bike_trips, BikeTripSequence) else self.bike_trips
+        for t in bike_trips:
+            if None not in (t.longitude_start, t.latitude_start, t.longitude_end, t.latitude_end):
+                yield (t.trip_started_at_utc,
+                       GeoJSONWriter.line_string([(t.longitude_start, t.latitude_start),
+                                                  (t.longitude_end, t.latitude_end)]),
+                       t.model_dump())
+
+    def save_to_geojson_seq(self, output_path: str, partition: Optional[Partition] = None,
+                            compress: bool = False, record_separator: bool = False) -> dict:
+        """
+        Save the bike trips and ridership as GeoJSON text sequences (one feature per line), which can be
+        written and read as a stream with constant memory, unlike a FeatureCollection.
+        :param output_path: The folder where the files will be saved.
+        :param partition: None for a single file per layer, "day" or "month" for one file per period in a folder per layer.
+        :param compress: gzip compress the files (.geojsonl.gz). Default is False.
+        :param record_separator: Prefix every feature with the RFC 8142 record separator (`jq --seq`, GDAL
+            GeoJSONSeq). Default is False, newline-delimited GeoJSON.
+        :return: The number of exported features by layer.
+        """
+        return {
+            "bike_trips": self.bike_trips_to_geojson_seq(output_path, partition, compress, record_separator),
+            "ridership": self.ridership_to_geojson_seq(output_path, partition, compress, record_separator),
+        }
+
+    def bike_trips_to_geojson_seq(self, output_path: str, partition: Optional[Partition] = None,
+                                  compress: bool = False, record_separator: bool = False) -> int:
+        """
+        Export bike trips as a GeoJSON text sequence, see save_to_geojson_seq. Trips are partitioned by start date.
+        Args:
+            output_path (str): The folder where the files will be saved.
+            partition (str, optional): None for a single bike_trips.geojsonl file, "day" or "month" for a bike_trips folder of partitions.
+            compress (bool): gzip compress the files. Defaults to False.
+            record_separator (bool): Prefix the features with the RFC 8142 record separator. Defaults to False.
+        Returns:
+            int: The number of exported trips.
+        """
+        return self._write_geojson_seq(output_path, "bike_trips", self._bike_trip_features(), partition, compress,
+                                       record_separator)
+
+    def ridership_to_geojson_seq(self, output_path: str, partition: Optional[Partition] = None,
+                                 compress: bool = False, record_separator: bool = False) -> int:
+        """
+        Export ridership as a GeoJSON text sequence, see save_to_geojson_seq. Records are partitioned by date.
+        Args:
+            output_path (str): The folder where the files will be saved.
+            partition (str, optional): None for a single ridership.geojsonl file, "day" or "month" for a ridership folder of partitions.
+            compress (bool): gzip compress the files. Defaults to False.
+            record_separator (bool): Prefix the features with the RFC 8142 record separator. Defaults to False.
+        Returns:
+            int: The number of exported records.
+        """
+        return self._write_geojson_seq(output_path, "ridership", self._ridership_features(), partition, compress,
+                                       record_separator)
+
+    @staticmethod
+    def _write_geojson_seq(output_path: str, name: str, features, partition: Optional[Partition],
+                           compress: bool, record_separator: bool = False) -> int:
+        Path(output_path).mkdir(parents=True, exist_ok=True)
+        with stage(f"export_{name}_geojson_seq", partition=partition) as span:
+            if partition is None:
+                filepath = os.path.join(output_path, f"{name}{GEOJSON_SEQ_EXTENSION}" + (".gz" if compress else ""))
+                with GeoJSONSeqWriter(filepath, record_separator=record_separator) as writer:
+                    writer.write_features((geometry, properties) for _, geometry, properties in features)
+                span.attributes["filepath"] = filepath
+            else:
+                with PartitionedGeoJSONSeqWriter(output_path, name, partition, compress,
+                                                 record_separator=record_separator) as writer:
+                    writer.write_features(features)
+                span.attributes["partitions"] = len(writer.partitions)
+                span.attributes["filepath"] = writer.folder
+            span.rows_out = writer.count
+        return writer.count
+
+    def bike_trips_to_columnar(self) -> ColumnarLayer:
+        """
+        Convert the bike trips to a compact columnar layer of (start, end) LineStrings, e.g. to export them in a worker process.
+        A BikeTripSequence not materialized is converted from the columns of its store, without building the BikeTrip
+        objects.
+        """
+        if isinstance(self.bike_trips, BikeTripSequence) and not self.bike_trips.is_materialized:
+            return self._bike_trip_store_to_columnar(self.bike_trips.store)
+        return ColumnarLayer.from_models(
+            "bike_trips", "LineString", self.bike_trips,
+            lambda t: [(t.longitude_start, t.latitude_start), (t.longitude_end, t.latitude_end)]
+            if None not in (t.longitude_start, t.latitude_start, t.longitude_end, t.latitude_end) else None)
+
+    @staticmethod
+    def _bike_trip_store_to_columnar(store: BikeTripStore) -> ColumnarLayer:
+        """
+        Columnar layer of the trips of a store, with the columns of ColumnarLayer.from_models over its BikeTrip
+        objects. The trips of a store are all located, see BikeTripStore.from_dataframe.
+        """
+        starts = np.column_stack([store["longitude_start"], store["latitude_start"]])
+        ends = np.column_stack([store["longitude_end"], store["latitude_end"]])
+        columns = {}
+        for name in BikeTrip.model_fields:
+            values = store[name]
+            if name in BIKE_TRIP_TIME_COLUMNS:
+                columns[name] = values.astype("datetime64[us]")
+            elif name in BIKE_TRIP_FLOAT_COLUMNS:
+                columns[name] = values
             else:
-                d["geometry"] = None
-            features.append(d)
-        gdf = gpd.GeoDataFrame(
-            features,
-            geometry="geometry",
-            crs="EPSG:4326"
-        )
-        gdf = gdf[gdf.geometry.notnull()]
-        gdf.to_file(filepath, driver="GeoJSON")
+                columns[name] = values.tolist()
+        return ColumnarLayer(name="bike_trips", geometry_type="LineString",
+                             coordinates=np.stack([starts, ends], axis=1).reshape(-1, 2),
+                             offsets=np.arange(0, 2 * len(store) + 1, 2, dtype=np.int64),
+                             columns=columns if len(store) else {})
+
+    def od_trips_to_json(self, filepath, resolution: Optional[int] = None,
+                         top_n: Optional[int] = 500, time_of_day: Optional[Tuple[float, float]] = None):
+        """
+        Export the top bike trip flows between hex cells, in the od_trips.json format read by the map demo.
+        Args:
+            filepath (str): The path to the output JSON file.
+            resolution (int, optional): H3 resolution used to bin the trips. Defaults to the hex grid resolution, or 8 without hex grid.
+            top_n (int, optional): Number of flows to export. If None, all flows are exported. Defaults to 500.
+            time_of_day (tuple, optional): (start_hour, end_hour) window applied to the trip start time. Defaults to None, all trips.
+        """
+        if not self.bike_trips:
+            return
+        od_matrix = self.bike_trips_to_od_matrix(resolution, time_of_day)
+        return od_matrix.to_od_trips_json(filepath, top_n)
+
+    def bike_trips_to_od_matrix(self, resolution: Optional[int] = None,
+                                time_of_day: Optional[Tuple[float, float]] = None):
+        """
+        Aggregate the bike trips into a sparse origin-destination matrix between H3 cells.
+        Args:
+            resolution (int, optional): H3 resolution used to bin the trips. Defaults to the hex grid resolution, or 8 without hex grid.
+            time_of_day (tuple, optional): (start_hour, end_hour) window applied to the trip start time. Defaults to None, all trips.
+        Returns:
+            ODMatrix: The aggregated flows.
+        """
+        if resolution is None:
+            resolution = self.hex_grid.resolution if self.hex_grid else 8
+        return self.bike_trip_store.to_od_matrix(resolution, time_of_day)
+
+    def match_ridership_stops(self, tolerance_m: float = 150, code_aliases: Optional[dict] = None,
+                              refresh: bool = False):
+        """
+        Join the ridership stops to the GTFS stops in bulk, see StopMatcher, and set the stop_id of every ridership record.
+        The mapping table is cached, and reused until refresh is set.
+        Args:
+            tolerance_m (float): Maximum distance between a ridership stop and its GTFS stop, in metres. Defaults to 150.
+            code_aliases (dict, optional): {ridership stop code: GTFS stop id} mapping checked before the spatial match.
+            refresh (bool): Match again instead of using the cached table. Defaults to False.
+        Returns:
+            StopMatchTable: The mapping table from the ridership stop codes to the GTFS stop ids.
+        """
+        from sum_gtfs_geojson.utils import StopMatcher  # utils depends on models
+
+        if self._ridership_stop_matches is None or refresh:
+            with stage("match_ridership_stops", rows_in=len(self.ridership)) as span:
+                matcher = StopMatcher(self.public_transport.stops, tolerance_m, code_aliases=code_aliases)
+                self._ridership_stop_matches = matcher.match_ridership(self.ridership)
+                span.rows_out = len(self._ridership_stop_matches)
+                span.attributes.update(self._ridership_stop_matches.summary())
+        stop_ids = self._ridership_stop_matches.to_dict()
+        for record in self.ridership:
+            record.stop_id = stop_ids.get(record.stop_code)
+        return self._ridership_stop_matches
+
+    def bike_station_inventory(self, max_distance_m: Optional[float] = 100):
+        """
+        Reconstruct the inventory timeline of the bike stations from the bike trips.
+        Args:
+            max_distance_m (float, optional): Trip ends farther than this from every station are ignored. Defaults to 100 m.
+        Returns:
+            StationInventory: The timelines of the stations.
+        """
+        from sum_gtfs_geojson.utils import StationInventory  # utils depends on models
+
+        return StationInventory.from_trip_store(self.bike_trip_store, self.bike_stations, max_distance_m)
+
+    def build_bike_station_history(self, period: str = "hour", max_distance_m: Optional[float] = 100):
+        """
+        Fill the history of the bike stations with StationStatusPeriod rows reconstructed from the bike trips.
+        Args:
+            period (str): "hour", "day_type" (weekday/weekend), "day_type_hour" or "month". Defaults to "hour".
+            max_distance_m (float, optional): Trip ends farther than this from every station are ignored. Defaults to 100 m.
+        Returns:
+            StationInventory: The timelines the history was aggregated from.
+        """
+        inventory = self.bike_station_inventory(max_distance_m)
+        for station, history in zip(self.bike_stations, inventory.histories(period)):
+            station.history = history
+        return inventory
 
     def hex_grid_to_geojson(self, filepath):
         """
@@ -153,4 +595,15 @@ class UrbanMobilitySystem(SumGtfsBaseModel):
         """
         if not self.hex_grid:
             return
-        self.hex_grid.to_geojson(filepath)
+        return self.hex_grid.to_geojson(filepath)
+
+    def hex_pyramid_to_geojson(self, output_path):
+        """
+        Export every level of the hex pyramid to a separate GeoJSON file named hex_grid_{resolution}res.geojson.
+        Args:
+            output_path (str): The folder where the GeoJSON files will be saved.
+        """
+        if not self.hex_pyramid:
+            return
+        with stage("export_hex_pyramid", filepath=output_path):
+            self.hex_pyramid.to_geojson(output_path)
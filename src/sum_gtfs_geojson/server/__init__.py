@@ -0,0 +1,16 @@
+from typing import TYPE_CHECKING
+from sum_gtfs_geojson.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .feature_index import FeatureIndex, LayerIndex, TIME_COLUMNS
+    from .feature_server import FeatureServer, Response, DEFAULT_PORT
+    from .benchmark import benchmark_feature_server, default_benchmark_paths
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    **dict.fromkeys(["FeatureIndex", "LayerIndex", "TIME_COLUMNS"], ".feature_index"),
+    **dict.fromkeys(["FeatureServer", "Response", "DEFAULT_PORT"], ".feature_server"),
+    **dict.fromkeys(["benchmark_feature_server", "default_benchmark_paths"], ".benchmark"),
+})
+
+__all__ = ["FeatureIndex", "LayerIndex", "TIME_COLUMNS", "FeatureServer", "Response", "DEFAULT_PORT",
+           "benchmark_feature_server", "default_benchmark_paths"]
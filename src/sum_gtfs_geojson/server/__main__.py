@@ -0,0 +1,3 @@
+from .feature_server import main
+
+main()
@@ -0,0 +1,146 @@
+from typing import List, Sequence, Tuple
+import asyncio
+import time
+import h3
+import numpy as np
+from .feature_index import FeatureIndex
+from .feature_server import FeatureServer
+
+BENCHMARK_BBOX_SIZE = 0.01  # degrees, ~1 km around Geneva
+BENCHMARK_CELL_RESOLUTION = 8
+
+
+def default_benchmark_paths(index: FeatureIndex, count: int = 50, seed: int = 0) -> List[str]:
+    """
+    Build a reproducible mix of queries over the indexed layers: small bboxes around random features,
+    one-day time windows on the temporal layers, and H3 cells of random features.
+
+    Args:
+        index: The indexes of the served layers.
+        count: Number of queries per layer and query type. Defaults to 50.
+        seed: Seed of the random generator. Defaults to 0.
+
+    Returns:
+        List[str]: The request paths.
+    """
+    rng = np.random.default_rng(seed)
+    paths = []
+    for name, layer_index in index.layers.items():
+        if not len(layer_index):
+            continue
+        centroids = layer_index.layer.centroids()
+        for i in rng.integers(0, len(layer_index), count):
+            lon, lat = centroids[i]
+            half = BENCHMARK_BBOX_SIZE / 2
+            paths.append(f"/layers/{name}?bbox={lon - half:.5f},{lat - half:.5f},{lon + half:.5f},{lat + half:.5f}")
+            cell = h3.latlng_to_cell(lat, lon, BENCHMARK_CELL_RESOLUTION)
+            paths.append(f"/layers/{name}?cell={cell}")
+        time_range = layer_index.time_range
+        if time_range is not None:
+            days = np.arange(time_range[0].astype("datetime64[D]"), time_range[1].astype("datetime64[D]") + 1)
+            for day in rng.choice(days, count):
+                paths.append(f"/layers/{name}?start={day}&end={day + 1}")
+    rng.shuffle(paths)
+    return paths
+
+
+async def _fetch(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str, path: str,
+                 accept_gzip: bool) -> Tuple[int, int]:
+    """
+    Send a GET request on a kept-alive connection and read the whole response.
+
+    Returns:
+        Tuple[int, int]: The status code and the body size.
+    """
+    encoding = "Accept-Encoding: gzip\r\n" if accept_gzip else ""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{encoding}\r\n".encode("latin-1"))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status, length
+
+
+async def _run_level(server: FeatureServer, paths: Sequence[str], concurrency: int, requests: int,
+                     accept_gzip: bool) -> dict:
+    """
+    Send `requests` requests from `concurrency` concurrent clients, each on its own kept-alive connection.
+    """
+    latencies = np.zeros(requests)
+    sizes = np.zeros(requests, dtype=np.int64)
+    errors = 0
+    counter = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        try:
+            for i in counter:
+                start = time.perf_counter()
+                status, sizes[i] = await _fetch(reader, writer, server.host, paths[i % len(paths)], accept_gzip)
+                latencies[i] = time.perf_counter() - start
+                errors += status != 200
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "requests_per_second": round(requests / seconds, 1),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+        "latency_p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 3),
+        "mean_response_bytes": int(sizes.mean()),
+    }
+
+
+async def _benchmark(server: FeatureServer, paths: Sequence[str], concurrency_levels: Sequence[int],
+                     requests: int, accept_gzip: bool) -> List[dict]:
+    await server.start()
+    try:
+        results = []
+        for concurrency in concurrency_levels:
+            server._cache.clear()  # every level starts with a cold cache
+            results.append(await _run_level(server, paths, concurrency, requests, accept_gzip))
+            print(f"Concurrency {concurrency}: {results[-1]['requests_per_second']} requests/s, "
+                  f"p95 {results[-1]['latency_p95_ms']} ms")
+        return results
+    finally:
+        await server.stop()
+
+
+def benchmark_feature_server(server: FeatureServer, paths: Sequence[str],
+                             concurrency_levels: Sequence[int] = (1, 8, 32), requests: int = 500,
+                             accept_gzip: bool = True) -> List[dict]:
+    """
+    Measure the throughput and latency of a feature server under concurrent requests, entirely locally:
+    the server is started on its host and port (use port 0 for a free port), queried by asyncio clients
+    in the same event loop, then stopped.
+
+    The paths are requested in a round-robin, so with more requests than paths the later requests hit the
+    response cache, as dashboards repeating the same queries would. The cache is cleared between levels.
+
+    Args:
+        server: The server to benchmark, not started.
+        paths: Request paths, see default_benchmark_paths.
+        concurrency_levels: Number of concurrent clients of each run. Defaults to 1, 8 and 32.
+        requests: Number of requests of each run. Defaults to 500.
+        accept_gzip: Ask for gzip compressed responses. Defaults to True.
+
+    Returns:
+        List[dict]: For each concurrency level, the requests per second, latency percentiles and response size.
+    """
+    return asyncio.run(_benchmark(server, paths, concurrency_levels, requests, accept_gzip))
@@ -0,0 +1,184 @@
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import shapely
+from h3.api import basic_int as h3_int
+from sum_gtfs_geojson.exporter import ColumnarLayer
+from sum_gtfs_geojson.models import UrbanMobilitySystem
+from sum_gtfs_geojson.utils import GeoToolkit
+
+# Column holding the time of the features of the temporal layers
+TIME_COLUMNS = {
+    "bike_trips": "trip_started_at_utc",
+    "ridership": "date",
+}
+
+BBox = Tuple[float, float, float, float]
+
+
+def _to_datetime64(values: Sequence) -> np.ndarray:
+    """
+    Convert a datetime column, or a column of ISO strings, to datetime64[us] with NaT for missing values.
+    """
+    if isinstance(values, np.ndarray) and np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[us]")
+    return np.array([value if value is not None else "NaT" for value in values], dtype="datetime64[us]")
+
+
+class LayerIndex:
+    """
+    In-memory spatial, temporal and H3 indexes over a columnar layer, to select features without scanning them.
+
+    - Spatial: STRtree over the feature bounding boxes, a bbox query returns the features whose bbox intersects it.
+    - Temporal: feature indexes sorted by time, a time window [start, end) is two binary searches.
+    - H3: cell of every feature centroid, computed once per queried resolution.
+
+    Queries are safe to run from several threads, only the H3 cell cache is guarded by a lock.
+
+    Attributes:
+        layer (ColumnarLayer): The indexed layer.
+        time_column (str, optional): Name of the time column, None for layers without time.
+        bounds (np.ndarray): (n, 4) array with the (min_lon, min_lat, max_lon, max_lat) of each feature.
+    """
+
+    def __init__(self, layer: ColumnarLayer, time_column: Optional[str] = None):
+        self.layer = layer
+        self.time_column = time_column if time_column in layer.columns else None
+        self.bounds = self._feature_bounds(layer)
+        self._tree = shapely.STRtree(shapely.box(*self.bounds.T))
+        self._cells: Dict[int, np.ndarray] = {}
+        self._cells_lock = threading.Lock()  # the cells of a resolution are computed on first use
+        if self.time_column is not None:
+            times = _to_datetime64(layer.columns[self.time_column])
+            located = np.flatnonzero(~np.isnat(times))
+            order = located[np.argsort(times[located], kind="stable")]
+            self._time_order = order
+            self._sorted_times = times[order]
+
+    def __len__(self) -> int:
+        return len(self.layer)
+
+    @staticmethod
+    def _feature_bounds(layer: ColumnarLayer) -> np.ndarray:
+        bounds = np.full((len(layer), 4), np.nan)
+        lengths = np.diff(layer.offsets)
+        located = np.flatnonzero(lengths > 0)
+        if len(located):
+            # features without vertices have no coordinates, so each segment only holds the located feature
+            starts = layer.offsets[located]
+            bounds[located, :2] = np.minimum.reduceat(layer.coordinates, starts, axis=0)
+            bounds[located, 2:] = np.maximum.reduceat(layer.coordinates, starts, axis=0)
+        return bounds
+
+    @property
+    def bbox(self) -> Optional[BBox]:
+        """
+        Bounding box of the whole layer, None when empty.
+        """
+        if not len(self) or np.isnan(self.bounds).all():
+            return None
+        return (*np.nanmin(self.bounds[:, :2], axis=0).tolist(), *np.nanmax(self.bounds[:, 2:], axis=0).tolist())
+
+    @property
+    def time_range(self) -> Optional[Tuple[np.datetime64, np.datetime64]]:
+        """
+        First and last time of the layer, None for layers without time.
+        """
+        if self.time_column is None or not len(self._sorted_times):
+            return None
+        return self._sorted_times[0], self._sorted_times[-1]
+
+    def within_bbox(self, bbox: BBox) -> np.ndarray:
+        """
+        Indexes of the features whose bounding box intersects `bbox` (min_lon, min_lat, max_lon, max_lat).
+        """
+        return np.sort(self._tree.query(shapely.box(*bbox)))
+
+    def within_time(self, start: Optional[np.datetime64] = None, end: Optional[np.datetime64] = None) -> np.ndarray:
+        """
+        Indexes of the features whose time is in [start, end), an open bound being unbounded.
+        """
+        if self.time_column is None:
+            raise ValueError(f"Layer {self.layer.name} has no time column")
+        low = 0 if start is None else np.searchsorted(self._sorted_times, np.datetime64(start, "us"), side="left")
+        high = (len(self._sorted_times) if end is None
+                else np.searchsorted(self._sorted_times, np.datetime64(end, "us"), side="left"))
+        return np.sort(self._time_order[low:high])
+
+    def within_cell(self, cell: int) -> np.ndarray:
+        """
+        Indexes of the features whose centroid is in the H3 cell, at the resolution of the cell.
+        """
+        resolution = h3_int.get_resolution(cell)
+        with self._cells_lock:
+            cells = self._cells.get(resolution)
+            if cells is None:
+                centroids = self.layer.centroids()
+                cells = GeoToolkit.points_to_cells(centroids[:, 1], centroids[:, 0], resolution)
+                self._cells[resolution] = cells
+        return np.flatnonzero(cells == np.uint64(cell))
+
+    def query(self, bbox: Optional[BBox] = None, start: Optional[np.datetime64] = None,
+              end: Optional[np.datetime64] = None, cell: Optional[int] = None,
+              limit: Optional[int] = None) -> np.ndarray:
+        """
+        Indexes of the features matching every given filter, in layer order.
+
+        Args:
+            bbox: (min_lon, min_lat, max_lon, max_lat) intersecting the feature bounding boxes.
+            start: Start of the time window, included.
+            end: End of the time window, excluded.
+            cell: Integer H3 cell containing the feature centroids.
+            limit: Maximum number of features.
+
+        Returns:
+            np.ndarray: The sorted feature indexes.
+        """
+        selections = []
+        if bbox is not None:
+            selections.append(self.within_bbox(bbox))
+        if start is not None or end is not None:
+            selections.append(self.within_time(start, end))
+        if cell is not None:
+            selections.append(self.within_cell(cell))
+        if not selections:
+            indices = np.arange(len(self))
+        else:
+            indices = selections[0]
+            for selection in selections[1:]:
+                indices = np.intersect1d(indices, selection, assume_unique=True)
+        return indices[:limit] if limit is not None else indices
+
+
+class FeatureIndex:
+    """
+    Indexes of every layer of an Urban Mobility System, see LayerIndex.
+
+    Usage:
+        index = FeatureIndex.from_system(manager.get_data())
+        trips = index["bike_trips"].query(bbox=(6.14, 46.19, 6.16, 46.21), start=np.datetime64("2024-05-01"))
+
+    Attributes:
+        layers (Dict[str, LayerIndex]): Index of every layer, by layer name.
+    """
+
+    def __init__(self, layers: List[ColumnarLayer]):
+        self.layers = {layer.name: LayerIndex(layer, TIME_COLUMNS.get(layer.name)) for layer in layers}
+
+    @classmethod
+    def from_system(cls, system: UrbanMobilitySystem, spatial_sort: bool = True) -> "FeatureIndex":
+        """
+        Index the layers of a loaded system.
+
+        Args:
+            system: The loaded Urban Mobility System.
+            spatial_sort: Store the features in Hilbert curve order, so the features of a bbox are close
+                in memory. Defaults to True.
+        """
+        return cls(system.to_columnar_layers(spatial_sort))
+
+    def __getitem__(self, name: str) -> LayerIndex:
+        return self.layers[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.layers
@@ -0,0 +1,387 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs, unquote
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import h3
+import numpy as np
+from sum_gtfs_geojson.enums import LivingLabsCity, DataType
+from sum_gtfs_geojson.exporter import GeoJSONWriter
+from sum_gtfs_geojson.exporter.geojson_writer import DEFAULT_COORDINATE_PRECISION
+from sum_gtfs_geojson.models import UrbanMobilitySystem
+from .feature_index import FeatureIndex, BBox
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 256  # encoded responses kept in memory
+DEFAULT_GZIP_LEVEL = 6
+QUERY_PARAMETERS = {"bbox", "start", "end", "cell", "limit"}
+HTTP_REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+QueryKey = Tuple[str, Optional[BBox], Optional[str], Optional[str], Optional[int], Optional[int]]
+
+
+@dataclass
+class Response:
+    """
+    HTTP response of the feature server.
+
+    Attributes:
+        status (int): HTTP status code.
+        body (bytes): Response body, already encoded.
+        headers (Dict[str, str]): Response headers, without Content-Length and Connection.
+    """
+    status: int
+    body: bytes = b""
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class _EncodedResult:
+    """
+    Encoded GeoJSON of a query, with its gzip compressed version and their ETags.
+    """
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    feature_count: int
+
+    @property
+    def gzip_etag(self) -> str:
+        return self.etag[:-1] + '-gzip"'  # strong ETags differ between content encodings
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Check if the Accept-Encoding header allows gzip, i.e. lists gzip or * without q=0.
+    """
+    for token in accept_encoding.split(","):
+        name, *parameters = [part.strip() for part in token.split(";")]
+        if name.lower() in ("gzip", "*"):
+            return not any(p.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000") for p in parameters)
+    return False
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag, with the weak comparison of RFC 9110.
+    """
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+class FeatureServer:
+    """
+    Lightweight asyncio HTTP server answering feature queries over a loaded Urban Mobility System, from the
+    in-memory indexes of FeatureIndex. Only uses the standard library, and listens on localhost by default.
+
+    Endpoints:
+        GET /layers: Name, feature count, bbox and time range of every layer, as JSON.
+        GET /layers/{name}?bbox=&start=&end=&cell=&limit=: GeoJSON FeatureCollection of the matching features.
+            - bbox: min_lon,min_lat,max_lon,max_lat, features whose bbox intersects it.
+            - start, end: ISO dates or datetimes, features whose time is in [start, end) (bike_trips, ridership).
+            - cell: H3 cell, features whose centroid is in the cell.
+            - limit: maximum number of features.
+
+    Responses are gzip compressed when the client accepts it, and carry an ETag so clients revalidating
+    with If-None-Match get a 304 without body. Encoded responses are kept in an LRU cache, and encoding
+    runs in a thread pool so the event loop keeps accepting requests.
+
+    Usage:
+        server = FeatureServer.from_system(manager.get_data(), port=8765)
+        server.run()  # http://127.0.0.1:8765/layers/bike_trips?bbox=6.14,46.19,6.16,46.21&start=2024-05-01
+
+    Attributes:
+        index (FeatureIndex): The indexes of the served layers.
+        host (str): Interface to listen on.
+        port (int): Port to listen on, 0 to pick a free port (updated once started).
+        precision (int): Number of decimals kept for the coordinates.
+        compresslevel (int): gzip compression level of the responses.
+        cache_size (int): Number of encoded query results kept in memory.
+    """
+
+    def __init__(self, index: FeatureIndex, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 precision: int = DEFAULT_COORDINATE_PRECISION, compresslevel: int = DEFAULT_GZIP_LEVEL,
+                 cache_size: int = DEFAULT_CACHE_SIZE, max_workers: Optional[int] = None):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.precision = precision
+        self.compresslevel = compresslevel
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[QueryKey, _EncodedResult]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @classmethod
+    def from_system(cls, system: UrbanMobilitySystem, **kwargs) -> "FeatureServer":
+        """
+        Index the layers of a loaded system and build a server on top of them, see FeatureServer arguments.
+        """
+        return cls(FeatureIndex.from_system(system), **kwargs)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def handle_request(self, method: str, target: str, headers: Dict[str, str]) -> Response:
+        """
+        Answer a request. Synchronous, so it can be called without a socket, e.g. from tests or other servers.
+
+        Args:
+            method: HTTP method, GET and HEAD are supported.
+            target: Request target, path and query string.
+            headers: Request headers, with lower case names.
+
+        Returns:
+            Response: The response, the body being kept for HEAD requests (dropped when sent).
+        """
+        if method not in ("GET", "HEAD"):
+            return self._error(405, f"Method {method} not allowed", {"Allow": "GET, HEAD"})
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip("/")
+        if path in ("", "/layers"):
+            return self._json_response(self._layers_summary())
+        if not path.startswith("/layers/"):
+            return self._error(404, f"Unknown path {path}")
+        name = path[len("/layers/"):]
+        if name not in self.index:
+            return self._error(404, f"Unknown layer {name}, expected one of {list(self.index.layers)}")
+        try:
+            key = self._query_key(name, parse_qs(url.query, keep_blank_values=True))
+            result = self._query(key)
+        except ValueError as e:
+            return self._error(400, str(e))
+
+        use_gzip = _accepts_gzip(headers.get("accept-encoding", ""))
+        etag = result.gzip_etag if use_gzip else result.etag
+        response_headers = {
+            "Content-Type": "application/geo+json",
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+            "Access-Control-Allow-Origin": "*",
+            "X-Feature-Count": str(result.feature_count),
+        }
+        if _etag_matches(headers.get("if-none-match", ""), etag):
+            return Response(304, headers=response_headers)
+        if use_gzip:
+            response_headers["Content-Encoding"] = "gzip"
+        return Response(200, result.gzip_body if use_gzip else result.body, response_headers)
+
+    def _query_key(self, name: str, parameters: Dict[str, List[str]]) -> QueryKey:
+        """
+        Validate and normalize the query parameters, so equivalent queries share a cache entry.
+        """
+        unknown = set(parameters) - QUERY_PARAMETERS
+        if unknown:
+            raise ValueError(f"Unknown parameters {sorted(unknown)}, expected {sorted(QUERY_PARAMETERS)}")
+        values = {key: value[-1] for key, value in parameters.items()}
+
+        bbox = None
+        if values.get("bbox"):
+            try:
+                bbox = tuple(float(v) for v in values["bbox"].split(","))
+            except ValueError:
+                bbox = ()
+            if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+        start, end = (self._parse_time(values.get(bound), bound) for bound in ("start", "end"))
+        if (start or end) and self.index[name].time_column is None:
+            raise ValueError(f"Layer {name} has no time, start and end are not supported")
+        cell = None
+        if values.get("cell"):
+            if not h3.is_valid_cell(values["cell"]):
+                raise ValueError(f"Invalid H3 cell {values['cell']}")
+            cell = h3.str_to_int(values["cell"])
+        limit = None
+        if values.get("limit"):
+            if not values["limit"].isdigit():
+                raise ValueError("limit must be a non-negative integer")
+            limit = int(values["limit"])
+        return name, bbox, start, end, cell, limit
+
+    @staticmethod
+    def _parse_time(value: Optional[str], bound: str) -> Optional[str]:
+        if not value:
+            return None
+        try:
+            return str(np.datetime64(value.rstrip("Z"), "us"))
+        except ValueError:
+            raise ValueError(f"{bound} must be an ISO date or datetime, got {value}") from None
+
+    def _query(self, key: QueryKey) -> _EncodedResult:
+        """
+        Encoded result of a query, from the LRU cache or computed.
+        """
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                return result
+
+        name, bbox, start, end, cell, limit = key
+        layer_index = self.index[name]
+        indices = layer_index.query(bbox, start and np.datetime64(start), end and np.datetime64(end), cell, limit)
+        layer = layer_index.layer.take(indices)
+        writer = GeoJSONWriter(name, name=name, precision=self.precision)
+        features = ",\n".join(writer.encode_columns(layer.geometries(), layer.columns))
+        body = f'{{"type":"FeatureCollection","name":{json.dumps(name)},"features":[\n{features}\n]}}\n'.encode()
+        result = _EncodedResult(body=body, gzip_body=gzip.compress(body, self.compresslevel, mtime=0),
+                                etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"', feature_count=len(layer))
+
+        with self._cache_lock:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _layers_summary(self) -> List[dict]:
+        summary = []
+        for name, layer_index in self.index.layers.items():
+            time_range = layer_index.time_range
+            summary.append({
+                "name": name,
+                "geometry_type": layer_index.layer.geometry_type,
+                "feature_count": len(layer_index),
+                "bbox": layer_index.bbox,
+                "time_column": layer_index.time_column,
+                "time_range": [str(t) for t in time_range] if time_range else None,
+                "url": f"/layers/{name}",
+            })
+        return summary
+
+    @staticmethod
+    def _json_response(content, status: int = 200) -> Response:
+        return Response(status, json.dumps(content).encode(),
+                        {"Content-Type": "application/json", "Access-Control-Allow-Origin": "*"})
+
+    def _error(self, status: int, message: str, headers: Optional[Dict[str, str]] = None) -> Response:
+        response = self._json_response({"error": message}, status)
+        response.headers.update(headers or {})
+        return response
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serve the requests of a connection, kept alive for HTTP/1.1 clients unless they ask to close it.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    header, _, value = line.decode("latin-1").partition(":")
+                    headers[header.strip().lower()] = value.strip()
+                if len(parts) != 3:
+                    writer.write(self._serialize(self._error(400, "Malformed request line"), "GET", False))
+                    break
+                method, target, version = parts
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if headers.get("content-length", "0") != "0" or "transfer-encoding" in headers:
+                    keep_alive = False  # request bodies are not supported, the connection cannot be reused
+                response = await loop.run_in_executor(self._executor, self.handle_request, method, target, headers)
+                writer.write(self._serialize(response, method, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    @staticmethod
+    def _serialize(response: Response, method: str, keep_alive: bool) -> bytes:
+        body = response.body if method != "HEAD" and response.status != 304 else b""
+        headers = {**response.headers, "Content-Length": str(len(response.body) if response.status != 304 else 0),
+                   "Connection": "keep-alive" if keep_alive else "close"}
+        head = f"HTTP/1.1 {response.status} {HTTP_REASONS.get(response.status, '')}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        return (head + "\r\n").encode("latin-1") + body
+
+    async def start(self) -> asyncio.AbstractServer:
+        """
+        Start listening, in the running event loop. With port 0, `port` is updated to the chosen port.
+        """
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Feature server listening on %s", self.url)
+        return self._server
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self):
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        """
+        Run the server until interrupted (Ctrl+C).
+        """
+        with suppress(KeyboardInterrupt):
+            asyncio.run(self.serve_forever())
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Console entry point: load the data of a Living Lab and serve it, or benchmark the server.
+    """
+    from sum_gtfs_geojson.shared_mobility_manager import DEFAULT_DATA_TYPES, get_city_loader
+    from .benchmark import benchmark_feature_server, default_benchmark_paths
+
+    parser = argparse.ArgumentParser(
+        prog="sum-gtfs-geojson-server",
+        description="Serve bbox, time window and H3 cell queries over the data of a Living Lab.")
+    parser.add_argument("--city", default=LivingLabsCity.GENEVA.name, choices=[c.name for c in LivingLabsCity])
+    parser.add_argument("--data-types", nargs="+", default=[t.name for t in DEFAULT_DATA_TYPES],
+                        choices=[t.name for t in DataType])
+    parser.add_argument("--radius-km", type=float, default=None)
+    parser.add_argument("--within-country", action="store_true")
+    parser.add_argument("--resolution", type=int, default=8, help="Hex grid resolution.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Run the concurrent request benchmark against a local server, then exit.")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="Requests per concurrency level.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")  # stages of the load
+
+    loader = get_city_loader(LivingLabsCity[args.city], restrict_country_boundaries=args.within_country,
+                             distance_radius_km=args.radius_km, grid_resolution=args.resolution)
+    system = loader.load_all_data([DataType[t] for t in args.data_types])
+    server = FeatureServer.from_system(system, host=args.host, port=0 if args.benchmark else args.port)
+    if args.benchmark:
+        results = benchmark_feature_server(server, default_benchmark_paths(server.index), args.concurrency,
+                                           args.requests)
+        print(json.dumps(results, indent=2))
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    main()
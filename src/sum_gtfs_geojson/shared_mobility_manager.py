@@ -1,7 +1,15 @@
 from sum_gtfs_geojson.enums import LivingLabsCity, DataType
-from sum_gtfs_geojson.loader import GenevaLoader, AbstractLoader
+from sum_gtfs_geojson.loader import GTFSFeedLoader, AbstractLoader, CityConfig, get_city_config
 from sum_gtfs_geojson.models import UrbanMobilitySystem
-from typing import Optional
+from sum_gtfs_geojson.instrumentation import LoadReport, ReportSink, ProfileOption, record_span
+from sum_gtfs_geojson.utils import Perimeter, PerimeterOption
+from sum_gtfs_geojson.exporter import ExportReport, ExportManifest, CompressionOption, library_version, \
+    compression_levels, sidecar_paths, input_keys, input_signature
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_OUTPUT_JSON_FILES_PATH = "data/sum_gtfs_geojson/geojson/"
 DEFAULT_DATA_TYPES = [
@@ -12,6 +20,141 @@ DEFAULT_DATA_TYPES = [
     DataType.BIKE_TRIPS,
     DataType.HEX_GRID
 ]
+# Data types each exported layer is built from, to find the input files of the layer
+LAYER_DATA_TYPES = {
+    "stops": [DataType.STOPS],
+    "itineraries": [DataType.STOPS, DataType.ITINERARIES],
+    "itineraries_topojson": [DataType.STOPS, DataType.ITINERARIES],
+    "bike_stations": [DataType.BIKE_STATIONS, DataType.BIKE_TRIPS],  # history reconstructed from the trips
+    "ridership": [DataType.RIDERSHIP],
+    "bike_trips": [DataType.BIKE_TRIPS],
+    "od_trips": [DataType.BIKE_TRIPS],
+    "hex_grid": [DataType.HEX_GRID],
+}
+
+
+def layer_data_types(layer_name: str) -> List[DataType]:
+    """
+    Data types an exported layer is built from. The hex grid pyramid levels (hex_grid_{resolution}res)
+    depend on the hex grid.
+    """
+    if layer_name.startswith("hex_grid"):
+        return LAYER_DATA_TYPES["hex_grid"]
+    return LAYER_DATA_TYPES.get(layer_name, [])
+
+
+def get_city_loader(city: LivingLabsCity,
+                    restrict_country_boundaries: Optional[bool] = False,
+                    distance_radius_km: Optional[float] = None,
+                    grid_resolution: Optional[int] = 8,
+                    grid_pyramid_resolutions: Optional[list[int]] = None,
+                    city_config: Optional[CityConfig] = None,
+                    perimeter: PerimeterOption = None,
+                    station_history_period: Optional[str] = None) -> AbstractLoader:
+    """
+    Get the loader of the GTFS feed and mobility files of the specified city, see get_city_config.
+    Args:
+        city_config (CityConfig, optional): Location and data files of the city. Defaults to None, the registered config of the city.
+        perimeter (optional): Study area, a GeoJSON file or a shapely Polygon or MultiPolygon, see AbstractLoader. Defaults to None.
+        station_history_period (str, optional): Period of the bike station history reconstructed from the bike trips, see AbstractLoader. Defaults to None, no history.
+    Returns:
+        An instance of the loader for the specified city.
+    """
+    return GTFSFeedLoader(city_config if city_config is not None else get_city_config(city),
+                          restrict_country_boundaries=restrict_country_boundaries,
+                          distance_radius_km=distance_radius_km,
+                          grid_resolution=grid_resolution,
+                          grid_pyramid_resolutions=grid_pyramid_resolutions,
+                          station_history_period=station_history_period,
+                          perimeter=perimeter
+                          )
+
+
+def _load_city(city_config: CityConfig, data_types: Optional[list[DataType]], restrict_country_boundaries: bool,
+               distance_radius_km: Optional[float], grid_resolution: Optional[int],
+               grid_pyramid_resolutions: Optional[list[int]],
+               perimeter: PerimeterOption,
+               station_history_period: Optional[str] = None) -> Tuple[UrbanMobilitySystem, LoadReport]:
+    """
+    Load a city in a worker process, the stages are recorded without sink and sent back with the data.
+    """
+    loader = GTFSFeedLoader(city_config, restrict_country_boundaries=restrict_country_boundaries,
+                            distance_radius_km=distance_radius_km, grid_resolution=grid_resolution,
+                            grid_pyramid_resolutions=grid_pyramid_resolutions,
+                            station_history_period=station_history_period, perimeter=perimeter)
+    return loader.load_with_report(data_types, sinks=[])
+
+
+def load_cities(cities: Sequence[LivingLabsCity],
+                data_types: Optional[list[DataType]] = DEFAULT_DATA_TYPES,
+                restrict_country_boundaries: Optional[bool] = False,
+                distance_radius_km: Optional[float] = None,
+                grid_resolution: Optional[int] = 8,
+                grid_pyramid_resolutions: Optional[list[int]] = None,
+                max_workers: Optional[int] = None,
+                city_configs: Optional[Dict[LivingLabsCity, CityConfig]] = None,
+                perimeter: PerimeterOption = None,
+                station_history_period: Optional[str] = None
+                ) -> Dict[LivingLabsCity, Tuple[UrbanMobilitySystem, LoadReport]]:
+    """
+    Load several cities concurrently, one city per worker process, with the same filters.
+    The top-level stage of every city is recorded in the active report as the city completes, and logged.
+    Args:
+        cities (list[LivingLabsCity]): The cities to load.
+        data_types (list[DataType], optional): List of data types to load. Defaults to all data types.
+        max_workers (int, optional): Maximum number of worker processes. Defaults to the number of processors.
+        city_configs (dict, optional): Location and data files of some of the cities. Defaults to None, the registered configs.
+        perimeter (optional): Study area of all the cities, see AbstractLoader. Defaults to None.
+        station_history_period (str, optional): Period of the bike station history of all the cities, see AbstractLoader. Defaults to None, no history.
+    Returns:
+        The loaded data and the LoadReport of every city, in the order of the cities.
+    """
+    configs = {city: (city_configs or {}).get(city) or get_city_config(city) for city in cities}
+    loaded = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_load_city, config, data_types, restrict_country_boundaries, distance_radius_km,
+                                   grid_resolution, grid_pyramid_resolutions, perimeter, station_history_period): city
+                   for city, config in configs.items()}
+        for future in as_completed(futures):
+            city = futures[future]
+            data, report = future.result()
+            loaded[city] = (data, report)
+            for span in report.spans:
+                span.attributes["city"] = city.name
+                record_span(span)
+                logger.info("%s %s", city.name, span.summary())
+    return {city: loaded[city] for city in configs}
+
+
+def get_default_geojson_path(city: LivingLabsCity,
+                             data_types: Optional[list[DataType]],
+                             restrict_country_boundaries: Optional[bool] = False,
+                             distance_radius_km: Optional[float] = None,
+                             grid_resolution: Optional[int] = None,
+                             output_root: str = DEFAULT_OUTPUT_JSON_FILES_PATH,
+                             perimeter: PerimeterOption = None) -> str:
+    """
+    Get the default path for saving the GeoJSON files of a filter/grid configuration.
+    Returns:
+        The default path for saving GeoJSON files, e.g. "data/sum_gtfs_geojson/geojson/geneva_within-country_1km-radius".
+    """
+    city_name = str(city.name).lower()
+    file_path = [output_root, city_name]
+
+    if restrict_country_boundaries:
+        file_path.append("_within-country")
+
+    if distance_radius_km:
+        file_path.append(f"_{distance_radius_km}km-radius")
+
+    if perimeter is not None:
+        file_path.append(f"_{Perimeter.of(perimeter).name}-perimeter")
+
+    if grid_resolution is not None and data_types and DataType.HEX_GRID in data_types:
+        file_path.append(f"_{grid_resolution}res-hexgrid")
+
+    return "".join(file_path)
+
 
 class SharedMobilityManager:
     def __init__(self,
@@ -20,7 +163,15 @@ class SharedMobilityManager:
                  geojson_output_path: Optional[str] = None,
                  restrict_country_boundaries: Optional[bool] = False,
                  distance_radius_km: Optional[float] = None,
-                 grid_resolution: Optional[int] = 8
+                 grid_resolution: Optional[int] = 8,
+                 grid_pyramid_resolutions: Optional[list[int]] = None,
+                 report_sinks: Optional[List[ReportSink]] = None,
+                 trace_memory: bool = False,
+                 profile: ProfileOption = None,
+                 city_config: Optional[CityConfig] = None,
+                 loaded: Optional[Tuple[UrbanMobilitySystem, LoadReport]] = None,
+                 perimeter: PerimeterOption = None,
+                 station_history_period: Optional[str] = None
                  ):
         """
         Initialize the SharedMobilityManager with a specific city. The initialization will load the data for the specified city and data types.  
@@ -33,15 +184,60 @@ class SharedMobilityManager:
             include_country_border_crossing (bool, optional): Flag to restrict to country data. Defaults to False, then the complete data will be loaded, including neighbor countries (when applicable).
             distance_radius_km (float, optional): The distance radius in kilometers for filtering data. Defaults to None.
             grid_resolution (int, optional): Resolution of the grid, from 0 to 15. Defaults to 8 (~1 km width, edge length ~1.22 km). Will apply only if HEX_GRID is included in data_types. Check H3 documentation for more details https://h3geo.org/docs/core-library/restable/
+            grid_pyramid_resolutions (list[int], optional): Coarser resolutions rolled up from the grid for zoom-dependent display, e.g. [5, 6, 7]. Defaults to None, no pyramid. Will apply only if HEX_GRID is included in data_types.
+            report_sinks (list[ReportSink], optional): Sinks receiving the stages of the load and of the exports, e.g. [LoggingSink(), JsonFileSink("report.json")]. Defaults to None, a LoggingSink.
+            trace_memory (bool, optional): Also measure the peak Python allocations of every stage with tracemalloc, which slows the load down. Defaults to False.
+            profile (str or StageProfiler, optional): Folder where a cProfile .pstats file per loading stage and a collapsed-stack (flamegraph) file are written, or a StageProfiler choosing the stages and the profiler. Defaults to None, no profiling.
+            city_config (CityConfig, optional): Location and data files of the city, e.g. another GTFS feed folder or zip archive. Defaults to None, the registered config of the city, see get_city_config.
+            loaded (tuple, optional): Data and LoadReport already loaded with the same parameters, see load_cities. Defaults to None, the data is loaded.
+            perimeter (optional): Study area, only the positions within it are loaded: a GeoJSON file of a canton, a commune..., or a shapely Polygon or MultiPolygon. Cached for the process. Defaults to None, no perimeter.
+            station_history_period (str, optional): Period of the bike station history reconstructed from the bike trips when both are loaded: "hour", "day_type", "day_type_hour" or "month". Defaults to None, no history.
         """
         self.city = city
         self.data_types = data_types
         self.restrict_country_boundaries = restrict_country_boundaries
         self.distance_radius_km = distance_radius_km
         self.grid_resolution = grid_resolution
+        self.grid_pyramid_resolutions = grid_pyramid_resolutions
+        self.report_sinks = report_sinks
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.city_config = city_config
+        self.perimeter = perimeter
+        self.station_history_period = station_history_period
         self.loader = self._get_loader()
         self.geojson_output_path = geojson_output_path if geojson_output_path is not None else self._get_default_geojson_path()
-        self.data = self.loader.load_all_data(data_types)
+        if loaded is not None:
+            self.data, self.load_report = loaded
+        else:
+            self._load_data(data_types)
+
+    @classmethod
+    def load_cities(cls, cities: Sequence[LivingLabsCity],
+                    data_types: Optional[list[DataType]] = DEFAULT_DATA_TYPES,
+                    restrict_country_boundaries: Optional[bool] = False,
+                    distance_radius_km: Optional[float] = None,
+                    grid_resolution: Optional[int] = 8,
+                    grid_pyramid_resolutions: Optional[list[int]] = None,
+                    max_workers: Optional[int] = None,
+                    city_configs: Optional[Dict[LivingLabsCity, CityConfig]] = None,
+                    perimeter: PerimeterOption = None,
+                    station_history_period: Optional[str] = None
+                    ) -> Dict[LivingLabsCity, "SharedMobilityManager"]:
+        """
+        Load several cities concurrently in a process pool, see load_cities, and get a manager of every city
+        to export its data.
+        Returns:
+            The manager of every city, in the order of the cities.
+        """
+        loaded = load_cities(cities, data_types, restrict_country_boundaries, distance_radius_km, grid_resolution,
+                             grid_pyramid_resolutions, max_workers, city_configs, perimeter, station_history_period)
+        return {city: cls(city, data_types, restrict_country_boundaries=restrict_country_boundaries,
+                          distance_radius_km=distance_radius_km, grid_resolution=grid_resolution,
+                          grid_pyramid_resolutions=grid_pyramid_resolutions,
+                          city_config=(city_configs or {}).get(city), loaded=city_data, perimeter=perimeter,
+                          station_history_period=station_history_period)
+                for city, city_data in loaded.items()}
 
     def _get_loader(self) -> AbstractLoader:
         """
@@ -49,25 +245,25 @@ class SharedMobilityManager:
         Returns: 
             An instance of the loader for the specified city.
         """
-        if self.city == LivingLabsCity.GENEVA:
-            return GenevaLoader(restrict_country_boundaries=self.restrict_country_boundaries,
-                                distance_radius_km=self.distance_radius_km,
-                                grid_resolution=self.grid_resolution
-                                )
-        else:
-            raise ValueError(
-                f"Unsupported Living Lab: {self.city}, no values found for this city.")
-        # Add more loaders for other cities as needed
+        return get_city_loader(self.city,
+                               restrict_country_boundaries=self.restrict_country_boundaries,
+                               distance_radius_km=self.distance_radius_km,
+                               grid_resolution=self.grid_resolution,
+                               grid_pyramid_resolutions=self.grid_pyramid_resolutions,
+                               city_config=self.city_config,
+                               perimeter=self.perimeter,
+                               station_history_period=self.station_history_period)
 
     def _load_data(self, datatypes: list[DataType] = None) -> UrbanMobilitySystem:
         """
-        Load data for the specified city and data types.
+        Load data for the specified city and data types, the stages being recorded in load_report.
         Args: 
             datatypes: List of data types to load. If None, load all data types.
         Returns: 
             An UrbanMobilitySystem object containing the loaded data.
         """
-        self.data = self.loader.load_all_data(datatypes)
+        self.data, self.load_report = self.loader.load_with_report(datatypes, self.report_sinks, self.trace_memory,
+                                                                   self.profile)
         return self.data
 
     def _get_default_geojson_path(self) -> str:
@@ -76,30 +272,73 @@ class SharedMobilityManager:
         Returns:
             The default path for saving GeoJSON files. Value is "data/geojson/{city_name}".
         """
-        city_name = str(self.city.name).lower()
-        file_path = [DEFAULT_OUTPUT_JSON_FILES_PATH, city_name]
-
-        if self.restrict_country_boundaries:
-            file_path.append("_within-country")
+        return get_default_geojson_path(self.city, self.data_types, self.restrict_country_boundaries,
+                                        self.distance_radius_km, self.grid_resolution, perimeter=self.perimeter)
 
-        if self.distance_radius_km:
-            file_path.append(f"_{self.distance_radius_km}km-radius")
-        
-        if self.grid_resolution is not None and DataType.HEX_GRID in self.data_types:
-            file_path.append(f"_{self.grid_resolution}res-hexgrid")
-
-        return "".join(file_path)
-
-    def save_to_geojson(self, output_path: str = None):
+    def save_to_geojson(self, output_path: str = None, parallel: bool = False,
+                        max_workers: Optional[int] = None, spatial_sort: bool = False,
+                        incremental: bool = False, compression: CompressionOption = None,
+                        profile: ProfileOption = None) -> ExportReport:
         """
         Save the loaded data to GeoJSON files.
+
+        A manifest.json is written next to the files, with the hashes of the input files, the loader
+        parameters and the library version each layer was built from, and the hashes of the written files.
+        With `incremental`, the layers whose inputs did not change and whose files are untouched are not
+        exported again.
         Args:
             output_path: The path where the GeoJSON files will be saved.
+            parallel (bool, optional): Export the layers concurrently in a process pool. Defaults to False.
+            max_workers (int, optional): Maximum number of worker processes for the parallel export. Defaults to the number of processors.
+            spatial_sort (bool, optional): Write the features in Hilbert curve order, for smaller compressed files. Defaults to False.
+            incremental (bool, optional): Skip the layers unchanged since the previous export, according to the manifest. Defaults to False.
+            compression (optional): Precompressed .gz/.br sidecars written with every file, e.g. ["gzip", "brotli"] or {"gzip": 9, "brotli": 11}. Defaults to None.
+            profile (str or StageProfiler, optional): Folder of a .pstats file per exported layer and of a collapsed-stack file, see UrbanMobilitySystem.save_to_geojson. Defaults to None, no profiling.
+        Returns:
+            ExportReport with the feature count and the duration of every exported layer.
         """
         if output_path is None:
             output_path = self.geojson_output_path
-        self.data.save_to_geojson(output_path)
-        print(f"Data saved to {output_path} as GeoJSON files.")
+        manifest = ExportManifest.load(output_path)
+        manifest.library_version = library_version()
+        compression = compression_levels(compression)
+        fingerprints = self._layer_fingerprints(spatial_sort, compression)
+        skip_layers = [name for name, (fingerprint, _, _) in fingerprints.items()
+                       if manifest.is_up_to_date(name, fingerprint, output_path)] if incremental else []
+
+        with self.load_report.activate():
+            report = self.data.save_to_geojson(output_path, parallel=parallel, max_workers=max_workers,
+                                              spatial_sort=spatial_sort, skip_layers=skip_layers,
+                                              compression=compression, profile=profile)
+        exported = {layer.name: layer for layer in report.layers}
+        for name, (fingerprint, inputs, parameters) in fingerprints.items():
+            if name in exported:
+                filepath = exported[name].filepath
+                manifest.record(name, fingerprint, inputs, parameters,
+                                [filepath] + sidecar_paths(filepath, compression))
+            elif name not in skip_layers:
+                manifest.layers.pop(name, None)  # empty layer, no file written
+        manifest.save(output_path)
+        return report
+
+    def _layer_fingerprints(self, spatial_sort: bool, compression: Dict[str, int]) -> Dict[str, tuple]:
+        """
+        Fingerprint, input file signatures and parameters of every layer, see ExportManifest.fingerprint.
+        The input files are recorded by portable name, see input_keys, each one being hashed once; missing
+        files are recorded as None.
+        """
+        parameters = {**self.loader.parameters(), "spatial_sort": spatial_sort, "compression": compression}
+        version = library_version()
+        layer_inputs = {name: [str(filepath) for datatype in layer_data_types(name)
+                               for filepath in self.loader.input_files(datatype)]
+                        for name in self.data.layer_names()}
+        keys = input_keys(filepath for filepaths in layer_inputs.values() for filepath in filepaths)
+        signatures = {filepath: input_signature(filepath) for filepath in keys}
+        fingerprints = {}
+        for name, filepaths in layer_inputs.items():
+            inputs = {keys[filepath]: signatures[filepath] for filepath in filepaths}
+            fingerprints[name] = (ExportManifest.fingerprint(inputs, parameters, version), inputs, parameters)
+        return fingerprints
         
     def get_data(self) -> UrbanMobilitySystem:
         """
@@ -108,6 +347,14 @@ class SharedMobilityManager:
             The loaded UrbanMobilitySystem data.
         """
         return self.data
+    def get_load_report(self) -> LoadReport:
+        """
+        Get the report of the load, with the stages of the later exports.
+        Returns:
+            The LoadReport of the stages.
+        """
+        return self.load_report
+
     def get_loader(self) -> AbstractLoader:
         """
         Get the loader used to load the data.
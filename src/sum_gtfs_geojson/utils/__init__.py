@@ -1,5 +1,33 @@
-from .geo_toolkit import GeoToolkit
+from typing import TYPE_CHECKING
+from sum_gtfs_geojson.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .geo_toolkit import GeoToolkit
+    from .od_matrix import ODMatrix, write_od_trips_layer
+    from .station_inventory import StationInventory, StationPeriod
+    from .stop_matcher import StopMatcher, StopMatchTable, normalize_stop_name
+    from .stop_deduplicator import StopDeduplicator
+    from .perimeter import Perimeter, PerimeterOption
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "GeoToolkit": ".geo_toolkit",
+    **dict.fromkeys(["ODMatrix", "write_od_trips_layer"], ".od_matrix"),
+    **dict.fromkeys(["StationInventory", "StationPeriod"], ".station_inventory"),
+    **dict.fromkeys(["StopMatcher", "StopMatchTable", "normalize_stop_name"], ".stop_matcher"),
+    "StopDeduplicator": ".stop_deduplicator",
+    **dict.fromkeys(["Perimeter", "PerimeterOption"], ".perimeter"),
+})
 
 __all__ = [
     "GeoToolkit",
+    "ODMatrix",
+    "write_od_trips_layer",
+    "StationInventory",
+    "StationPeriod",
+    "StopMatcher",
+    "StopMatchTable",
+    "normalize_stop_name",
+    "StopDeduplicator",
+    "Perimeter",
+    "PerimeterOption",
 ]
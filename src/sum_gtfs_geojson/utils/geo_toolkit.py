@@ -1,7 +1,20 @@
-from typing import List
+from typing import Iterable, List, Literal, Optional, Tuple
 from shapely.geometry import Point, MultiPoint
 import h3
-from sum_gtfs_geojson.models import HexGrid, HexCell
+import numpy as np
+from scipy.spatial import cKDTree
+from h3.api import basic_int as h3_int
+from sum_gtfs_geojson.models import HexGrid, HexCell, HexPyramid
+from sum_gtfs_geojson.exporter import ColumnarLayer
+
+H3_RESOLUTION_OFFSET = np.uint64(52)
+H3_RESOLUTION_MASK = np.uint64(0xF) << H3_RESOLUTION_OFFSET
+H3_MAX_RESOLUTION = 15
+HILBERT_ORDER = 16  # 2^16 x 2^16 grid, ~1 m cells over a city
+SPATIAL_SORT_H3_RESOLUTION = 12
+EARTH_RADIUS_M = 6371008.8
+
+SpatialSortMethod = Literal["hilbert", "h3"]
 
 
 class GeoToolkit:
@@ -28,17 +41,287 @@ class GeoToolkit:
         convex_hull = multipoint.convex_hull
         buffered_polygon = convex_hull.buffer(0.01)
 
-        coords = [(x, y) for x, y in buffered_polygon.exterior.coords]
+        # H3 polygons are defined with (lat, lng) vertices
+        coords = [(y, x) for x, y in buffered_polygon.exterior.coords]
         polygon = h3.LatLngPoly(coords)
 
         hex_ids = h3.polygon_to_cells(polygon, resolution)
 
-        cells = []
-        for h3_id in hex_ids:
-            lat, lon = h3.cell_to_latlng(h3_id)
-            center = (lon, lat)
-            boundary = h3.cell_to_boundary(h3_id)
-            polygon = [(point[0], point[1]) for point in boundary]
-            cells.append(HexCell(h3_id=h3_id, center=center, polygon=polygon))
+        cells = [GeoToolkit._build_hex_cell(h3_id) for h3_id in hex_ids]
 
         return HexGrid(resolution=resolution, cells=cells)
+
+    @staticmethod
+    def generate_hex_pyramid(grid: HexGrid, resolutions: Iterable[int]) -> HexPyramid:
+        """
+        Roll up a hexagonal grid into coarser resolutions, for zoom-dependent display.
+
+        Each level is aggregated from the next finer one, so every level costs about a seventh
+        of the previous one. The cell metrics are summed into the parent cells.
+
+        Args:
+            grid: The finest hex grid, its resolution is included in the pyramid.
+            resolutions: H3 resolution levels to generate, lower or equal to the grid resolution.
+
+        Returns:
+            HexPyramid with one HexGrid per resolution.
+        """
+        resolutions = sorted(set(resolutions) | {grid.resolution}, reverse=True)
+        if resolutions[0] > grid.resolution or resolutions[-1] < 0:
+            raise ValueError(
+                f"Pyramid resolutions must be between 0 and the grid resolution {grid.resolution}")
+
+        metric_names = grid.metric_names
+        cells = np.array([h3.str_to_int(cell.h3_id) for cell in grid.cells], dtype=np.uint64)
+        metrics = np.array([[cell.metrics.get(name, 0) for name in metric_names] for cell in grid.cells],
+                           dtype=np.int64).reshape(len(cells), len(metric_names))
+
+        levels = {grid.resolution: grid}
+        for resolution in resolutions[1:]:
+            parents, inverse = np.unique(
+                GeoToolkit.cells_to_parent(cells, resolution), return_inverse=True)
+            parent_metrics = np.zeros((len(parents), len(metric_names)), dtype=np.int64)
+            np.add.at(parent_metrics, inverse, metrics)
+
+            level_cells = []
+            for parent, values in zip(parents.tolist(), parent_metrics.tolist()):
+                cell = GeoToolkit._build_hex_cell(h3.int_to_str(parent))
+                cell.metrics = dict(zip(metric_names, values))
+                level_cells.append(cell)
+            levels[resolution] = HexGrid(resolution=resolution, cells=level_cells)
+
+            cells, metrics = parents, parent_metrics
+
+        return HexPyramid(levels=levels)
+
+    @staticmethod
+    def cells_to_parent(cells: np.ndarray, resolution: int) -> np.ndarray:
+        """
+        Vectorized equivalent of `h3.cell_to_parent` for integer H3 cell indexes.
+
+        The parent index is computed with bit operations: the resolution field is replaced,
+        and the digits of the finer resolutions are set to the unused value 7.
+
+        Args:
+            cells: Array of integer H3 cell indexes, at a resolution higher or equal to `resolution`.
+            resolution: H3 resolution of the parents.
+
+        Returns:
+            np.ndarray: uint64 array with the parent index of every cell.
+        """
+        if resolution < 0 or resolution > H3_MAX_RESOLUTION:
+            raise ValueError("Resolution must be between 0 and 15")
+        cells = np.asarray(cells, dtype=np.uint64)
+        unused_digits = (np.uint64(1) << np.uint64(3 * (H3_MAX_RESOLUTION - resolution))) - np.uint64(1)
+        return (cells & ~H3_RESOLUTION_MASK) | (np.uint64(resolution) << H3_RESOLUTION_OFFSET) | unused_digits
+
+    @staticmethod
+    def _build_hex_cell(h3_id: str) -> HexCell:
+        """
+        Build the HexCell of an H3 cell identifier, with (lon, lat) center and boundary.
+        """
+        lat, lon = h3.cell_to_latlng(h3_id)
+        center = (lon, lat)
+        boundary = h3.cell_to_boundary(h3_id)
+        polygon = [(point[1], point[0]) for point in boundary]
+        return HexCell(h3_id=h3_id, center=center, polygon=polygon)
+
+    @staticmethod
+    def points_to_cells(latitudes: np.ndarray, longitudes: np.ndarray, resolution: int) -> np.ndarray:
+        """
+        Bin WGS84 positions into H3 cells, returned as integer cell indexes.
+
+        Integer indexes (instead of the usual hexadecimal strings) keep the result in a
+        compact uint64 array, so it can be grouped with numpy without any string handling.
+        Use `h3.int_to_str` to convert a cell back to its string identifier.
+
+        Args:
+            latitudes: Array of latitudes.
+            longitudes: Array of longitudes, same length as latitudes.
+            resolution: H3 resolution level (int), from 0 to 15.
+
+        Returns:
+            np.ndarray: uint64 array with the H3 cell index of every position.
+        """
+        if resolution < 0 or resolution > 15:
+            raise ValueError("Resolution must be between 0 and 15")
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        if latitudes.shape != longitudes.shape:
+            raise ValueError("Latitudes and longitudes must have the same length")
+
+        latlng_to_cell = h3_int.latlng_to_cell
+        return np.fromiter(
+            (latlng_to_cell(lat, lon, resolution)
+             for lat, lon in zip(latitudes.tolist(), longitudes.tolist())),
+            dtype=np.uint64,
+            count=len(latitudes),
+        )
+
+    @staticmethod
+    def cell_centers(cells: np.ndarray) -> np.ndarray:
+        """
+        Get the center of H3 cells given as integer indexes.
+
+        Args:
+            cells: Array of integer H3 cell indexes.
+
+        Returns:
+            np.ndarray: Array of shape (n, 2) with the (longitude, latitude) of each cell center.
+        """
+        centers = np.empty((len(cells), 2), dtype=np.float64)
+        for i, cell in enumerate(np.asarray(cells).tolist()):
+            lat, lon = h3_int.cell_to_latlng(cell)
+            centers[i] = (lon, lat)
+        return centers
+
+    @staticmethod
+    def local_xy(longitudes: np.ndarray, latitudes: np.ndarray, origin_latitude: float) -> np.ndarray:
+        """
+        Project WGS84 positions to local equirectangular metres, accurate to a few metres over a city.
+
+        Args:
+            longitudes: Array of longitudes.
+            latitudes: Array of latitudes, same length as longitudes.
+            origin_latitude: Latitude where the scale is exact, e.g. the city center.
+
+        Returns:
+            np.ndarray: Array of shape (n, 2) with the (x, y) of each position in metres.
+        """
+        scale = np.radians(1) * EARTH_RADIUS_M
+        x = np.asarray(longitudes, dtype=np.float64) * scale * np.cos(np.radians(origin_latitude))
+        return np.column_stack([x, np.asarray(latitudes, dtype=np.float64) * scale])
+
+    @staticmethod
+    def nearest_points(latitudes: np.ndarray, longitudes: np.ndarray, reference_latitudes: np.ndarray,
+                       reference_longitudes: np.ndarray,
+                       max_distance_m: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Snap positions to their nearest reference point, e.g. trip ends to bike stations, with a KD-tree
+        over the reference points in local metres, see local_xy.
+
+        Args:
+            latitudes: Array of latitudes of the positions to snap.
+            longitudes: Array of longitudes, same length as latitudes.
+            reference_latitudes: Array of latitudes of the reference points.
+            reference_longitudes: Array of longitudes of the reference points.
+            max_distance_m: Positions farther than this from every reference point are not snapped.
+                Defaults to None, no limit.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The index of the nearest reference point of every position,
+                -1 when not snapped, and the distance to it in metres, inf when not snapped.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        if latitudes.shape != longitudes.shape:
+            raise ValueError("Latitudes and longitudes must have the same length")
+        indices = np.full(len(latitudes), -1, dtype=np.int64)
+        distances = np.full(len(latitudes), np.inf)
+        located = np.flatnonzero(~(np.isnan(latitudes) | np.isnan(longitudes)))
+        if not len(reference_latitudes) or not len(located):
+            return indices, distances
+        origin_latitude = float(np.mean(reference_latitudes))
+        tree = cKDTree(GeoToolkit.local_xy(reference_longitudes, reference_latitudes, origin_latitude))
+        found_distances, found = tree.query(
+            GeoToolkit.local_xy(longitudes[located], latitudes[located], origin_latitude),
+            distance_upper_bound=np.inf if max_distance_m is None else max_distance_m)
+        snapped = found < len(reference_latitudes)  # cKDTree returns n for the positions beyond the bound
+        indices[located[snapped]] = found[snapped]
+        distances[located[snapped]] = found_distances[snapped]
+        return indices, distances
+
+    @staticmethod
+    def hilbert_keys(longitudes: np.ndarray, latitudes: np.ndarray,
+                     bounds: Optional[Tuple[float, float, float, float]] = None,
+                     order: int = HILBERT_ORDER) -> np.ndarray:
+        """
+        Compute the distance of positions along a Hilbert curve, in a single vectorized pass.
+
+        The positions are scaled to a 2^order x 2^order grid over `bounds`, and the classic
+        xy-to-distance algorithm is applied to all positions at once, one bit level at a time.
+        Positions close along the curve are close in space, so sorting by key groups nearby features.
+
+        Args:
+            longitudes: Array of longitudes.
+            latitudes: Array of latitudes, same length as longitudes.
+            bounds: (min_lon, min_lat, max_lon, max_lat) of the grid. Defaults to the bounds of the positions.
+            order: Number of bits per axis, from 1 to 31. Defaults to 16.
+
+        Returns:
+            np.ndarray: uint64 array with the Hilbert distance of every position.
+        """
+        if order < 1 or order > 31:
+            raise ValueError("Order must be between 1 and 31")
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        if latitudes.shape != longitudes.shape:
+            raise ValueError("Latitudes and longitudes must have the same length")
+        if not len(longitudes):
+            return np.empty(0, dtype=np.uint64)
+        if bounds is None:
+            bounds = (longitudes.min(), latitudes.min(), longitudes.max(), latitudes.max())
+        min_lon, min_lat, max_lon, max_lat = bounds
+
+        side = (1 << order) - 1
+        x = np.rint((longitudes - min_lon) / max(max_lon - min_lon, 1e-12) * side)
+        y = np.rint((latitudes - min_lat) / max(max_lat - min_lat, 1e-12) * side)
+        x = np.clip(x, 0, side).astype(np.int64)
+        y = np.clip(y, 0, side).astype(np.int64)
+
+        keys = np.zeros(len(x), dtype=np.uint64)
+        s = 1 << (order - 1)
+        while s > 0:
+            rx = (x & s) > 0
+            ry = (y & s) > 0
+            keys += np.uint64(s) * np.uint64(s) * ((3 * rx) ^ ry).astype(np.uint64)
+            # Rotate the quadrant, so the sub-curve is in the standard orientation
+            flip = ~ry & rx
+            x = np.where(flip, side - x, x)
+            y = np.where(flip, side - y, y)
+            x, y = np.where(ry, x, y), np.where(ry, y, x)
+            s >>= 1
+        return keys
+
+    @staticmethod
+    def spatial_sort_order(longitudes: np.ndarray, latitudes: np.ndarray, method: SpatialSortMethod = "hilbert",
+                           resolution: int = SPATIAL_SORT_H3_RESOLUTION) -> np.ndarray:
+        """
+        Get the indexes sorting positions in spatial order.
+
+        Args:
+            longitudes: Array of longitudes.
+            latitudes: Array of latitudes, same length as longitudes.
+            method: "hilbert" for the Hilbert curve distance, "h3" for the integer H3 cell index
+                (hierarchical, cells sharing a parent are contiguous). Defaults to "hilbert".
+            resolution: H3 resolution used by the "h3" method. Defaults to 12.
+
+        Returns:
+            np.ndarray: The indexes of the positions in spatial order, ties keep their original order.
+        """
+        if method == "hilbert":
+            keys = GeoToolkit.hilbert_keys(longitudes, latitudes)
+        elif method == "h3":
+            keys = GeoToolkit.points_to_cells(latitudes, longitudes, resolution)
+        else:
+            raise ValueError(f"Unsupported spatial sort method: {method}, expected 'hilbert' or 'h3'")
+        return np.argsort(keys, kind="stable")
+
+    @staticmethod
+    def sort_layer(layer: ColumnarLayer, method: SpatialSortMethod = "hilbert") -> ColumnarLayer:
+        """
+        Reorder the features of a columnar layer by the spatial key of their centroid, see spatial_sort_order.
+        Every exporter writes the features in layer order, so a sorted layer gives smaller compressed files
+        and contiguous reads of nearby features.
+
+        Args:
+            layer: The layer to sort.
+            method: "hilbert" or "h3". Defaults to "hilbert".
+
+        Returns:
+            ColumnarLayer: A new layer with the features in spatial order.
+        """
+        if len(layer) < 2:
+            return layer
+        centroids = layer.centroids()
+        return layer.take(GeoToolkit.spatial_sort_order(centroids[:, 0], centroids[:, 1], method))
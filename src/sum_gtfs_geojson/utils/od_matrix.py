@@ -0,0 +1,217 @@
+from typing import List, Optional, Tuple
+import json
+import time
+import h3
+import numpy as np
+from scipy import sparse
+from sum_gtfs_geojson.models import BikeTrip
+from sum_gtfs_geojson.exporter import ColumnarLayer, LayerExportReport, CompressionOption, atomic_write
+from .geo_toolkit import GeoToolkit
+
+DEFAULT_OD_RESOLUTION = 8
+DEFAULT_OD_TOP_N = 500
+
+
+class ODMatrix:
+    """
+    Sparse origin-destination flow matrix between H3 cells.
+
+    Rows are origin cells and columns destination cells, both indexed by `cells`.
+    Each value is the number of trips going from the origin to the destination cell.
+
+    Attributes:
+        cells (np.ndarray): uint64 array of the H3 cell indexes used by the matrix, sorted.
+        flows (sparse.csr_matrix): Square matrix of trip counts, shape (len(cells), len(cells)).
+        resolution (int): H3 resolution of the cells.
+    """
+
+    def __init__(self, cells: np.ndarray, flows: sparse.csr_matrix, resolution: int):
+        self.cells = cells
+        self.flows = flows
+        self.resolution = resolution
+
+    @classmethod
+    def from_arrays(cls,
+                    latitude_start: np.ndarray,
+                    longitude_start: np.ndarray,
+                    latitude_end: np.ndarray,
+                    longitude_end: np.ndarray,
+                    resolution: int = DEFAULT_OD_RESOLUTION,
+                    started_at: Optional[np.ndarray] = None,
+                    time_of_day: Optional[Tuple[float, float]] = None) -> "ODMatrix":
+        """
+        Build the OD matrix from columnar trip positions.
+
+        Args:
+            latitude_start: Latitudes of the trip origins.
+            longitude_start: Longitudes of the trip origins.
+            latitude_end: Latitudes of the trip destinations.
+            longitude_end: Longitudes of the trip destinations.
+            resolution: H3 resolution used to bin the positions. Defaults to 8.
+            started_at: Trip start timestamps (datetime64), required when time_of_day is set.
+            time_of_day: Optional (start_hour, end_hour) window applied to the trip start time,
+                end excluded. Hours may be fractional, and the window may wrap around midnight, e.g. (22, 2).
+
+        Returns:
+            ODMatrix: The aggregated flows.
+        """
+        latitude_start = np.asarray(latitude_start, dtype=np.float64)
+        longitude_start = np.asarray(longitude_start, dtype=np.float64)
+        latitude_end = np.asarray(latitude_end, dtype=np.float64)
+        longitude_end = np.asarray(longitude_end, dtype=np.float64)
+
+        mask = ~(np.isnan(latitude_start) | np.isnan(longitude_start) |
+                 np.isnan(latitude_end) | np.isnan(longitude_end))
+        if time_of_day is not None:
+            if started_at is None:
+                raise ValueError("started_at is required to slice trips by time of day.")
+            mask &= cls._time_of_day_mask(started_at, time_of_day)
+
+        origins = GeoToolkit.points_to_cells(
+            latitude_start[mask], longitude_start[mask], resolution)
+        destinations = GeoToolkit.points_to_cells(
+            latitude_end[mask], longitude_end[mask], resolution)
+
+        # Factorize both ends on a shared index, so the matrix is square
+        cells, inverse = np.unique(np.concatenate([origins, destinations]), return_inverse=True)
+        rows = inverse[:len(origins)]
+        cols = inverse[len(origins):]
+        flows = sparse.coo_matrix(
+            (np.ones(len(rows), dtype=np.int64), (rows, cols)),
+            shape=(len(cells), len(cells))
+        ).tocsr()  # duplicates are summed on conversion
+
+        return cls(cells=cells, flows=flows, resolution=resolution)
+
+    @classmethod
+    def from_bike_trips(cls,
+                        bike_trips: List[BikeTrip],
+                        resolution: int = DEFAULT_OD_RESOLUTION,
+                        time_of_day: Optional[Tuple[float, float]] = None) -> "ODMatrix":
+        """
+        Build the OD matrix from a list of bike trips.
+
+        Args:
+            bike_trips: List of BikeTrip objects.
+            resolution: H3 resolution used to bin the positions. Defaults to 8.
+            time_of_day: Optional (start_hour, end_hour) window applied to the trip start time.
+
+        Returns:
+            ODMatrix: The aggregated flows.
+        """
+        count = len(bike_trips)
+        started_at = None
+        if time_of_day is not None:
+            started_at = np.array(
+                [t.trip_started_at_utc.replace(tzinfo=None) for t in bike_trips], dtype="datetime64[ns]")
+        return cls.from_arrays(
+            np.fromiter((t.latitude_start for t in bike_trips), dtype=np.float64, count=count),
+            np.fromiter((t.longitude_start for t in bike_trips), dtype=np.float64, count=count),
+            np.fromiter((t.latitude_end for t in bike_trips), dtype=np.float64, count=count),
+            np.fromiter((t.longitude_end for t in bike_trips), dtype=np.float64, count=count),
+            resolution=resolution,
+            started_at=started_at,
+            time_of_day=time_of_day,
+        )
+
+    @staticmethod
+    def _time_of_day_mask(started_at: np.ndarray, time_of_day: Tuple[float, float]) -> np.ndarray:
+        """
+        Select the timestamps whose time of day falls in the [start_hour, end_hour) window.
+        """
+        started_at = np.asarray(started_at, dtype="datetime64[ns]")
+        hours = (started_at - started_at.astype("datetime64[D]")) / np.timedelta64(1, "h")
+        start_hour, end_hour = time_of_day
+        if start_hour <= end_hour:
+            return (hours >= start_hour) & (hours < end_hour)
+        return (hours >= start_hour) | (hours < end_hour)
+
+    @property
+    def total_trips(self) -> int:
+        """
+        Total number of trips aggregated in the matrix.
+        """
+        return int(self.flows.sum())
+
+    def top_flows(self, n: Optional[int] = DEFAULT_OD_TOP_N, include_intra_cell: bool = False) -> List[dict]:
+        """
+        Get the largest flows of the matrix, in decreasing order of demand.
+
+        Args:
+            n: Number of flows to keep. If None, all flows are returned. Defaults to 500.
+            include_intra_cell: Keep the trips starting and ending in the same cell. Defaults to False.
+
+        Returns:
+            List[dict]: One dict per flow with origin and destination H3 ids, the cell center
+            coordinates as [[lon, lat], [lon, lat]] and the demand (trip count).
+        """
+        coo = self.flows.tocoo()
+        rows, cols, demand = coo.row, coo.col, coo.data
+        if not include_intra_cell:
+            keep = rows != cols
+            rows, cols, demand = rows[keep], cols[keep], demand[keep]
+
+        if n is not None and n < len(demand):
+            selected = np.argpartition(-demand, n)[:n]
+        else:
+            selected = np.arange(len(demand))
+        selected = selected[np.argsort(-demand[selected], kind="stable")]
+
+        used_cells = np.unique(np.concatenate([rows[selected], cols[selected]]))
+        centers = dict(zip(used_cells.tolist(),
+                           GeoToolkit.cell_centers(self.cells[used_cells]).tolist()))
+
+        flows = []
+        for i in selected.tolist():
+            origin, destination = int(rows[i]), int(cols[i])
+            flows.append({
+                "origin": h3.int_to_str(int(self.cells[origin])),
+                "destination": h3.int_to_str(int(self.cells[destination])),
+                "coordinates": [centers[origin], centers[destination]],
+                "demand": int(demand[i]),
+            })
+        return flows
+
+    def to_od_trips_json(self, filepath: str = None, top_n: Optional[int] = DEFAULT_OD_TOP_N,
+                         compression: CompressionOption = None) -> List[dict]:
+        """
+        Export the top flows in the `od_trips.json` format read by the map demo.
+
+        Args:
+            filepath (str): The path to the output JSON file. Optional, if defined it will be saved to this path.
+            top_n: Number of flows to export. If None, all flows are exported. Defaults to 500.
+            compression: Compressed sidecars written with the file, see compression_levels. Defaults to None.
+
+        Returns:
+            List[dict]: The exported flows.
+        """
+        flows = self.top_flows(top_n)
+        if filepath is not None:
+            with atomic_write(filepath, compression=compression) as f:
+                json.dump(flows, f)
+        return flows
+
+
+def write_od_trips_layer(bike_trips: ColumnarLayer, filepath: str, resolution: int = DEFAULT_OD_RESOLUTION,
+                         top_n: Optional[int] = DEFAULT_OD_TOP_N,
+                         compression: CompressionOption = None) -> LayerExportReport:
+    """
+    Write od_trips.json from the columnar bike trips layer. Top-level function, so it can run in a worker process.
+
+    Args:
+        bike_trips: The bike trips layer, one (start, end) LineString per trip.
+        filepath: The path to the output JSON file.
+        resolution: H3 resolution used to bin the trips. Defaults to 8.
+        top_n: Number of flows to export. If None, all flows are exported. Defaults to 500.
+        compression: Compressed sidecars written with the file, see compression_levels. Defaults to None.
+
+    Returns:
+        LayerExportReport: The timing of the export.
+    """
+    start = time.perf_counter()
+    starts = bike_trips.coordinates[bike_trips.offsets[:-1]]
+    ends = bike_trips.coordinates[bike_trips.offsets[1:] - 1]
+    od_matrix = ODMatrix.from_arrays(starts[:, 1], starts[:, 0], ends[:, 1], ends[:, 0], resolution)
+    flows = od_matrix.to_od_trips_json(filepath, top_n, compression)
+    return LayerExportReport(name="od_trips", filepath=filepath,
+                             feature_count=len(flows), seconds=time.perf_counter() - start)
@@ -0,0 +1,126 @@
+from hashlib import sha1
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Optional, Union
+import os
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+CRS_GEOGRAPHIC = "EPSG:4326"
+
+_PERIMETERS: Dict[Hashable, "Perimeter"] = {}
+
+
+class Perimeter:
+    """
+    Polygonal study area, e.g. a canton, a commune or a custom polygon, to keep the positions within it.
+
+    The geometry is prepared once, and positions are tested in batches: the positions outside the bounding
+    box are rejected with array comparisons, and the others are tested with one vectorized
+    shapely.contains_xy call. Perimeters read from a file or built from a geometry with `Perimeter.of`
+    are cached, so they are read and prepared once for all the loads of the process.
+
+    Usage:
+        perimeter = Perimeter.of("data/canton_geneve.geojson")
+        inside = perimeter.contains(latitudes, longitudes)
+
+    Attributes:
+        geometry (BaseGeometry): The Polygon or MultiPolygon, in WGS84 (lon, lat).
+        name (str): Name of the perimeter, e.g. the file name, used in the output folder names.
+        source (str, optional): The file the perimeter is read from, None for a geometry.
+    """
+
+    def __init__(self, geometry: BaseGeometry, name: Optional[str] = None, source: Optional[str] = None):
+        if geometry.geom_type not in ("Polygon", "MultiPolygon"):
+            raise ValueError(f"A perimeter must be a Polygon or a MultiPolygon, got a {geometry.geom_type}")
+        if geometry.is_empty:
+            raise ValueError("A perimeter must not be empty")
+        self.geometry = geometry
+        shapely.prepare(self.geometry)
+        self.bounds = geometry.bounds  # (min lon, min lat, max lon, max lat)
+        self.name = name if name is not None else f"polygon-{sha1(geometry.wkb).hexdigest()[:8]}"
+        self.source = source
+
+    def __repr__(self) -> str:
+        return f"Perimeter(name={self.name!r}, bounds={self.bounds})"
+
+    @classmethod
+    def from_file(cls, filepath: Union[str, Path], name: Optional[str] = None) -> "Perimeter":
+        """
+        Read a perimeter from a GeoJSON file, or any file readable by geopandas, as the union of its
+        polygons in WGS84.
+
+        Args:
+            filepath: The file.
+            name: Name of the perimeter. Defaults to None, the file name without extension.
+
+        Returns:
+            Perimeter: The perimeter, not cached, see Perimeter.of.
+        """
+        boundaries = gpd.read_file(filepath)
+        if boundaries.crs is not None and boundaries.crs != CRS_GEOGRAPHIC:
+            boundaries = boundaries.to_crs(CRS_GEOGRAPHIC)
+        polygons = boundaries.geometry[boundaries.geometry.geom_type.isin(["Polygon", "MultiPolygon"])]
+        if polygons.empty:
+            raise ValueError(f"No polygon found in the perimeter file {filepath}")
+        return cls(shapely.union_all(polygons.to_numpy()), name if name is not None else Path(filepath).stem,
+                   str(filepath))
+
+    @classmethod
+    def cached(cls, key: Hashable, build: Callable[[], "Perimeter"]) -> "Perimeter":
+        """
+        Perimeter built once per key for the process, e.g. a country boundary.
+        """
+        if key not in _PERIMETERS:
+            _PERIMETERS[key] = build()
+        return _PERIMETERS[key]
+
+    @classmethod
+    def of(cls, perimeter: "PerimeterOption") -> Optional["Perimeter"]:
+        """
+        Cached perimeter of a `perimeter=` option: a file, a shapely Polygon or MultiPolygon, or a Perimeter.
+        A file is read again when it is modified.
+
+        Args:
+            perimeter: The option, None for no perimeter.
+
+        Returns:
+            Perimeter: The perimeter, None when perimeter is None.
+        """
+        if perimeter is None or isinstance(perimeter, Perimeter):
+            return perimeter
+        if isinstance(perimeter, BaseGeometry):
+            return cls.cached(("geometry", perimeter.wkb), lambda: cls(perimeter))
+        filepath = os.path.abspath(perimeter)
+        return cls.cached(("file", filepath, os.stat(filepath).st_mtime_ns), lambda: cls.from_file(perimeter))
+
+    def contains(self, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """
+        Vectorized test of many positions, with a bounding box prefilter.
+
+        Args:
+            latitudes (np.ndarray): latitudes, NaN for missing values.
+            longitudes (np.ndarray): longitudes, NaN for missing values.
+
+        Returns:
+            np.ndarray: Boolean mask of the positions within the perimeter, False for missing values.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        min_lon, min_lat, max_lon, max_lat = self.bounds
+        inside = (longitudes >= min_lon) & (longitudes <= max_lon) & (latitudes >= min_lat) & (latitudes <= max_lat)
+        inside[inside] = shapely.contains_xy(self.geometry, longitudes[inside], latitudes[inside])
+        return inside
+
+    def contains_point(self, latitude: float, longitude: float) -> bool:
+        """
+        Test a single position, see contains.
+        """
+        min_lon, min_lat, max_lon, max_lat = self.bounds
+        if not (min_lon <= longitude <= max_lon and min_lat <= latitude <= max_lat):
+            return False
+        return bool(shapely.contains_xy(self.geometry, longitude, latitude))
+
+
+PerimeterOption = Union[None, str, Path, BaseGeometry, Perimeter]
@@ -0,0 +1,207 @@
+from typing import Dict, List, Literal, Optional, Tuple
+from datetime import datetime
+import numpy as np
+from sum_gtfs_geojson.models import BikeTripStore, StationInfoStatus
+from sum_gtfs_geojson.models.gbfs import StationStatusPeriod
+from .geo_toolkit import GeoToolkit
+
+StationPeriod = Literal["hour", "day_type", "day_type_hour", "month"]
+DEFAULT_STATION_PERIOD = "hour"
+DEFAULT_SNAP_DISTANCE_M = 100
+DAY_TYPES = ("weekday", "weekend")
+
+
+class StationInventory:
+    """
+    Inventory timeline of every bike station, reconstructed from the bike trips.
+
+    Trip origins and destinations are snapped to their nearest station, and every trip becomes two events:
+    -1 at its origin station when it starts and +1 at its destination station when it ends. The events are
+    sorted by station then time, and a cumulative sum per station gives the net flow since the first event.
+    Rebalancing is not in the trips, so the inventory is the net flow shifted so that its minimum is zero,
+    i.e. the fewest bikes the station needs to serve every departure. It is an estimate: the StationStatusPeriod
+    rows only report the observed departures, arrivals and net flow, not the availability.
+
+    Usage:
+        inventory = StationInventory.from_trip_store(ums.bike_trip_store, ums.bike_stations)
+        history = inventory.history_by_station("day_type_hour")
+
+    Attributes:
+        station_ids (np.ndarray): Identifier of every station, events refer to their index in this array.
+        event_stations (np.ndarray): Station index of every event, sorted.
+        event_times (np.ndarray): datetime64[ns] time of every event, sorted within each station.
+        event_deltas (np.ndarray): +1 for an arrival, -1 for a departure.
+        inventory (np.ndarray): Number of bikes at the station after every event.
+    """
+
+    def __init__(self, station_ids: np.ndarray, event_stations: np.ndarray, event_times: np.ndarray,
+                 event_deltas: np.ndarray, inventory: np.ndarray):
+        self.station_ids = station_ids
+        self.event_stations = event_stations
+        self.event_times = event_times
+        self.event_deltas = event_deltas
+        self.inventory = inventory
+
+    @classmethod
+    def from_trip_store(cls, store: BikeTripStore, stations: List[StationInfoStatus],
+                        max_distance_m: Optional[float] = DEFAULT_SNAP_DISTANCE_M) -> "StationInventory":
+        """
+        Reconstruct the inventory timelines from the trips and the station positions.
+
+        Args:
+            store: The bike trips.
+            stations: The bike stations. Stations without position get no event.
+            max_distance_m: Trip ends farther than this from every station (free-floating parking) are
+                ignored. Defaults to 100 m.
+
+        Returns:
+            StationInventory: The timelines of the stations.
+        """
+        station_ids = np.array([s.station_id for s in stations], dtype=str)
+        latitudes = np.array([np.nan if s.lat is None else s.lat for s in stations], dtype=np.float64)
+        longitudes = np.array([np.nan if s.lon is None else s.lon for s in stations], dtype=np.float64)
+        located = np.flatnonzero(~(np.isnan(latitudes) | np.isnan(longitudes)))
+
+        def snap(latitude_column: str, longitude_column: str) -> np.ndarray:
+            if not len(located):
+                return np.full(len(store), -1, dtype=np.int64)
+            nearest, _ = GeoToolkit.nearest_points(store[latitude_column], store[longitude_column],
+                                                   latitudes[located], longitudes[located], max_distance_m)
+            return np.where(nearest >= 0, located[np.maximum(nearest, 0)], -1)
+
+        origins = snap("latitude_start", "longitude_start")
+        destinations = snap("latitude_end", "longitude_end")
+        event_stations = np.concatenate([origins, destinations])
+        event_times = np.concatenate([store.started_at, store.ended_at])
+        event_deltas = np.concatenate([np.full(len(store), -1, dtype=np.int64), np.ones(len(store), dtype=np.int64)])
+        snapped = event_stations >= 0
+        event_stations, event_times, event_deltas = (
+            event_stations[snapped], event_times[snapped], event_deltas[snapped])
+
+        # arrivals before departures at the same time, so a bike returned and rented again never goes negative
+        order = np.lexsort((-event_deltas, event_times, event_stations))
+        event_stations, event_times, event_deltas = event_stations[order], event_times[order], event_deltas[order]
+
+        inventory = np.empty(0, dtype=np.int64)
+        if len(event_stations):
+            starts = np.flatnonzero(np.r_[True, event_stations[1:] != event_stations[:-1]])
+            counts = np.diff(np.r_[starts, len(event_stations)])
+            running = np.cumsum(event_deltas)
+            net_flow = running - np.repeat(running[starts] - event_deltas[starts], counts)
+            # the station starts with enough bikes to serve every departure, the net flow before any event being 0
+            initial = -np.minimum(np.minimum.reduceat(net_flow, starts), 0)
+            inventory = net_flow + np.repeat(initial, counts)
+        return cls(station_ids, event_stations, event_times, event_deltas, inventory)
+
+    def __len__(self) -> int:
+        return len(self.event_times)
+
+    def timeline(self, station_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Inventory timeline of a station.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The event times and the number of bikes after each event.
+        """
+        station = np.flatnonzero(self.station_ids == station_id)
+        if not len(station):
+            raise KeyError(f"Unknown station: {station_id}")
+        low, high = np.searchsorted(self.event_stations, [station[0], station[0] + 1])
+        return self.event_times[low:high], self.inventory[low:high]
+
+    def period_codes(self, period: StationPeriod) -> Tuple[np.ndarray, List[str], List[str]]:
+        """
+        Period of every event.
+
+        Args:
+            period: "hour" for the hour of the day, "day_type" for weekday or weekend, "day_type_hour" for
+                both, "month" for the calendar month. Hours and days are in UTC, as the trip timestamps.
+
+        Returns:
+            Tuple[np.ndarray, List[str], List[str]]: The period code of every event, and the identifier and
+                label of every code.
+        """
+        days = self.event_times.astype("datetime64[D]")
+        hours = ((self.event_times - days) // np.timedelta64(1, "h")).astype(np.int64)
+        day_types = ((days.astype(np.int64) + 3) % 7 >= 5).astype(np.int64)  # 1970-01-01 was a Thursday
+        hour_ids = [f"{hour:02d}" for hour in range(24)]
+        hour_labels = [f"{hour:02d}:00-{hour + 1:02d}:00" for hour in range(24)]
+        if period == "hour":
+            return hours, [f"hour_{hour}" for hour in hour_ids], hour_labels
+        if period == "day_type":
+            return day_types, list(DAY_TYPES), [day_type.capitalize() for day_type in DAY_TYPES]
+        if period == "day_type_hour":
+            return (day_types * 24 + hours,
+                    [f"{day_type}_{hour}" for day_type in DAY_TYPES for hour in hour_ids],
+                    [f"{day_type.capitalize()} {label}" for day_type in DAY_TYPES for label in hour_labels])
+        if period == "month":
+            months, codes = np.unique(self.event_times.astype("datetime64[M]"), return_inverse=True)
+            months = [datetime.strptime(str(month), "%Y-%m") for month in months]
+            return codes, [f"{month:%Y-%m}" for month in months], [f"{month:%B %Y}" for month in months]
+        raise ValueError(f"Unsupported period: {period}, expected one of {list(StationPeriod.__args__)}")
+
+    def aggregate(self, period: StationPeriod = DEFAULT_STATION_PERIOD) -> Dict[str, np.ndarray]:
+        """
+        Aggregate the events of every station by period, see period_codes.
+
+        Returns:
+            Dict[str, np.ndarray]: One row per station and period with events: "station" (index in station_ids),
+                "period" (code), "departures", "arrivals", "net_flow", "mean_inventory" (mean number of bikes
+                after the events of the period) and "last_event" (datetime64[ns]).
+        """
+        codes, period_ids, _ = self.period_codes(period)
+        keys = self.event_stations * len(period_ids) + codes
+        groups, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(groups))
+        arrivals = np.bincount(inverse, weights=self.event_deltas > 0, minlength=len(groups)).astype(np.int64)
+        last_event = np.full(len(groups), np.iinfo(np.int64).min)
+        np.maximum.at(last_event, inverse, self.event_times.astype(np.int64))
+        return {
+            "station": groups // len(period_ids),
+            "period": groups % len(period_ids),
+            "departures": counts - arrivals,
+            "arrivals": arrivals,
+            "net_flow": 2 * arrivals - counts,
+            "mean_inventory": np.bincount(inverse, weights=self.inventory, minlength=len(groups)) / counts,
+            "last_event": last_event.astype("datetime64[ns]"),
+        }
+
+    def to_status_periods(self, period: StationPeriod = DEFAULT_STATION_PERIOD) -> List[StationStatusPeriod]:
+        """
+        Convert the aggregated periods to StationStatusPeriod rows, ordered by station then period.
+        Only the trip counts are filled: the availability and the station flags are not observed in the trips,
+        and are left unset.
+        """
+        _, period_ids, period_labels = self.period_codes(period)
+        rows = self.aggregate(period)
+        return [
+            StationStatusPeriod(
+                station_id=self.station_ids[station],
+                period_id=period_ids[code],
+                period_label=period_labels[code],
+                num_departures=departures,
+                num_arrivals=arrivals,
+                net_flow=net_flow,
+            )
+            for station, code, departures, arrivals, net_flow in zip(
+                rows["station"].tolist(), rows["period"].tolist(), rows["departures"].tolist(),
+                rows["arrivals"].tolist(), rows["net_flow"].tolist())
+        ]
+
+    def histories(self, period: StationPeriod = DEFAULT_STATION_PERIOD) -> List[List[StationStatusPeriod]]:
+        """
+        StationStatusPeriod rows of every station, aligned with station_ids, in period order.
+        Stations without events have no row.
+        """
+        histories = [[] for _ in range(len(self.station_ids))]
+        rows = self.to_status_periods(period)
+        for station, status in zip(self.aggregate(period)["station"].tolist(), rows):
+            histories[station].append(status)
+        return histories
+
+    def history_by_station(self, period: StationPeriod = DEFAULT_STATION_PERIOD
+                           ) -> Dict[str, List[StationStatusPeriod]]:
+        """
+        StationStatusPeriod rows of every station by station identifier, see histories.
+        """
+        return dict(zip(self.station_ids.tolist(), self.histories(period)))
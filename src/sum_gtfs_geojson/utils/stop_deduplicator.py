@@ -0,0 +1,112 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import math
+from sum_gtfs_geojson.models import Stop
+from sum_gtfs_geojson.models.gtfs.gtfs_network import DEFAULT_MERGE_DISTANCE_M, DEFAULT_MERGE_NAME_SIMILARITY
+from .stop_matcher import normalize_stop_name, name_similarity
+
+METERS_PER_DEGREE = 111_320.0
+
+
+def stop_name_similarity(name: str, other: str) -> float:
+    """
+    Similarity of two normalized stop names, from 0 to 1. A name whose words are all in the other name
+    is fully similar, as feeds often add the stop type to the name, e.g. "cornavin" and "cornavin gare".
+    """
+    if name == other:
+        return 1.0
+    if not name or not other:
+        return 0.0
+    words, other_words = set(name.split()), set(other.split())
+    if words <= other_words or other_words <= words:
+        return 1.0
+    return name_similarity(name, other)
+
+
+class StopDeduplicator:
+    """
+    Finds the stops of different feeds describing the same place: the same location type, within a distance
+    and with similar names, e.g. a border station served by a Swiss and a French operator.
+
+    The kept stops are indexed in a spatial hash grid whose cells are as wide as the merge distance, so every
+    stop is compared with the stops of its 3x3 neighbor cells only, and a whole merge runs in linear time.
+    Stops of the same feed are never merged, a feed being consistent on its own.
+
+    Usage:
+        deduplicator = StopDeduplicator(distance_m=50)
+        for feed, stops in enumerate(feeds_stops):
+            for stop in stops:
+                kept_stop_id = deduplicator.add(stop, feed)  # None when the stop is kept
+
+    Attributes:
+        distance_m (float): Maximum distance between two merged stops, in meters.
+        name_similarity (float): Minimum similarity of the names of two merged stops, from 0 to 1.
+    """
+
+    def __init__(self, distance_m: float = DEFAULT_MERGE_DISTANCE_M,
+                 name_similarity: float = DEFAULT_MERGE_NAME_SIMILARITY):
+        if distance_m <= 0:
+            raise ValueError(f"The merge distance must be positive, got {distance_m}")
+        self.distance_m = distance_m
+        self.name_similarity = name_similarity
+        self._cells: Dict[Tuple[int, int], List[Tuple[Stop, int, str]]] = defaultdict(list)
+        self._meters_per_degree_lon: Optional[float] = None
+
+    def _cell(self, stop: Stop) -> Tuple[int, int]:
+        """
+        Grid cell of the stop, on an equirectangular projection in meters at the latitude of the first stop.
+        """
+        if self._meters_per_degree_lon is None:
+            self._meters_per_degree_lon = METERS_PER_DEGREE * math.cos(math.radians(stop.stop_lat))
+        return (math.floor(stop.stop_lon * self._meters_per_degree_lon / self.distance_m),
+                math.floor(stop.stop_lat * METERS_PER_DEGREE / self.distance_m))
+
+    @staticmethod
+    def stop_distance_m(stop: Stop, other: Stop) -> float:
+        """
+        Distance between two close stops, in meters.
+        """
+        x = (other.stop_lon - stop.stop_lon) * math.cos(math.radians((stop.stop_lat + other.stop_lat) / 2))
+        return math.hypot(x, other.stop_lat - stop.stop_lat) * METERS_PER_DEGREE
+
+    def find(self, stop: Stop, group: int) -> Optional[Stop]:
+        """
+        Kept stop of another group describing the same place as the stop, the closest one when there are many.
+
+        Args:
+            stop (Stop): The stop.
+            group (int): Group of the stop, e.g. the index of its feed.
+
+        Returns:
+            Stop: The duplicated stop, None when the stop is not a duplicate.
+        """
+        cell_x, cell_y = self._cell(stop)
+        name = normalize_stop_name(stop.stop_name)
+        location_type = stop.location_type or 0
+        best, best_distance = None, self.distance_m
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for other, other_group, other_name in self._cells.get((cell_x + dx, cell_y + dy), ()):
+                    if other_group == group or (other.location_type or 0) != location_type:
+                        continue
+                    distance = self.stop_distance_m(stop, other)
+                    if distance <= best_distance and stop_name_similarity(name, other_name) >= self.name_similarity:
+                        best, best_distance = other, distance
+        return best
+
+    def add(self, stop: Stop, group: int) -> Optional[str]:
+        """
+        Index the stop, unless it duplicates a kept stop of another group.
+
+        Args:
+            stop (Stop): The stop.
+            group (int): Group of the stop, e.g. the index of its feed.
+
+        Returns:
+            str: Identifier of the kept stop the stop duplicates, None when the stop is kept.
+        """
+        duplicated = self.find(stop, group)
+        if duplicated is not None:
+            return duplicated.stop_id
+        self._cells[self._cell(stop)].append((stop, group, normalize_stop_name(stop.stop_name)))
+        return None
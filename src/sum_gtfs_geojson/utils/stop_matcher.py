@@ -0,0 +1,281 @@
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+from difflib import SequenceMatcher
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from sum_gtfs_geojson.models import IdDictionary, Ridership, Stop
+from sum_gtfs_geojson.exporter import atomic_write
+from .geo_toolkit import GeoToolkit
+
+DEFAULT_MATCH_TOLERANCE_M = 150
+DEFAULT_MATCH_CANDIDATES = 8
+DEFAULT_NAME_SIMILARITY = 0.6
+DEFAULT_NAME_RADIUS_M = 2000
+MATCH_METHODS = ("code", "nearest", "name")
+MATCH_TABLE_COLUMNS = ("stop_code", "stop_id", "method", "distance_m", "name_similarity")
+
+
+def normalize_stop_name(name: Optional[str]) -> str:
+    """
+    Normalize a stop name for comparison: accents removed, lower case, punctuation as spaces, and the
+    "Locality, " prefix of the Swiss GTFS names dropped, e.g. "Genève, 31-Décembre" gives "31 decembre".
+    """
+    if not name:
+        return ""
+    name = name.rsplit(", ", 1)[-1]
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join(re.findall(r"[a-z0-9]+", name))
+
+
+def name_similarity(first: str, second: str) -> float:
+    """
+    Similarity of two normalized stop names, from 0 to 1, see difflib.SequenceMatcher.ratio.
+    """
+    if not first or not second:
+        return 0.0
+    return SequenceMatcher(None, first, second).ratio()
+
+
+class StopMatchTable:
+    """
+    Mapping table from ridership stop codes to GTFS stop ids, built once by StopMatcher and reused by every
+    query: lookups are binary searches on the sorted codes.
+
+    Attributes:
+        stop_codes (np.ndarray): Sorted ridership stop codes.
+        stop_ids (np.ndarray): Matched GTFS stop id of every code, "" when unmatched.
+        methods (np.ndarray): How every code was matched, "code", "nearest" or "name", "" when unmatched.
+        distances_m (np.ndarray): Distance to the matched stop in metres, NaN when unknown.
+        similarities (np.ndarray): Normalized name similarity with the matched stop, from 0 to 1.
+    """
+
+    def __init__(self, stop_codes: np.ndarray, stop_ids: np.ndarray, methods: np.ndarray,
+                 distances_m: np.ndarray, similarities: np.ndarray):
+        order = np.argsort(stop_codes, kind="stable")
+        self.stop_codes = np.asarray(stop_codes, dtype=str)[order]
+        self.stop_ids = np.asarray(stop_ids, dtype=str)[order]
+        self.methods = np.asarray(methods, dtype=str)[order]
+        self.distances_m = np.asarray(distances_m, dtype=np.float64)[order]
+        self.similarities = np.asarray(similarities, dtype=np.float64)[order]
+
+    def __len__(self) -> int:
+        return len(self.stop_codes)
+
+    def lookup(self, stop_codes: Iterable[str]) -> np.ndarray:
+        """
+        GTFS stop ids of ridership stop codes, e.g. the stop_code dictionary of a RidershipCube.
+
+        Returns:
+            np.ndarray: The stop id of every code, "" for unknown or unmatched codes.
+        """
+        stop_codes = np.asarray(list(stop_codes), dtype=str)
+        if not len(self):
+            return np.full(len(stop_codes), "", dtype=str)
+        positions = np.minimum(np.searchsorted(self.stop_codes, stop_codes), len(self) - 1)
+        return np.where(self.stop_codes[positions] == stop_codes, self.stop_ids[positions], "")
+
+    def lookup_codes(self, stop_codes: Iterable[str], ids: IdDictionary) -> np.ndarray:
+        """
+        Codes of the GTFS stops of ridership stop codes in the IdDictionary of the network, e.g. to join the
+        ridership with the stop codes of the StopTimeTable without comparing identifier strings.
+
+        Returns:
+            np.ndarray: int32 stop code of every ridership code, MISSING_CODE for unknown or unmatched codes.
+        """
+        return np.array([ids.code("stop", stop_id) for stop_id in self.lookup(stop_codes).tolist()], dtype=np.int32)
+
+    def to_dict(self) -> Dict[str, str]:
+        """
+        Matched codes as a {stop_code: stop_id} dict.
+        """
+        return {code: stop_id for code, stop_id in zip(self.stop_codes.tolist(), self.stop_ids.tolist()) if stop_id}
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Number of codes matched by each method, and unmatched.
+        """
+        counts = {method: int((self.methods == method).sum()) for method in MATCH_METHODS}
+        counts["unmatched"] = int((self.methods == "").sum())
+        return counts
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(dict(zip(MATCH_TABLE_COLUMNS, (self.stop_codes, self.stop_ids, self.methods,
+                                                           self.distances_m, self.similarities))))
+
+    def save(self, filepath: str) -> str:
+        """
+        Save the table to a CSV file, reloadable with load.
+
+        Returns:
+            str: The file path.
+        """
+        with atomic_write(filepath, newline="", encoding="utf-8") as f:
+            self.to_dataframe().to_csv(f, index=False)
+        return filepath
+
+    @classmethod
+    def load(cls, filepath: str) -> "StopMatchTable":
+        """
+        Load a table saved with save.
+        """
+        table = pd.read_csv(filepath, dtype={"stop_code": str, "stop_id": str, "method": str},
+                            keep_default_na=False, na_values={"distance_m": [""], "name_similarity": [""]})
+        return cls(*(table[name].to_numpy() for name in MATCH_TABLE_COLUMNS))
+
+
+class StopMatcher:
+    """
+    Bulk matcher joining ridership stops to GTFS stops, in three passes over the distinct stop codes:
+
+    1. Exact code: the ridership code is a GTFS stop id, or is mapped to one by `code_aliases`.
+    2. Nearest: GTFS stops within the tolerance of the ridership stop position, found with a KD-tree;
+       the candidate with the most similar normalized name wins, then the nearest.
+    3. Name: nearest GTFS stop with the same normalized name within `name_radius_m`, for the codes without
+       candidate in the tolerance. A code without position only matches a name whose stops all lie within
+       `name_radius_m` of each other, the names shared by distant stops, e.g. "Gare" in several localities,
+       are ambiguous and left unmatched.
+
+    Usage:
+        matcher = StopMatcher(ums.public_transport.stops)
+        table = matcher.match_ridership(ums.ridership)
+        stop_ids = table.lookup(ums.ridership_cube.dictionaries["stop_code"])
+
+    Attributes:
+        stops (List[Stop]): The GTFS stops candidates to the matching.
+        tolerance_m (float): Maximum distance of the nearest pass, in metres.
+        candidates (int): Number of nearest stops compared by name in the nearest pass.
+        min_name_similarity (float): Minimum name similarity for a stop beyond the nearest to win on name.
+        name_radius_m (float): Maximum distance, or spread of the stops of a name, of the name pass, in metres.
+    """
+
+    def __init__(self, stops: List[Stop], tolerance_m: float = DEFAULT_MATCH_TOLERANCE_M,
+                 location_types: Optional[Sequence[int]] = (0,),
+                 code_aliases: Optional[Mapping[str, str]] = None,
+                 candidates: int = DEFAULT_MATCH_CANDIDATES,
+                 min_name_similarity: float = DEFAULT_NAME_SIMILARITY,
+                 name_radius_m: float = DEFAULT_NAME_RADIUS_M):
+        """
+        Index the GTFS stops once, by id, position and normalized name.
+
+        Args:
+            stops: The GTFS stops.
+            tolerance_m: Maximum distance of the nearest pass, in metres. Defaults to 150.
+            location_types: Location types of the candidate stops. Defaults to (0,), the stops and platforms
+                referenced by the stop times, None for all.
+            code_aliases: Optional {ridership stop code: GTFS stop id} mapping checked in the code pass.
+            candidates: Number of nearest stops compared by name. Defaults to 8.
+            min_name_similarity: Minimum name similarity for a farther stop to win on name. Defaults to 0.6.
+            name_radius_m: Maximum distance of the name pass, in metres. Defaults to 2000.
+        """
+        self.stops = [s for s in stops
+                      if location_types is None or (s.location_type or 0) in location_types]
+        self.tolerance_m = tolerance_m
+        self.candidates = candidates
+        self.min_name_similarity = min_name_similarity
+        self.name_radius_m = name_radius_m
+        self.code_aliases = dict(code_aliases or {})
+        self._ids = {s.stop_id.strip().upper(): i for i, s in enumerate(self.stops)}
+        self._names = [normalize_stop_name(s.stop_name) for s in self.stops]
+        self._by_name: Dict[str, List[int]] = {}
+        for i, name in enumerate(self._names):
+            if name:
+                self._by_name.setdefault(name, []).append(i)
+        latitudes = np.array([s.stop_lat for s in self.stops], dtype=np.float64)
+        longitudes = np.array([s.stop_lon for s in self.stops], dtype=np.float64)
+        self._origin_latitude = float(np.mean(latitudes)) if len(latitudes) else 0.0
+        self._tree = cKDTree(GeoToolkit.local_xy(longitudes, latitudes, self._origin_latitude)) if self.stops else None
+
+    def _name_match(self, name: str, xy: np.ndarray) -> int:
+        """
+        Nearest stop with the normalized name within name_radius_m of xy or, when xy is unknown, the first stop of
+        a name whose stops are all within name_radius_m of each other. -1 when missing, too far or ambiguous.
+        """
+        stops = self._by_name.get(name)
+        if not stops:
+            return -1
+        stops_xy = self._tree.data[stops]
+        if np.isnan(xy).any():
+            spread = np.hypot(*np.ptp(stops_xy, axis=0))
+            return stops[0] if spread <= self.name_radius_m else -1
+        distances = np.hypot(*(stops_xy - xy).T)
+        nearest = int(np.argmin(distances))
+        return stops[nearest] if distances[nearest] <= self.name_radius_m else -1
+
+    def _code_match(self, code: str) -> int:
+        stop_id = self.code_aliases.get(code, code)
+        return self._ids.get(stop_id.strip().upper(), -1)
+
+    def match(self, stop_codes: Sequence[str], stop_names: Sequence[str], latitudes: Sequence[float],
+              longitudes: Sequence[float]) -> StopMatchTable:
+        """
+        Match distinct ridership stops to the GTFS stops.
+
+        Args:
+            stop_codes: Codes of the ridership stops, distinct.
+            stop_names: Names of the ridership stops.
+            latitudes: Latitudes of the ridership stops, NaN when unknown.
+            longitudes: Longitudes of the ridership stops, NaN when unknown.
+
+        Returns:
+            StopMatchTable: The mapping table of the codes.
+        """
+        count = len(stop_codes)
+        matched = np.full(count, -1, dtype=np.int64)
+        methods = np.full(count, "", dtype=object)
+        distances = np.full(count, np.nan)
+        similarities = np.full(count, np.nan)
+        names = [normalize_stop_name(name) for name in stop_names]
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        xy = GeoToolkit.local_xy(longitudes, latitudes, self._origin_latitude)
+
+        for i, code in enumerate(stop_codes):
+            matched[i] = self._code_match(code)
+        methods[matched >= 0] = "code"
+
+        pending = np.flatnonzero((matched < 0) & ~np.isnan(xy).any(axis=1))
+        if self._tree is not None and len(pending):
+            k = min(self.candidates, len(self.stops))
+            found_distances, found = self._tree.query(xy[pending], k=k, distance_upper_bound=self.tolerance_m)
+            found_distances, found = found_distances.reshape(len(pending), k), found.reshape(len(pending), k)
+            for row, i in enumerate(pending.tolist()):
+                in_range = found[row] < len(self.stops)  # cKDTree returns n beyond the bound
+                if not in_range.any():
+                    continue
+                # candidates are sorted by distance, so the max keeps the nearest of the most similar names
+                scores = [name_similarity(names[i], self._names[stop]) for stop in found[row][in_range].tolist()]
+                best = int(np.argmax(scores))
+                if scores[best] < self.min_name_similarity:
+                    best = 0
+                matched[i] = found[row][in_range][best]
+                methods[i] = "nearest"
+                similarities[i] = scores[best]
+
+        for i in np.flatnonzero(matched < 0).tolist():
+            stop = self._name_match(names[i], xy[i])
+            if stop >= 0:
+                matched[i] = stop
+                methods[i] = "name"
+
+        located = np.flatnonzero(matched >= 0)
+        if len(located):
+            stops_xy = self._tree.data[matched[located]]
+            distances[located] = np.hypot(*(xy[located] - stops_xy).T)
+            for i in located[np.isnan(similarities[located])].tolist():
+                similarities[i] = name_similarity(names[i], self._names[matched[i]])
+        stop_ids = np.array([self.stops[stop].stop_id if stop >= 0 else "" for stop in matched.tolist()], dtype=str)
+        return StopMatchTable(np.asarray(stop_codes, dtype=str), stop_ids, methods.astype(str), distances,
+                              similarities)
+
+    def match_ridership(self, ridership: List[Ridership]) -> StopMatchTable:
+        """
+        Match the distinct stop codes of ridership records, the first record of a code giving its name
+        and position.
+        """
+        stops: Dict[str, Ridership] = {}
+        for record in ridership:
+            stops.setdefault(record.stop_code, record)
+        return self.match(list(stops), [r.stop_name for r in stops.values()],
+                          [r.stop_lat for r in stops.values()], [r.stop_lon for r in stops.values()])
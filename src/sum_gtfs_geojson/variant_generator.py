@@ -0,0 +1,289 @@
+from dataclasses import dataclass
+from itertools import product
+from typing import Dict, Iterator, List, Optional, Sequence
+import argparse
+import logging
+import os
+from pathlib import Path
+import numpy as np
+import shapely
+from sum_gtfs_geojson.enums import LivingLabsCity, DataType
+from sum_gtfs_geojson.exporter import ExportReport, run_export_tasks
+from sum_gtfs_geojson.instrumentation import stage
+from sum_gtfs_geojson.models import UrbanMobilitySystem, GTFSNetwork
+from sum_gtfs_geojson.models.gtfs import Itinerary
+from sum_gtfs_geojson.utils import StationPeriod
+from sum_gtfs_geojson.shared_mobility_manager import (DEFAULT_DATA_TYPES, DEFAULT_OUTPUT_JSON_FILES_PATH,
+                                                      get_city_loader, get_default_geojson_path)
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6378137.0  # web mercator sphere, as the EPSG:3857 buffer used by the loaders
+
+
+@dataclass(frozen=True)
+class Variant:
+    """
+    A filter/grid configuration of the exported data, as set on SharedMobilityManager.
+
+    Attributes:
+        restrict_country_boundaries (bool): Keep only the positions within the country.
+        distance_radius_km (Optional[float]): Keep only the positions within this radius of the city center.
+        grid_resolution (Optional[int]): Resolution of the hex grid.
+    """
+    restrict_country_boundaries: bool = False
+    distance_radius_km: Optional[float] = None
+    grid_resolution: Optional[int] = 8
+
+
+class _PositionFlags:
+    """
+    Per-row filter values of a list of positions: projected distance to the city center and in-country flag.
+    """
+
+    def __init__(self, latitudes: Sequence[Optional[float]], longitudes: Sequence[Optional[float]],
+                 center: tuple, country=None):
+        latitudes, longitudes = _coordinates(latitudes), _coordinates(longitudes)
+        self.located = ~(np.isnan(latitudes) | np.isnan(longitudes))
+        center_lat, center_lon = center
+        # Distance in EPSG:3857 meters, the projection used by AbstractLoader.is_location_within_radius
+        x, y = _to_web_mercator(latitudes, longitudes)
+        center_x, center_y = _to_web_mercator(np.array([center_lat]), np.array([center_lon]))
+        self.distance_m = np.hypot(x - center_x[0], y - center_y[0])
+        self.within_country = None
+        if country is not None:
+            self.within_country = np.zeros(len(latitudes), dtype=bool)
+            self.within_country[self.located] = shapely.contains_xy(
+                country, longitudes[self.located], latitudes[self.located])
+
+    def mask(self, variant: Variant) -> np.ndarray:
+        """
+        Rows kept by the loader for the variant filters, see AbstractLoader.position_is_valid.
+        """
+        mask = self.located.copy()
+        if variant.restrict_country_boundaries:
+            mask &= self.within_country
+        if variant.distance_radius_km is not None:
+            mask &= self.distance_m <= variant.distance_radius_km * 1000
+        return mask
+
+
+def _coordinates(values: Sequence[Optional[float]]) -> np.ndarray:
+    if isinstance(values, np.ndarray):
+        return values.astype(np.float64)
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _to_web_mercator(latitudes: np.ndarray, longitudes: np.ndarray):
+    x = EARTH_RADIUS_M * np.radians(longitudes)
+    y = EARTH_RADIUS_M * np.log(np.tan(np.pi / 4 + np.radians(latitudes) / 2))
+    return x, y
+
+
+class VariantGenerator:
+    """
+    Generate several filter/grid variants of a city data from a single load.
+
+    Creating a SharedMobilityManager per variant re-reads every file and re-runs the filters.
+    Instead, the raw data is loaded once without any filter, the distance to the city center and
+    the in-country flag of every row are computed in a vectorized pass, and each variant
+    (radius x country flag x grid resolution) is derived by masking the loaded lists.
+    Each variant is saved to the same folder as with SharedMobilityManager, see get_default_geojson_path.
+
+    Usage:
+        generator = VariantGenerator(radii_km=[None, 1, 5], country_flags=[False, True], grid_resolutions=[8, 9])
+        reports = generator.save_to_geojson(parallel=True)
+    """
+
+    def __init__(self,
+                 city: LivingLabsCity = LivingLabsCity.GENEVA,
+                 data_types: Optional[List[DataType]] = DEFAULT_DATA_TYPES,
+                 radii_km: Sequence[Optional[float]] = (None,),
+                 country_flags: Sequence[bool] = (False,),
+                 grid_resolutions: Sequence[Optional[int]] = (8,),
+                 grid_pyramid_resolutions: Optional[List[int]] = None,
+                 station_history_period: Optional[StationPeriod] = None):
+        """
+        Load the city data once, for all the variants.
+        Args:
+            city (LivingLabsCity, optional): The city of the data. Defaults to LivingLabsCity.GENEVA.
+            data_types (list[DataType], optional): List of data types to load. Defaults to all data types.
+            radii_km (list[float], optional): Distance radius of each variant in kilometers, None for no radius filter. Defaults to [None].
+            country_flags (list[bool], optional): Country restriction of each variant. Defaults to [False].
+            grid_resolutions (list[int], optional): Hex grid resolution of each variant. Defaults to [8]. Will apply only if HEX_GRID is included in data_types.
+            grid_pyramid_resolutions (list[int], optional): Coarser resolutions rolled up from every grid. Defaults to None, no pyramid.
+            station_history_period (str, optional): Period of the bike station history of every variant, rebuilt from the trips of the variant, see AbstractLoader. Defaults to None, no history.
+        """
+        data_types = list(DataType) if data_types is None else list(data_types)
+        self.city = city
+        self.data_types = data_types
+        self.radii_km = list(radii_km)
+        self.country_flags = list(country_flags)
+        self.grid_resolutions = list(grid_resolutions) if DataType.HEX_GRID in data_types else [None]
+        self.grid_pyramid_resolutions = grid_pyramid_resolutions
+        self.station_history_period = station_history_period
+
+        # Unfiltered load, the hex grid and the station history are built for every variant
+        self.loader = get_city_loader(city, restrict_country_boundaries=False, distance_radius_km=None,
+                                      grid_pyramid_resolutions=grid_pyramid_resolutions)
+        self.data = self.loader.load_all_data([t for t in data_types if t != DataType.HEX_GRID])
+
+        country = None
+        if any(self.country_flags):
+            country = self.loader.get_country_boundaries().union_all()
+            shapely.prepare(country)
+        center = self.loader.CITY_CENTER
+        stops = self.data.public_transport.stops
+        trips = self.data.bike_trip_store
+        self._flags = {
+            "stops": _PositionFlags([s.stop_lat for s in stops], [s.stop_lon for s in stops], center, country),
+            "bike_stations": _PositionFlags([s.lat for s in self.data.bike_stations],
+                                            [s.lon for s in self.data.bike_stations], center, country),
+            "ridership": _PositionFlags([r.stop_lat for r in self.data.ridership],
+                                        [r.stop_lon for r in self.data.ridership], center, country),
+            "bike_trips_start": _PositionFlags(trips["latitude_start"], trips["longitude_start"], center, country),
+            "bike_trips_end": _PositionFlags(trips["latitude_end"], trips["longitude_end"], center, country),
+        }
+
+    def variants(self) -> Iterator[Variant]:
+        """
+        Generate every requested combination of country flag, radius and grid resolution.
+        """
+        for country_flag, radius, resolution in product(self.country_flags, self.radii_km, self.grid_resolutions):
+            yield Variant(restrict_country_boundaries=country_flag, distance_radius_km=radius,
+                          grid_resolution=resolution)
+
+    def output_path(self, variant: Variant, output_root: str = DEFAULT_OUTPUT_JSON_FILES_PATH) -> str:
+        """
+        The folder of a variant, named as the SharedMobilityManager default GeoJSON path.
+        """
+        return get_default_geojson_path(self.city, self.data_types, variant.restrict_country_boundaries,
+                                        variant.distance_radius_km, variant.grid_resolution, output_root)
+
+    def build(self, variant: Variant) -> UrbanMobilitySystem:
+        """
+        Derive the data of a variant by masking the loaded data, as if loaded with the variant filters.
+        The bike station history is rebuilt from the trips kept by the variant, on copies of the stations.
+        """
+        stops = _select(self.data.public_transport.stops, self._flags["stops"].mask(variant))
+        bike_stations = _select(self.data.bike_stations, self._flags["bike_stations"].mask(variant))
+        trips_mask = self._flags["bike_trips_start"].mask(variant) & self._flags["bike_trips_end"].mask(variant)
+
+        network = self.data.public_transport
+        ums = UrbanMobilitySystem(
+            public_transport=GTFSNetwork(stops=stops, routes=network.routes, trips=network.trips,
+                                         stop_times=network.stop_times,
+                                         itineraries=_filter_itineraries(network.itineraries, stops)),
+            bike_stations=bike_stations,
+            ridership=_select(self.data.ridership, self._flags["ridership"].mask(variant)),
+            bike_trips=self.data.bike_trip_store.take(np.flatnonzero(trips_mask)).as_bike_trips(),
+            hex_grid=None
+        )
+        if (self.station_history_period is not None and DataType.BIKE_STATIONS in self.data_types
+                and DataType.BIKE_TRIPS in self.data_types):
+            ums.bike_stations = [station.model_copy() for station in bike_stations]
+            ums.build_bike_station_history(self.station_history_period)
+        if variant.grid_resolution is not None:
+            ums.hex_grid = self.loader.load_hex_grid(stops, bike_stations, variant.grid_resolution)
+            if self.grid_pyramid_resolutions:
+                ums.hex_pyramid = self.loader.load_hex_pyramid(ums.hex_grid)
+        return ums
+
+    def save_to_geojson(self, output_root: str = DEFAULT_OUTPUT_JSON_FILES_PATH, parallel: bool = False,
+                        max_workers: Optional[int] = None) -> Dict[str, ExportReport]:
+        """
+        Save every variant to GeoJSON files, one folder per variant.
+        Args:
+            output_root (str, optional): Prefix of the variant folders. Defaults to "data/sum_gtfs_geojson/geojson/".
+            parallel (bool, optional): Export the layers of all the variants concurrently, in a single process pool. Defaults to False.
+            max_workers (int, optional): Maximum number of worker processes for the parallel export. Defaults to the number of processors.
+        Returns:
+            Dict[str, ExportReport]: The export report of each variant folder.
+        """
+        reports = {}
+        tasks = []
+        for variant in self.variants():
+            output_path = self.output_path(variant, output_root)
+            with stage("build_variant", output_path=output_path):
+                ums = self.build(variant)
+            if parallel:
+                Path(output_path).mkdir(parents=True, exist_ok=True)
+                reports[output_path] = ExportReport(output_path=output_path, max_workers=max_workers)
+                tasks += ums._export_tasks(output_path)
+            else:
+                reports[output_path] = ums.save_to_geojson(output_path)
+
+        if parallel:
+            report = run_export_tasks(tasks, output_root, max_workers)
+            for layer in report.layers:
+                reports[os.path.dirname(layer.filepath)].layers.append(layer)
+            for variant_report in reports.values():
+                variant_report.total_seconds = report.total_seconds
+            logger.info(report.summary())
+        return reports
+
+
+def _select(items: list, mask: np.ndarray) -> list:
+    return [item for item, keep in zip(items, mask.tolist()) if keep]
+
+
+def _filter_itineraries(itineraries: List[Itinerary], stops: list) -> List[Itinerary]:
+    """
+    Keep the filtered stops of every itinerary, and the itineraries with at least two of them,
+    as GTFSNetwork.build_itineraries does with filtered stops.
+    """
+    stop_ids = {stop.stop_id for stop in stops}
+    filtered = []
+    for itinerary in itineraries:
+        itinerary_stops = [stop for stop in itinerary.stops if stop.stop_id in stop_ids]
+        if len(itinerary_stops) >= 2:
+            filtered.append(itinerary.model_copy(update={"stops": itinerary_stops}))
+    return filtered
+
+
+def _radius(value: str) -> Optional[float]:
+    if value.lower() == "none":
+        return None
+    radius = float(value)
+    return int(radius) if radius.is_integer() else radius  # "1km-radius" folder names, as the shipped variants
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Console entry point: generate the GeoJSON variants of a city from a single load.
+    """
+    parser = argparse.ArgumentParser(
+        prog="sum-gtfs-geojson-variants",
+        description="Load the data of a Living Lab once and save every radius x country x grid resolution variant.")
+    parser.add_argument("--city", default=LivingLabsCity.GENEVA.name, choices=[c.name for c in LivingLabsCity])
+    parser.add_argument("--data-types", nargs="+", default=[t.name for t in DEFAULT_DATA_TYPES],
+                        choices=[t.name for t in DataType])
+    parser.add_argument("--radius-km", nargs="+", type=_radius, default=[None],
+                        help="Distance radius of each variant in km, 'none' for no radius filter.")
+    parser.add_argument("--country", nargs="+", choices=["all", "within"], default=["all"],
+                        help="'all' keeps neighbouring countries, 'within' restricts to the country.")
+    parser.add_argument("--resolution", nargs="+", type=int, default=[8], help="Hex grid resolutions.")
+    parser.add_argument("--pyramid", nargs="+", type=int, default=None, help="Hex pyramid resolutions.")
+    parser.add_argument("--station-history", default=None, choices=["hour", "day_type", "day_type_hour", "month"],
+                        help="Period of the bike station history rebuilt from the trips of every variant.")
+    parser.add_argument("--output-root", default=DEFAULT_OUTPUT_JSON_FILES_PATH,
+                        help="Prefix of the variant folders.")
+    parser.add_argument("--parallel", action="store_true", help="Export the layers in a process pool.")
+    parser.add_argument("--max-workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")  # stages of the load
+
+    generator = VariantGenerator(city=LivingLabsCity[args.city],
+                                 data_types=[DataType[t] for t in args.data_types],
+                                 radii_km=args.radius_km,
+                                 country_flags=[c == "within" for c in args.country],
+                                 grid_resolutions=args.resolution,
+                                 grid_pyramid_resolutions=args.pyramid,
+                                 station_history_period=args.station_history)
+    reports = generator.save_to_geojson(args.output_root, parallel=args.parallel, max_workers=args.max_workers)
+    for output_path in reports:
+        print(f"Saved variant to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
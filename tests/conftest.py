@@ -0,0 +1,36 @@
+import pytest
+from sum_gtfs_geojson.benchmark.synthetic import SyntheticCity, SyntheticLoader
+from sum_gtfs_geojson.enums import DataType, LivingLabsCity
+from sum_gtfs_geojson.loader import CityConfig, get_city_config
+
+SYNTHETIC_SCALE = 0.02
+
+
+@pytest.fixture(scope="session")
+def synthetic_folder(tmp_path_factory) -> str:
+    """
+    Folder of a small synthetic Geneva, with the files of every data type.
+    """
+    folder = tmp_path_factory.mktemp("synthetic")
+    SyntheticCity(scale=SYNTHETIC_SCALE).write(str(folder))
+    return str(folder)
+
+
+@pytest.fixture(scope="session")
+def synthetic_system(synthetic_folder):
+    """
+    Every data type of the synthetic city, shared by the tests: do not modify it.
+    """
+    return SyntheticLoader(synthetic_folder).load_all_data(list(DataType))
+
+
+@pytest.fixture(scope="session")
+def synthetic_city_config():
+    """
+    Function giving the Geneva config reading the files of a synthetic city folder.
+    """
+    def city_config(folder: str) -> CityConfig:
+        return get_city_config(LivingLabsCity.GENEVA).replace(
+            gtfs=folder, bike_stations_file=f"{folder}/shared_bikes_stations.xlsx",
+            ridership_file=f"{folder}/ridership.csv", bike_trips_file=f"{folder}/shared_bikes_trips.csv")
+    return city_config
@@ -0,0 +1,92 @@
+import gzip
+import os
+import shutil
+from sum_gtfs_geojson import SharedMobilityManager
+from sum_gtfs_geojson.enums import DataType, LivingLabsCity
+from sum_gtfs_geojson.loader import ExportedDataLoader
+
+
+def _read_files(folder: str) -> dict:
+    files = {}
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name), "rb") as f:
+            files[name] = f.read()
+    return files
+
+
+def test_parallel_export_writes_the_sequential_files(synthetic_system, tmp_path):
+    sequential = synthetic_system.save_to_geojson(str(tmp_path / "sequential"))
+    parallel = synthetic_system.save_to_geojson(str(tmp_path / "parallel"), parallel=True, max_workers=2)
+
+    assert parallel.max_workers == 2
+    assert ({layer.name: layer.feature_count for layer in parallel.layers}
+            == {layer.name: layer.feature_count for layer in sequential.layers})
+    assert _read_files(str(tmp_path / "parallel")) == _read_files(str(tmp_path / "sequential"))
+
+
+def test_geoparquet_export_reloads_the_same_data(synthetic_system, tmp_path):
+    synthetic_system.save_to_geo_format(str(tmp_path), "geoparquet")
+    reloaded = ExportedDataLoader(str(tmp_path), "geoparquet").load_all_data()
+
+    def by_key(models, key):
+        return {key(model): model for model in models}
+
+    network = synthetic_system.public_transport
+    assert by_key(reloaded.public_transport.stops, lambda s: s.stop_id) == by_key(network.stops, lambda s: s.stop_id)
+    itinerary_key = lambda i: (i.route_id, i.direction_id)  # noqa: E731
+    assert (by_key(reloaded.public_transport.itineraries, itinerary_key)
+            == by_key(network.itineraries, itinerary_key))
+    assert (by_key(reloaded.bike_trips, lambda t: t.trip_id)
+            == by_key(synthetic_system.bike_trips, lambda t: t.trip_id))
+    assert {cell.h3_id: cell.metrics for cell in reloaded.hex_grid.cells} == \
+        {cell.h3_id: cell.metrics for cell in synthetic_system.hex_grid.cells}
+
+
+def test_incremental_export_skips_the_unchanged_layers(synthetic_folder, synthetic_city_config, tmp_path):
+    folder = shutil.copytree(synthetic_folder, tmp_path / "data")
+    output_path = str(tmp_path / "geojson")
+
+    def export():
+        manager = SharedMobilityManager(LivingLabsCity.GENEVA, [DataType.STOPS, DataType.BIKE_TRIPS],
+                                        city_config=synthetic_city_config(str(folder)))
+        return manager.save_to_geojson(output_path, incremental=True)
+
+    first = export()
+    assert {layer.name for layer in first.layers} == {"stops", "bike_trips", "od_trips"}
+
+    second = export()
+    assert not second.layers
+    assert set(second.skipped) == {"stops", "bike_trips", "od_trips"}
+
+    with open(folder / "shared_bikes_trips.csv") as f:
+        lines = f.readlines()
+    with open(folder / "shared_bikes_trips.csv", "w") as f:
+        f.writelines(lines[:-1])  # one trip less
+    third = export()
+    assert {layer.name for layer in third.layers} == {"bike_trips", "od_trips"}
+    assert third.skipped == ["stops"]
+
+
+def test_compressed_export_writes_the_sidecars(synthetic_system, tmp_path):
+    report = synthetic_system.save_to_geojson(str(tmp_path), compression=["gzip"])
+
+    assert report.layers
+    for layer in report.layers:
+        with open(layer.filepath, "rb") as f, gzip.open(layer.filepath + ".gz") as sidecar:
+            assert sidecar.read() == f.read()
+
+
+def test_edits_of_the_loaded_bike_trips_are_exported(synthetic_system):
+    trips = synthetic_system.bike_trip_store.as_bike_trips()  # as set by the loaders
+    system = synthetic_system.model_copy(update={"bike_trips": trips})
+    loaded = len(trips)
+
+    trips[0].vehicle_type = "cargo"
+    trips.append(trips[1].model_copy(update={"trip_id": "extra"}))
+
+    assert system.bike_trips[0].vehicle_type == "cargo"
+    store = system.bike_trip_store
+    assert len(store) == loaded + 1
+    assert "cargo" in store.columns["vehicle_type"] and "extra" in store.columns["trip_id"]
+    assert len(system.bike_trips_to_columnar()) == loaded + 1
+    assert system.model_dump()["bike_trips"][-1]["trip_id"] == "extra"
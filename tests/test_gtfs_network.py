@@ -0,0 +1,122 @@
+from collections import defaultdict
+from typing import List
+from sum_gtfs_geojson.models import GTFSNetwork, Route, Stop, StopTime, StopTimeSequence, Transfer, Trip
+from sum_gtfs_geojson.models.gtfs import Itinerary
+
+
+def _reference_itineraries(network: GTFSNetwork) -> List[Itinerary]:
+    """
+    Itineraries built with string joins, as before the identifiers were dictionary-encoded.
+    """
+    stop_lookup = {stop.stop_id: stop for stop in network.stops}
+    stop_times_by_trip = defaultdict(list)
+    for stop_time in network.stop_times:
+        stop_times_by_trip[stop_time.trip_id].append(stop_time)
+    trip_by_route_dir = {}
+    for trip in network.trips:
+        trip_by_route_dir.setdefault((trip.route_id, trip.direction_id or 0), trip)
+    route_lookup = {route.route_id: route for route in network.routes}
+
+    itineraries = []
+    for (route_id, direction_id), trip in trip_by_route_dir.items():
+        stop_times = sorted(stop_times_by_trip[trip.trip_id], key=lambda st: st.stop_sequence)
+        stops = [stop_lookup[st.stop_id] for st in stop_times if st.stop_id in stop_lookup]
+        if len(stops) < 2:
+            continue
+        route = route_lookup.get(route_id)
+        itineraries.append(Itinerary(
+            route_id=route_id, direction_id=direction_id, trip_id=trip.trip_id, headsign=trip.trip_headsign,
+            route_short_name=route.route_short_name if route else None,
+            route_long_name=route.route_long_name if route else None,
+            route_type=route.route_type if route else None,
+            color=route.route_color if route else None,
+            text_color=route.route_text_color if route else None,
+            stops=stops))
+    return itineraries
+
+
+def _small_network(stop_ids, latitude: float = 46.2) -> GTFSNetwork:
+    stops = [Stop(stop_id=stop_id, stop_name=f"Stop {stop_id}", stop_lat=latitude + index * 0.01, stop_lon=6.14)
+             for index, stop_id in enumerate(stop_ids)]
+    return GTFSNetwork(
+        stops=stops,
+        routes=[Route(route_id="R", route_short_name="1", route_long_name="Line 1", route_type=3)],
+        trips=[Trip(route_id="R", service_id="S", trip_id="T", direction_id=0)],
+        stop_times=[StopTime(trip_id="T", arrival_time="08:00:00", departure_time="08:00:00", stop_id=stop_id,
+                             stop_sequence=index + 1) for index, stop_id in enumerate(stop_ids)],
+        transfers=[Transfer(from_stop_id=stop_ids[0], to_stop_id=stop_ids[1], transfer_type=2)])
+
+
+def test_itineraries_match_the_string_joins(synthetic_system):
+    network = synthetic_system.public_transport
+    assert network.itineraries
+    assert network.itineraries == _reference_itineraries(network)
+
+
+def test_itineraries_of_a_stop_time_list_match_the_loaded_sequence(synthetic_system):
+    loaded = synthetic_system.public_transport
+    assert isinstance(loaded.stop_times, StopTimeSequence)
+    network = GTFSNetwork(stops=loaded.stops, routes=loaded.routes, trips=loaded.trips,
+                          stop_times=list(loaded.stop_times))
+
+    assert network.stop_times == loaded.stop_times
+    assert network.build_itineraries(network.stops, network.stop_times, network.trips, network.routes) \
+        == loaded.itineraries
+
+
+def test_stop_time_table_follows_the_replaced_stop_times():
+    network = _small_network(["A", "B", "C"])
+    assert len(network.stop_time_table) == 3
+
+    network.stop_times = [st.model_copy(update={"stop_id": "B" if st.stop_id == "A" else st.stop_id})
+                          for st in network.stop_times]  # same length, another list
+    codes = network.stop_time_table.trip_stop_codes(network.ids.code("trip", "T"))
+    assert network.ids.decode_values("stop", codes) == ["B", "B", "C"]
+
+
+def test_edits_of_the_loaded_stop_times_are_kept():
+    network = _small_network(["A", "B", "C"])
+    network.stop_times = network.stop_time_table.as_stop_times()  # as set by the loaders
+    network.stop_time_table = network.stop_times.table
+
+    network.stop_times[0].stop_id = "B"
+    network.stop_times.append(StopTime(trip_id="T", arrival_time="08:30:00", departure_time="08:30:00",
+                                       stop_id="A", stop_sequence=4))
+
+    assert [st.stop_id for st in network.stop_times] == ["B", "B", "C", "A"]
+    codes = network.stop_time_table.trip_stop_codes(network.ids.code("trip", "T"))
+    assert network.ids.decode_values("stop", codes) == ["B", "B", "C", "A"]
+    assert [st["stop_id"] for st in network.model_dump()["stop_times"]] == ["B", "B", "C", "A"]
+
+
+def test_merge_deduplicates_the_stops_of_the_same_network(synthetic_system):
+    network = synthetic_system.public_transport
+    merged = GTFSNetwork.merge([network, network], ["ch", "fr"])
+
+    assert len(merged.stops) == len(network.stops)
+    assert {stop.stop_id for stop in merged.stops} == {f"ch:{stop.stop_id}" for stop in network.stops}
+    assert len(merged.stop_times) == 2 * len(network.stop_times)
+    kept = {stop.stop_id for stop in merged.stops}
+    assert all(stop_time.stop_id in kept for stop_time in merged.stop_times)
+    assert all(stop.stop_id in kept for itinerary in merged.itineraries for stop in itinerary.stops)
+
+    merged.build_itineraries(merged.stops, merged.stop_times, merged.trips, merged.routes)
+    assert merged.itineraries == _reference_itineraries(merged)
+    assert len(merged.itineraries) == 2 * len(network.itineraries)
+
+
+def test_merge_unifies_the_transfers_and_keeps_distant_stops():
+    first = _small_network(["A", "B", "C"])
+    second = _small_network(["X", "Y"])  # other ids, at the places and with the names of A and B
+    second.stops = [stop.model_copy(update={"stop_name": f"Stop {name}"}) for stop, name in zip(second.stops, "AB")]
+    distant = _small_network(["A", "B"], latitude=47.0)
+
+    merged = GTFSNetwork.merge([first, second, distant], ["ch", "fr", "far"])
+
+    assert {stop.stop_id for stop in merged.stops} == {"ch:A", "ch:B", "ch:C", "far:A", "far:B"}
+    assert [(t.from_stop_id, t.to_stop_id) for t in merged.transfers] == [("ch:A", "ch:B"), ("far:A", "far:B")]
+    fr_stop_ids = [st.stop_id for st in merged.stop_times if st.trip_id == "fr:T"]
+    assert fr_stop_ids == ["ch:A", "ch:B"]
+    merged.build_itineraries(merged.stops, merged.stop_times, merged.trips, merged.routes)
+    assert {i.trip_id: [s.stop_id for s in i.stops] for i in merged.itineraries} == {
+        "ch:T": ["ch:A", "ch:B", "ch:C"], "fr:T": ["ch:A", "ch:B"], "far:T": ["far:A", "far:B"]}
@@ -0,0 +1,40 @@
+import numpy as np
+from h3.api import basic_int as h3_int
+import h3
+from shapely.geometry import Point, Polygon
+from sum_gtfs_geojson.utils import GeoToolkit
+
+
+def test_hex_grid_cells_are_located_at_their_h3_ids(synthetic_system):
+    # the H3 ids were computed from swapped (lng, lat) vertices, giving plausible polygons for cells elsewhere
+    stops = synthetic_system.public_transport.stops
+    grid = GeoToolkit.generate_hex_grid([Point(s.stop_lon, s.stop_lat) for s in stops], 8)
+
+    assert grid.cells
+    for cell in grid.cells:
+        lon, lat = cell.center
+        assert h3.latlng_to_cell(lat, lon, 8) == cell.h3_id
+        assert Polygon(cell.polygon).contains(Point(lon, lat))
+        assert 5.5 < lon < 6.8 and 45.9 < lat < 46.6  # around Geneva, not with the coordinates swapped
+
+
+def test_hex_grid_covers_the_cells_of_the_points(synthetic_system):
+    stops = synthetic_system.public_transport.stops
+    grid = GeoToolkit.generate_hex_grid([Point(s.stop_lon, s.stop_lat) for s in stops], 8)
+
+    cells = GeoToolkit.points_to_cells([s.stop_lat for s in stops], [s.stop_lon for s in stops], 8)
+    assert set(h3_int.int_to_str(cell) for cell in cells.tolist()) <= {cell.h3_id for cell in grid.cells}
+
+
+def test_hex_pyramid_levels_roll_up_the_finest_grid(synthetic_system):
+    grid = synthetic_system.hex_grid
+    pyramid = GeoToolkit.generate_hex_pyramid(grid, [6, 7])
+
+    for resolution in (6, 7):
+        level = pyramid.levels[resolution]
+        parents = {h3.cell_to_parent(cell.h3_id, resolution) for cell in grid.cells}
+        assert {cell.h3_id for cell in level.cells} == parents
+        for name in grid.metric_names:
+            assert (sum(cell.metrics[name] for cell in level.cells)
+                    == sum(cell.metrics.get(name, 0) for cell in grid.cells))
+    assert np.all([h3.get_resolution(cell.h3_id) == 6 for cell in pyramid.levels[6].cells])